@@ -0,0 +1,160 @@
+"""
+Just enough of the Ethereum ABI to decode the HealthSecure contract events.
+
+Event definitions come from the compiler metadata in ``contracts/metadata``
+(the files the deploy scripts push to IPFS). Topics are the Keccak-256 of
+the event signature. Keccak is not in ``hashlib`` (its ``sha3_256`` pads
+differently), so a small implementation lives here. It hashes only the
+handful of signatures at startup and never runs per log.
+"""
+
+import json
+from collections import namedtuple
+from pathlib import Path
+
+_MASK = (1 << 64) - 1
+
+_ROUND_CONSTANTS = (
+    0x0000000000000001, 0x0000000000008082, 0x800000000000808A, 0x8000000080008000,
+    0x000000000000808B, 0x0000000080000001, 0x8000000080008081, 0x8000000000008009,
+    0x000000000000008A, 0x0000000000000088, 0x0000000080008009, 0x000000008000000A,
+    0x000000008000808B, 0x800000000000008B, 0x8000000000008089, 0x8000000000008003,
+    0x8000000000008002, 0x8000000000000080, 0x000000000000800A, 0x800000008000000A,
+    0x8000000080008081, 0x8000000000008080, 0x0000000080000001, 0x8000000080008008,
+)
+
+# Rotation offsets, indexed [x][y]
+_ROTATIONS = (
+    (0, 36, 3, 41, 18),
+    (1, 44, 10, 45, 2),
+    (62, 6, 43, 15, 61),
+    (28, 55, 25, 21, 56),
+    (27, 20, 39, 8, 14),
+)
+
+_RATE = 136  # bytes absorbed per permutation for a 256-bit output
+
+
+def _rotl(value, shift):
+    return ((value << shift) | (value >> (64 - shift))) & _MASK if shift else value
+
+
+def _keccak_f(state):
+    for constant in _ROUND_CONSTANTS:
+        parity = [state[x] ^ state[x + 5] ^ state[x + 10] ^ state[x + 15] ^ state[x + 20] for x in range(5)]
+        mix = [parity[(x - 1) % 5] ^ _rotl(parity[(x + 1) % 5], 1) for x in range(5)]
+        state = [lane ^ mix[index % 5] for index, lane in enumerate(state)]
+        moved = [0] * 25
+        for x in range(5):
+            for y in range(5):
+                moved[y + 5 * ((2 * x + 3 * y) % 5)] = _rotl(state[x + 5 * y], _ROTATIONS[x][y])
+        state = [
+            moved[index] ^ (~moved[(index + 1) % 5 + index - index % 5] & moved[(index + 2) % 5 + index - index % 5])
+            for index in range(25)
+        ]
+        state[0] ^= constant
+    return state
+
+
+def keccak256(data):
+    """Keccak-256 digest of ``data`` (bytes), as used by Ethereum."""
+    padded = bytearray(data) + b'\x01' + bytes(-(len(data) + 1) % _RATE)
+    padded[-1] |= 0x80
+    state = [0] * 25
+    for start in range(0, len(padded), _RATE):
+        block = padded[start:start + _RATE]
+        for index in range(_RATE // 8):
+            state[index] ^= int.from_bytes(block[index * 8:index * 8 + 8], 'little')
+        state = _keccak_f(state)
+    return b''.join(lane.to_bytes(8, 'little') for lane in state[:4])
+
+
+EventABI = namedtuple('EventABI', ['contract', 'name', 'inputs', 'signature', 'topic'])
+
+
+def load_metadata_abi(path):
+    """The ABI from a solc metadata file (plain or JSON-encoded-string JSON)."""
+    data = json.loads(Path(path).read_text(encoding='utf-8'))
+    if isinstance(data, str):
+        data = json.loads(data)
+    return data['output']['abi'] if 'output' in data else data['abi']
+
+
+def event_abis(contract, abi, names=None):
+    """``EventABI`` for each event of ``abi`` (only those in ``names``, if given)."""
+    events = []
+    for entry in abi:
+        if entry.get('type') != 'event' or (names is not None and entry['name'] not in names):
+            continue
+        signature = f"{entry['name']}({','.join(item['type'] for item in entry['inputs'])})"
+        events.append(EventABI(
+            contract=contract,
+            name=entry['name'],
+            inputs=entry['inputs'],
+            signature=signature,
+            topic='0x' + keccak256(signature.encode()).hex()
+        ))
+    return events
+
+
+def _is_dynamic(abi_type):
+    return abi_type in ('string', 'bytes') or abi_type.endswith(']')
+
+
+def _decode_word(abi_type, word):
+    if abi_type == 'address':
+        return '0x' + word[12:].hex()
+    if abi_type == 'bool':
+        return word != bytes(32)
+    if abi_type.startswith('uint'):
+        return int.from_bytes(word, 'big')
+    if abi_type.startswith('int'):
+        return int.from_bytes(word, 'big', signed=True)
+    if abi_type.startswith('bytes'):
+        return '0x' + word[:int(abi_type[5:])].hex()
+    raise ValueError(f"Unsupported ABI type {abi_type}")
+
+
+def _decode_dynamic(abi_type, data, offset):
+    length = int.from_bytes(data[offset:offset + 32], 'big')
+    value = data[offset + 32:offset + 32 + length]
+    if abi_type == 'string':
+        return value.decode('utf-8', errors='replace')
+    if abi_type == 'bytes':
+        return '0x' + value.hex()
+    raise ValueError(f"Unsupported ABI type {abi_type}")
+
+
+def _to_bytes(hex_string):
+    return bytes.fromhex(hex_string[2:] if hex_string.startswith('0x') else hex_string)
+
+
+def decode_log(event, log):
+    """
+    Decode the arguments of a raw ``eth_getLogs`` entry.
+
+    Args:
+        event: The ``EventABI`` whose topic matches ``log['topics'][0]``
+        log: The log object from the RPC
+
+    Returns:
+        dict: argument name -> value (addresses and bytes as lowercase hex)
+    """
+    topics = [_to_bytes(topic) for topic in log['topics'][1:]]
+    data = _to_bytes(log['data'])
+    args = {}
+    head = 0
+    for item in event.inputs:
+        abi_type = item['type']
+        if item['indexed']:
+            word = topics.pop(0)
+            # Indexed dynamic values are stored as their hash only
+            args[item['name']] = '0x' + word.hex() if _is_dynamic(abi_type) else _decode_word(abi_type, word)
+            continue
+        word = data[head:head + 32]
+        if _is_dynamic(abi_type):
+            args[item['name']] = _decode_dynamic(abi_type, data, int.from_bytes(word, 'big'))
+        else:
+            args[item['name']] = _decode_word(abi_type, word)
+        head += 32
+    return args
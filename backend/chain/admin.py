@@ -0,0 +1,34 @@
+from django.contrib import admin
+from .models import ChainCheckpoint, ChainEvent, ChainRecord, ChainAccessGrant, ChainIdentity
+
+
+@admin.register(ChainCheckpoint)
+class ChainCheckpointAdmin(admin.ModelAdmin):
+    list_display = ('chain_id', 'block_number', 'block_hash', 'updated_at')
+
+
+@admin.register(ChainEvent)
+class ChainEventAdmin(admin.ModelAdmin):
+    list_display = ('event', 'block_number', 'log_index', 'key', 'transaction_hash')
+    list_filter = ('event',)
+    search_fields = ('key', 'transaction_hash')
+
+
+@admin.register(ChainRecord)
+class ChainRecordAdmin(admin.ModelAdmin):
+    list_display = ('record_id', 'record_type', 'patient', 'doctor', 'is_visible', 'created_at')
+    list_filter = ('record_type', 'is_visible')
+    search_fields = ('patient', 'doctor', 'ipfs_cid')
+
+
+@admin.register(ChainAccessGrant)
+class ChainAccessGrantAdmin(admin.ModelAdmin):
+    list_display = ('patient', 'doctor', 'granted_at', 'expires_at', 'revoked_at')
+    search_fields = ('patient', 'doctor')
+
+
+@admin.register(ChainIdentity)
+class ChainIdentityAdmin(admin.ModelAdmin):
+    list_display = ('wallet', 'role', 'health_id', 'doctor_id', 'registered_at')
+    list_filter = ('role',)
+    search_fields = ('wallet', 'health_id', 'doctor_id')
@@ -0,0 +1,365 @@
+"""
+Incremental indexer of the HealthSecure contract events.
+
+``manage.py index_chain`` pulls these logs over JSON-RPC:
+
+- ``RecordCreated`` and ``RecordVisibilityChanged`` from the
+  ``MedicalRecordRegistry``
+- ``AccessGranted`` and ``AccessRevoked`` from ``AccessControl``
+- ``IdentityRegistered`` from ``HealthSecureIdentity``, plus
+  ``HealthIdLinked`` and ``DoctorIdLinked``, which tie wallets to our IDs
+
+Each log is stored as a ``ChainEvent`` and folded into the
+``ChainRecord``, ``ChainAccessGrant`` and ``ChainIdentity`` tables. The
+API reads those tables, so it answers chain questions without calling the
+node.
+
+Blocks are fetched in batches that adapt to the node. A batch halves when
+``getLogs`` errors or times out (providers cap the range or the result
+count) or returns more than ``target_logs``. It doubles, up to
+``max_batch_blocks``, while logs are sparse. Only blocks at least
+``confirmations`` deep are indexed. Each batch's events, projections and
+checkpoint are committed in one transaction, so a crash never indexes a
+block twice.
+
+Reorgs: the hash of every batch's last block (and of every block with
+logs) is kept for ``reorg_window`` blocks. Before each batch the checkpoint
+block's hash is compared with the node's. On a mismatch the indexer walks
+back to the newest stored block the node still agrees on, deletes the
+events above it, and rebuilds the rows they touched from the events that
+remain. A reorg deeper than the window reindexes from ``start_block``.
+"""
+
+import logging
+from collections import namedtuple
+from datetime import datetime, timezone as dt_timezone
+from functools import reduce
+from operator import or_
+from pathlib import Path
+
+import requests
+from django.db import connection, transaction
+from django.db.models import Q
+
+from .abi import decode_log, event_abis, load_metadata_abi
+from .models import ChainAccessGrant, ChainBlock, ChainCheckpoint, ChainEvent, ChainIdentity, ChainRecord
+from .rpc import RPCError
+
+logger = logging.getLogger(__name__)
+
+INDEXED_EVENTS = {
+    'MedicalRecordRegistry': ('RecordCreated', 'RecordVisibilityChanged'),
+    'AccessControl': ('AccessGranted', 'AccessRevoked'),
+    'HealthSecureIdentity': ('IdentityRegistered', 'HealthIdLinked', 'DoctorIdLinked'),
+}
+
+BatchResult = namedtuple('BatchResult', ['from_block', 'to_block', 'events', 'reorged_to'])
+
+
+class ChainMismatch(Exception):
+    """The database was indexed from a different chain than the node serves."""
+
+
+def load_contracts(addresses, metadata_dir):
+    """
+    Event ABIs of the indexed contracts.
+
+    Args:
+        addresses: contract name -> deployed address (e.g. ``deployments.json``'s ``contracts``)
+        metadata_dir: Directory holding ``<Contract>_metadata.json``
+
+    Returns:
+        tuple: (lowercase address -> contract name, topic -> ``EventABI``)
+    """
+    contracts = {}
+    events = {}
+    for name, event_names in INDEXED_EVENTS.items():
+        if not addresses.get(name):
+            raise ValueError(f"No deployed address for {name}")
+        contracts[addresses[name].lower()] = name
+        abi = load_metadata_abi(Path(metadata_dir) / f"{name}_metadata.json")
+        for event in event_abis(name, abi, event_names):
+            events[event.topic] = event
+    return contracts, events
+
+
+def event_key(name, args):
+    """The projection row an event applies to (``ChainEvent.key``)."""
+    if name in ('RecordCreated', 'RecordVisibilityChanged'):
+        return f"record:{args['recordId']}"
+    if name in ('AccessGranted', 'AccessRevoked'):
+        return f"grant:{args['patient']}:{args['doctor']}"
+    return f"identity:{args['wallet']}"
+
+
+def _timestamp(seconds):
+    return datetime.fromtimestamp(seconds, tz=dt_timezone.utc)
+
+
+def _upsert(model, rows, unique_fields):
+    if not rows:
+        return
+    update_fields = [
+        field.name for field in model._meta.concrete_fields
+        if not field.primary_key and field.name not in unique_fields
+    ]
+    # MySQL resolves the conflict target itself and rejects an explicit one
+    if not connection.features.supports_update_conflicts_with_target:
+        unique_fields = None
+    model.objects.bulk_create(rows, update_conflicts=True, unique_fields=unique_fields, update_fields=update_fields)
+
+
+def project(events):
+    """
+    Fold ``events`` (oldest first) into the record, grant and identity rows.
+
+    The current rows of every key involved are loaded in one query per
+    table, updated in memory, and written back with one upsert per table.
+    """
+    record_ids = {event.args['recordId'] for event in events if event.key.startswith('record:')}
+    pairs = {(event.args['patient'], event.args['doctor']) for event in events if event.key.startswith('grant:')}
+    wallets = {event.args['wallet'] for event in events if event.key.startswith('identity:')}
+
+    records = ChainRecord.objects.in_bulk(record_ids)
+    grants = {}
+    if pairs:
+        patients, doctors = zip(*pairs)
+        for grant in ChainAccessGrant.objects.filter(patient__in=patients, doctor__in=doctors):
+            grants[grant.patient, grant.doctor] = grant
+    identities = ChainIdentity.objects.in_bulk(wallets)
+
+    for event in events:
+        args = event.args
+        block = event.block_number
+        if event.event == 'RecordCreated':
+            records[args['recordId']] = ChainRecord(
+                record_id=args['recordId'],
+                patient=args['patient'],
+                doctor=args['doctor'],
+                record_hash=args['recordHash'],
+                ipfs_cid=args['ipfsCid'],
+                record_type=args['recordType'],
+                is_visible=True,
+                created_at=_timestamp(args['timestamp']),
+                block_number=block,
+                updated_block=block
+            )
+        elif event.event == 'RecordVisibilityChanged':
+            record = records.get(args['recordId'])
+            if record is None:
+                # Created before the indexer's start block
+                continue
+            record.is_visible = args['isVisible']
+            record.updated_block = block
+        elif event.event in ('AccessGranted', 'AccessRevoked'):
+            pair = (args['patient'], args['doctor'])
+            grant = grants.get(pair) or ChainAccessGrant(patient=pair[0], doctor=pair[1])
+            if event.event == 'AccessGranted':
+                grant.granted_at = _timestamp(args['grantedAt'])
+                grant.expires_at = _timestamp(args['expiresAt']) if args['expiresAt'] else None
+                grant.revoked_at = None
+            else:
+                grant.revoked_at = _timestamp(args['revokedAt'])
+            grant.updated_block = block
+            grants[pair] = grant
+        else:
+            identity = identities.get(args['wallet']) or ChainIdentity(wallet=args['wallet'])
+            if event.event == 'IdentityRegistered':
+                identity.identity_hash = args['identityHash']
+                identity.role = args['role']
+                identity.registered_at = _timestamp(args['timestamp'])
+            elif event.event == 'HealthIdLinked':
+                identity.health_id = args['healthId']
+            else:
+                identity.doctor_id = args['doctorId']
+            identity.updated_block = block
+            identities[args['wallet']] = identity
+
+    _upsert(ChainRecord, [records[key] for key in record_ids if key in records], ['record_id'])
+    _upsert(ChainAccessGrant, list(grants.values()), ['patient', 'doctor'])
+    _upsert(ChainIdentity, list(identities.values()), ['wallet'])
+
+
+def _delete_projections(keys):
+    record_ids, grant_filters, wallets = [], [], []
+    for key in keys:
+        kind, _, rest = key.partition(':')
+        if kind == 'record':
+            record_ids.append(int(rest))
+        elif kind == 'grant':
+            patient, doctor = rest.split(':')
+            grant_filters.append(Q(patient=patient, doctor=doctor))
+        else:
+            wallets.append(rest)
+    ChainRecord.objects.filter(record_id__in=record_ids).delete()
+    if grant_filters:
+        ChainAccessGrant.objects.filter(reduce(or_, grant_filters)).delete()
+    ChainIdentity.objects.filter(wallet__in=wallets).delete()
+
+
+class ChainIndexer:
+    """Index contract events batch by batch from a checkpoint."""
+
+    def __init__(self, rpc, contracts, events, start_block=0, confirmations=0,
+                 batch_blocks=1000, max_batch_blocks=10000, target_logs=2000, reorg_window=256):
+        """
+        Args:
+            rpc: ``ChainRPC`` for the node
+            contracts: lowercase address -> contract name (from ``load_contracts``)
+            events: topic -> ``EventABI`` (from ``load_contracts``)
+            start_block: First block to index (the deployment block)
+            confirmations: Blocks to stay behind the head
+            batch_blocks: Initial blocks per ``getLogs`` call
+            max_batch_blocks: Upper bound for the adaptive batch size
+            target_logs: Logs per batch to aim for
+            reorg_window: Blocks of hashes kept for finding fork points
+        """
+        self.rpc = rpc
+        self.contracts = contracts
+        self.events = events
+        self.start_block = start_block
+        self.confirmations = confirmations
+        self.batch_blocks = max(1, batch_blocks)
+        self.max_batch_blocks = max(self.batch_blocks, max_batch_blocks)
+        self.target_logs = target_logs
+        self.reorg_window = reorg_window
+        self._chain_id = None
+
+    @property
+    def chain_id(self):
+        if self._chain_id is None:
+            self._chain_id = self.rpc.chain_id()
+        return self._chain_id
+
+    def checkpoint(self):
+        checkpoint = ChainCheckpoint.objects.first()
+        if checkpoint is not None and checkpoint.chain_id != self.chain_id:
+            raise ChainMismatch(
+                f"Indexed data is from chain {checkpoint.chain_id} but the node serves chain {self.chain_id}"
+            )
+        return checkpoint
+
+    def step(self):
+        """
+        Index the next batch.
+
+        Returns:
+            BatchResult, or None when caught up with the confirmed head
+        """
+        head = self.rpc.block_number() - self.confirmations
+        checkpoint = self.checkpoint()
+        reorged_to = None
+        if checkpoint is not None and self.rpc.block_hash(checkpoint.block_number) != checkpoint.block_hash:
+            reorged_to = self.rollback(checkpoint)
+            checkpoint = self.checkpoint()
+
+        start = checkpoint.block_number + 1 if checkpoint else self.start_block
+        if start > head:
+            return BatchResult(start, start - 1, 0, reorged_to) if reorged_to is not None else None
+
+        end, end_hash, logs = self._fetch(start, min(head, start + self.batch_blocks - 1))
+        count = self._store(end, end_hash, logs)
+        return BatchResult(start, end, count, reorged_to)
+
+    def _fetch(self, start, end):
+        addresses = list(self.contracts)
+        topics = list(self.events)
+        while True:
+            end_hash = self.rpc.block_hash(end)
+            try:
+                logs = self.rpc.get_logs(start, end, addresses, topics)
+            except (RPCError, requests.Timeout) as exc:
+                if end == start:
+                    raise
+                self.batch_blocks = max(1, (end - start + 1) // 2)
+                logger.info("getLogs %s-%s failed (%s); retrying %s blocks", start, end, exc, self.batch_blocks)
+                end = start + self.batch_blocks - 1
+                continue
+            if self.rpc.block_hash(end) != end_hash:
+                # Reorged while fetching: the logs may mix both forks
+                continue
+            break
+
+        span = end - start + 1
+        if len(logs) > self.target_logs:
+            self.batch_blocks = max(1, span // 2)
+        elif len(logs) < self.target_logs // 4 and span == self.batch_blocks:
+            self.batch_blocks = min(self.max_batch_blocks, span * 2)
+        return end, end_hash, logs
+
+    def _decode(self, logs):
+        events = []
+        for log in logs:
+            if log.get('removed') or not log['topics']:
+                continue
+            event = self.events.get(log['topics'][0].lower())
+            if event is None or self.contracts.get(log['address'].lower()) != event.contract:
+                continue
+            args = decode_log(event, log)
+            events.append(ChainEvent(
+                block_number=int(log['blockNumber'], 16),
+                block_hash=log['blockHash'].lower(),
+                transaction_hash=log['transactionHash'].lower(),
+                log_index=int(log['logIndex'], 16),
+                contract=log['address'].lower(),
+                event=event.name,
+                key=event_key(event.name, args),
+                args=args
+            ))
+        events.sort(key=lambda event: (event.block_number, event.log_index))
+        return events
+
+    def _store(self, end, end_hash, logs):
+        events = self._decode(logs)
+        blocks = {event.block_number: event.block_hash for event in events}
+        blocks[end] = end_hash
+        with transaction.atomic():
+            ChainEvent.objects.bulk_create(events)
+            project(events)
+            _upsert(ChainBlock, [ChainBlock(number=number, hash=hash) for number, hash in blocks.items()], ['number'])
+            ChainBlock.objects.filter(number__lte=end - self.reorg_window).delete()
+            ChainCheckpoint.objects.update_or_create(
+                pk=ChainCheckpoint.objects.values_list('pk', flat=True).first(),
+                defaults={'chain_id': self.chain_id, 'block_number': end, 'block_hash': end_hash}
+            )
+        return len(events)
+
+    def fork_point(self, checkpoint):
+        """Newest stored block the node still agrees on, or None."""
+        stored = ChainBlock.objects.filter(number__lt=checkpoint.block_number).order_by('-number')
+        for block in stored.iterator():
+            if self.rpc.block_hash(block.number) == block.hash:
+                return block
+        return None
+
+    def rollback(self, checkpoint):
+        """Undo everything above the fork point; returns the new last indexed block."""
+        ancestor = self.fork_point(checkpoint)
+        if ancestor is None:
+            logger.warning("Reorg deeper than the %s-block window; reindexing from block %s",
+                           self.reorg_window, self.start_block)
+        keep_to = ancestor.number if ancestor else self.start_block - 1
+
+        with transaction.atomic():
+            stale = ChainEvent.objects.filter(block_number__gt=keep_to)
+            keys = set(stale.values_list('key', flat=True))
+            stale.delete()
+            ChainBlock.objects.filter(number__gt=keep_to).delete()
+            _delete_projections(keys)
+            project(list(ChainEvent.objects.filter(key__in=keys).order_by('block_number', 'log_index')))
+            if ancestor is None:
+                ChainCheckpoint.objects.all().delete()
+            else:
+                ChainCheckpoint.objects.filter(pk=checkpoint.pk).update(
+                    block_number=ancestor.number, block_hash=ancestor.hash
+                )
+        logger.warning("Chain reorg at block %s: rolled back %s keys to block %s",
+                       checkpoint.block_number, len(keys), keep_to)
+        return keep_to
+
+
+def reset():
+    """Delete all indexed chain data."""
+    with transaction.atomic():
+        for model in (ChainEvent, ChainRecord, ChainAccessGrant, ChainIdentity, ChainBlock, ChainCheckpoint):
+            model.objects.all().delete()
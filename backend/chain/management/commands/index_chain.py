@@ -0,0 +1,92 @@
+import json
+import time
+
+import requests
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from chain.indexer import ChainIndexer, ChainMismatch, load_contracts, reset
+from chain.rpc import ChainRPC, RPCError
+
+
+class Command(BaseCommand):
+    help = (
+        "Index MedicalRecordRegistry, AccessControl and HealthSecureIdentity events "
+        "from the JSON-RPC node into the chain tables."
+    )
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--rpc-url', default=settings.CHAIN_RPC_URL)
+        parser.add_argument('--deployments', default=str(settings.CHAIN_DEPLOYMENTS_FILE),
+                            help="deployments.json with the contract addresses")
+        parser.add_argument('--from-block', type=int, default=None,
+                            help="First block to index when there is no checkpoint "
+                                 "(default: the deployments file's startBlock, else CHAIN_START_BLOCK)")
+        parser.add_argument('--confirmations', type=int, default=settings.CHAIN_CONFIRMATIONS)
+        parser.add_argument('--batch-blocks', type=int, default=settings.CHAIN_BATCH_BLOCKS)
+        parser.add_argument('--poll-interval', type=float, default=settings.CHAIN_POLL_SECONDS,
+                            help="Seconds to wait for new blocks once caught up")
+        parser.add_argument('--once', action='store_true',
+                            help="Exit once caught up with the confirmed head")
+        parser.add_argument('--reset', action='store_true',
+                            help="Delete all indexed chain data first (e.g. after pointing at another chain)")
+    
+    def handle(self, *args, **options):
+        try:
+            with open(options['deployments'], encoding='utf-8') as file:
+                deployments = json.load(file)
+            addresses = deployments['contracts']
+            contracts, events = load_contracts(addresses, settings.CHAIN_METADATA_DIR)
+        except (OSError, KeyError, ValueError) as exc:
+            raise CommandError(f"Cannot load contracts: {exc}")
+        
+        if options['reset']:
+            reset()
+            self.stdout.write("Deleted indexed chain data.")
+        
+        indexer = ChainIndexer(
+            ChainRPC(options['rpc_url'], timeout=settings.CHAIN_RPC_TIMEOUT, namespace=settings.CHAIN_RPC_NAMESPACE),
+            contracts,
+            events,
+            start_block=(
+                options['from_block'] if options['from_block'] is not None
+                else deployments.get('startBlock', settings.CHAIN_START_BLOCK)
+            ),
+            confirmations=options['confirmations'],
+            batch_blocks=options['batch_blocks'],
+            max_batch_blocks=settings.CHAIN_MAX_BATCH_BLOCKS,
+            target_logs=settings.CHAIN_TARGET_LOGS,
+            reorg_window=settings.CHAIN_REORG_WINDOW,
+        )
+        self.stdout.write(f"Indexing {', '.join(sorted(addresses))} from {options['rpc_url']}...")
+        
+        total = 0
+        try:
+            while True:
+                try:
+                    result = indexer.step()
+                except ChainMismatch as exc:
+                    raise CommandError(f"{exc}; rerun with --reset to reindex")
+                except (RPCError, requests.RequestException) as exc:
+                    if options['once']:
+                        raise CommandError(f"RPC failed: {exc}")
+                    self.stderr.write(f"RPC failed: {exc}; retrying")
+                    time.sleep(options['poll_interval'])
+                    continue
+                
+                if result is None:
+                    if options['once']:
+                        break
+                    time.sleep(options['poll_interval'])
+                    continue
+                if result.reorged_to is not None:
+                    self.stdout.write(self.style.WARNING(f"Reorg: rolled back to block {result.reorged_to}"))
+                if result.to_block >= result.from_block:
+                    total += result.events
+                    self.stdout.write(
+                        f"Blocks {result.from_block}-{result.to_block}: {result.events} events "
+                        f"(next batch {indexer.batch_blocks} blocks)"
+                    )
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write(self.style.SUCCESS(f"Indexed {total} events."))
@@ -0,0 +1,98 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChainBlock',
+            fields=[
+                ('number', models.PositiveBigIntegerField(primary_key=True, serialize=False)),
+                ('hash', models.CharField(max_length=66)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ChainCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('chain_id', models.PositiveBigIntegerField()),
+                ('block_number', models.PositiveBigIntegerField()),
+                ('block_hash', models.CharField(max_length=66)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ChainIdentity',
+            fields=[
+                ('wallet', models.CharField(max_length=42, primary_key=True, serialize=False)),
+                ('identity_hash', models.CharField(blank=True, max_length=66)),
+                ('role', models.PositiveSmallIntegerField(choices=[(0, 'NONE'), (1, 'PATIENT'), (2, 'DOCTOR')], default=0)),
+                ('health_id', models.CharField(blank=True, db_index=True, max_length=64)),
+                ('doctor_id', models.CharField(blank=True, db_index=True, max_length=64)),
+                ('registered_at', models.DateTimeField(blank=True, null=True)),
+                ('updated_block', models.PositiveBigIntegerField()),
+            ],
+            options={
+                'verbose_name_plural': 'chain identities',
+            },
+        ),
+        migrations.CreateModel(
+            name='ChainRecord',
+            fields=[
+                ('record_id', models.PositiveBigIntegerField(primary_key=True, serialize=False)),
+                ('patient', models.CharField(db_index=True, max_length=42)),
+                ('doctor', models.CharField(db_index=True, max_length=42)),
+                ('record_hash', models.CharField(max_length=66)),
+                ('ipfs_cid', models.CharField(db_index=True, max_length=100)),
+                ('record_type', models.PositiveSmallIntegerField(choices=[(0, 'PRESCRIPTION'), (1, 'LAB_REPORT'), (2, 'DIAGNOSIS'), (3, 'IMAGING'), (4, 'PROCEDURE'), (5, 'CONSULTATION'), (6, 'FOLLOWUP')])),
+                ('is_visible', models.BooleanField(default=True)),
+                ('created_at', models.DateTimeField()),
+                ('block_number', models.PositiveBigIntegerField()),
+                ('updated_block', models.PositiveBigIntegerField()),
+            ],
+            options={
+                'ordering': ['-record_id'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ChainAccessGrant',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('patient', models.CharField(max_length=42)),
+                ('doctor', models.CharField(db_index=True, max_length=42)),
+                ('granted_at', models.DateTimeField(blank=True, null=True)),
+                ('expires_at', models.DateTimeField(blank=True, help_text='Empty = until revoked', null=True)),
+                ('revoked_at', models.DateTimeField(blank=True, null=True)),
+                ('updated_block', models.PositiveBigIntegerField()),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('patient', 'doctor'), name='chaingrant_patient_doctor_uniq')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ChainEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('block_number', models.PositiveBigIntegerField()),
+                ('block_hash', models.CharField(max_length=66)),
+                ('transaction_hash', models.CharField(max_length=66)),
+                ('log_index', models.PositiveIntegerField()),
+                ('contract', models.CharField(max_length=42)),
+                ('event', models.CharField(max_length=64)),
+                ('key', models.CharField(max_length=100)),
+                ('args', models.JSONField()),
+            ],
+            options={
+                'ordering': ['block_number', 'log_index'],
+                'indexes': [models.Index(fields=['key', 'block_number'], name='chainevent_key_block_idx'), models.Index(fields=['transaction_hash'], name='chainevent_tx_idx')],
+                'constraints': [models.UniqueConstraint(fields=('block_number', 'log_index'), name='chainevent_block_log_uniq')],
+            },
+        ),
+    ]
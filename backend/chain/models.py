@@ -0,0 +1,132 @@
+from django.db import models
+
+
+class ChainCheckpoint(models.Model):
+    """How far ``manage.py index_chain`` has indexed (a single row)."""
+    
+    chain_id = models.PositiveBigIntegerField()
+    block_number = models.PositiveBigIntegerField()
+    block_hash = models.CharField(max_length=66)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"Chain {self.chain_id} at block {self.block_number}"
+
+
+class ChainBlock(models.Model):
+    """Hash of a recently indexed block, kept to find the fork point of a reorg."""
+    
+    number = models.PositiveBigIntegerField(primary_key=True)
+    hash = models.CharField(max_length=66)
+    
+    def __str__(self):
+        return f"{self.number} {self.hash}"
+
+
+class ChainEvent(models.Model):
+    """A decoded contract event log, as indexed."""
+    
+    block_number = models.PositiveBigIntegerField()
+    block_hash = models.CharField(max_length=66)
+    transaction_hash = models.CharField(max_length=66)
+    log_index = models.PositiveIntegerField()
+    contract = models.CharField(max_length=42)
+    event = models.CharField(max_length=64)
+    # Projection row the event applies to: "record:<id>", "grant:<patient>:<doctor>" or "identity:<wallet>"
+    key = models.CharField(max_length=100)
+    args = models.JSONField()
+    
+    class Meta:
+        ordering = ['block_number', 'log_index']
+        constraints = [
+            models.UniqueConstraint(fields=['block_number', 'log_index'], name='chainevent_block_log_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['key', 'block_number'], name='chainevent_key_block_idx'),
+            models.Index(fields=['transaction_hash'], name='chainevent_tx_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.event} at {self.block_number}:{self.log_index}"
+
+
+class ChainRecord(models.Model):
+    """A ``MedicalRecordRegistry`` entry, from ``RecordCreated`` and ``RecordVisibilityChanged``."""
+    
+    # MedicalRecordRegistry.RecordType, in declaration order
+    RECORD_TYPES = (
+        (0, 'PRESCRIPTION'),
+        (1, 'LAB_REPORT'),
+        (2, 'DIAGNOSIS'),
+        (3, 'IMAGING'),
+        (4, 'PROCEDURE'),
+        (5, 'CONSULTATION'),
+        (6, 'FOLLOWUP'),
+    )
+    
+    record_id = models.PositiveBigIntegerField(primary_key=True)
+    patient = models.CharField(max_length=42, db_index=True)
+    doctor = models.CharField(max_length=42, db_index=True)
+    record_hash = models.CharField(max_length=66)
+    ipfs_cid = models.CharField(max_length=100, db_index=True)
+    record_type = models.PositiveSmallIntegerField(choices=RECORD_TYPES)
+    is_visible = models.BooleanField(default=True)
+    created_at = models.DateTimeField()
+    block_number = models.PositiveBigIntegerField()
+    updated_block = models.PositiveBigIntegerField()
+    
+    class Meta:
+        ordering = ['-record_id']
+    
+    def __str__(self):
+        return f"On-chain record {self.record_id} ({self.ipfs_cid})"
+
+
+class ChainAccessGrant(models.Model):
+    """``AccessControl`` state of one patient/doctor pair."""
+    
+    patient = models.CharField(max_length=42)
+    doctor = models.CharField(max_length=42, db_index=True)
+    granted_at = models.DateTimeField(null=True, blank=True)
+    expires_at = models.DateTimeField(null=True, blank=True, help_text="Empty = until revoked")
+    revoked_at = models.DateTimeField(null=True, blank=True)
+    updated_block = models.PositiveBigIntegerField()
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['patient', 'doctor'], name='chaingrant_patient_doctor_uniq'),
+        ]
+    
+    def __str__(self):
+        return f"{self.patient} -> {self.doctor}"
+    
+    def is_active(self, at):
+        if self.granted_at is None or self.revoked_at is not None:
+            return False
+        return self.expires_at is None or self.expires_at > at
+
+
+class ChainIdentity(models.Model):
+    """A ``HealthSecureIdentity`` wallet with its linked health or doctor ID."""
+    
+    # HealthSecureIdentity.Role
+    ROLES = (
+        (0, 'NONE'),
+        (1, 'PATIENT'),
+        (2, 'DOCTOR'),
+    )
+    
+    wallet = models.CharField(max_length=42, primary_key=True)
+    identity_hash = models.CharField(max_length=66, blank=True)
+    role = models.PositiveSmallIntegerField(choices=ROLES, default=0)
+    # Free-form strings on chain; longer than the local ID format allows
+    health_id = models.CharField(max_length=64, blank=True, db_index=True)
+    doctor_id = models.CharField(max_length=64, blank=True, db_index=True)
+    registered_at = models.DateTimeField(null=True, blank=True)
+    updated_block = models.PositiveBigIntegerField()
+    
+    class Meta:
+        verbose_name_plural = 'chain identities'
+    
+    def __str__(self):
+        return f"{self.wallet} ({self.get_role_display()})"
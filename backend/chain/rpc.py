@@ -0,0 +1,75 @@
+"""
+Minimal JSON-RPC client for an EVM node (Hardhat, Geth, or Quai).
+
+Quai nodes serve the same calls under the ``quai_`` namespace instead of
+``eth_``; ``CHAIN_RPC_NAMESPACE`` selects it.
+"""
+
+import itertools
+
+import requests
+
+
+class RPCError(Exception):
+    """The node answered with a JSON-RPC error object."""
+
+    def __init__(self, code, message, data=None):
+        super().__init__(f"{message} (code {code})")
+        self.code = code
+        self.message = message
+        self.data = data
+
+
+class ChainRPC:
+    """Blocking JSON-RPC calls over one keep-alive session."""
+
+    def __init__(self, url, timeout=30, namespace='eth'):
+        self.url = url
+        self.timeout = timeout
+        self.namespace = namespace
+        self.session = requests.Session()
+        self._ids = itertools.count(1)
+
+    def call(self, method, *params):
+        """
+        Call ``<namespace>_<method>`` and return its result.
+
+        Raises:
+            RPCError: The node returned an error
+            requests.RequestException: Transport failure or timeout
+        """
+        response = self.session.post(
+            self.url,
+            json={
+                'jsonrpc': '2.0',
+                'id': next(self._ids),
+                'method': f"{self.namespace}_{method}",
+                'params': list(params),
+            },
+            timeout=self.timeout
+        )
+        response.raise_for_status()
+        payload = response.json()
+        if payload.get('error'):
+            error = payload['error']
+            raise RPCError(error.get('code'), error.get('message', 'RPC error'), error.get('data'))
+        return payload.get('result')
+
+    def chain_id(self):
+        return int(self.call('chainId'), 16)
+
+    def block_number(self):
+        return int(self.call('blockNumber'), 16)
+
+    def block_hash(self, number):
+        """Hash of block ``number`` on the node's canonical chain, or None."""
+        block = self.call('getBlockByNumber', hex(number), False)
+        return block['hash'].lower() if block else None
+
+    def get_logs(self, from_block, to_block, addresses, topics):
+        return self.call('getLogs', {
+            'fromBlock': hex(from_block),
+            'toBlock': hex(to_block),
+            'address': addresses,
+            'topics': [topics],
+        })
@@ -0,0 +1,37 @@
+from rest_framework import serializers
+from .models import ChainAccessGrant, ChainCheckpoint, ChainRecord
+
+
+class ChainCheckpointSerializer(serializers.ModelSerializer):
+    """Serializer for the indexer's progress."""
+    
+    class Meta:
+        model = ChainCheckpoint
+        fields = ['chain_id', 'block_number', 'block_hash', 'updated_at']
+
+
+class ChainRecordSerializer(serializers.ModelSerializer):
+    """Serializer for indexed on-chain records."""
+    
+    record_type = serializers.CharField(source='get_record_type_display')
+    
+    class Meta:
+        model = ChainRecord
+        fields = [
+            'record_id', 'patient', 'doctor', 'record_hash', 'ipfs_cid',
+            'record_type', 'is_visible', 'created_at', 'block_number'
+        ]
+
+
+class ChainAccessGrantSerializer(serializers.ModelSerializer):
+    """Serializer for indexed on-chain access grants."""
+    
+    is_active = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = ChainAccessGrant
+        fields = ['patient', 'doctor', 'granted_at', 'expires_at', 'revoked_at', 'is_active', 'updated_block']
+    
+    def get_is_active(self, obj):
+        from django.utils import timezone
+        return obj.is_active(timezone.now())
@@ -0,0 +1,167 @@
+from django.conf import settings
+from django.test import TestCase
+
+from .indexer import ChainIndexer, load_contracts, reset
+from .models import ChainAccessGrant, ChainBlock, ChainCheckpoint, ChainEvent
+from .rpc import RPCError
+
+ADDRESSES = {
+    'MedicalRecordRegistry': '0x' + '1' * 40,
+    'AccessControl': '0x' + '2' * 40,
+    'HealthSecureIdentity': '0x' + '3' * 40,
+}
+
+
+def address(number):
+    return f'0x{number:040x}'
+
+
+def word(value):
+    return f'{value:064x}'
+
+
+class FakeRPC:
+    """An in-memory node: a hash and a list of logs per block."""
+
+    def __init__(self, events, max_results=None):
+        self.events = {event.name: event for event in events.values()}
+        self.max_results = max_results
+        self.hashes = []
+        self.logs = {}
+        self.calls = []
+
+    def mine(self, count, fork='a'):
+        for _ in range(count):
+            number = len(self.hashes)
+            self.hashes.append(f'0x{fork}{number:063x}')
+
+    def reorg(self, from_block, fork):
+        """Replace every block from ``from_block`` with one from another fork, keeping its logs."""
+        count = len(self.hashes) - from_block
+        del self.hashes[from_block:]
+        self.mine(count, fork)
+        for number, logs in self.logs.items():
+            for log in logs:
+                if number >= from_block:
+                    log['blockHash'] = self.hashes[number]
+
+    def add_log(self, number, name, patient, doctor, *values):
+        event = self.events[name]
+        logs = self.logs.setdefault(number, [])
+        logs.append({
+            'address': ADDRESSES[event.contract],
+            'topics': [event.topic, '0x' + word(patient), '0x' + word(doctor)],
+            'data': '0x' + ''.join(word(value) for value in values),
+            'blockNumber': hex(number),
+            'blockHash': self.hashes[number],
+            'transactionHash': f'0x{number:032x}{len(logs):032x}',
+            'logIndex': hex(len(logs)),
+        })
+
+    def drop_logs(self, from_block):
+        self.logs = {number: logs for number, logs in self.logs.items() if number < from_block}
+
+    def chain_id(self):
+        return 31337
+
+    def block_number(self):
+        return len(self.hashes) - 1
+
+    def block_hash(self, number):
+        return self.hashes[number] if number < len(self.hashes) else None
+
+    def get_logs(self, from_block, to_block, addresses, topics):
+        logs = [log for number in range(from_block, to_block + 1) for log in self.logs.get(number, [])]
+        if self.max_results is not None and len(logs) > self.max_results:
+            self.calls.append((from_block, to_block, False))
+            raise RPCError(-32005, f'query returned more than {self.max_results} results')
+        self.calls.append((from_block, to_block, True))
+        return [dict(log) for log in logs]
+
+
+class ChainIndexerTests(TestCase):
+
+    def setUp(self):
+        self.contracts, self.events = load_contracts(ADDRESSES, settings.CHAIN_METADATA_DIR)
+
+    def indexer(self, rpc, **options):
+        return ChainIndexer(rpc, self.contracts, self.events, **options)
+
+    def index_all(self, indexer):
+        results = []
+        while (result := indexer.step()) is not None:
+            results.append(result)
+        return results
+
+    def grants(self):
+        return list(ChainAccessGrant.objects.order_by('patient', 'doctor').values(
+            'patient', 'doctor', 'granted_at', 'expires_at', 'revoked_at', 'updated_block'
+        ))
+
+    def test_range_error_halves_the_batch_which_then_grows_again(self):
+        rpc = FakeRPC(self.events, max_results=12)
+        rpc.mine(100)
+        for number in range(8):
+            for pair in range(3):
+                rpc.add_log(number, 'AccessGranted', number * 3 + pair + 1, 99, 1000 + number, 0)
+
+        self.index_all(self.indexer(rpc, batch_blocks=8, max_batch_blocks=32, target_logs=100))
+
+        # 24 logs in the first 8 blocks: the node refuses that range, then serves half of it
+        self.assertEqual(rpc.calls[:2], [(0, 7, False), (0, 3, True)])
+        # Past the dense blocks the batch doubles back up to max_batch_blocks
+        spans = [end - start + 1 for start, end, ok in rpc.calls if ok]
+        self.assertEqual(spans[:4], [4, 8, 16, 32])
+        self.assertEqual(ChainEvent.objects.count(), 24)
+        self.assertEqual(ChainCheckpoint.objects.get().block_number, 99)
+
+    def test_reorg_rolls_back_events_and_rows_past_the_fork(self):
+        rpc = FakeRPC(self.events)
+        rpc.mine(20)
+        rpc.add_log(5, 'AccessGranted', 1, 9, 500, 0)
+        rpc.add_log(15, 'AccessGranted', 2, 9, 1500, 0)
+        rpc.add_log(16, 'AccessRevoked', 1, 9, 1600)
+        indexer = self.indexer(rpc)
+        self.index_all(indexer)
+        self.assertEqual(ChainAccessGrant.objects.filter(revoked_at__isnull=False).count(), 1)
+
+        # Blocks from 12 on are replaced; the new fork grants a third patient instead
+        rpc.drop_logs(12)
+        rpc.reorg(12, 'b')
+        rpc.add_log(13, 'AccessGranted', 3, 9, 1300, 0)
+
+        result = indexer.step()
+        self.assertEqual((result.reorged_to, result.from_block, result.to_block), (5, 6, 19))
+        self.assertEqual(list(ChainEvent.objects.values_list('block_number', flat=True)), [5, 13])
+        self.assertEqual(
+            [(grant['patient'], grant['revoked_at']) for grant in self.grants()],
+            [(address(1), None), (address(3), None)]
+        )
+        # Every stored hash, the checkpoint's included, is on the node's chain
+        for block in ChainBlock.objects.all():
+            self.assertEqual(block.hash, rpc.block_hash(block.number))
+        checkpoint = ChainCheckpoint.objects.get()
+        self.assertEqual(checkpoint.block_hash, rpc.block_hash(checkpoint.block_number))
+
+    def test_reindexing_the_same_range_is_idempotent(self):
+        rpc = FakeRPC(self.events)
+        rpc.mine(30)
+        rpc.add_log(3, 'AccessGranted', 1, 9, 300, 0)
+        rpc.add_log(10, 'AccessGranted', 2, 9, 1000, 2000)
+        rpc.add_log(21, 'AccessRevoked', 1, 9, 2100)
+        indexer = self.indexer(rpc, batch_blocks=7)
+        self.index_all(indexer)
+        events = list(ChainEvent.objects.values_list('block_number', 'log_index', 'key'))
+        grants = self.grants()
+
+        # The same transactions re-mined on another fork replay onto the same rows
+        rpc.reorg(8, 'c')
+        self.index_all(indexer)
+        self.assertEqual(list(ChainEvent.objects.values_list('block_number', 'log_index', 'key')), events)
+        self.assertEqual(self.grants(), grants)
+
+        # So does a full reindex in different batch sizes
+        reset()
+        self.index_all(self.indexer(rpc, batch_blocks=3))
+        self.assertEqual(list(ChainEvent.objects.values_list('block_number', 'log_index', 'key')), events)
+        self.assertEqual(self.grants(), grants)
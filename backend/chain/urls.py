@@ -0,0 +1,8 @@
+from django.urls import path
+from .views import ChainStatusView, ChainRecordListView, ChainAccessView
+
+urlpatterns = [
+    path('status/', ChainStatusView.as_view(), name='chain_status'),
+    path('records/', ChainRecordListView.as_view(), name='chain_records'),
+    path('access/', ChainAccessView.as_view(), name='chain_access'),
+]
@@ -0,0 +1,101 @@
+from django.conf import settings
+from rest_framework import status
+from rest_framework.views import APIView
+from rest_framework.response import Response
+from rest_framework.permissions import IsAuthenticated
+
+from .models import ChainAccessGrant, ChainCheckpoint, ChainIdentity, ChainRecord
+from .serializers import ChainAccessGrantSerializer, ChainCheckpointSerializer, ChainRecordSerializer
+
+
+def resolve_wallet(value, id_field):
+    """
+    A wallet address from a ``0x`` address or a linked health/doctor ID.
+    
+    Args:
+        value: Address, or the ID linked on chain through HealthIdLinked/DoctorIdLinked
+        id_field: ``'health_id'`` or ``'doctor_id'``
+    
+    Returns:
+        str: Lowercase address, or None if the ID is not linked to a wallet
+    """
+    if value.lower().startswith('0x'):
+        return value.lower()
+    return ChainIdentity.objects.filter(**{id_field: value}).values_list('wallet', flat=True).first()
+
+
+class ChainStatusView(APIView):
+    """How far the chain indexer has got."""
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request):
+        checkpoint = ChainCheckpoint.objects.first()
+        if checkpoint is None:
+            return Response({"indexed": False})
+        return Response({"indexed": True, **ChainCheckpointSerializer(checkpoint).data})
+
+
+class ChainRecordListView(APIView):
+    """Indexed on-chain records, filtered by patient, doctor or IPFS CID.
+    
+    Everything here is public on chain already; only filtering is offered.
+    """
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request):
+        params = request.query_params
+        if not any(params.get(name) for name in ('patient', 'doctor', 'ipfs_cid')):
+            return Response(
+                {"error": "One of 'patient', 'doctor' or 'ipfs_cid' is required"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        try:
+            limit = min(max(int(params.get('limit', 50)), 1), settings.SEARCH_MAX_RESULTS)
+            offset = max(int(params.get('offset', 0)), 0)
+        except ValueError:
+            return Response(
+                {"error": "limit and offset must be integers"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        records = ChainRecord.objects.all()
+        for param, id_field in (('patient', 'health_id'), ('doctor', 'doctor_id')):
+            if params.get(param):
+                wallet = resolve_wallet(params[param], id_field)
+                if wallet is None:
+                    return Response({"results": [], "next_offset": None})
+                records = records.filter(**{param: wallet})
+        if params.get('ipfs_cid'):
+            records = records.filter(ipfs_cid=params['ipfs_cid'])
+        
+        page = list(records[offset:offset + limit])
+        return Response({
+            "results": ChainRecordSerializer(page, many=True).data,
+            "next_offset": offset + limit if len(page) == limit else None
+        })
+
+
+class ChainAccessView(APIView):
+    """On-chain access grant between a patient and a doctor."""
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request):
+        patient = request.query_params.get('patient')
+        doctor = request.query_params.get('doctor')
+        if not patient or not doctor:
+            return Response(
+                {"error": "'patient' and 'doctor' are required"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        grant = ChainAccessGrant.objects.filter(
+            patient=resolve_wallet(patient, 'health_id'),
+            doctor=resolve_wallet(doctor, 'doctor_id')
+        ).first()
+        if grant is None:
+            return Response(
+                {"error": "No on-chain grant found"},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        return Response(ChainAccessGrantSerializer(grant).data)
@@ -0,0 +1,216 @@
+"""
+Per-request timing of SQL, serialization and outbound IPFS calls.
+
+When ``REQUEST_INSTRUMENTATION`` is on, ``RequestInstrumentationMiddleware``
+measures every request:
+
+- SQL through a ``connection.execute_wrapper`` on each database alias:
+  the query count, the time spent, and each statement's count. The
+  wrapper is installed by ``measure()``, which ``healthsecure.metrics``
+  shares, so a request runs through one wrapper however many read it.
+- Serializer time spent building ``serializer.data``. Only the outermost
+  serializer is timed, and any lazy queries it triggers count here too.
+  The ``data`` properties of ``Serializer`` and ``ListSerializer`` are
+  wrapped only once the middleware is enabled, and ``uninstall_hooks``
+  puts the originals back.
+- Pinata calls through the ``users.ipfs_service.ipfs_request`` signal.
+
+The totals go out as a ``Server-Timing`` header, which browser dev tools
+show next to each request. Requests slower than ``SLOW_REQUEST_MS`` or
+issuing more than ``SLOW_REQUEST_QUERIES`` queries are logged to
+``healthsecure.requests`` with their most repeated statements, which is
+how an N+1 shows up. For streamed responses only the work done before
+the first byte is counted.
+"""
+
+import logging
+import re
+import time
+from collections import defaultdict
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+logger = logging.getLogger('healthsecure.requests')
+
+# IN (%s, %s, ...) lists vary in length with the data, not the code path
+_PLACEHOLDER_LIST = re.compile(r'\((?:\s*%s\s*,)+\s*%s\s*\)')
+
+
+class RequestMetrics:
+    """What one request spent its time on."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.sql_seconds = 0.0
+        self.statements = defaultdict(lambda: [0, 0.0])
+        self.serializer_seconds = 0.0
+        self.serializer_depth = 0
+        self.http_calls = 0
+        self.http_seconds = 0.0
+
+    @property
+    def total_seconds(self):
+        return time.perf_counter() - self.started
+
+    def repeated_statements(self, limit):
+        """The ``limit`` statements run most often (more than once), busiest first."""
+        repeated = [(sql, count, seconds) for sql, (count, seconds) in self.statements.items() if count > 1]
+        repeated.sort(key=lambda item: (item[1], item[2]), reverse=True)
+        return repeated[:limit]
+
+
+_current = ContextVar('request_metrics', default=None)
+
+
+def current_metrics():
+    """Metrics of the request being served, or None outside instrumented requests."""
+    return _current.get()
+
+
+@contextmanager
+def measure():
+    """
+    Collect ``RequestMetrics`` for the enclosed work.
+
+    Installs the SQL ``execute_wrapper`` on every connection. Nested uses
+    (``MetricsMiddleware`` around ``RequestInstrumentationMiddleware``)
+    share the outer metrics and its single wrapper.
+
+    Yields:
+        RequestMetrics
+    """
+    metrics = _current.get()
+    if metrics is not None:
+        yield metrics
+        return
+    metrics = RequestMetrics()
+    token = _current.set(metrics)
+    try:
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(_record_sql))
+            yield metrics
+    finally:
+        _current.reset(token)
+
+
+def _record_sql(execute, sql, params, many, context):
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        elapsed = time.perf_counter() - started
+        metrics.queries += 1
+        metrics.sql_seconds += elapsed
+        entry = metrics.statements[_PLACEHOLDER_LIST.sub('(...)', sql)]
+        entry[0] += 1
+        entry[1] += elapsed
+
+
+def _record_http(sender, duration, **kwargs):
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.http_calls += 1
+        metrics.http_seconds += duration
+
+
+# Serializer class -> its own ``data`` property, while the timed one is installed
+_original_data = {}
+
+
+def _timed_data(prop):
+    """Wrap a serializer's ``data`` property to time the outermost access."""
+
+    def data(self):
+        metrics = _current.get()
+        if metrics is None:
+            return prop.fget(self)
+        metrics.serializer_depth += 1
+        started = time.perf_counter()
+        try:
+            return prop.fget(self)
+        finally:
+            metrics.serializer_depth -= 1
+            if metrics.serializer_depth == 0:
+                metrics.serializer_seconds += time.perf_counter() - started
+
+    return property(data)
+
+
+def _serializer_classes():
+    from rest_framework import serializers
+
+    return (serializers.Serializer, serializers.ListSerializer)
+
+
+def install_hooks():
+    """Hook serializers and the IPFS client (idempotent)."""
+    from users.ipfs_service import ipfs_request
+
+    for cls in _serializer_classes():
+        if cls not in _original_data:
+            _original_data[cls] = cls.__dict__['data']
+            cls.data = _timed_data(_original_data[cls])
+    ipfs_request.connect(_record_http, dispatch_uid='healthsecure.instrumentation')
+
+
+def uninstall_hooks():
+    """Restore the serializers' own ``data`` and disconnect the IPFS signal (idempotent)."""
+    from users.ipfs_service import ipfs_request
+
+    for cls in _serializer_classes():
+        if cls in _original_data:
+            cls.data = _original_data.pop(cls)
+    ipfs_request.disconnect(dispatch_uid='healthsecure.instrumentation')
+
+
+def server_timing(metrics):
+    """Render a ``Server-Timing`` header value."""
+    return ', '.join([
+        f'db;desc="{metrics.queries} queries";dur={metrics.sql_seconds * 1000:.1f}',
+        f'serialize;dur={metrics.serializer_seconds * 1000:.1f}',
+        f'ipfs;desc="{metrics.http_calls} calls";dur={metrics.http_seconds * 1000:.1f}',
+        f'total;dur={metrics.total_seconds * 1000:.1f}',
+    ])
+
+
+class RequestInstrumentationMiddleware:
+    """Measure each request and report it via ``Server-Timing`` and the slow log."""
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'REQUEST_INSTRUMENTATION', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.slow_ms = getattr(settings, 'SLOW_REQUEST_MS', 500)
+        self.slow_queries = getattr(settings, 'SLOW_REQUEST_QUERIES', 50)
+        self.top_statements = getattr(settings, 'SLOW_REQUEST_TOP_STATEMENTS', 5)
+        install_hooks()
+
+    def __call__(self, request):
+        with measure() as metrics:
+            response = self.get_response(request)
+
+        response['Server-Timing'] = server_timing(metrics)
+        total_ms = metrics.total_seconds * 1000
+        if total_ms >= self.slow_ms or metrics.queries > self.slow_queries:
+            self._log_slow(request, response, metrics, total_ms)
+        return response
+
+    def _log_slow(self, request, response, metrics, total_ms):
+        lines = [
+            f"Slow request {request.method} {request.path} -> {response.status_code}: "
+            f"{total_ms:.0f}ms, {metrics.queries} queries ({metrics.sql_seconds * 1000:.0f}ms SQL), "
+            f"{metrics.serializer_seconds * 1000:.0f}ms serializing, "
+            f"{metrics.http_calls} IPFS calls ({metrics.http_seconds * 1000:.0f}ms)"
+        ]
+        for sql, count, seconds in metrics.repeated_statements(self.top_statements):
+            lines.append(f"  {count}x {seconds * 1000:.1f}ms  {sql}")
+        logger.warning('\n'.join(lines))
@@ -0,0 +1,450 @@
+"""
+In-process metrics served in the Prometheus text format at ``/metrics``.
+
+Off unless ``METRICS_ENABLED`` is set; scrapes then need ``METRICS_TOKEN``
+(or ``DEBUG``). Counters and histograms are kept in memory per process,
+behind a lock. Under gunicorn each worker is its own process. When
+``METRICS_DIR`` is set, every process (web workers, ``run_ipfs_workers``)
+snapshots its values to ``METRICS_DIR/metrics-<host>-<pid>-<start>.json``
+every ``METRICS_FLUSH_SECONDS`` and at exit. A scrape then sums its own
+live values with every other snapshot, so the answer is the same
+whichever worker serves ``/metrics``. Each scrape also folds the
+snapshots of exited processes on its host into ``archive.json`` and
+deletes them, so the directory stays bounded while counters never go
+backwards. Without ``METRICS_DIR`` each process reports only itself.
+
+Query counts come from ``healthsecure.instrumentation.measure()``, the
+same SQL wrapper the request instrumentation uses.
+
+Gauges are computed from the database at scrape time, so they are
+correct across processes by construction.
+
+Metrics:
+
+- ``ipfs_operation_duration_seconds{operation}`` and
+  ``ipfs_operations_total{operation,outcome}`` for each
+  ``PinataIPFSService`` method
+- ``ipfs_upload_failures_total{source}`` for uploads the caller carried on
+  without (e.g. doctor certificates)
+- ``http_request_duration_seconds{view,method}``,
+  ``http_request_queries{view,method}`` and
+  ``http_requests_total{view,method,status}``
+- ``records_unpinned{status}``, ``ipfs_pin_jobs{status}`` and
+  ``doctor_certificates_unpinned``
+"""
+
+import atexit
+import fcntl
+import functools
+import json
+import os
+import socket
+import threading
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import Http404, HttpResponse, HttpResponseForbidden
+
+from .instrumentation import measure
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (1, 2, 3, 5, 10, 20, 50, 100, 200, 500)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+HTTP_METHODS = frozenset(['GET', 'HEAD', 'OPTIONS', 'POST', 'PUT', 'PATCH', 'DELETE'])
+
+ARCHIVE_NAME = 'archive.json'
+
+
+class Registry:
+    """All metrics of this process, plus snapshot I/O for multi-process mode."""
+
+    def __init__(self):
+        self.metrics = {}
+        self.lock = threading.Lock()
+        self._pid = None
+        self._dirty = False
+
+    def register(self, metric):
+        self.metrics[metric.name] = metric
+        return metric
+
+    def _check_process(self):
+        # A forked worker must not report its parent's values as its own
+        pid = os.getpid()
+        if pid == self._pid:
+            return
+        with self.lock:
+            if pid == self._pid:
+                return
+            for metric in self.metrics.values():
+                metric.values.clear()
+            self._pid = pid
+            self._snapshot_name = f"metrics-{socket.gethostname()}-{pid}-{time.time_ns()}.json"
+            if getattr(settings, 'METRICS_DIR', ''):
+                threading.Thread(target=self._flush_loop, daemon=True).start()
+                atexit.register(self.flush)
+
+    def changed(self):
+        self._check_process()
+        self._dirty = True
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                name: [[list(labels), value] for labels, value in metric.values.items()]
+                for name, metric in self.metrics.items()
+                if metric.kind != 'gauge'
+            }
+
+    def flush(self):
+        """Write this process's values for other workers' scrapes."""
+        directory = getattr(settings, 'METRICS_DIR', '')
+        if not directory or self._pid != os.getpid() or not self._dirty:
+            return
+        self._dirty = False
+        path = Path(directory) / self._snapshot_name
+        temporary = path.with_suffix('.tmp')
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temporary.write_text(json.dumps(self.snapshot()))
+        os.replace(temporary, path)
+
+    def _flush_loop(self):
+        pid = os.getpid()
+        while pid == self._pid:
+            time.sleep(getattr(settings, 'METRICS_FLUSH_SECONDS', 5))
+            try:
+                self.flush()
+            except OSError:
+                pass  # Next round retries; a scrape misses at most one interval
+
+    def collect(self):
+        """Values summed over this process and every other snapshot."""
+        self._check_process()
+        merged = {
+            name: {labels: _copy(value) for labels, value in metric.values.items()}
+            for name, metric in self.metrics.items()
+            if metric.kind != 'gauge'
+        }
+        directory = getattr(settings, 'METRICS_DIR', '')
+        if directory and Path(directory).is_dir():
+            directory = Path(directory)
+            # Serialized with other scrapes, so no snapshot is folded and read twice
+            with open(directory / 'metrics.lock', 'a') as lock:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+                self._archive_dead(directory)
+                for path in [directory / ARCHIVE_NAME, *directory.glob('metrics-*.json')]:
+                    if path.name != self._snapshot_name:
+                        _merge(merged, _read(path))
+        return merged
+
+    def _archive_dead(self, directory):
+        """Fold snapshots of exited processes on this host into the archive, then drop them."""
+        host = socket.gethostname()
+        dead = []
+        for path in directory.glob(f'metrics-{host}-*.json'):
+            try:
+                pid = int(path.name[len(f'metrics-{host}-'):].split('-')[0])
+            except ValueError:
+                continue
+            if pid != os.getpid() and not _alive(pid):
+                dead.append(path)
+        if not dead:
+            return
+        archive = {}
+        _merge(archive, _read(directory / ARCHIVE_NAME), keep_unknown=True)
+        for path in dead:
+            _merge(archive, _read(path), keep_unknown=True)
+        archived = {
+            name: [[list(labels), value] for labels, value in series.items()]
+            for name, series in archive.items()
+        }
+        temporary = directory / 'archive.tmp'
+        temporary.write_text(json.dumps(archived))
+        os.replace(temporary, directory / ARCHIVE_NAME)
+        for path in dead:
+            path.unlink(missing_ok=True)
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass  # Someone else's process
+    return True
+
+
+def _read(path):
+    try:
+        return json.loads(path.read_text())
+    except (OSError, ValueError):
+        return {}
+
+
+def _merge(merged, snapshot, keep_unknown=False):
+    """Add a snapshot's series into ``{name: {labels: value}}``."""
+    for name, series in snapshot.items():
+        if name not in merged:
+            if not keep_unknown:
+                continue
+            merged[name] = {}
+        for labels, value in series:
+            labels = tuple(labels)
+            merged[name][labels] = _add(merged[name].get(labels), value)
+
+
+def _copy(value):
+    return list(value) if isinstance(value, list) else value
+
+
+def _add(total, value):
+    if total is None:
+        return _copy(value)
+    if isinstance(total, list):
+        return [a + b for a, b in zip(total, value)]
+    return total + value
+
+
+REGISTRY = Registry()
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.values = {}
+        REGISTRY.register(self)
+
+    def labels(self, *values):
+        return _Bound(self, tuple(str(value) for value in values))
+
+
+class _Bound:
+    """A metric with its label values filled in."""
+
+    def __init__(self, metric, labels):
+        self.metric = metric
+        self.key = labels
+
+    def inc(self, amount=1):
+        self.metric.inc(amount, self.key)
+
+    def observe(self, value):
+        self.metric.observe(value, self.key)
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, key=()):
+        REGISTRY.changed()
+        with REGISTRY.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, key=()):
+        # Stored as [count per bucket..., count above the last bucket, sum]
+        REGISTRY.changed()
+        with REGISTRY.lock:
+            counts = self.values.get(key)
+            if counts is None:
+                counts = self.values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            index = next(
+                (i for i, bound in enumerate(self.buckets) if value <= bound),
+                len(self.buckets)
+            )
+            counts[index] += 1
+            counts[-1] += value
+
+
+class Gauge(Metric):
+    """Computed at scrape time by ``collect()``, which returns ``[(labels, value)]``."""
+
+    kind = 'gauge'
+
+    def __init__(self, name, documentation, labelnames=(), collect=None):
+        super().__init__(name, documentation, labelnames)
+        self.collect = collect
+
+
+IPFS_DURATION = Histogram(
+    'ipfs_operation_duration_seconds', "PinataIPFSService call latency.", ['operation']
+)
+IPFS_OPERATIONS = Counter(
+    'ipfs_operations_total', "PinataIPFSService calls by outcome.", ['operation', 'outcome']
+)
+IPFS_UPLOAD_FAILURES = Counter(
+    'ipfs_upload_failures_total', "Uploads the caller continued without.", ['source']
+)
+REQUEST_DURATION = Histogram(
+    'http_request_duration_seconds', "Request latency per view.", ['view', 'method']
+)
+REQUEST_QUERIES = Histogram(
+    'http_request_queries', "Database queries per request.", ['view', 'method'],
+    buckets=QUERY_BUCKETS
+)
+REQUESTS = Counter(
+    'http_requests_total', "Requests per view and status code.", ['view', 'method', 'status']
+)
+
+
+def _unpinned_records():
+    from django.db.models import Count
+    from records.models import MedicalRecord
+
+    rows = (
+        MedicalRecord.objects.exclude(ipfs_status='pinned')
+        .values('ipfs_status').annotate(total=Count('pk')).order_by()
+    )
+    counts = {status: 0 for status, _ in MedicalRecord.IPFS_STATUS_CHOICES if status != 'pinned'}
+    counts.update({row['ipfs_status']: row['total'] for row in rows})
+    return [((status,), total) for status, total in counts.items()]
+
+
+def _pin_jobs():
+    from django.db.models import Count
+    from records.models import IPFSPinJob
+
+    rows = IPFSPinJob.objects.values('status').annotate(total=Count('pk')).order_by()
+    counts = {status: 0 for status, _ in IPFSPinJob.STATUS_CHOICES}
+    counts.update({row['status']: row['total'] for row in rows})
+    return [((status,), total) for status, total in counts.items()]
+
+
+def _unpinned_certificates():
+    from users.models import DoctorProfile
+
+    count = DoctorProfile.objects.filter(certificate_cid__isnull=True).exclude(
+        certificate__isnull=True
+    ).exclude(certificate='').count()
+    return [((), count)]
+
+
+Gauge('records_unpinned', "Medical records not yet pinned to IPFS.", ['status'], collect=_unpinned_records)
+Gauge('ipfs_pin_jobs', "Background pinning jobs by status.", ['status'], collect=_pin_jobs)
+Gauge(
+    'doctor_certificates_unpinned', "Stored doctor certificates without a CID.",
+    collect=_unpinned_certificates
+)
+
+
+def instrument_ipfs(operation):
+    """Decorate a ``PinataIPFSService`` method to time it and count its outcome."""
+
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            outcome = 'error'
+            try:
+                result = method(*args, **kwargs)
+                succeeded = result.get('success') if isinstance(result, dict) else bool(result)
+                outcome = 'success' if succeeded else 'error'
+                return result
+            finally:
+                IPFS_DURATION.labels(operation).observe(time.perf_counter() - started)
+                IPFS_OPERATIONS.labels(operation, outcome).inc()
+
+        return wrapper
+
+    return decorator
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = [*zip(names, values), *extra]
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(str(value))}"' for name, value in pairs) + '}'
+
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render():
+    """The whole registry in the Prometheus text exposition format."""
+    merged = REGISTRY.collect()
+    lines = []
+    for name, metric in sorted(REGISTRY.metrics.items()):
+        lines.append(f"# HELP {name} {metric.documentation}")
+        lines.append(f"# TYPE {name} {metric.kind}")
+        if metric.kind == 'gauge':
+            for labels, value in metric.collect():
+                lines.append(f"{name}{_labels(metric.labelnames, labels)} {_number(value)}")
+            continue
+        for labels, value in sorted(merged[name].items()):
+            if metric.kind == 'counter':
+                lines.append(f"{name}{_labels(metric.labelnames, labels)} {_number(value)}")
+                continue
+            cumulative = 0
+            for bound, count in zip((*metric.buckets, float('inf')), value):
+                cumulative += count
+                bucket_labels = _labels(metric.labelnames, labels, [('le', _number(bound))])
+                lines.append(f"{name}_bucket{bucket_labels} {cumulative}")
+            lines.append(f"{name}_sum{_labels(metric.labelnames, labels)} {_number(value[-1])}")
+            lines.append(f"{name}_count{_labels(metric.labelnames, labels)} {cumulative}")
+    return '\n'.join(lines) + '\n'
+
+
+def metrics_view(request):
+    """
+    Prometheus scrape endpoint.
+
+    Requires ``Authorization: Bearer <METRICS_TOKEN>`` when a token is
+    configured, and is only open without one in DEBUG.
+    """
+    if not getattr(settings, 'METRICS_ENABLED', False):
+        raise Http404
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    if token:
+        if request.META.get('HTTP_AUTHORIZATION', '') != f"Bearer {token}":
+            return HttpResponseForbidden()
+    elif not settings.DEBUG:
+        return HttpResponseForbidden()
+    return HttpResponse(render(), content_type=CONTENT_TYPE)
+
+
+class MetricsMiddleware:
+    """Record latency, query count and status per resolved view."""
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'METRICS_ENABLED', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with measure() as metrics:
+            response = self.get_response(request)
+        elapsed = metrics.total_seconds
+        queries = metrics.queries
+
+        # Unresolved paths and odd methods share one label each, so
+        # scanners can't blow up the number of series
+        match = getattr(request, 'resolver_match', None)
+        view = (match.view_name or match._func_path) if match else 'unmatched'
+        method = request.method if request.method in HTTP_METHODS else 'other'
+        REQUEST_DURATION.labels(view, method).observe(elapsed)
+        REQUEST_QUERIES.labels(view, method).observe(queries)
+        REQUESTS.labels(view, method, response.status_code).inc()
+        return response
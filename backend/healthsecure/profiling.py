@@ -0,0 +1,241 @@
+"""
+On-demand profiling of single requests, for staff users.
+
+A staff or superuser request carrying ``?_profile=1`` or an
+``X-Profile: 1`` header runs the rest of the middleware stack and the view
+under two profilers:
+
+- ``cProfile``, deterministic, saved as ``<name>.pstats`` (open it with
+  ``python -m pstats`` or snakeviz)
+- a sampling profiler reading the request thread's stack every
+  ``PROFILE_SAMPLE_INTERVAL_MS``, saved in the collapsed-stack format as
+  ``<name>.collapsed`` (feed it to ``flamegraph.pl`` or speedscope)
+
+Pass ``sample`` instead of ``1`` to skip ``cProfile``, whose overhead
+inflates timings of call-heavy code. Files go to ``PROFILE_DIR``; each
+capture is recorded as a ``users.RequestProfile`` row, listed in the admin
+with its top functions and download links, and the response carries its
+id in ``X-Profile-Id``. Only the newest ``PROFILE_KEEP`` captures are kept.
+
+Anyone else's trigger is ignored, and only one request per process is
+profiled at a time. JWT requests are authenticated here with the same
+``ClaimsJWTAuthentication`` the API uses, since DRF authenticates only
+inside the view. For streamed responses only the work done before the
+first byte is profiled.
+"""
+
+import cProfile
+import io
+import logging
+import pstats
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from pathlib import Path
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.utils import timezone
+
+from .instrumentation import measure
+
+logger = logging.getLogger(__name__)
+
+QUERY_FLAG = '_profile'
+HEADER = 'HTTP_X_PROFILE'
+
+# Only one cProfile can be active per process (Python 3.12+ enforces it)
+_active = threading.Lock()
+
+
+def profile_dir():
+    return Path(getattr(settings, 'PROFILE_DIR', settings.BASE_DIR / 'profiles'))
+
+
+def requested_mode(request):
+    """``'full'``, ``'sample'`` or None, from the query flag or header."""
+    value = request.GET.get(QUERY_FLAG) or request.META.get(HEADER)
+    if not value or value.lower() in ('0', 'false', 'no', 'off'):
+        return None
+    return 'sample' if value.lower() == 'sample' else 'full'
+
+
+def staff_user(request):
+    """The staff or superuser making the request, or None."""
+    user = getattr(request, 'user', None)
+    if user is None or not user.is_authenticated:
+        from rest_framework.exceptions import AuthenticationFailed
+        from rest_framework_simplejwt.exceptions import InvalidToken
+        from users.authentication import ClaimsJWTAuthentication
+
+        try:
+            authenticated = ClaimsJWTAuthentication().authenticate(request)
+        except (AuthenticationFailed, InvalidToken):
+            return None
+        if authenticated is None:
+            return None
+        user = authenticated[0]
+    if user.is_active and (user.is_staff or user.is_superuser):
+        return user
+    return None
+
+
+def _frame_label(code, roots):
+    filename = code.co_filename
+    for root in roots:
+        if filename.startswith(root):
+            filename = filename[len(root):].lstrip('/\\')
+            break
+    name = getattr(code, 'co_qualname', code.co_name)
+    return f"{name} ({filename}:{code.co_firstlineno})".replace(';', ',')
+
+
+class StackSampler:
+    """Count the stacks of one thread, sampled every ``interval`` seconds."""
+
+    def __init__(self, thread_id, interval, stop_at=None):
+        self.thread_id = thread_id
+        self.interval = interval
+        # Frames from the server down to stop_at are the same in every sample
+        self.stop_at = stop_at
+        self.stacks = Counter()
+        self.samples = 0
+        self._roots = sorted(
+            {str(settings.BASE_DIR), *(path for path in sys.path if path)},
+            key=len, reverse=True
+        )
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='request-profiler', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None and frame is not self.stop_at:
+                stack.append(_frame_label(frame.f_code, self._roots))
+                frame = frame.f_back
+            if stack:
+                self.stacks[';'.join(reversed(stack))] += 1
+                self.samples += 1
+
+    def collapsed(self):
+        """The samples in Brendan Gregg's collapsed-stack format."""
+        return ''.join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+def _file_stem(request):
+    slug = re.sub(r'[^A-Za-z0-9]+', '-', request.path).strip('-')[:80] or 'root'
+    return f"{timezone.now():%Y%m%d-%H%M%S}-{request.method.lower()}-{slug}-{uuid.uuid4().hex[:6]}"
+
+
+def _summary(profiler, limit):
+    stream = io.StringIO()
+    stats = pstats.Stats(profiler, stream=stream)
+    stats.strip_dirs().sort_stats(pstats.SortKey.CUMULATIVE).print_stats(limit)
+    return stream.getvalue()
+
+
+def prune(keep):
+    """Delete all but the newest ``keep`` profiles and their files."""
+    from users.models import RequestProfile
+
+    stale = RequestProfile.objects.order_by('-created_at', '-pk')[keep:]
+    for profile in stale:
+        profile.delete()
+
+
+class ProfilingMiddleware:
+    """Profile the requests of staff users who ask for it."""
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'PROFILING_ENABLED', True):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.interval = getattr(settings, 'PROFILE_SAMPLE_INTERVAL_MS', 1) / 1000
+        self.keep = getattr(settings, 'PROFILE_KEEP', 100)
+        self.summary_lines = getattr(settings, 'PROFILE_SUMMARY_LINES', 30)
+
+    def __call__(self, request):
+        mode = requested_mode(request)
+        if mode is None:
+            return self.get_response(request)
+        user = staff_user(request)
+        if user is None:
+            return self.get_response(request)
+        if not _active.acquire(blocking=False):
+            logger.warning("Profile of %s %s skipped: another request is being profiled",
+                           request.method, request.path)
+            return self.get_response(request)
+        try:
+            return self._profile(request, mode, user)
+        finally:
+            _active.release()
+
+    def _profile(self, request, mode, user):
+        sampler = StackSampler(threading.get_ident(), self.interval, stop_at=sys._getframe())
+        profiler = cProfile.Profile() if mode == 'full' else None
+        # Shares the request's SQL wrapper when metrics already installed one
+        with measure() as metrics:
+            queries = metrics.queries
+            started = time.perf_counter()
+            sampler.start()
+            if profiler is not None:
+                profiler.enable()
+            try:
+                response = self.get_response(request)
+            finally:
+                if profiler is not None:
+                    profiler.disable()
+                sampler.stop()
+            duration = time.perf_counter() - started
+            queries = metrics.queries - queries
+
+        try:
+            profile = self._save(request, response, user, mode, profiler, sampler, duration, queries)
+        except Exception:
+            # The profile is a diagnostic; never fail the request over it
+            logger.exception("Could not save profile of %s %s", request.method, request.path)
+            return response
+        response['X-Profile-Id'] = str(profile.pk)
+        return response
+
+    def _save(self, request, response, user, mode, profiler, sampler, duration, queries):
+        from users.models import RequestProfile
+
+        directory = profile_dir()
+        directory.mkdir(parents=True, exist_ok=True)
+        stem = _file_stem(request)
+        pstats_file = ''
+        summary = ''
+        if profiler is not None:
+            pstats_file = f"{stem}.pstats"
+            profiler.dump_stats(directory / pstats_file)
+            summary = _summary(profiler, self.summary_lines)
+        collapsed_file = f"{stem}.collapsed"
+        (directory / collapsed_file).write_text(sampler.collapsed(), encoding='utf-8')
+
+        profile = RequestProfile.objects.create(
+            method=request.method,
+            path=request.get_full_path()[:500],
+            user_email=getattr(user, 'email', '') or str(user),
+            mode=mode,
+            status_code=response.status_code,
+            duration_ms=duration * 1000,
+            queries=queries,
+            samples=sampler.samples,
+            pstats_file=pstats_file,
+            collapsed_file=collapsed_file,
+            summary=summary,
+        )
+        prune(self.keep)
+        return profile
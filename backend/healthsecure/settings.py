@@ -7,6 +7,8 @@ from datetime import timedelta
 from dotenv import load_dotenv
 import os
 
+from .database import database_config
+
 load_dotenv()
 
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -29,17 +31,22 @@ INSTALLED_APPS = [
     'corsheaders',
     'users',
     'records',
+    'chain',
 ]
 
 MIDDLEWARE = [
+    'healthsecure.metrics.MetricsMiddleware',
+    'healthsecure.instrumentation.RequestInstrumentationMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'healthsecure.database.ReplicaRoutingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'healthsecure.profiling.ProfilingMiddleware',
 ]
 
 ROOT_URLCONF = 'healthsecure.urls'
@@ -61,13 +68,95 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'healthsecure.wsgi.application'
 
-# Database - SQLite for simplicity
+# Database - DATABASE_URL (SQLite file by default; postgres:// needs psycopg).
+# Each URL in DATABASE_REPLICA_URLS adds a read replica that safe requests
+# read from (healthsecure.database); writes always go to the primary.
+DB_CONN_MAX_AGE = int(os.getenv('DB_CONN_MAX_AGE', '60'))
+SQLITE_BUSY_TIMEOUT = float(os.getenv('SQLITE_BUSY_TIMEOUT', '20'))
+# WAL journaling for SQLite files; off by default because it rewrites the
+# database file (the bundled db.sqlite3 is tracked in git)
+SQLITE_WAL = os.getenv('SQLITE_WAL', 'False') == 'True'
 DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
+    'default': database_config(
+        os.getenv('DATABASE_URL', 'sqlite:///db.sqlite3'),
+        BASE_DIR,
+        conn_max_age=DB_CONN_MAX_AGE,
+        sqlite_busy_timeout=SQLITE_BUSY_TIMEOUT,
+        sqlite_wal=SQLITE_WAL
+    )
 }
+for index, replica_url in enumerate(filter(None, os.getenv('DATABASE_REPLICA_URLS', '').split(',')), 1):
+    DATABASES[f'replica_{index}'] = {
+        **database_config(
+            replica_url.strip(),
+            BASE_DIR,
+            conn_max_age=DB_CONN_MAX_AGE,
+            sqlite_busy_timeout=SQLITE_BUSY_TIMEOUT,
+            sqlite_wal=SQLITE_WAL
+        ),
+        'TEST': {'MIRROR': 'default'},
+    }
+DATABASE_ROUTERS = ['healthsecure.database.PrimaryReplicaRouter']
+# Seconds a client reads from the primary after writing (replication lag)
+REPLICA_STICKY_SECONDS = int(os.getenv('REPLICA_STICKY_SECONDS', '10'))
+
+# Per-request SQL/serializer/IPFS timing (healthsecure.instrumentation):
+# Server-Timing headers, and requests over either threshold are logged
+# with their most repeated SQL statements
+REQUEST_INSTRUMENTATION = os.getenv('REQUEST_INSTRUMENTATION', 'False') == 'True'
+SLOW_REQUEST_MS = float(os.getenv('SLOW_REQUEST_MS', '500'))
+SLOW_REQUEST_QUERIES = int(os.getenv('SLOW_REQUEST_QUERIES', '50'))
+SLOW_REQUEST_TOP_STATEMENTS = int(os.getenv('SLOW_REQUEST_TOP_STATEMENTS', '5'))
+
+# Prometheus metrics at /metrics (healthsecure.metrics), off by default.
+# Scrapes need "Authorization: Bearer <METRICS_TOKEN>" (open without a
+# token only in DEBUG). Under gunicorn point METRICS_DIR at a directory
+# shared by all workers, so any worker reports the totals.
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'False') == 'True'
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+METRICS_DIR = os.getenv('METRICS_DIR', '')
+METRICS_FLUSH_SECONDS = float(os.getenv('METRICS_FLUSH_SECONDS', '5'))
+
+# On-demand profiling (healthsecure.profiling): staff requests with
+# ?_profile=1 or "X-Profile: 1" save pstats and collapsed stacks to
+# PROFILE_DIR, listed under "Request profiles" in the admin
+PROFILING_ENABLED = os.getenv('PROFILING_ENABLED', 'True') == 'True'
+PROFILE_DIR = Path(os.getenv('PROFILE_DIR', str(BASE_DIR / 'profiles')))
+PROFILE_SAMPLE_INTERVAL_MS = float(os.getenv('PROFILE_SAMPLE_INTERVAL_MS', '1'))
+PROFILE_KEEP = int(os.getenv('PROFILE_KEEP', '100'))
+PROFILE_SUMMARY_LINES = int(os.getenv('PROFILE_SUMMARY_LINES', '30'))
+
+# Cache - shared across processes when REDIS_URL is set (requires `redis`)
+if os.getenv('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.getenv('REDIS_URL'),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# Access decisions (users.access): short per-process layer over the shared cache
+ACCESS_CACHE_LOCAL_TTL = int(os.getenv('ACCESS_CACHE_LOCAL_TTL', '5'))
+ACCESS_CACHE_LOCAL_SIZE = int(os.getenv('ACCESS_CACHE_LOCAL_SIZE', '10000'))
+ACCESS_CACHE_SHARED_TTL = int(os.getenv('ACCESS_CACHE_SHARED_TTL', '300'))
+
+# Claims-based auth (users.authentication): how long a user's active/role/
+# password state may be served from cache between invalidations
+AUTH_STATE_LOCAL_TTL = int(os.getenv('AUTH_STATE_LOCAL_TTL', '5'))
+AUTH_STATE_LOCAL_SIZE = int(os.getenv('AUTH_STATE_LOCAL_SIZE', '10000'))
+AUTH_STATE_SHARED_TTL = int(os.getenv('AUTH_STATE_SHARED_TTL', '60'))
+
+# Health/doctor ID allocation (users.identifiers): sequence values reserved
+# per round-trip, and the permutation key (derived from SECRET_KEY if unset;
+# changing it changes which IDs future registrations get, never existing ones)
+ID_BLOCK_SIZE = int(os.getenv('ID_BLOCK_SIZE', '100'))
+ID_PERMUTATION_KEY = os.getenv('ID_PERMUTATION_KEY', '')
 
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
@@ -88,6 +177,16 @@ STATIC_URL = 'static/'
 MEDIA_URL = 'media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Uploaded documents are hashed, stored and pinned in chunks of this size
+DOCUMENT_CHUNK_SIZE = int(os.getenv('DOCUMENT_CHUNK_SIZE', str(1024 * 1024)))
+
+# Profile pictures are resized in the background to these square WebP sizes
+# (users.images); lists use the smallest, profile pages the largest
+PROFILE_PICTURE_SIZES = tuple(int(size) for size in os.getenv('PROFILE_PICTURE_SIZES', '64,160,512').split(','))
+PROFILE_PICTURE_QUALITY = int(os.getenv('PROFILE_PICTURE_QUALITY', '80'))
+PROFILE_PICTURE_WORKERS = int(os.getenv('PROFILE_PICTURE_WORKERS', '2'))
+PROFILE_PICTURE_ASYNC = os.getenv('PROFILE_PICTURE_ASYNC', 'True') == 'True'
+
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
@@ -97,7 +196,7 @@ AUTH_USER_MODEL = 'users.User'
 # REST Framework
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'users.authentication.ClaimsJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
@@ -125,3 +224,55 @@ CORS_ALLOW_CREDENTIALS = True
 PINATA_API_KEY = os.getenv('PINATA_API_KEY', '')
 PINATA_SECRET_KEY = os.getenv('PINATA_SECRET_KEY', '')
 PINATA_GATEWAY = os.getenv('PINATA_GATEWAY', 'https://gateway.pinata.cloud/ipfs/')
+# Point at `manage.py run_pinata_stub` to work fully offline
+PINATA_API_URL = os.getenv('PINATA_API_URL', 'https://api.pinata.cloud')
+PINATA_TIMEOUT = float(os.getenv('PINATA_TIMEOUT', '30'))
+# Keep-alive connection pool shared by the ipfs_service singleton
+PINATA_POOL_CONNECTIONS = int(os.getenv('PINATA_POOL_CONNECTIONS', '4'))  # distinct hosts
+PINATA_POOL_MAXSIZE = int(os.getenv('PINATA_POOL_MAXSIZE', '10'))  # connections per host
+PINATA_POOL_BLOCK = os.getenv('PINATA_POOL_BLOCK', 'False') == 'True'
+# Gateway verification results (IPFSVerifyView), cached per process
+IPFS_VERIFY_CACHE_SIZE = int(os.getenv('IPFS_VERIFY_CACHE_SIZE', '10000'))
+IPFS_VERIFY_HIT_TTL = int(os.getenv('IPFS_VERIFY_HIT_TTL', '86400'))
+IPFS_VERIFY_MISS_TTL = int(os.getenv('IPFS_VERIFY_MISS_TTL', '30'))
+
+# Bulk record import (POST /api/records/bulk/, `manage.py import_records`)
+BULK_IMPORT_MAX_ROWS = int(os.getenv('BULK_IMPORT_MAX_ROWS', '1000'))
+BULK_IMPORT_BATCH_SIZE = int(os.getenv('BULK_IMPORT_BATCH_SIZE', '500'))
+
+# Streaming exports: rows fetched per database round-trip
+EXPORT_CHUNK_SIZE = int(os.getenv('EXPORT_CHUNK_SIZE', '500'))
+
+# Full-text record search (GET /api/records/search/): page size cap
+SEARCH_MAX_RESULTS = int(os.getenv('SEARCH_MAX_RESULTS', '100'))
+
+# Background IPFS pinning queue (`manage.py run_ipfs_workers`)
+IPFS_WORKER_THREADS = int(os.getenv('IPFS_WORKER_THREADS', '4'))
+IPFS_JOB_MAX_ATTEMPTS = int(os.getenv('IPFS_JOB_MAX_ATTEMPTS', '5'))
+IPFS_JOB_BACKOFF_SECONDS = float(os.getenv('IPFS_JOB_BACKOFF_SECONDS', '5'))
+IPFS_JOB_MAX_BACKOFF_SECONDS = float(os.getenv('IPFS_JOB_MAX_BACKOFF_SECONDS', '600'))
+IPFS_JOB_LEASE_SECONDS = int(os.getenv('IPFS_JOB_LEASE_SECONDS', '300'))
+
+# Merkle-batched record anchoring (`manage.py anchor_records`): pinned
+# records are batched every window and only the batch root is anchored
+ANCHOR_WINDOW_SECONDS = float(os.getenv('ANCHOR_WINDOW_SECONDS', '300'))
+ANCHOR_MAX_BATCH = int(os.getenv('ANCHOR_MAX_BATCH', '10000'))
+# Dotted path of a callable(batch) that publishes a root outside the database
+# and returns a reference (e.g. tx hash) once confirmed; unset, batches stop
+# at MANIFEST_PINNED
+ANCHOR_PUBLISHER = os.getenv('ANCHOR_PUBLISHER', '')
+
+# On-chain event indexer (`manage.py index_chain`). The default RPC URL is a
+# local `npx hardhat node`; Quai nodes need CHAIN_RPC_NAMESPACE=quai
+CHAIN_RPC_URL = os.getenv('CHAIN_RPC_URL', 'http://127.0.0.1:8545')
+CHAIN_RPC_NAMESPACE = os.getenv('CHAIN_RPC_NAMESPACE', 'eth')
+CHAIN_RPC_TIMEOUT = float(os.getenv('CHAIN_RPC_TIMEOUT', '30'))
+CHAIN_DEPLOYMENTS_FILE = Path(os.getenv('CHAIN_DEPLOYMENTS_FILE', str(BASE_DIR.parent / 'contracts' / 'deployments.json')))
+CHAIN_METADATA_DIR = Path(os.getenv('CHAIN_METADATA_DIR', str(BASE_DIR.parent / 'contracts' / 'metadata')))
+CHAIN_START_BLOCK = int(os.getenv('CHAIN_START_BLOCK', '0'))
+CHAIN_CONFIRMATIONS = int(os.getenv('CHAIN_CONFIRMATIONS', '0'))
+CHAIN_BATCH_BLOCKS = int(os.getenv('CHAIN_BATCH_BLOCKS', '1000'))
+CHAIN_MAX_BATCH_BLOCKS = int(os.getenv('CHAIN_MAX_BATCH_BLOCKS', '10000'))
+CHAIN_TARGET_LOGS = int(os.getenv('CHAIN_TARGET_LOGS', '2000'))
+CHAIN_REORG_WINDOW = int(os.getenv('CHAIN_REORG_WINDOW', '256'))
+CHAIN_POLL_SECONDS = float(os.getenv('CHAIN_POLL_SECONDS', '2'))
@@ -0,0 +1,332 @@
+import json
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections, router, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import path
+from rest_framework import serializers
+from rest_framework.decorators import api_view, authentication_classes, permission_classes
+from rest_framework.response import Response
+
+from records.ipfs_jobs import enqueue_record_pin
+from records.models import MedicalRecord
+from users.ipfs_service import ipfs_service
+from users.models import DoctorProfile, PatientProfile, RequestProfile, User
+from users.pinata_stub import PinataStubServer
+from users.serializers import CustomTokenObtainPairSerializer
+from . import instrumentation, metrics, profiling
+from .database import PrimaryReplicaRouter
+
+
+class UserSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = User
+        fields = ['id', 'email']
+
+
+@api_view(['GET'])
+@authentication_classes([])
+@permission_classes([])
+def probe(request):
+    """Three queries, one list serialization and, with ``?pin=1``, one Pinata call."""
+    users = list(User.objects.all())
+    User.objects.count()
+    User.objects.filter(is_staff=True).exists()
+    data = UserSerializer(users, many=True).data
+    if request.GET.get('pin'):
+        ipfs_service.upload_json({'probe': True}, name='probe')
+    return Response({'users': data})
+
+
+@api_view(['GET', 'POST'])
+@authentication_classes([])
+@permission_classes([])
+def route(request):
+    """Read, optionally write (``?write=1``), then read again."""
+    User.objects.count()
+    if request.GET.get('write'):
+        User.objects.filter(email='nobody@example.com').update(phone='0')
+    User.objects.exists()
+    return Response({})
+
+
+urlpatterns = [
+    path('probe/', probe),
+    path('route/', route),
+    path('metrics', metrics.metrics_view),
+]
+
+
+def server_timing(response):
+    """``Server-Timing`` as ``{name: (desc, milliseconds)}``."""
+    timings = {}
+    for metric in response['Server-Timing'].split(', '):
+        name, *params = metric.split(';')
+        params = dict(param.split('=', 1) for param in params)
+        timings[name] = (params.get('desc', '').strip('"'), float(params['dur']))
+    return timings
+
+
+@override_settings(ROOT_URLCONF='healthsecure.tests', REQUEST_INSTRUMENTATION=True)
+class RequestInstrumentationTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.pinata = PinataStubServer(('127.0.0.1', 0))
+        cls.pinata.start_in_thread()
+        cls.addClassCleanup(cls.pinata.server_close)
+        cls.addClassCleanup(cls.pinata.shutdown)
+
+    def setUp(self):
+        self.addCleanup(instrumentation.uninstall_hooks)
+        self.enterContext(mock.patch.object(ipfs_service, 'base_url', self.pinata.url))
+        User.objects.create_user(email='one@example.com', password='Secret-pass-1')
+        User.objects.create_user(email='two@example.com', password='Secret-pass-1')
+
+    def test_server_timing_counts_sql_serializer_and_ipfs(self):
+        response = self.client.get('/probe/', {'pin': 1})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['users']), 2)
+
+        timings = server_timing(response)
+        self.assertEqual(timings['db'][0], '3 queries')
+        self.assertGreater(timings['serialize'][1], 0)
+        self.assertEqual(timings['ipfs'][0], '1 calls')
+        self.assertGreater(timings['ipfs'][1], 0)
+        self.assertGreaterEqual(timings['total'][1], timings['ipfs'][1])
+
+    def test_slow_requests_log_their_repeated_statements(self):
+        with override_settings(SLOW_REQUEST_QUERIES=2):
+            self.client = self.client_class()
+            with self.assertLogs('healthsecure.requests', 'WARNING') as logs:
+                self.client.get('/probe/')
+        self.assertRegex(logs.output[0], r'Slow request GET /probe/ -> 200: \d+ms, 3 queries')
+
+    def test_serializers_are_untouched_unless_enabled(self):
+        original = serializers.ListSerializer.__dict__['data']
+        self.client.get('/probe/')
+        self.assertIsNot(serializers.ListSerializer.__dict__['data'], original)
+
+        instrumentation.uninstall_hooks()
+        self.assertIs(serializers.ListSerializer.__dict__['data'], original)
+        with override_settings(REQUEST_INSTRUMENTATION=False):
+            response = self.client_class().get('/probe/')
+        self.assertNotIn('Server-Timing', response)
+        self.assertIs(serializers.ListSerializer.__dict__['data'], original)
+
+
+def scrape(client):
+    """``/metrics`` as ``{series with labels: value}``."""
+    response = client.get('/metrics', HTTP_AUTHORIZATION='Bearer scrape-token')
+    assert response.status_code == 200, response.status_code
+    samples = {}
+    for line in response.content.decode().splitlines():
+        if line and not line.startswith('#'):
+            series, value = line.rsplit(' ', 1)
+            samples[series] = float(value)
+    return samples
+
+
+@override_settings(
+    ROOT_URLCONF='healthsecure.tests',
+    METRICS_ENABLED=True,
+    METRICS_TOKEN='scrape-token',
+    METRICS_DIR=''
+)
+class MetricsTests(TestCase):
+    view = 'view="healthsecure.tests.probe",method="GET"'
+
+    def setUp(self):
+        patient = PatientProfile.objects.create(
+            user=User.objects.create_user(email='patient@example.com', password='Secret-pass-1', role='PATIENT'),
+            first_name='Pat',
+            last_name='Ient'
+        )
+        doctor = DoctorProfile.objects.create(
+            user=User.objects.create_user(email='doctor@example.com', password='Secret-pass-1', role='DOCTOR'),
+            first_name='Doc',
+            last_name='Tor',
+            medical_license='LIC-1',
+            specialization='General',
+            hospital='General Hospital'
+        )
+        for _ in range(2):
+            enqueue_record_pin(MedicalRecord.objects.create(
+                patient=patient, doctor=doctor, record_type='lab', diagnosis='Diagnosis', notes='Notes'
+            ))
+
+    def test_scrape_reports_counter_histogram_and_backlog(self):
+        before = scrape(self.client)
+        for _ in range(3):
+            self.assertEqual(self.client.get('/probe/').status_code, 200)
+        after = scrape(self.client)
+
+        requests = f'http_requests_total{{{self.view},status="200"}}'
+        self.assertEqual(after[requests] - before.get(requests, 0), 3)
+        # The probe runs three queries, counted by the shared SQL wrapper
+        for bound, delta in (('2', 0), ('3', 3), ('+Inf', 3)):
+            bucket = f'http_request_queries_bucket{{{self.view},le="{bound}"}}'
+            self.assertEqual(after[bucket] - before.get(bucket, 0), delta)
+        count = f'http_request_duration_seconds_count{{{self.view}}}'
+        self.assertEqual(after[count] - before.get(count, 0), 3)
+        self.assertEqual(after['ipfs_pin_jobs{status="QUEUED"}'], 2)
+        self.assertEqual(after['records_unpinned{status="pending"}'], 2)
+
+    def test_scrape_needs_the_token_and_the_setting(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 403)
+        with override_settings(METRICS_ENABLED=False):
+            response = self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer scrape-token')
+        self.assertEqual(response.status_code, 404)
+
+    def test_dead_process_snapshots_are_archived(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        exited = subprocess.run([sys.executable, '-c', 'import os; print(os.getpid())'], capture_output=True)
+        dead_pid = int(exited.stdout)
+        series = [[['unpin', 'success'], 4]]
+        for name, pid in ((f'metrics-{socket.gethostname()}-{dead_pid}-1.json', dead_pid),
+                          (f'metrics-{socket.gethostname()}-{os.getppid()}-1.json', os.getppid())):
+            with open(os.path.join(directory, name), 'w') as snapshot:
+                json.dump({'ipfs_operations_total': series}, snapshot)
+
+        sample = 'ipfs_operations_total{operation="unpin",outcome="success"}'
+        baseline = scrape(self.client).get(sample, 0)
+        with override_settings(METRICS_DIR=directory):
+            self.assertEqual(scrape(self.client)[sample], baseline + 8)
+            # Folded into the archive, so the total holds once the file is gone
+            self.assertEqual(
+                sorted(name for name in os.listdir(directory) if name.endswith('.json')),
+                [metrics.ARCHIVE_NAME, f'metrics-{socket.gethostname()}-{os.getppid()}-1.json']
+            )
+            self.assertEqual(scrape(self.client)[sample], baseline + 8)
+
+
+REPLICA = 'replica_test'
+
+
+@override_settings(ROOT_URLCONF='healthsecure.tests', REPLICA_STICKY_SECONDS=10)
+class PrimaryReplicaRouterTests(TransactionTestCase):
+    """A replica alias on its own connection to the same test database."""
+
+    @classmethod
+    def setUpClass(cls):
+        primary = connections[DEFAULT_DB_ALIAS].settings_dict
+        replica = {**primary, 'TEST': {**primary['TEST'], 'MIRROR': DEFAULT_DB_ALIAS}}
+        # Only this replica, even if DATABASE_REPLICA_URLS configured others
+        patcher = mock.patch.dict(settings.DATABASES, {DEFAULT_DB_ALIAS: primary, REPLICA: replica}, clear=True)
+        patcher.start()
+        cls.addClassCleanup(patcher.stop)
+        connections.settings[REPLICA] = replica
+        cls.addClassCleanup(connections.settings.pop, REPLICA)
+        cls.addClassCleanup(connections.close_all)
+        # Declared here, not on the class, so the runner doesn't try to create it
+        cls.databases = {DEFAULT_DB_ALIAS, REPLICA}
+        super().setUpClass()
+
+    def setUp(self):
+        cache.clear()
+        self.queries = []
+        for alias in (DEFAULT_DB_ALIAS, REPLICA):
+            self.enterContext(connections[alias].execute_wrapper(self.record(alias)))
+
+    def record(self, alias):
+        def wrapper(execute, sql, params, many, context):
+            self.queries.append((alias, sql.split()[0].upper()))
+            return execute(sql, params, many, context)
+        return wrapper
+
+    def request(self, method, path, **extra):
+        self.queries.clear()
+        response = getattr(self.client, method)(path, **extra)
+        self.assertEqual(response.status_code, 200)
+        return list(self.queries)
+
+    def test_safe_reads_go_to_the_replica(self):
+        self.assertEqual(self.request('get', '/route/'), [(REPLICA, 'SELECT'), (REPLICA, 'SELECT')])
+
+    def test_reads_after_a_write_stay_on_the_primary(self):
+        queries = self.request('get', '/route/?write=1')
+        self.assertEqual(queries[0], (REPLICA, 'SELECT'))
+        self.assertEqual({alias for alias, _ in queries[1:]}, {DEFAULT_DB_ALIAS})
+        self.assertEqual(queries[-1], (DEFAULT_DB_ALIAS, 'SELECT'))
+
+        # The same client keeps reading from the primary while replicas may lag
+        self.assertEqual({alias for alias, _ in self.request('get', '/route/')}, {DEFAULT_DB_ALIAS})
+        other = self.request('get', '/route/', REMOTE_ADDR='10.0.0.2')
+        self.assertEqual({alias for alias, _ in other}, {REPLICA})
+
+    def test_unsafe_requests_and_transactions_use_the_primary(self):
+        self.assertEqual({alias for alias, _ in self.request('post', '/route/')}, {DEFAULT_DB_ALIAS})
+        self.assertEqual(router.db_for_read(User), DEFAULT_DB_ALIAS)  # Outside any request
+        with transaction.atomic():
+            self.assertEqual(router.db_for_read(User), DEFAULT_DB_ALIAS)
+
+    def test_migrations_run_on_the_primary_only(self):
+        self.assertTrue(router.allow_migrate(DEFAULT_DB_ALIAS, 'users', model_name='user'))
+        self.assertFalse(router.allow_migrate(REPLICA, 'users', model_name='user'))
+        self.assertFalse(PrimaryReplicaRouter().allow_migrate(REPLICA, 'records'))
+
+
+def bearer(user):
+    return f'Bearer {CustomTokenObtainPairSerializer.get_token(user).access_token}'
+
+
+@override_settings(ROOT_URLCONF='healthsecure.tests', PROFILING_ENABLED=True)
+class ProfilingTests(TestCase):
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        self.enterContext(override_settings(PROFILE_DIR=directory))
+        self.directory = directory
+        cache.clear()
+        self.staff = User.objects.create_user(email='staff@example.com', password='Secret-pass-1', is_staff=True)
+        self.member = User.objects.create_user(email='member@example.com', password='Secret-pass-1')
+        self.expected = self.client.get('/probe/').json()
+
+    def test_non_staff_trigger_is_ignored(self):
+        for headers in ({}, {'HTTP_AUTHORIZATION': bearer(self.member)}, {'HTTP_AUTHORIZATION': 'Bearer junk'}):
+            response = self.client.get('/probe/', {profiling.QUERY_FLAG: '1'}, **headers)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.json(), self.expected)
+            self.assertNotIn('X-Profile-Id', response)
+        self.assertFalse(RequestProfile.objects.exists())
+        self.assertEqual(os.listdir(self.directory), [])
+
+    def test_staff_request_is_profiled_and_still_answered(self):
+        response = self.client.get('/probe/', {profiling.QUERY_FLAG: '1'}, HTTP_AUTHORIZATION=bearer(self.staff))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), self.expected)
+
+        profile = RequestProfile.objects.get(pk=response['X-Profile-Id'])
+        self.assertEqual((profile.mode, profile.user_email, profile.status_code), ('full', 'staff@example.com', 200))
+        self.assertEqual(profile.queries, 3)
+        self.assertIn('probe', profile.summary)
+        self.assertEqual(
+            sorted(os.listdir(self.directory)),
+            sorted([profile.pstats_file, profile.collapsed_file])
+        )
+
+    def test_header_selects_sampling_only(self):
+        response = self.client.get('/probe/', HTTP_X_PROFILE='sample', HTTP_AUTHORIZATION=bearer(self.staff))
+        self.assertEqual(response.json(), self.expected)
+        profile = RequestProfile.objects.get(pk=response['X-Profile-Id'])
+        self.assertEqual((profile.mode, profile.pstats_file, profile.summary), ('sample', '', ''))
+        self.assertEqual(os.listdir(self.directory), [profile.collapsed_file])
+
+    def test_failed_save_keeps_the_response(self):
+        with mock.patch.object(RequestProfile.objects, 'create', side_effect=OSError('disk full')):
+            with self.assertLogs('healthsecure.profiling', 'ERROR'):
+                response = self.client.get('/probe/', {profiling.QUERY_FLAG: '1'},
+                                           HTTP_AUTHORIZATION=bearer(self.staff))
+        self.assertEqual(response.json(), self.expected)
+        self.assertNotIn('X-Profile-Id', response)
@@ -1,10 +1,25 @@
 from django.contrib import admin
-from .models import MedicalRecord
+from .models import MedicalRecord, IPFSPinJob, AnchorBatch
 
 
 @admin.register(MedicalRecord)
 class MedicalRecordAdmin(admin.ModelAdmin):
-    list_display = ('record_type', 'patient', 'doctor', 'is_visible', 'created_at')
-    list_filter = ('record_type', 'is_visible', 'created_at')
+    list_display = ('record_type', 'patient', 'doctor', 'is_visible', 'ipfs_status', 'created_at')
+    list_filter = ('record_type', 'is_visible', 'ipfs_status', 'created_at')
     search_fields = ('patient__health_id', 'doctor__doctor_id', 'diagnosis')
     readonly_fields = ('created_at', 'updated_at')
+
+
+@admin.register(IPFSPinJob)
+class IPFSPinJobAdmin(admin.ModelAdmin):
+    list_display = ('record', 'status', 'attempts', 'next_attempt_at', 'updated_at')
+    list_filter = ('status',)
+    readonly_fields = ('created_at', 'updated_at')
+
+
+@admin.register(AnchorBatch)
+class AnchorBatchAdmin(admin.ModelAdmin):
+    list_display = ('id', 'root', 'leaf_count', 'status', 'manifest_cid', 'anchor_tx', 'created_at', 'anchored_at')
+    list_filter = ('status',)
+    search_fields = ('root', 'manifest_cid', 'anchor_tx')
+    readonly_fields = ('created_at', 'pinned_at', 'anchored_at')
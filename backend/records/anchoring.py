@@ -0,0 +1,227 @@
+"""
+Merkle-batched anchoring of record metadata.
+
+Anchoring each record on chain costs one transaction per record. Instead,
+``manage.py anchor_records`` collects pinned records every
+``ANCHOR_WINDOW_SECONDS``, up to ``ANCHOR_MAX_BATCH`` at a time. It hashes
+each record's metadata (the JSON pinned by ``records.ipfs_jobs``, in
+canonical form) and builds a Merkle tree over the hashes. Only the root is
+anchored, and every record keeps its inclusion proof.
+
+Hashing follows RFC 6962: leaves are ``sha256(0x00 || metadata_sha256)``
+and inner nodes ``sha256(0x01 || left || right)``, so a leaf can never pass
+as a node. An odd node at the end of a level moves up unchanged instead of
+being paired with itself.
+
+Each batch then goes through two steps:
+
+1. ``MANIFEST_PINNED``: the batch manifest (root plus every ``[record_id,
+   metadata_sha256]``) is pinned to IPFS. This makes the batch easy to
+   distribute and audit, but attests nothing: the root and the CID both
+   live only in this database, so whoever can write to it can rewrite
+   both together.
+2. ``ANCHORED``: ``ANCHOR_PUBLISHER`` (the dotted path of a callable) has
+   published the root outside the database and confirmed it. The callable
+   takes the batch, blocks until the publication is final (e.g. the
+   transaction has enough confirmations), and returns a reference such as
+   the transaction hash. It returns None or raises if that fails. The
+   deployed contracts have no function that takes a root and the backend
+   holds no signing key, so no publisher ships here. Without one, batches
+   stop at ``MANIFEST_PINNED``.
+
+Checking a record needs only its proof and its batch's root. The leaf is
+recomputed from the record as it is now and hashed up the ``log2(n)``
+proof steps. This touches neither the chain nor the other records, and a
+record edited after anchoring no longer verifies.
+"""
+
+import hashlib
+import json
+import logging
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from users.ipfs_service import ipfs_service
+from .ipfs_jobs import build_record_metadata
+from .models import AnchorBatch, MedicalRecord, RecordAnchor
+
+logger = logging.getLogger(__name__)
+
+LEAF_PREFIX = b'\x00'
+NODE_PREFIX = b'\x01'
+
+
+def metadata_sha256(record):
+    """SHA-256 (hex) of a record's metadata JSON in canonical form."""
+    canonical = json.dumps(build_record_metadata(record), sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+def leaf_hash(metadata_hash):
+    return hashlib.sha256(LEAF_PREFIX + bytes.fromhex(metadata_hash)).digest()
+
+
+def node_hash(left, right):
+    return hashlib.sha256(NODE_PREFIX + left + right).digest()
+
+
+def build_tree(metadata_hashes):
+    """
+    Every level of the Merkle tree over ``metadata_hashes``.
+
+    Returns:
+        list: Levels of node digests, leaves first and ``[root]`` last
+    """
+    level = [leaf_hash(value) for value in metadata_hashes]
+    levels = [level]
+    while len(level) > 1:
+        level = [
+            node_hash(level[index], level[index + 1]) if index + 1 < len(level) else level[index]
+            for index in range(0, len(level), 2)
+        ]
+        levels.append(level)
+    return levels
+
+
+def inclusion_proof(levels, index):
+    """Sibling hashes from leaf ``index`` up to the root."""
+    proof = []
+    for level in levels[:-1]:
+        sibling = index ^ 1
+        if sibling < len(level):
+            proof.append({
+                'position': 'left' if sibling < index else 'right',
+                'hash': level[sibling].hex()
+            })
+        index //= 2
+    return proof
+
+
+def root_from_proof(metadata_hash, proof):
+    """The root (hex) that ``proof`` leads to from ``metadata_hash``."""
+    node = leaf_hash(metadata_hash)
+    for step in proof:
+        sibling = bytes.fromhex(step['hash'])
+        node = node_hash(sibling, node) if step['position'] == 'left' else node_hash(node, sibling)
+    return node.hex()
+
+
+def verify_record(record, anchor):
+    """
+    Check a record against its anchored root.
+
+    Args:
+        record: The ``MedicalRecord``, as stored now
+        anchor: Its ``RecordAnchor``, with ``batch`` loaded
+
+    Returns:
+        dict: ``verified``, the current and anchored metadata hashes and the root
+    """
+    current = metadata_sha256(record)
+    return {
+        'verified': current == anchor.metadata_sha256 and root_from_proof(current, anchor.proof) == anchor.batch.root,
+        'metadata_sha256': current,
+        'anchored_metadata_sha256': anchor.metadata_sha256,
+        'root': anchor.batch.root,
+    }
+
+
+def pending_records(limit):
+    """Pinned records not yet in a batch, oldest first."""
+    return list(
+        MedicalRecord.objects.filter(ipfs_status='pinned', anchor__isnull=True)
+        .select_related('patient', 'doctor')
+        .order_by('id')[:limit]
+    )
+
+
+def build_batch(records):
+    """Hash ``records`` into a new ``AnchorBatch`` and store their proofs."""
+    hashes = [metadata_sha256(record) for record in records]
+    levels = build_tree(hashes)
+    with transaction.atomic():
+        batch = AnchorBatch.objects.create(root=levels[-1][0].hex(), leaf_count=len(records))
+        RecordAnchor.objects.bulk_create([
+            RecordAnchor(
+                record=record,
+                batch=batch,
+                leaf_index=index,
+                metadata_sha256=value,
+                proof=inclusion_proof(levels, index)
+            )
+            for index, (record, value) in enumerate(zip(records, hashes))
+        ], batch_size=1000)
+    return batch
+
+
+def pin_manifest(batch):
+    """Pin the batch manifest to IPFS. Returns True once pinned."""
+    leaves = list(batch.leaves.order_by('leaf_index').values_list('record_id', 'metadata_sha256'))
+    result = ipfs_service.upload_json(
+        {
+            'root': batch.root,
+            'hash': 'sha256',
+            'tree': 'rfc6962',
+            'leaves': [list(leaf) for leaf in leaves],
+        },
+        name=f"anchor_batch_{batch.pk}"
+    )
+    if not result.get('success'):
+        logger.warning("Pinning the manifest of batch %s failed: %s", batch.pk, result.get('error'))
+        return False
+    batch.manifest_cid = result.get('cid')
+    batch.status = 'MANIFEST_PINNED'
+    batch.pinned_at = timezone.now()
+    batch.save(update_fields=['manifest_cid', 'status', 'pinned_at'])
+    return True
+
+
+def get_publisher():
+    """The ``ANCHOR_PUBLISHER`` callable, or None if none is configured."""
+    path = getattr(settings, 'ANCHOR_PUBLISHER', '')
+    return import_string(path) if path else None
+
+
+def publish_batch(batch, publisher):
+    """Publish a pinned batch's root. Returns True once anchored."""
+    try:
+        reference = publisher(batch)
+    except Exception:
+        logger.exception("Publishing the root of batch %s failed", batch.pk)
+        return False
+    if not reference:
+        return False
+    batch.anchor_tx = str(reference)
+    batch.status = 'ANCHORED'
+    batch.anchored_at = timezone.now()
+    batch.save(update_fields=['anchor_tx', 'status', 'anchored_at'])
+    return True
+
+
+def run_anchoring(max_batch=None):
+    """
+    Batch every pending record, then move every batch as far as it can go.
+
+    Returns:
+        dict: ``batches`` built, ``records`` batched, ``pinned`` manifests
+        and ``anchored`` batches
+    """
+    max_batch = max_batch or settings.ANCHOR_MAX_BATCH
+    totals = {'batches': 0, 'records': 0, 'pinned': 0, 'anchored': 0}
+    while True:
+        records = pending_records(max_batch)
+        if not records:
+            break
+        build_batch(records)
+        totals['batches'] += 1
+        totals['records'] += len(records)
+    for batch in AnchorBatch.objects.filter(status='PENDING').order_by('pk'):
+        totals['pinned'] += pin_manifest(batch)
+    publisher = get_publisher()
+    if publisher is not None:
+        for batch in AnchorBatch.objects.filter(status='MANIFEST_PINNED').order_by('pk'):
+            totals['anchored'] += publish_batch(batch, publisher)
+    return totals
@@ -0,0 +1,106 @@
+"""
+Set-based bulk import of medical records for lab and hospital feeds.
+
+A batch of rows costs a fixed number of queries regardless of its size:
+one to resolve every patient health ID, one to load the doctor's
+approved grants for those patients, one ``bulk_create`` for the records
+and one for their IPFS pin jobs, plus grouped stats refreshes.
+"""
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from users.access import invalidate_access_on_commit
+from users.models import PatientProfile, AccessRequest
+from . import stats
+from .models import MedicalRecord, IPFSPinJob
+from .serializers import BulkRecordRowSerializer
+
+
+def import_records(doctor, rows, all_or_nothing=False):
+    """
+    Validate and insert a batch of records authored by ``doctor``.
+
+    Args:
+        doctor: ``DoctorProfile`` creating the records
+        rows: List of dicts with patient_health_id, record_type, diagnosis,
+            notes and optionally is_visible
+        all_or_nothing: Create nothing if any row fails; the valid rows
+            are then reported as ``'skipped'``
+
+    Returns:
+        list: One result per row, in order: ``{'index', 'status': 'created',
+            'id'}``, ``{'index', 'status': 'error', 'errors'}`` or
+            ``{'index', 'status': 'skipped'}``
+    """
+    results = [None] * len(rows)
+    valid = []
+    for index, row in enumerate(rows):
+        serializer = BulkRecordRowSerializer(data=row)
+        if serializer.is_valid():
+            valid.append((index, serializer.validated_data))
+        else:
+            results[index] = {'index': index, 'status': 'error', 'errors': serializer.errors}
+
+    health_ids = {data['patient_health_id'] for _, data in valid}
+    patients = dict(
+        PatientProfile.objects.filter(health_id__in=health_ids).values_list('health_id', 'id')
+    )
+    granted = set(
+        AccessRequest.objects.filter(
+            Q(expires_at__isnull=True) | Q(expires_at__gt=timezone.now()),
+            doctor=doctor,
+            patient_id__in=patients.values(),
+            status='APPROVED'
+        ).values_list('patient_id', flat=True)
+    )
+
+    to_create = []
+    for index, data in valid:
+        patient_id = patients.get(data['patient_health_id'])
+        if patient_id is None:
+            results[index] = {'index': index, 'status': 'error',
+                              'errors': {'patient_health_id': ["Patient not found with this Health ID."]}}
+        elif patient_id not in granted:
+            results[index] = {'index': index, 'status': 'error',
+                              'errors': {'patient_health_id': ["You do not have access to this patient's records."]}}
+        else:
+            to_create.append((index, MedicalRecord(
+                patient_id=patient_id,
+                doctor=doctor,
+                record_type=data['record_type'],
+                diagnosis=data['diagnosis'],
+                notes=data['notes'],
+                is_visible=data['is_visible'],
+            )))
+
+    if all_or_nothing and len(to_create) < len(rows):
+        for index, _ in to_create:
+            results[index] = {'index': index, 'status': 'skipped'}
+        return results
+    if not to_create:
+        return results
+
+    batch_size = settings.BULK_IMPORT_BATCH_SIZE
+    with transaction.atomic():
+        records = MedicalRecord.objects.bulk_create(
+            [record for _, record in to_create], batch_size=batch_size
+        )
+        # Metadata pinning is batched through the background queue
+        IPFSPinJob.objects.bulk_create(
+            [IPFSPinJob(record=record, max_attempts=settings.IPFS_JOB_MAX_ATTEMPTS)
+             for record in records],
+            batch_size=batch_size
+        )
+        # bulk_create skips the save signals, so refresh derived state here
+        patient_ids = {record.patient_id for record in records}
+        stats.refresh_many(patient_ids=patient_ids, doctor_ids=[doctor.pk])
+
+    for patient_id in patient_ids:
+        invalidate_access_on_commit(patient_id, doctor.pk)
+
+    for (index, _), record in zip(to_create, records):
+        results[index] = {'index': index, 'status': 'created', 'id': record.id}
+    return results
@@ -0,0 +1,41 @@
+from django.core.checks import Error, Tags, register
+from django.db import connections
+from django.db.migrations.recorder import MigrationRecorder
+
+from .search import FTS_TABLE, SQLITE_TRIGGERS
+
+FULLTEXT_MIGRATION = '0008_medicalrecord_fulltext_index'
+
+
+def missing_fulltext_objects(connection):
+    """
+    Names of the SQLite full-text table and triggers that are missing.
+
+    Empty on other backends and until migration 0008 has created them.
+    """
+    if connection.vendor != 'sqlite':
+        return []
+    recorder = MigrationRecorder(connection)
+    if not recorder.has_table() or not recorder.migration_qs.filter(
+        app='records', name=FULLTEXT_MIGRATION
+    ).exists():
+        return []
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT name FROM sqlite_master WHERE type IN ('table', 'trigger')")
+        existing = {row[0] for row in cursor.fetchall()}
+    return [name for name in (FTS_TABLE, *SQLITE_TRIGGERS) if name not in existing]
+
+
+@register(Tags.database)
+def check_fulltext_index(app_configs, databases=None, **kwargs):
+    errors = []
+    for alias in databases or []:
+        missing = missing_fulltext_objects(connections[alias])
+        if missing:
+            errors.append(Error(
+                f"The full-text search index on '{alias}' is missing {', '.join(missing)}.",
+                hint="A rebuild of records_medicalrecord drops its triggers. "
+                     "Run 'python manage.py check_fts --repair'.",
+                id='records.E001',
+            ))
+    return errors
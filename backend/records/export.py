@@ -0,0 +1,110 @@
+"""
+Streaming export of a patient's complete record history.
+
+Records are walked with ``iterator(chunk_size=...)`` and joined
+doctor/patient data, and each one is encoded as soon as it is fetched.
+Memory stays constant and the first byte goes out after the first chunk,
+however long the history is. Two encodings are supported: NDJSON (one
+``MedicalRecordSerializer`` object per line) and a FHIR R4 ``Bundle`` of
+``DocumentReference`` resources. The Bundle's ``total`` is counted while
+streaming and written after the entries (JSON members are unordered), so
+the export still costs a single query.
+"""
+
+import base64
+import json
+import mimetypes
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+
+from .models import MedicalRecord
+from .serializers import MedicalRecordSerializer
+
+EXPORT_FORMATS = ('ndjson', 'fhir')
+
+CONTENT_TYPES = {
+    'ndjson': 'application/x-ndjson',
+    'fhir': 'application/fhir+json',
+}
+
+
+def export_queryset(patient, doctor=None):
+    """Records to export, oldest first; a doctor sees visible plus authored."""
+    records = MedicalRecord.objects.filter(patient=patient)
+    if doctor is not None:
+        records = records.filter(Q(is_visible=True) | Q(doctor=doctor))
+    return records.select_related('doctor', 'patient').order_by('created_at', 'id')
+
+
+def _dumps(data):
+    return json.dumps(data, cls=DjangoJSONEncoder, separators=(',', ':'))
+
+
+def iter_ndjson(records, chunk_size=None):
+    """Yield one JSON line per record."""
+    chunk_size = chunk_size or settings.EXPORT_CHUNK_SIZE
+    for record in records.iterator(chunk_size=chunk_size):
+        yield _dumps(MedicalRecordSerializer(record).data) + '\n'
+
+
+def record_to_fhir(record):
+    """Map a record to a FHIR R4 ``DocumentReference`` resource."""
+    resource = {
+        'resourceType': 'DocumentReference',
+        'id': str(record.id),
+        'meta': {'lastUpdated': record.updated_at},
+        'status': 'current',
+        'type': {'text': record.get_record_type_display()},
+        'category': [{'text': record.record_type}],
+        'subject': {
+            'identifier': {'system': 'urn:healthsecure:health-id', 'value': record.patient.health_id},
+            'display': record.patient.full_name,
+        },
+        'date': record.created_at,
+        'author': [{
+            'identifier': {'system': 'urn:healthsecure:doctor-id', 'value': record.doctor.doctor_id},
+            'display': record.doctor.full_name,
+        }],
+        'custodian': {'display': record.doctor.hospital},
+        'description': record.diagnosis,
+        # Attachment content is base64 ``data``; ``title`` is only a label
+        'content': [{'attachment': {
+            'contentType': 'text/plain; charset=utf-8',
+            'data': base64.b64encode(record.notes.encode()).decode(),
+            'title': 'Clinical notes',
+        }}],
+    }
+    if record.ipfs_cid:
+        gateway = getattr(settings, 'PINATA_GATEWAY', 'https://gateway.pinata.cloud/ipfs/')
+        content_type = mimetypes.guess_type(record.document.name)[0] if record.document else None
+        resource['content'].append({'attachment': {
+            'contentType': content_type or 'application/octet-stream',
+            'url': f"{gateway}{record.ipfs_cid}",
+            'size': record.document_size,
+        }})
+    return resource
+
+
+def iter_fhir_bundle(records, chunk_size=None):
+    """Yield a FHIR ``collection`` Bundle incrementally, one entry at a time."""
+    chunk_size = chunk_size or settings.EXPORT_CHUNK_SIZE
+    yield '{"resourceType":"Bundle","type":"collection","entry":['
+    separator = ''
+    total = 0
+    for record in records.iterator(chunk_size=chunk_size):
+        entry = {
+            'fullUrl': f"urn:healthsecure:record:{record.id}",
+            'resource': record_to_fhir(record),
+        }
+        yield separator + _dumps(entry)
+        separator = ','
+        total += 1
+    yield f'],"total":{total}}}\n'
+
+
+def iter_export(records, export_format, chunk_size=None):
+    if export_format == 'fhir':
+        return iter_fhir_bundle(records, chunk_size)
+    return iter_ndjson(records, chunk_size)
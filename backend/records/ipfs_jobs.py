@@ -0,0 +1,186 @@
+"""
+Durable background queue for pinning medical records to IPFS.
+
+Record creation only inserts an ``IPFSPinJob`` row; the slow Pinata
+round-trips happen in ``manage.py run_ipfs_workers``. Workers claim jobs
+with a compare-and-swap UPDATE (safe across threads and processes on any
+database backend), pin the document and metadata, and reschedule failed
+attempts with capped exponential backoff. A job whose worker died is
+reclaimed once its lease expires.
+"""
+
+import logging
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from users.content_store import pin_blob
+from users.ipfs_service import ipfs_service
+from .models import MedicalRecord, IPFSPinJob
+
+logger = logging.getLogger(__name__)
+
+
+class PinError(Exception):
+    """A Pinata call did not succeed; the job will be retried."""
+
+
+def build_record_metadata(record):
+    """Metadata JSON pinned alongside each record."""
+    return {
+        'record_id': record.id,
+        'record_type': record.record_type,
+        'diagnosis': record.diagnosis,
+        'patient_health_id': record.patient.health_id,
+        'doctor_id': record.doctor.doctor_id,
+        'created_at': record.created_at.isoformat() if record.created_at else None,
+        'document_cid': record.ipfs_cid,
+        'document_sha256': record.document_sha256
+    }
+
+
+def enqueue_record_pin(record):
+    """Queue pinning for a record and mark it pending."""
+    with transaction.atomic():
+        if record.ipfs_status != 'pending':
+            record.ipfs_status = 'pending'
+            record.save(update_fields=['ipfs_status', 'updated_at'])
+        return IPFSPinJob.objects.create(
+            record=record,
+            max_attempts=settings.IPFS_JOB_MAX_ATTEMPTS
+        )
+
+
+def backoff_delay(attempt):
+    """Seconds to wait before retry ``attempt + 1`` (jittered exponential)."""
+    base = settings.IPFS_JOB_BACKOFF_SECONDS
+    delay = min(base * (2 ** max(attempt - 1, 0)), settings.IPFS_JOB_MAX_BACKOFF_SECONDS)
+    return random.uniform(delay / 2, delay)
+
+
+def claim_jobs(limit):
+    """
+    Atomically claim up to ``limit`` due jobs for this worker.
+
+    Returns:
+        list: Claimed ``IPFSPinJob`` instances with their records joined
+    """
+    now = timezone.now()
+    lease_expired = now - timedelta(seconds=settings.IPFS_JOB_LEASE_SECONDS)
+    candidates = IPFSPinJob.objects.filter(
+        Q(status='QUEUED', next_attempt_at__lte=now) |
+        Q(status='RUNNING', locked_at__lt=lease_expired)
+    ).values_list('pk', 'status', 'locked_at')[:limit * 2]
+
+    claimed = []
+    for pk, job_status, locked_at in candidates:
+        if len(claimed) >= limit:
+            break
+        # Only one worker can move the row out of the state it observed
+        won = IPFSPinJob.objects.filter(
+            pk=pk, status=job_status, locked_at=locked_at
+        ).update(status='RUNNING', locked_at=now, attempts=F('attempts') + 1)
+        if won:
+            claimed.append(pk)
+
+    return list(
+        IPFSPinJob.objects.filter(pk__in=claimed)
+        .select_related('record__patient', 'record__doctor')
+    )
+
+
+def pin_record(record):
+    """Pin a record's document (if any) and metadata, saving CIDs as they land."""
+    if record.document and not record.ipfs_cid:
+        # Identical content pinned earlier is reused without re-uploading
+        result = pin_blob(record.document_sha256, record.document)
+        if not result.get('success'):
+            raise PinError(result.get('error', 'Document upload failed'))
+        # Persist right away so a retry never re-uploads the document
+        record.ipfs_cid = result.get('cid')
+        record.save(update_fields=['ipfs_cid', 'updated_at'])
+
+    if not record.ipfs_metadata_cid:
+        result = ipfs_service.upload_json(
+            build_record_metadata(record),
+            name=f"record_{record.id}_metadata"
+        )
+        if not result.get('success'):
+            raise PinError(result.get('error', 'Metadata upload failed'))
+        record.ipfs_metadata_cid = result.get('cid')
+
+    record.ipfs_status = 'pinned'
+    record.save(update_fields=['ipfs_metadata_cid', 'ipfs_status', 'updated_at'])
+
+
+def process_job(job):
+    """Run one claimed job. Returns True if the record is now pinned."""
+    try:
+        pin_record(job.record)
+    except Exception as exc:
+        job.last_error = str(exc)[:1000]
+        job.locked_at = None
+        if job.attempts >= job.max_attempts:
+            job.status = 'FAILED'
+            job.record.ipfs_status = 'failed'
+            job.record.save(update_fields=['ipfs_status', 'updated_at'])
+            logger.error("Pinning record %s failed permanently: %s", job.record_id, exc)
+        else:
+            job.status = 'QUEUED'
+            job.next_attempt_at = timezone.now() + timedelta(seconds=backoff_delay(job.attempts))
+            logger.warning(
+                "Pinning record %s failed (attempt %s/%s): %s",
+                job.record_id, job.attempts, job.max_attempts, exc
+            )
+        job.save(update_fields=['status', 'locked_at', 'last_error', 'next_attempt_at', 'updated_at'])
+        return False
+
+    job.status = 'DONE'
+    job.locked_at = None
+    job.last_error = ''
+    job.save(update_fields=['status', 'locked_at', 'last_error', 'updated_at'])
+    return True
+
+
+def _run_in_thread(job):
+    try:
+        return process_job(job)
+    finally:
+        # Each pool thread owns its own DB connection
+        connection.close()
+
+
+def run_workers(threads=None, poll_interval=1.0, once=False, stop_event=None):
+    """
+    Claim and process jobs on a thread pool until stopped.
+
+    Args:
+        threads: Pool size (defaults to ``IPFS_WORKER_THREADS``)
+        poll_interval: Seconds to sleep when no job is due
+        once: Exit as soon as no job is due instead of polling
+        stop_event: Optional ``threading.Event`` to stop the loop
+
+    Returns:
+        dict: Counts of 'pinned' and 'failed' job runs
+    """
+    threads = threads or settings.IPFS_WORKER_THREADS
+    stop_event = stop_event or threading.Event()
+    totals = {'pinned': 0, 'failed': 0}
+
+    with ThreadPoolExecutor(max_workers=threads, thread_name_prefix='ipfs-pin') as pool:
+        while not stop_event.is_set():
+            jobs = claim_jobs(threads)
+            if not jobs:
+                if once:
+                    break
+                stop_event.wait(poll_interval)
+                continue
+            for pinned in pool.map(_run_in_thread, jobs):
+                totals['pinned' if pinned else 'failed'] += 1
+    return totals
@@ -0,0 +1,36 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from records.anchoring import run_anchoring
+
+
+class Command(BaseCommand):
+    help = (
+        "Batch newly pinned records into Merkle trees, store each record's inclusion "
+        "proof, pin the batch manifests and publish the roots (ANCHOR_PUBLISHER)."
+    )
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--window', type=float, default=settings.ANCHOR_WINDOW_SECONDS,
+                            help="Seconds between batches")
+        parser.add_argument('--max-batch', type=int, default=settings.ANCHOR_MAX_BATCH,
+                            help="Most records per Merkle tree")
+        parser.add_argument('--once', action='store_true',
+                            help="Batch what is pending now, then exit")
+    
+    def handle(self, *args, **options):
+        try:
+            while True:
+                totals = run_anchoring(max_batch=options['max_batch'])
+                if totals['batches'] or totals['pinned'] or totals['anchored'] or options['once']:
+                    self.stdout.write(
+                        f"Batched {totals['records']} records into {totals['batches']} trees, "
+                        f"pinned {totals['pinned']} manifests, anchored {totals['anchored']} roots."
+                    )
+                if options['once']:
+                    break
+                time.sleep(options['window'])
+        except KeyboardInterrupt:
+            return
@@ -0,0 +1,338 @@
+import json
+import platform
+import random
+import statistics
+import subprocess
+import time
+from collections import Counter, namedtuple
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+import django
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import (
+    CaptureQueriesContext, setup_databases, setup_test_environment,
+    teardown_databases, teardown_test_environment,
+)
+from rest_framework.test import APIClient
+
+from records.models import MedicalRecord
+from records.synthetic import VOCABULARY, seed
+from users.ipfs_service import ipfs_service
+from users.models import User, PatientProfile, DoctorProfile, AccessRequest
+from users.pinata_stub import PinataStubServer
+from users.serializers import CustomTokenObtainPairSerializer
+
+# One endpoint under load. ``path``, ``data`` and ``headers`` may be
+# callables of the request index; ``actor`` is an access token (or a
+# callable returning one), None for anonymous requests.
+Scenario = namedtuple('Scenario', ['name', 'method', 'path', 'actor', 'data', 'headers', 'expect', 'requests'])
+Scenario.__new__.__defaults__ = (None, None, 200, None)
+
+
+def _value(value, index):
+    return value(index) if callable(value) else value
+
+
+def _percentile(timings, p):
+    return timings[min(len(timings) - 1, int(len(timings) * p))]
+
+
+class Command(BaseCommand):
+    help = (
+        "Drive every users/records API endpoint against a throwaway database seeded "
+        "with synthetic data (IPFS served by the local Pinata stub) and report latency "
+        "percentiles, queries per request and throughput."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--patients', type=int, default=2000)
+        parser.add_argument('--doctors', type=int, default=100)
+        parser.add_argument('--records', type=int, default=50000)
+        parser.add_argument('--requests', type=int, default=50,
+                            help="Timed requests per endpoint")
+        parser.add_argument('--auth-requests', type=int, default=5,
+                            help="Timed requests for login/registration (password hashing bound)")
+        parser.add_argument('--warmup', type=int, default=2,
+                            help="Untimed requests per endpoint before measuring")
+        parser.add_argument('--only', action='append', default=[],
+                            help="Run only scenarios whose name contains this (repeatable)")
+        parser.add_argument('--json', dest='json_path',
+                            help="Write machine-readable results to this file (- for stdout)")
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        quiet = options['json_path'] == '-'
+        log = (lambda message: None) if quiet else self.stdout.write
+
+        setup_test_environment()
+        old_config = setup_databases(verbosity=0, interactive=False, aliases={'default'})
+        try:
+            with self._ipfs_stub():
+                started = time.perf_counter()
+                dataset = seed(
+                    options['patients'], options['doctors'], options['records'], rng=rng,
+                    progress=lambda message: None if quiet else self.stdout.write(f"\r{message}", ending='')
+                )
+                log(f"\nSeeding took {time.perf_counter() - started:.1f}s ({connection.vendor} backend)")
+
+                scenarios = self._scenarios(rng, dataset, options)
+                if options['only']:
+                    scenarios = [s for s in scenarios if any(part in s.name for part in options['only'])]
+                cache.clear()
+
+                results = [
+                    self._run(scenario, options['requests'], options['warmup'], log)
+                    for scenario in scenarios
+                ]
+        finally:
+            teardown_databases(old_config, verbosity=0)
+            teardown_test_environment()
+
+        report = {
+            'benchmark': 'api',
+            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'commit': self._commit(),
+            'environment': {
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'database': connection.vendor,
+            },
+            'dataset': {
+                'patients': len(dataset.patient_ids),
+                'doctors': len(dataset.doctor_ids),
+                'grants': dataset.grants,
+                'records': dataset.records,
+                'largest_panel': max(dataset.panel_sizes.values()),
+                'longest_history': max(dataset.history_lengths.values(), default=0),
+            },
+            'options': {key: options[key] for key in (
+                'requests', 'auth_requests', 'warmup', 'seed'
+            )},
+            'results': results,
+        }
+        if options['json_path'] == '-':
+            self.stdout.write(json.dumps(report, indent=2))
+        elif options['json_path']:
+            with open(options['json_path'], 'w', encoding='utf-8') as output:
+                json.dump(report, output, indent=2)
+            log(f"Wrote {options['json_path']}")
+
+    @contextmanager
+    def _ipfs_stub(self):
+        """Point the shared IPFS service at an in-process Pinata stub."""
+        server = PinataStubServer(('127.0.0.1', 0))
+        server.start_in_thread()
+        saved = (ipfs_service.base_url, ipfs_service.gateway, ipfs_service.api_key, ipfs_service.secret_key)
+        ipfs_service.base_url = server.url
+        ipfs_service.gateway = f"{server.url}/ipfs/"
+        ipfs_service.api_key = ipfs_service.secret_key = 'benchmark'
+        ipfs_service.verify_cache.clear()
+        try:
+            yield server
+        finally:
+            ipfs_service.base_url, ipfs_service.gateway, ipfs_service.api_key, ipfs_service.secret_key = saved
+            ipfs_service.verify_cache.clear()
+            server.shutdown()
+            server.server_close()
+
+    def _commit(self):
+        try:
+            return subprocess.run(
+                ['git', 'rev-parse', 'HEAD'], cwd=settings.BASE_DIR,
+                capture_output=True, text=True, timeout=5
+            ).stdout.strip() or None
+        except (OSError, subprocess.SubprocessError):
+            return None
+
+    def _tokens(self, user):
+        refresh = CustomTokenObtainPairSerializer.get_token(user)
+        return str(refresh.access_token), str(refresh)
+
+    def _scenarios(self, rng, dataset, options):
+        n = options['requests']
+        auth_n = options['auth_requests']
+        tag = dataset.tag
+
+        # Representative actors: the busiest doctor and a median one, the
+        # patient with the longest history and a median one
+        panels = dataset.panel_sizes.most_common()
+        heavy_doctor = DoctorProfile.objects.select_related('user').get(pk=panels[0][0])
+        typical_doctor = DoctorProfile.objects.select_related('user').get(pk=panels[len(panels) // 2][0])
+        histories = dataset.history_lengths.most_common()
+        chronic = PatientProfile.objects.select_related('user').get(pk=histories[0][0])
+        typical = PatientProfile.objects.select_related('user').get(pk=histories[len(histories) // 2][0])
+        chronic_doctor = AccessRequest.objects.filter(
+            patient=chronic, status='APPROVED', access_type='FULL'
+        ).select_related('doctor__user').first().doctor
+        staff = User.objects.create_user(
+            email=f"synthetic-{tag}-admin@example.com", password=dataset.password,
+            role='ADMIN', is_staff=True
+        )
+
+        heavy_doctor_token, _ = self._tokens(heavy_doctor.user)
+        typical_doctor_token, _ = self._tokens(typical_doctor.user)
+        chronic_doctor_token, _ = self._tokens(chronic_doctor.user)
+        chronic_token, _ = self._tokens(chronic.user)
+        typical_token, typical_refresh = self._tokens(typical.user)
+        staff_token, _ = self._tokens(staff)
+
+        chronic_records = list(
+            MedicalRecord.objects.filter(patient=chronic).values_list('pk', flat=True)[:n]
+        )
+        panel_health_ids = list(
+            AccessRequest.objects.filter(doctor=heavy_doctor, status='APPROVED')
+            .values_list('patient__health_id', flat=True)[:n]
+        )
+        doctor_ids = list(DoctorProfile.objects.values_list('doctor_id', flat=True)[:n])
+        # Revoking is idempotent, so a handful of extra grants can be revoked repeatedly
+        revocable = [
+            AccessRequest.objects.create(patient=typical, doctor=doctor, status='APPROVED').pk
+            for doctor in DoctorProfile.objects.exclude(access_requests_received__patient=typical)[:5]
+        ] or list(AccessRequest.objects.filter(patient=typical).values_list('pk', flat=True))
+        cid = ipfs_service.upload_json({'benchmark': tag}, name=f"benchmark-{tag}")['cid']
+        queries = [
+            ' '.join(rng.sample(VOCABULARY, rng.randint(1, 2)))
+            for _ in range(n + options['warmup'])
+        ]
+
+        client = APIClient()
+
+        def etag(path, token):
+            response = client.get(path, HTTP_AUTHORIZATION=f"Bearer {token}")
+            return {'HTTP_IF_NONE_MATCH': response['ETag']}
+
+        def record_row(index):
+            return {
+                'patient_health_id': chronic.health_id,
+                'record_type': 'consultation',
+                'diagnosis': ' '.join(rng.sample(VOCABULARY, 3)),
+                'notes': ' '.join(rng.sample(VOCABULARY, 25)),
+            }
+
+        return [
+            # Authentication and registration
+            Scenario('login', 'POST', '/api/auth/login/', None,
+                     {'email': typical.user.email, 'password': dataset.password}, requests=auth_n),
+            Scenario('token refresh', 'POST', '/api/auth/token/refresh/', None,
+                     {'refresh': typical_refresh}),
+            Scenario('register patient', 'POST', '/api/auth/register/patient/', None,
+                     lambda i: {'email': f"synthetic-{tag}-reg-p{i}@example.com", 'password': dataset.password,
+                                'first_name': 'Bench', 'last_name': str(i)},
+                     expect=201, requests=auth_n),
+            Scenario('register doctor', 'POST', '/api/auth/register/doctor/', None,
+                     lambda i: {'email': f"synthetic-{tag}-reg-d{i}@example.com", 'password': dataset.password,
+                                'first_name': 'Bench', 'last_name': str(i),
+                                'medical_license': f"BENCH-{tag}-{i}", 'specialization': 'General Practice',
+                                'hospital': 'Bench Hospital'},
+                     expect=201, requests=auth_n),
+
+            # Profile, dashboard and lookups
+            Scenario('profile (patient)', 'GET', '/api/auth/profile/', typical_token),
+            Scenario('profile (doctor)', 'GET', '/api/auth/profile/', heavy_doctor_token),
+            Scenario('profile revalidate (patient)', 'GET', '/api/auth/profile/', typical_token,
+                     headers=lambda i: etag('/api/auth/profile/', typical_token), expect=304),
+            Scenario('profile update (patient)', 'PUT', '/api/auth/profile/', typical_token,
+                     lambda i: {'age': 20 + i % 60}),
+            Scenario('stats (patient)', 'GET', '/api/auth/stats/', chronic_token),
+            Scenario('stats (heavy doctor)', 'GET', '/api/auth/stats/', heavy_doctor_token),
+            Scenario('patient lookup (heavy doctor)', 'GET',
+                     lambda i: f"/api/auth/patients/{panel_health_ids[i % len(panel_health_ids)]}/",
+                     heavy_doctor_token),
+            Scenario('access list (patient)', 'GET', '/api/auth/access/', typical_token),
+            Scenario('access list (heavy doctor)', 'GET', '/api/auth/access/', heavy_doctor_token),
+            Scenario('access list (typical doctor)', 'GET', '/api/auth/access/', typical_doctor_token),
+            Scenario('access grant', 'POST', '/api/auth/access/', typical_token,
+                     lambda i: {'doctor_id': doctor_ids[i % len(doctor_ids)], 'access_type': 'FULL'},
+                     expect=201),
+            Scenario('ipfs verify', 'GET', f"/api/auth/ipfs/verify/{cid}/", None),
+            Scenario('ipfs pool stats', 'GET', '/api/auth/ipfs/pool/', staff_token),
+
+            # Records
+            Scenario('records list (chronic patient)', 'GET', '/api/records/', chronic_token),
+            Scenario('records list (heavy doctor)', 'GET', '/api/records/', heavy_doctor_token),
+            Scenario('records list revalidate (heavy doctor)', 'GET', '/api/records/', heavy_doctor_token,
+                     headers=lambda i: etag('/api/records/', heavy_doctor_token), expect=304),
+            Scenario('record detail (patient)', 'GET',
+                     lambda i: f"/api/records/{chronic_records[i % len(chronic_records)]}/", chronic_token),
+            Scenario('record search (heavy doctor)', 'GET', '/api/records/search/', heavy_doctor_token,
+                     lambda i: {'q': queries[i % len(queries)]}),
+            Scenario('patient records (doctor)', 'GET', f"/api/patients/{chronic.health_id}/records/",
+                     chronic_doctor_token),
+            Scenario('export ndjson (chronic patient)', 'GET', f"/api/patients/{chronic.health_id}/export/",
+                     chronic_token),
+            Scenario('export fhir (doctor)', 'GET', f"/api/patients/{chronic.health_id}/export/",
+                     chronic_doctor_token, {'output': 'fhir'}),
+            Scenario('record create (doctor)', 'POST', '/api/records/', chronic_doctor_token,
+                     record_row, expect=201),
+            Scenario('records bulk 50 (doctor)', 'POST', '/api/records/bulk/', chronic_doctor_token,
+                     lambda i: {'records': [record_row(i) for _ in range(50)]}, expect=201),
+            Scenario('visibility toggle (patient)', 'PATCH',
+                     lambda i: f"/api/records/{chronic_records[i % len(chronic_records)]}/visibility/",
+                     chronic_token),
+            Scenario('access revoke (patient)', 'POST',
+                     lambda i: f"/api/auth/access/{revocable[i % len(revocable)]}/revoke/", typical_token),
+        ]
+
+    def _run(self, scenario, requests, warmup, log):
+        client = APIClient()
+        count = scenario.requests or requests
+        timings, query_counts, statuses = [], [], Counter()
+
+        for index in range(warmup + count):
+            extra = dict(_value(scenario.headers, index) or {})
+            token = _value(scenario.actor, index)
+            if token:
+                extra['HTTP_AUTHORIZATION'] = f"Bearer {token}"
+            request = getattr(client, scenario.method.lower())
+            path = _value(scenario.path, index)
+            data = _value(scenario.data, index)
+
+            with CaptureQueriesContext(connection) as queries:
+                started = time.perf_counter()
+                if scenario.method == 'GET':
+                    response = request(path, data, **extra)
+                else:
+                    response = request(path, data, format='json', **extra)
+                if response.streaming:
+                    b''.join(response.streaming_content)
+                elapsed = (time.perf_counter() - started) * 1000
+
+            if index >= warmup:
+                timings.append(elapsed)
+                query_counts.append(len(queries))
+                statuses[response.status_code] += 1
+
+        timings.sort()
+        errors = sum(value for code, value in statuses.items() if code != scenario.expect)
+        result = {
+            'name': scenario.name,
+            'method': scenario.method,
+            'path': scenario.path if isinstance(scenario.path, str) else None,
+            'requests': count,
+            'errors': errors,
+            'status_codes': {str(code): value for code, value in sorted(statuses.items())},
+            'latency_ms': {
+                'mean': round(statistics.mean(timings), 3),
+                'p50': round(_percentile(timings, 0.50), 3),
+                'p95': round(_percentile(timings, 0.95), 3),
+                'p99': round(_percentile(timings, 0.99), 3),
+                'max': round(timings[-1], 3),
+            },
+            'queries': {
+                'mean': round(statistics.mean(query_counts), 2),
+                'max': max(query_counts),
+            },
+            'throughput_rps': round(count / (sum(timings) / 1000), 2),
+        }
+        log(
+            f"{scenario.name:<40} n={count:<4} p50={result['latency_ms']['p50']:8.2f}ms "
+            f"p95={result['latency_ms']['p95']:8.2f}ms p99={result['latency_ms']['p99']:8.2f}ms "
+            f"queries={result['queries']['mean']:6.1f} {result['throughput_rps']:8.1f} req/s"
+            + (f"  ERRORS={errors} {dict(statuses)}" if errors else '')
+        )
+        return result
@@ -0,0 +1,154 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import setup_databases, teardown_databases
+
+from records.models import MedicalRecord
+from records.search import accessible_records, search_records, tokenize, substring_search
+from records.synthetic import VOCABULARY
+from users.models import User, PatientProfile, DoctorProfile, AccessRequest
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark full-text record search against the unindexed icontains scan "
+        "on a throwaway database seeded with synthetic records."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--records', type=int, default=1_000_000)
+        parser.add_argument('--patients', type=int, default=2000)
+        parser.add_argument('--doctors', type=int, default=200)
+        parser.add_argument('--queries', type=int, default=200,
+                            help="Indexed searches to time")
+        parser.add_argument('--baseline-queries', type=int, default=20,
+                            help="icontains searches to time (these scan the table)")
+        parser.add_argument('--batch-size', type=int, default=10000)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        # Everything runs against a separate test database that is dropped afterwards
+        old_config = setup_databases(verbosity=0, interactive=False, aliases={'default'})
+        try:
+            doctor_user = self._seed(rng, options)
+            self._report(rng, doctor_user, options)
+        finally:
+            teardown_databases(old_config, verbosity=0)
+
+    def _seed(self, rng, options):
+        started = time.perf_counter()
+
+        users = [
+            User(email=f"bench-p{i}@example.com", role='PATIENT', password='!')
+            for i in range(options['patients'])
+        ] + [
+            User(email=f"bench-d{i}@example.com", role='DOCTOR', password='!')
+            for i in range(options['doctors'])
+        ]
+        User.objects.bulk_create(users, batch_size=options['batch_size'])
+        users = {user.email: user for user in User.objects.filter(email__startswith='bench-')}
+
+        patients = PatientProfile.objects.bulk_create([
+            PatientProfile(
+                user=users[f"bench-p{i}@example.com"],
+                first_name='Bench', last_name=str(i),
+                health_id=f"HID-{i // 10000:04d}-{i % 10000:04d}"
+            )
+            for i in range(options['patients'])
+        ], batch_size=options['batch_size'])
+        doctors = DoctorProfile.objects.bulk_create([
+            DoctorProfile(
+                user=users[f"bench-d{i}@example.com"],
+                first_name='Bench', last_name=str(i),
+                medical_license=f"BENCH-{i}", specialization='General', hospital='Bench Hospital',
+                doctor_id=f"DOC-{i // 10000:04d}-{i % 10000:04d}"
+            )
+            for i in range(options['doctors'])
+        ], batch_size=options['batch_size'])
+
+        # The benchmarked doctor holds grants for a tenth of the patients
+        AccessRequest.objects.bulk_create([
+            AccessRequest(patient=patient, doctor=doctors[0], status='APPROVED')
+            for patient in rng.sample(patients, max(1, len(patients) // 10))
+        ])
+
+        # Zipf-like term frequencies, so there are both common and rare words
+        weights = [1 / rank for rank in range(1, len(VOCABULARY) + 1)]
+        record_types = [key for key, _ in MedicalRecord.RECORD_TYPES]
+
+        def words(low, high):
+            return ' '.join(rng.choices(VOCABULARY, weights, k=rng.randint(low, high)))
+
+        remaining = options['records']
+        while remaining > 0:
+            count = min(options['batch_size'], remaining)
+            MedicalRecord.objects.bulk_create([
+                MedicalRecord(
+                    patient=rng.choice(patients),
+                    doctor=rng.choice(doctors),
+                    record_type=rng.choice(record_types),
+                    diagnosis=words(2, 6),
+                    notes=words(15, 40),
+                    is_visible=rng.random() > 0.1,
+                    ipfs_status='pinned'
+                )
+                for _ in range(count)
+            ])
+            remaining -= count
+            self.stdout.write(f"\rSeeded {options['records'] - remaining} records", ending='')
+            self.stdout.flush()
+
+        self.stdout.write(f"\nSeeding took {time.perf_counter() - started:.1f}s "
+                          f"({connection.vendor} backend)")
+        return doctors[0].user
+
+    def _queries(self, rng, count):
+        queries = []
+        # People search for specific terms, so query words are drawn
+        # uniformly: mostly from the tail, sometimes a near-ubiquitous one
+        for _ in range(count):
+            terms = rng.sample(VOCABULARY, rng.randint(1, 2))
+            if rng.random() < 0.3:
+                terms[-1] = terms[-1][:4]  # Prefix query, as typed in a search box
+            queries.append(' '.join(terms))
+        return queries
+
+    def _time(self, queries, run):
+        timings = []
+        for query in queries:
+            started = time.perf_counter()
+            run(query)
+            timings.append((time.perf_counter() - started) * 1000)
+        return timings
+
+    def _summary(self, label, timings):
+        timings = sorted(timings)
+
+        def pct(p):
+            return timings[min(len(timings) - 1, int(len(timings) * p))]
+
+        self.stdout.write(
+            f"{label:<24} n={len(timings):<5} mean={statistics.mean(timings):8.2f}ms "
+            f"p50={pct(0.50):8.2f}ms p95={pct(0.95):8.2f}ms p99={pct(0.99):8.2f}ms"
+        )
+
+    def _report(self, rng, doctor_user, options):
+        queries = self._queries(rng, options['queries'])
+        record_type = MedicalRecord.RECORD_TYPES[0][0]
+
+        self._summary('indexed', self._time(
+            queries, lambda q: search_records(doctor_user, q, limit=20)
+        ))
+        self._summary('indexed + record_type', self._time(
+            queries, lambda q: search_records(doctor_user, q, record_type=record_type, limit=20)
+        ))
+
+        scope = accessible_records(doctor_user)
+        self._summary('icontains baseline', self._time(
+            queries[:options['baseline_queries']],
+            lambda q: substring_search(scope, tokenize(q), 20, 0)
+        ))
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+from records.checks import missing_fulltext_objects
+from records.search import repair_sqlite_index
+
+
+class Command(BaseCommand):
+    help = (
+        "Check that the SQLite full-text search table and its sync triggers exist; "
+        "--repair recreates what is missing and reindexes every record."
+    )
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+        parser.add_argument('--repair', action='store_true',
+                            help="Recreate missing objects and rebuild the index")
+    
+    def handle(self, *args, **options):
+        connection = connections[options['database']]
+        if connection.vendor != 'sqlite':
+            self.stdout.write(f"No SQLite full-text index to check on {connection.vendor}.")
+            return
+        
+        missing = missing_fulltext_objects(connection)
+        if not missing:
+            self.stdout.write(self.style.SUCCESS("Full-text search index and triggers are in place."))
+            return
+        if not options['repair']:
+            raise CommandError(f"Missing: {', '.join(missing)}. Run again with --repair.")
+        
+        with transaction.atomic(using=options['database']):
+            repair_sqlite_index(connection)
+        self.stdout.write(self.style.SUCCESS(f"Recreated {', '.join(missing)} and rebuilt the index."))
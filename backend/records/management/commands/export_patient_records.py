@@ -0,0 +1,36 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from records.export import EXPORT_FORMATS, export_queryset, iter_export
+from users.models import PatientProfile
+
+
+class Command(BaseCommand):
+    help = "Stream a patient's full record history as NDJSON or a FHIR Bundle."
+    
+    def add_arguments(self, parser):
+        parser.add_argument('health_id')
+        parser.add_argument('--output-format', choices=EXPORT_FORMATS, default='ndjson')
+        parser.add_argument('--output', '-o', default='-', help="File to write, or - for stdout")
+        parser.add_argument('--chunk-size', type=int, default=settings.EXPORT_CHUNK_SIZE)
+    
+    def handle(self, *args, **options):
+        try:
+            patient = PatientProfile.objects.get(health_id=options['health_id'])
+        except PatientProfile.DoesNotExist:
+            raise CommandError(f"Patient {options['health_id']} not found")
+        
+        output = None if options['output'] == '-' else open(options['output'], 'w', encoding='utf-8')
+        try:
+            for chunk in iter_export(
+                export_queryset(patient),
+                options['output_format'],
+                chunk_size=options['chunk_size']
+            ):
+                if output is None:
+                    self.stdout.write(chunk, ending='')
+                else:
+                    output.write(chunk)
+        finally:
+            if output is not None:
+                output.close()
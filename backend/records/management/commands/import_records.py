@@ -0,0 +1,67 @@
+import json
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from records.bulk import import_records
+from users.models import DoctorProfile
+
+
+class Command(BaseCommand):
+    help = "Import medical records from an NDJSON file (one JSON object per line)."
+    
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="NDJSON file to import, or - for stdin")
+        parser.add_argument('--doctor-id', required=True, help="Doctor ID (DOC-XXXX-YYYY) authoring the records")
+        parser.add_argument('--batch-size', type=int, default=settings.BULK_IMPORT_BATCH_SIZE)
+    
+    def handle(self, *args, **options):
+        try:
+            doctor = DoctorProfile.objects.get(doctor_id=options['doctor_id'])
+        except DoctorProfile.DoesNotExist:
+            raise CommandError(f"Doctor {options['doctor_id']} not found")
+        
+        stream = sys.stdin if options['path'] == '-' else open(options['path'], encoding='utf-8')
+        created = failed = 0
+        started = time.perf_counter()
+        
+        def flush(batch, line_numbers):
+            nonlocal created, failed
+            for result in import_records(doctor, batch):
+                if result['status'] == 'created':
+                    created += 1
+                else:
+                    failed += 1
+                    line = line_numbers[result['index']]
+                    self.stderr.write(f"line {line}: {json.dumps(result['errors'])}")
+        
+        try:
+            batch, line_numbers = [], []
+            for line_number, line in enumerate(stream, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    row = json.loads(line)
+                except json.JSONDecodeError as exc:
+                    failed += 1
+                    self.stderr.write(f"line {line_number}: invalid JSON ({exc})")
+                    continue
+                batch.append(row)
+                line_numbers.append(line_number)
+                if len(batch) >= options['batch_size']:
+                    flush(batch, line_numbers)
+                    batch, line_numbers = [], []
+            if batch:
+                flush(batch, line_numbers)
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+        
+        elapsed = time.perf_counter() - started
+        rate = created / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {created} records ({failed} failed) in {elapsed:.2f}s "
+            f"- {rate:.0f} records/s"
+        ))
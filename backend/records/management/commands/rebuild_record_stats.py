@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from records import stats
+
+
+class Command(BaseCommand):
+    help = "Recompute the denormalized patient/doctor dashboard counters from scratch."
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+    
+    def handle(self, *args, **options):
+        patients, doctors = stats.rebuild_all(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt stats for {patients} patients and {doctors} doctors."
+        ))
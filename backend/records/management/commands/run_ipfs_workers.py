@@ -0,0 +1,40 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from records.ipfs_jobs import enqueue_record_pin, run_workers
+from records.models import MedicalRecord
+
+
+class Command(BaseCommand):
+    help = "Process the background IPFS pinning queue with a pool of worker threads."
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=settings.IPFS_WORKER_THREADS)
+        parser.add_argument('--poll-interval', type=float, default=1.0,
+                            help="Seconds to wait between polls when the queue is idle")
+        parser.add_argument('--once', action='store_true',
+                            help="Drain the jobs that are currently due, then exit")
+        parser.add_argument('--requeue-failed', action='store_true',
+                            help="Queue a fresh job for every record whose pinning failed")
+    
+    def handle(self, *args, **options):
+        if options['requeue_failed']:
+            failed = MedicalRecord.objects.filter(ipfs_status='failed')
+            count = 0
+            for record in failed.iterator(chunk_size=500):
+                enqueue_record_pin(record)
+                count += 1
+            self.stdout.write(f"Re-queued {count} failed records.")
+        
+        self.stdout.write(f"Starting {options['threads']} IPFS pinning workers...")
+        try:
+            totals = run_workers(
+                threads=options['threads'],
+                poll_interval=options['poll_interval'],
+                once=options['once'],
+            )
+        except KeyboardInterrupt:
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f"Pinned {totals['pinned']} records, {totals['failed']} attempts failed."
+        ))
@@ -0,0 +1,60 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+
+from records.synthetic import seed
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed the database with synthetic patients, doctors, access grants and records "
+        "(skewed panel sizes and chronic patients with long histories)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--patients', type=int, default=1000)
+        parser.add_argument('--doctors', type=int, default=50)
+        parser.add_argument('--records', type=int, default=20000)
+        parser.add_argument('--chronic-fraction', type=float, default=0.1,
+                            help="Share of patients with long record histories")
+        parser.add_argument('--password', default='synthetic-pass',
+                            help="Password of every synthetic account")
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=None,
+                            help="Random seed, for a repeatable dataset")
+
+    def handle(self, *args, **options):
+        if options['patients'] < 1 or options['doctors'] < 1:
+            self.stderr.write("Need at least one patient and one doctor.")
+            return
+
+        started = time.perf_counter()
+        dataset = seed(
+            options['patients'],
+            options['doctors'],
+            options['records'],
+            rng=random.Random(options['seed']),
+            password=options['password'],
+            chronic_fraction=options['chronic_fraction'],
+            batch_size=options['batch_size'],
+            progress=lambda message: self.stdout.write(f"\r{message}", ending=''),
+        )
+        elapsed = time.perf_counter() - started
+
+        panels = sorted(dataset.panel_sizes.values(), reverse=True)
+        histories = sorted(dataset.history_lengths.values(), reverse=True) or [0]
+        self.stdout.write('')
+        self.stdout.write(
+            f"Panel sizes: largest {panels[0]}, median {statistics.median(panels):.0f}, "
+            f"top 10% of doctors hold {sum(panels[:max(1, len(panels) // 10)]) / len(dataset.patient_ids):.0%} of patients"
+        )
+        self.stdout.write(
+            f"Records per patient: longest {histories[0]}, median {statistics.median(histories):.0f}"
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Seeded {len(dataset.patient_ids)} patients, {len(dataset.doctor_ids)} doctors, "
+            f"{dataset.grants} grants and {dataset.records} records in {elapsed:.1f}s "
+            f"(tag {dataset.tag}, password {dataset.password!r})"
+        ))
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('records', '0003_medicalrecord_ipfs_cid_and_more'),
+        ('users', '0005_accessrequest_access_doctor_status_idx'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='medicalrecord',
+            index=models.Index(fields=['patient', '-created_at', '-id'], name='record_patient_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='medicalrecord',
+            index=models.Index(fields=['doctor', '-created_at', '-id'], name='record_doctor_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='medicalrecord',
+            index=models.Index(condition=models.Q(('is_visible', True)), fields=['patient', '-created_at', '-id'], name='record_patient_visible_idx'),
+        ),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:46
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Max, Q
+
+
+def backfill_stats(apps, schema_editor):
+    MedicalRecord = apps.get_model('records', 'MedicalRecord')
+    PatientRecordStats = apps.get_model('records', 'PatientRecordStats')
+    DoctorRecordStats = apps.get_model('records', 'DoctorRecordStats')
+
+    PatientRecordStats.objects.bulk_create([
+        PatientRecordStats(patient_id=row.pop('patient'), **row)
+        for row in MedicalRecord.objects.order_by().values('patient').annotate(
+            total_records=Count('id'),
+            visible_records=Count('id', filter=Q(is_visible=True)),
+            hidden_records=Count('id', filter=Q(is_visible=False)),
+            unique_doctors=Count('doctor', distinct=True),
+            last_visit=Max('created_at'),
+        )
+    ])
+    DoctorRecordStats.objects.bulk_create([
+        DoctorRecordStats(doctor_id=row.pop('doctor'), **row)
+        for row in MedicalRecord.objects.order_by().values('doctor').annotate(
+            total_records=Count('id'),
+            unique_patients=Count('patient', distinct=True),
+            last_activity=Max('created_at'),
+        )
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('records', '0004_medicalrecord_record_patient_created_idx_and_more'),
+        ('users', '0005_accessrequest_access_doctor_status_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DoctorRecordStats',
+            fields=[
+                ('doctor', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='record_stats', serialize=False, to='users.doctorprofile')),
+                ('total_records', models.PositiveIntegerField(default=0)),
+                ('unique_patients', models.PositiveIntegerField(default=0)),
+                ('last_activity', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='PatientRecordStats',
+            fields=[
+                ('patient', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='record_stats', serialize=False, to='users.patientprofile')),
+                ('total_records', models.PositiveIntegerField(default=0)),
+                ('visible_records', models.PositiveIntegerField(default=0)),
+                ('hidden_records', models.PositiveIntegerField(default=0)),
+                ('unique_doctors', models.PositiveIntegerField(default=0)),
+                ('last_visit', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.RunPython(backfill_stats, migrations.RunPython.noop),
+    ]
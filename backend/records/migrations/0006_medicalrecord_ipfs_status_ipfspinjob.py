@@ -0,0 +1,48 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:48
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def backfill_ipfs_status(apps, schema_editor):
+    # Records created before the queue were pinned inline; a missing
+    # metadata CID means that attempt failed (`run_ipfs_workers --requeue-failed`)
+    MedicalRecord = apps.get_model('records', 'MedicalRecord')
+    MedicalRecord.objects.filter(ipfs_metadata_cid__isnull=False).update(ipfs_status='pinned')
+    MedicalRecord.objects.filter(ipfs_metadata_cid__isnull=True).update(ipfs_status='failed')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('records', '0005_doctorrecordstats_patientrecordstats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='medicalrecord',
+            name='ipfs_status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('pinned', 'Pinned'), ('failed', 'Failed')], default='pending', max_length=10),
+        ),
+        migrations.CreateModel(
+            name='IPFSPinJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('QUEUED', 'Queued'), ('RUNNING', 'Running'), ('DONE', 'Done'), ('FAILED', 'Failed')], default='QUEUED', max_length=10)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('max_attempts', models.PositiveIntegerField(default=5)),
+                ('next_attempt_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('locked_at', models.DateTimeField(blank=True, null=True)),
+                ('last_error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('record', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='pin_jobs', to='records.medicalrecord')),
+            ],
+            options={
+                'ordering': ['next_attempt_at'],
+                'indexes': [models.Index(fields=['status', 'next_attempt_at'], name='pinjob_status_next_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_ipfs_status, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('records', '0006_medicalrecord_ipfs_status_ipfspinjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='medicalrecord',
+            name='document_sha256',
+            field=models.CharField(blank=True, help_text='SHA-256 of the document content', max_length=64, null=True),
+        ),
+        migrations.AddField(
+            model_name='medicalrecord',
+            name='document_size',
+            field=models.PositiveBigIntegerField(blank=True, null=True),
+        ),
+    ]
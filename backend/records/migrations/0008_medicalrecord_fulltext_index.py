@@ -0,0 +1,83 @@
+from django.db import migrations
+
+SQLITE_FORWARD = [
+    """
+    CREATE VIRTUAL TABLE records_medicalrecord_fts USING fts5(
+        diagnosis, notes,
+        content='records_medicalrecord', content_rowid='id',
+        tokenize='porter unicode61'
+    )
+    """,
+    """
+    CREATE TRIGGER records_medicalrecord_fts_ai AFTER INSERT ON records_medicalrecord BEGIN
+        INSERT INTO records_medicalrecord_fts(rowid, diagnosis, notes)
+        VALUES (new.id, new.diagnosis, new.notes);
+    END
+    """,
+    """
+    CREATE TRIGGER records_medicalrecord_fts_ad AFTER DELETE ON records_medicalrecord BEGIN
+        INSERT INTO records_medicalrecord_fts(records_medicalrecord_fts, rowid, diagnosis, notes)
+        VALUES ('delete', old.id, old.diagnosis, old.notes);
+    END
+    """,
+    """
+    CREATE TRIGGER records_medicalrecord_fts_au AFTER UPDATE OF diagnosis, notes ON records_medicalrecord BEGIN
+        INSERT INTO records_medicalrecord_fts(records_medicalrecord_fts, rowid, diagnosis, notes)
+        VALUES ('delete', old.id, old.diagnosis, old.notes);
+        INSERT INTO records_medicalrecord_fts(rowid, diagnosis, notes)
+        VALUES (new.id, new.diagnosis, new.notes);
+    END
+    """,
+    "INSERT INTO records_medicalrecord_fts(records_medicalrecord_fts) VALUES ('rebuild')",
+]
+
+SQLITE_REVERSE = [
+    "DROP TRIGGER IF EXISTS records_medicalrecord_fts_au",
+    "DROP TRIGGER IF EXISTS records_medicalrecord_fts_ad",
+    "DROP TRIGGER IF EXISTS records_medicalrecord_fts_ai",
+    "DROP TABLE IF EXISTS records_medicalrecord_fts",
+]
+
+POSTGRES_FORWARD = [
+    """
+    ALTER TABLE records_medicalrecord ADD COLUMN search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', coalesce(diagnosis, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(notes, '')), 'B')
+    ) STORED
+    """,
+    "CREATE INDEX records_medicalrecord_search_idx ON records_medicalrecord USING GIN (search_vector)",
+]
+
+POSTGRES_REVERSE = [
+    "DROP INDEX IF EXISTS records_medicalrecord_search_idx",
+    "ALTER TABLE records_medicalrecord DROP COLUMN IF EXISTS search_vector",
+]
+
+
+def _run(statements_by_vendor):
+    def run(apps, schema_editor):
+        for statement in statements_by_vendor.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+    """
+    Full-text index over diagnosis and notes, maintained by the database.
+
+    SQLite gets an external-content FTS5 table kept in sync by triggers;
+    PostgreSQL gets a generated tsvector column with a GIN index. Other
+    backends fall back to ``icontains`` in ``records.search``.
+    """
+
+    dependencies = [
+        ('records', '0007_medicalrecord_document_sha256_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            _run({'sqlite': SQLITE_FORWARD, 'postgresql': POSTGRES_FORWARD}),
+            _run({'sqlite': SQLITE_REVERSE, 'postgresql': POSTGRES_REVERSE}),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:27
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('records', '0008_medicalrecord_fulltext_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AnchorBatch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('root', models.CharField(max_length=64, unique=True)),
+                ('leaf_count', models.PositiveIntegerField()),
+                ('status', models.CharField(choices=[('PENDING', 'Pending'), ('ANCHORED', 'Anchored')], default='PENDING', max_length=10)),
+                ('manifest_cid', models.CharField(blank=True, max_length=100, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('anchored_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name_plural': 'anchor batches',
+            },
+        ),
+        migrations.CreateModel(
+            name='RecordAnchor',
+            fields=[
+                ('record', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='anchor', serialize=False, to='records.medicalrecord')),
+                ('leaf_index', models.PositiveIntegerField()),
+                ('metadata_sha256', models.CharField(max_length=64)),
+                ('proof', models.JSONField()),
+                ('batch', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='leaves', to='records.anchorbatch')),
+            ],
+        ),
+    ]
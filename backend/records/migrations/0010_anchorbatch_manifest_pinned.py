@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:45
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def relabel_pinned_batches(apps, schema_editor):
+    # Batches marked ANCHORED so far only had their manifest pinned
+    AnchorBatch = apps.get_model('records', 'AnchorBatch')
+    AnchorBatch.objects.filter(status='ANCHORED', anchor_tx__isnull=True).update(
+        status='MANIFEST_PINNED', pinned_at=F('anchored_at'), anchored_at=None
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('records', '0009_anchorbatch_recordanchor'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='anchorbatch',
+            name='anchor_tx',
+            field=models.CharField(blank=True, max_length=100, null=True),
+        ),
+        migrations.AddField(
+            model_name='anchorbatch',
+            name='pinned_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='anchorbatch',
+            name='status',
+            field=models.CharField(choices=[('PENDING', 'Pending'), ('MANIFEST_PINNED', 'Manifest pinned'), ('ANCHORED', 'Anchored')], default='PENDING', max_length=20),
+        ),
+        migrations.RunPython(relabel_pinned_batches, migrations.RunPython.noop),
+    ]
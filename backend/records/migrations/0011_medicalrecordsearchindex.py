@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('records', '0010_anchorbatch_manifest_pinned'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MedicalRecordSearchIndex',
+            fields=[
+                ('rowid', models.IntegerField(primary_key=True, serialize=False)),
+            ],
+            options={
+                'db_table': 'records_medicalrecord_fts',
+                'managed': False,
+            },
+        ),
+    ]
@@ -1,5 +1,6 @@
-from django.db import models
+from django.db import models, transaction
 from django.conf import settings
+from django.utils import timezone
 from users.models import PatientProfile, DoctorProfile
 
 
@@ -16,6 +17,12 @@ class MedicalRecord(models.Model):
         ('follow-up', 'Follow-up Notes'),
     )
     
+    IPFS_STATUS_CHOICES = (
+        ('pending', 'Pending'),
+        ('pinned', 'Pinned'),
+        ('failed', 'Failed'),
+    )
+    
     patient = models.ForeignKey(
         PatientProfile, 
         on_delete=models.CASCADE, 
@@ -35,6 +42,14 @@ class MedicalRecord(models.Model):
         blank=True, 
         null=True
     )
+    # Hashed while the upload is written (see users.content_store)
+    document_sha256 = models.CharField(
+        max_length=64,
+        null=True,
+        blank=True,
+        help_text="SHA-256 of the document content"
+    )
+    document_size = models.PositiveBigIntegerField(null=True, blank=True)
     
     # IPFS CID for the uploaded document
     ipfs_cid = models.CharField(
@@ -50,6 +65,12 @@ class MedicalRecord(models.Model):
         blank=True,
         help_text="IPFS CID for record metadata"
     )
+    # Pinning runs in the background job queue (see records.ipfs_jobs)
+    ipfs_status = models.CharField(
+        max_length=10,
+        choices=IPFS_STATUS_CHOICES,
+        default='pending'
+    )
     
     is_visible = models.BooleanField(default=True)
     
@@ -58,6 +79,187 @@ class MedicalRecord(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Patient and doctor listings page newest-first on (created_at, id)
+            models.Index(
+                fields=['patient', '-created_at', '-id'],
+                name='record_patient_created_idx'
+            ),
+            models.Index(
+                fields=['doctor', '-created_at', '-id'],
+                name='record_doctor_created_idx'
+            ),
+            # Visible-only lookups skip hidden rows entirely
+            models.Index(
+                fields=['patient', '-created_at', '-id'],
+                condition=models.Q(is_visible=True),
+                name='record_patient_visible_idx'
+            ),
+        ]
     
     def __str__(self):
         return f"{self.get_record_type_display()} for {self.patient} by {self.doctor}"
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored visibility so saves can tell when it flipped
+        loaded = dict(zip(field_names, values))
+        if loaded.get('is_visible', models.DEFERRED) is not models.DEFERRED:
+            instance._loaded_is_visible = loaded['is_visible']
+        return instance
+    
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            return super().save(*args, **kwargs)
+        # The insert and its stats update (post_save) commit together, so
+        # records.stats can tell a new doctor/patient pair race-free
+        with transaction.atomic():
+            return super().save(*args, **kwargs)
+
+
+class MedicalRecordSearchIndex(models.Model):
+    """
+    The SQLite FTS5 index over diagnosis and notes (migration 0008).
+    
+    Read-only and unmanaged: the table and the triggers that fill it are
+    created by that migration, and only ``records.search`` queries it.
+    """
+    
+    rowid = models.IntegerField(primary_key=True)
+    
+    class Meta:
+        managed = False
+        db_table = 'records_medicalrecord_fts'
+
+
+class PatientRecordStats(models.Model):
+    """Denormalized dashboard counters for a patient's records.
+    
+    Maintained incrementally by the signal handlers in ``records.stats``;
+    ``manage.py rebuild_record_stats`` recomputes it from scratch.
+    """
+    
+    patient = models.OneToOneField(
+        PatientProfile,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='record_stats'
+    )
+    total_records = models.PositiveIntegerField(default=0)
+    visible_records = models.PositiveIntegerField(default=0)
+    hidden_records = models.PositiveIntegerField(default=0)
+    unique_doctors = models.PositiveIntegerField(default=0)
+    last_visit = models.DateTimeField(null=True, blank=True)
+    
+    def __str__(self):
+        return f"Record stats for {self.patient}"
+
+
+class DoctorRecordStats(models.Model):
+    """Denormalized dashboard counters for the records a doctor created."""
+    
+    doctor = models.OneToOneField(
+        DoctorProfile,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='record_stats'
+    )
+    total_records = models.PositiveIntegerField(default=0)
+    unique_patients = models.PositiveIntegerField(default=0)
+    last_activity = models.DateTimeField(null=True, blank=True)
+    
+    def __str__(self):
+        return f"Record stats for {self.doctor}"
+
+
+class IPFSPinJob(models.Model):
+    """Durable queue entry for pinning a record's document and metadata."""
+    
+    STATUS_CHOICES = (
+        ('QUEUED', 'Queued'),
+        ('RUNNING', 'Running'),
+        ('DONE', 'Done'),
+        ('FAILED', 'Failed'),
+    )
+    
+    record = models.ForeignKey(
+        MedicalRecord,
+        on_delete=models.CASCADE,
+        related_name='pin_jobs'
+    )
+    status = models.CharField(
+        max_length=10,
+        choices=STATUS_CHOICES,
+        default='QUEUED'
+    )
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        ordering = ['next_attempt_at']
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='pinjob_status_next_idx'),
+        ]
+    
+    def __str__(self):
+        return f"Pin job for record {self.record_id} ({self.status})"
+
+
+class AnchorBatch(models.Model):
+    """A Merkle root over the metadata hashes of a batch of records (see records.anchoring)."""
+    
+    STATUS_CHOICES = (
+        ('PENDING', 'Pending'),
+        ('MANIFEST_PINNED', 'Manifest pinned'),
+        ('ANCHORED', 'Anchored'),
+    )
+    
+    root = models.CharField(max_length=64, unique=True)
+    leaf_count = models.PositiveIntegerField()
+    status = models.CharField(
+        max_length=20,
+        choices=STATUS_CHOICES,
+        default='PENDING'
+    )
+    # IPFS CID of the pinned manifest (root and every leaf)
+    manifest_cid = models.CharField(max_length=100, null=True, blank=True)
+    # What ANCHOR_PUBLISHER returned once the root was confirmed (e.g. a tx hash)
+    anchor_tx = models.CharField(max_length=100, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    pinned_at = models.DateTimeField(null=True, blank=True)
+    anchored_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        verbose_name_plural = 'anchor batches'
+    
+    def __str__(self):
+        return f"Batch {self.pk}: {self.root[:16]} ({self.leaf_count} records, {self.status})"
+
+
+class RecordAnchor(models.Model):
+    """A record's leaf in an ``AnchorBatch`` and its inclusion proof."""
+    
+    record = models.OneToOneField(
+        MedicalRecord,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='anchor'
+    )
+    batch = models.ForeignKey(
+        AnchorBatch,
+        on_delete=models.CASCADE,
+        related_name='leaves'
+    )
+    leaf_index = models.PositiveIntegerField()
+    metadata_sha256 = models.CharField(max_length=64)
+    # Sibling hashes from the leaf up: [{"position": "left"|"right", "hash": hex}, ...]
+    proof = models.JSONField()
+    
+    def __str__(self):
+        return f"Record {self.record_id} in batch {self.batch_id}"
@@ -0,0 +1,97 @@
+"""
+Keyset (cursor) pagination for medical record listings.
+
+Pages are addressed by the ``(created_at, id)`` of the last record served
+instead of an offset, so fetching page N costs the same single indexed
+query as fetching page 1 and concurrent inserts never shift the window.
+"""
+
+import base64
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+
+
+class RecordKeysetPagination(BasePagination):
+    """Paginate records newest-first on ``(created_at, id)``."""
+
+    page_size = 50
+    max_page_size = 200
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    ordering = ('-created_at', '-id')
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+
+        queryset = queryset.order_by(*self.ordering)
+
+        cursor = request.query_params.get(self.cursor_query_param)
+        if cursor:
+            created_at, pk = self.decode_cursor(cursor)
+            queryset = queryset.filter(
+                Q(created_at__lt=created_at) |
+                Q(created_at=created_at, id__lt=pk)
+            )
+
+        # Fetch one extra row to learn whether another page exists
+        page = list(queryset[:self.page_size + 1])
+        self.has_next = len(page) > self.page_size
+        page = page[:self.page_size]
+
+        self.next_cursor = None
+        if self.has_next:
+            self.next_cursor = self.encode_cursor(page[-1])
+        return page
+
+    def get_validator_parts(self):
+        """What besides the rows identifies a page: where it starts, its size and whether more follow."""
+        return (
+            self.request.query_params.get(self.cursor_query_param),
+            self.page_size,
+            self.next_cursor,
+        )
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if size <= 0:
+            return self.page_size
+        return min(size, self.max_page_size)
+
+    def encode_cursor(self, record):
+        raw = f"{record.created_at.isoformat()}|{record.id}"
+        return base64.urlsafe_b64encode(raw.encode()).decode()
+
+    def decode_cursor(self, cursor):
+        try:
+            raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+            created_at, pk = raw.rsplit('|', 1)
+            created_at = parse_datetime(created_at)
+            pk = int(pk)
+        except (TypeError, ValueError, UnicodeDecodeError):
+            raise NotFound(self.invalid_cursor_message)
+        if created_at is None:
+            raise NotFound(self.invalid_cursor_message)
+        return created_at, pk
+
+    def get_next_link(self):
+        if self.next_cursor is None:
+            return None
+        params = self.request.query_params.copy()
+        params[self.cursor_query_param] = self.next_cursor
+        url = self.request.build_absolute_uri(self.request.path)
+        return f"{url}?{params.urlencode()}"
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'next_cursor': self.next_cursor,
+            'results': data,
+        })
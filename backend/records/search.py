@@ -0,0 +1,189 @@
+"""
+Ranked full-text search over record diagnoses and notes.
+
+The index is maintained by the database itself (see migration 0008): an
+FTS5 table kept current by triggers on SQLite, a generated ``tsvector``
+column with a GIN index on PostgreSQL. Writes, including ``bulk_create``
+imports, therefore never need to touch it from Python.
+
+Access scoping is expressed as an ordinary queryset that the match is
+joined onto, so a caller only ever ranks rows they are allowed to see:
+
+- a patient searches their own records;
+- a doctor searches records they authored, plus visible records of
+  patients who granted them unexpired access or whom they treated before.
+"""
+
+import re
+
+from django.db import connection
+from django.db.models import BooleanField, Exists, FloatField, OuterRef, Q
+from django.db.models.expressions import RawSQL
+from django.utils import timezone
+
+from .models import MedicalRecord, MedicalRecordSearchIndex
+
+FTS_TABLE = MedicalRecordSearchIndex._meta.db_table
+
+# The SQLite index objects of migration 0008, for ``manage.py check_fts``.
+# Django rebuilds records_medicalrecord for some schema changes (e.g. an
+# AlterField), and SQLite drops the triggers with the old table; the
+# records.E001 check reports that.
+SQLITE_TABLE = f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        diagnosis, notes,
+        content='records_medicalrecord', content_rowid='id',
+        tokenize='porter unicode61'
+    )
+"""
+
+SQLITE_TRIGGERS = {
+    f'{FTS_TABLE}_ai': f"""
+        CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON records_medicalrecord BEGIN
+            INSERT INTO {FTS_TABLE}(rowid, diagnosis, notes)
+            VALUES (new.id, new.diagnosis, new.notes);
+        END
+    """,
+    f'{FTS_TABLE}_ad': f"""
+        CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON records_medicalrecord BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, diagnosis, notes)
+            VALUES ('delete', old.id, old.diagnosis, old.notes);
+        END
+    """,
+    f'{FTS_TABLE}_au': f"""
+        CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF diagnosis, notes ON records_medicalrecord BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, diagnosis, notes)
+            VALUES ('delete', old.id, old.diagnosis, old.notes);
+            INSERT INTO {FTS_TABLE}(rowid, diagnosis, notes)
+            VALUES (new.id, new.diagnosis, new.notes);
+        END
+    """,
+}
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def tokenize(query):
+    """Split user input into plain word tokens (no search operators)."""
+    return _TOKEN_RE.findall(query or '')[:16]
+
+
+def _fts5_query(tokens):
+    """Quote every token so input can't inject FTS5 syntax; prefix-match the last."""
+    quoted = [f'"{token}"' for token in tokens]
+    quoted[-1] += '*'
+    return ' '.join(quoted)
+
+
+def accessible_records(user):
+    """
+    Records a user may search.
+
+    Returns:
+        QuerySet: The scoped records, or ``none()`` for unknown roles
+    """
+    if user.role == 'PATIENT':
+        return MedicalRecord.objects.filter(patient=user.patient_profile)
+    if user.role != 'DOCTOR':
+        return MedicalRecord.objects.none()
+
+    from users.models import AccessRequest
+
+    doctor = user.doctor_profile
+    granted = AccessRequest.objects.filter(
+        Q(expires_at__isnull=True) | Q(expires_at__gt=timezone.now()),
+        doctor=doctor,
+        status='APPROVED'
+    ).values('patient_id')
+    treated = MedicalRecord.objects.filter(doctor=doctor).values('patient_id')
+    return MedicalRecord.objects.filter(
+        Q(doctor=doctor) |
+        Q(is_visible=True, patient_id__in=granted) |
+        Q(is_visible=True, patient_id__in=treated)
+    )
+
+
+def repair_sqlite_index(connection):
+    """Recreate the FTS5 table and triggers where missing, then reindex every record."""
+    with connection.cursor() as cursor:
+        cursor.execute(SQLITE_TABLE)
+        for statement in SQLITE_TRIGGERS.values():
+            cursor.execute(statement)
+        cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+
+
+def _search_sqlite(scope, tokens, limit, offset):
+    # Drive the query from the FTS hits and check the access predicate per
+    # hit with a primary-key lookup, so the MATCH runs once however many
+    # records are in scope
+    rows = MedicalRecordSearchIndex.objects.filter(
+        RawSQL(f"{FTS_TABLE} MATCH %s", [_fts5_query(tokens)], output_field=BooleanField()),
+        Exists(scope.filter(pk=OuterRef('rowid')))
+    ).annotate(
+        rank=RawSQL(f"bm25({FTS_TABLE}, 2.0, 1.0)", [], output_field=FloatField())
+    ).order_by('rank').values_list('rowid', 'rank')
+    # bm25() is lower-is-better; flip it so callers sort descending
+    return [(record_id, -rank) for record_id, rank in rows[offset:offset + limit]]
+
+
+def _search_postgresql(scope, tokens, limit, offset):
+    query = ' '.join(tokens)
+    rows = scope.annotate(
+        matched=RawSQL(
+            "search_vector @@ websearch_to_tsquery('english', %s)",
+            [query],
+            output_field=BooleanField()
+        ),
+        rank=RawSQL(
+            "ts_rank_cd(search_vector, websearch_to_tsquery('english', %s))",
+            [query],
+            output_field=FloatField()
+        )
+    ).filter(matched=True).order_by('-rank', '-id').values_list('id', 'rank')
+    return list(rows[offset:offset + limit])
+
+
+def substring_search(scope, tokens, limit, offset):
+    """Unindexed substring match for backends without a full-text index."""
+    for token in tokens:
+        scope = scope.filter(Q(diagnosis__icontains=token) | Q(notes__icontains=token))
+    rows = scope.order_by('-created_at', '-id').values_list('id', flat=True)
+    return [(record_id, None) for record_id in rows[offset:offset + limit]]
+
+
+def search_records(user, query, record_type=None, health_id=None, limit=20, offset=0):
+    """
+    Search the records a user can access, best match first.
+
+    Args:
+        user: The requesting user (patient or doctor)
+        query: Free-text query; the last word is prefix-matched on SQLite
+        record_type: Optional ``MedicalRecord.RECORD_TYPE_CHOICES`` key
+        health_id: Optional patient health ID to restrict to
+        limit: Maximum number of results
+        offset: Number of ranked results to skip
+
+    Returns:
+        list: ``(MedicalRecord, rank)`` tuples; rank is None on the fallback path
+    """
+    tokens = tokenize(query)
+    if not tokens:
+        return []
+
+    scope = accessible_records(user)
+    if record_type:
+        scope = scope.filter(record_type=record_type)
+    if health_id:
+        scope = scope.filter(patient__health_id=health_id)
+
+    if connection.vendor == 'sqlite':
+        hits = _search_sqlite(scope, tokens, limit, offset)
+    elif connection.vendor == 'postgresql':
+        hits = _search_postgresql(scope, tokens, limit, offset)
+    else:
+        hits = substring_search(scope, tokens, limit, offset)
+
+    records = MedicalRecord.objects.select_related('doctor', 'patient').in_bulk(
+        [record_id for record_id, _ in hits]
+    )
+    return [(records[record_id], rank) for record_id, rank in hits if record_id in records]
@@ -1,3 +1,4 @@
+from django.db import transaction
 from rest_framework import serializers
 from .models import MedicalRecord
 
@@ -16,11 +17,15 @@ class MedicalRecordSerializer(serializers.ModelSerializer):
         model = MedicalRecord
         fields = [
             'id', 'record_type', 'record_type_display', 'diagnosis', 'notes',
-            'document', 'ipfs_cid', 'ipfs_url', 'ipfs_metadata_cid',
+            'document', 'document_sha256', 'document_size',
+            'ipfs_cid', 'ipfs_url', 'ipfs_metadata_cid', 'ipfs_status',
             'is_visible', 'created_at', 'updated_at',
             'doctor_name', 'hospital', 'patient_name', 'patient_health_id'
         ]
-        read_only_fields = ['id', 'ipfs_cid', 'ipfs_url', 'ipfs_metadata_cid', 'created_at', 'updated_at']
+        read_only_fields = [
+            'id', 'document_sha256', 'document_size', 'ipfs_cid', 'ipfs_url',
+            'ipfs_metadata_cid', 'ipfs_status', 'created_at', 'updated_at'
+        ]
     
     def get_doctor_name(self, obj):
         return obj.doctor.full_name
@@ -60,53 +65,59 @@ class CreateMedicalRecordSerializer(serializers.ModelSerializer):
         try:
             PatientProfile.objects.get(health_id=value)
         except PatientProfile.DoesNotExist:
-            raise serializers.ValidationError("Patient not found with this Health ID.")
+            from users.identifiers import mistyped_id_error
+            raise serializers.ValidationError(
+                mistyped_id_error(value, 'Health ID') or "Patient not found with this Health ID."
+            )
         return value
     
     def create(self, validated_data):
         from users.models import PatientProfile
-        from users.ipfs_service import ipfs_service
+        from users.content_store import release, store_upload
+        from .ipfs_jobs import enqueue_record_pin
         
         patient_health_id = validated_data.pop('patient_health_id')
         patient = PatientProfile.objects.get(health_id=patient_health_id)
         doctor = self.context['request'].user.doctor_profile
         
-        # Create the record first
-        record = MedicalRecord.objects.create(
-            patient=patient,
-            doctor=doctor,
-            **validated_data
-        )
-        
-        # Upload document to IPFS if provided
-        if record.document:
-            try:
-                result = ipfs_service.upload_file(
-                    record.document.file,
-                    filename=record.document.name
-                )
-                if result.get('success'):
-                    record.ipfs_cid = result.get('cid')
-                    record.save(update_fields=['ipfs_cid'])
-            except Exception:
-                pass  # Document saved locally, IPFS upload optional
+        # Hash and store the document in a single chunked pass; identical
+        # content already on disk (and its CID, if pinned) is reused. This
+        # stays outside the transaction so no file I/O holds the write lock
+        document = validated_data.pop('document', None)
+        document_field = MedicalRecord._meta.get_field('document')
+        blob = None
+        if document:
+            blob = store_upload(document, document_field)
+            validated_data.update(
+                document=blob.path,
+                document_sha256=blob.sha256,
+                document_size=blob.size,
+                ipfs_cid=blob.cid
+            )
         
-        # Store record metadata on IPFS as JSON
+        # Pinning to IPFS happens in the background (manage.py run_ipfs_workers)
         try:
-            metadata = {
-                'record_id': record.id,
-                'record_type': record.record_type,
-                'diagnosis': record.diagnosis,
-                'patient_health_id': patient.health_id,
-                'doctor_id': doctor.doctor_id,
-                'created_at': record.created_at.isoformat() if record.created_at else None,
-                'document_cid': record.ipfs_cid
-            }
-            result = ipfs_service.upload_json(metadata, name=f"record_{record.id}_metadata")
-            if result.get('success'):
-                record.ipfs_metadata_cid = result.get('cid')
-                record.save(update_fields=['ipfs_metadata_cid'])
+            with transaction.atomic():
+                record = MedicalRecord.objects.create(
+                    patient=patient,
+                    doctor=doctor,
+                    **validated_data
+                )
+                enqueue_record_pin(record)
         except Exception:
-            pass  # Metadata upload optional
+            # No record holds the reference taken above; give it back
+            if blob:
+                release(blob.sha256, document_field.storage)
+            raise
         
         return record
+
+
+class BulkRecordRowSerializer(serializers.Serializer):
+    """One row of a bulk import; patient and access are checked set-wise."""
+    
+    patient_health_id = serializers.CharField(max_length=20)
+    record_type = serializers.ChoiceField(choices=MedicalRecord.RECORD_TYPES)
+    diagnosis = serializers.CharField(max_length=500)
+    notes = serializers.CharField()
+    is_visible = serializers.BooleanField(required=False, default=True)
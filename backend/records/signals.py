@@ -0,0 +1,28 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from users.access import invalidate_access_on_commit
+from users.content_store import release
+from . import stats
+from .models import MedicalRecord
+
+
+@receiver(post_save, sender=MedicalRecord)
+def on_record_saved(sender, instance, created, raw=False, using=None, **kwargs):
+    if raw:
+        return  # Fixture loading; rebuild_record_stats covers it
+
+    if created:
+        stats.record_created(instance)
+        # The pair's legacy (authored-records) access may have just appeared
+        invalidate_access_on_commit(instance.patient_id, instance.doctor_id, using=using)
+    elif getattr(instance, '_loaded_is_visible', instance.is_visible) != instance.is_visible:
+        stats.visibility_changed(instance)
+    instance._loaded_is_visible = instance.is_visible
+
+
+@receiver(post_delete, sender=MedicalRecord)
+def on_record_deleted(sender, instance, using=None, **kwargs):
+    stats.record_deleted(instance)
+    release(instance.document_sha256, instance.document.storage)
+    invalidate_access_on_commit(instance.patient_id, instance.doctor_id, using=using)
@@ -0,0 +1,165 @@
+"""
+Incremental maintenance of the denormalized dashboard counters.
+
+Every change to a ``MedicalRecord`` that affects the dashboard (create,
+delete, visibility toggle) adjusts ``PatientRecordStats`` and
+``DoctorRecordStats`` with ``F()`` updates so the stats endpoint only has
+to read a single row. ``rebuild_all`` recomputes everything from the
+records table and is the recovery path if the counters ever drift.
+
+``unique_doctors``/``unique_patients`` go up only for a record that is the
+first of its doctor/patient pair. That check runs with the patient's stats
+row locked, in the transaction that inserted the record, so two
+concurrent first records of a pair are serialized: the second one waits
+for the first to commit, sees it and doesn't count the pair again.
+"""
+
+from django.db import transaction
+from django.db.models import Count, F, Max, Q, Value
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import MedicalRecord, PatientRecordStats, DoctorRecordStats
+
+
+def _latest(field, value):
+    """Expression keeping the later of a nullable column and ``value``."""
+    return Coalesce(Greatest(F(field), Value(value)), Value(value))
+
+
+def record_created(record):
+    """
+    Account for a newly inserted record.
+
+    Call it in the transaction that inserted ``record`` (``MedicalRecord.save``
+    does); the pair check is only race-free while that insert is uncommitted.
+    """
+    with transaction.atomic():
+        # Every record of the pair shares this row, so the lock serializes them
+        PatientRecordStats.objects.select_for_update().get_or_create(patient_id=record.patient_id)
+        pair_exists = MedicalRecord.objects.filter(
+            patient_id=record.patient_id,
+            doctor_id=record.doctor_id
+        ).exclude(pk=record.pk).exists()
+        new_pair = 0 if pair_exists else 1
+
+        PatientRecordStats.objects.filter(patient_id=record.patient_id).update(
+            total_records=F('total_records') + 1,
+            visible_records=F('visible_records') + (1 if record.is_visible else 0),
+            hidden_records=F('hidden_records') + (0 if record.is_visible else 1),
+            unique_doctors=F('unique_doctors') + new_pair,
+            last_visit=_latest('last_visit', record.created_at)
+        )
+
+        DoctorRecordStats.objects.get_or_create(doctor_id=record.doctor_id)
+        DoctorRecordStats.objects.filter(doctor_id=record.doctor_id).update(
+            total_records=F('total_records') + 1,
+            unique_patients=F('unique_patients') + new_pair,
+            last_activity=_latest('last_activity', record.created_at)
+        )
+
+
+def visibility_changed(record):
+    """Move one record between the visible and hidden counters."""
+    delta = 1 if record.is_visible else -1
+    PatientRecordStats.objects.filter(patient_id=record.patient_id).update(
+        visible_records=F('visible_records') + delta,
+        hidden_records=F('hidden_records') - delta
+    )
+
+
+def record_deleted(record):
+    """Recompute the affected rows; deletes are rare and may move the max."""
+    refresh_patient(record.patient_id)
+    refresh_doctor(record.doctor_id)
+
+
+def _patient_aggregates():
+    return dict(
+        total_records=Count('id'),
+        visible_records=Count('id', filter=Q(is_visible=True)),
+        hidden_records=Count('id', filter=Q(is_visible=False)),
+        unique_doctors=Count('doctor', distinct=True),
+        last_visit=Max('created_at'),
+    )
+
+
+def _doctor_aggregates():
+    return dict(
+        total_records=Count('id'),
+        unique_patients=Count('patient', distinct=True),
+        last_activity=Max('created_at'),
+    )
+
+
+def refresh_patient(patient_id):
+    """Recompute one patient's counters from the records table."""
+    values = MedicalRecord.objects.filter(
+        patient_id=patient_id
+    ).aggregate(**_patient_aggregates())
+    PatientRecordStats.objects.filter(patient_id=patient_id).update(**values)
+
+
+def refresh_doctor(doctor_id):
+    """Recompute one doctor's counters from the records table."""
+    values = MedicalRecord.objects.filter(
+        doctor_id=doctor_id
+    ).aggregate(**_doctor_aggregates())
+    DoctorRecordStats.objects.filter(doctor_id=doctor_id).update(**values)
+
+
+def refresh_many(patient_ids=(), doctor_ids=()):
+    """
+    Recompute the counters of many profiles with one grouped query each.
+
+    Used after ``bulk_create`` imports, which bypass the save signals.
+    """
+    if patient_ids:
+        rows = [
+            PatientRecordStats(patient_id=row.pop('patient'), **row)
+            for row in MedicalRecord.objects.filter(patient_id__in=patient_ids)
+            .order_by().values('patient').annotate(**_patient_aggregates())
+        ]
+        PatientRecordStats.objects.bulk_create(
+            rows,
+            update_conflicts=True,
+            unique_fields=['patient'],
+            update_fields=list(_patient_aggregates())
+        )
+    if doctor_ids:
+        rows = [
+            DoctorRecordStats(doctor_id=row.pop('doctor'), **row)
+            for row in MedicalRecord.objects.filter(doctor_id__in=doctor_ids)
+            .order_by().values('doctor').annotate(**_doctor_aggregates())
+        ]
+        DoctorRecordStats.objects.bulk_create(
+            rows,
+            update_conflicts=True,
+            unique_fields=['doctor'],
+            update_fields=list(_doctor_aggregates())
+        )
+
+
+@transaction.atomic
+def rebuild_all(batch_size=1000):
+    """
+    Rebuild every stats row with two grouped aggregate queries.
+
+    Returns:
+        tuple: (patient rows written, doctor rows written)
+    """
+    patient_rows = [
+        PatientRecordStats(patient_id=row.pop('patient'), **row)
+        for row in MedicalRecord.objects.order_by().values('patient')
+        .annotate(**_patient_aggregates())
+    ]
+    doctor_rows = [
+        DoctorRecordStats(doctor_id=row.pop('doctor'), **row)
+        for row in MedicalRecord.objects.order_by().values('doctor')
+        .annotate(**_doctor_aggregates())
+    ]
+
+    PatientRecordStats.objects.all().delete()
+    DoctorRecordStats.objects.all().delete()
+    PatientRecordStats.objects.bulk_create(patient_rows, batch_size=batch_size)
+    DoctorRecordStats.objects.bulk_create(doctor_rows, batch_size=batch_size)
+    return len(patient_rows), len(doctor_rows)
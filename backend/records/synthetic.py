@@ -0,0 +1,248 @@
+"""
+Synthetic patients, doctors, access grants and records for benchmarks.
+
+The data is skewed the way a real deployment is:
+
+- Doctor panels follow a Zipf-like law, so a few doctors see a large
+  share of all patients and most doctors see only a handful.
+- About ``chronic_fraction`` of patients are chronic. They visit about
+  ``chronic_weight`` times as often as everyone else, and within each group
+  visit counts are log-normal, so some histories run to hundreds of
+  records while the median patient has a few.
+- Most records come from the patient's primary doctor. The rest come from
+  other doctors chosen by panel size, as referrals would.
+- Every patient grants their primary doctor full access. Some also hold
+  temporary or revoked grants for a second doctor.
+
+Everything is inserted with ``bulk_create`` in batches and the dashboard
+counters are rebuilt at the end. Synthetic rows are tagged through their
+email (``synthetic-<tag>-...@example.com``), so several seeds can share a
+database.
+"""
+
+import random
+from collections import Counter, namedtuple
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.utils import timezone
+
+from users.identifiers import allocate_many
+from users.ipfs_service import generate_blockchain_id
+from users.models import User, PatientProfile, DoctorProfile, AccessRequest
+
+from . import stats
+from .models import MedicalRecord
+
+VOCABULARY = (
+    "hypertension diabetes asthma migraine fracture infection anemia arthritis "
+    "bronchitis pneumonia dermatitis gastritis influenza sinusitis tonsillitis "
+    "hypothyroidism hyperlipidemia obesity insomnia anxiety depression eczema "
+    "allergy vertigo tachycardia arrhythmia angina neuropathy sciatica tendinitis "
+    "cholesterol glucose hemoglobin platelet creatinine bilirubin thyroid insulin "
+    "metformin amoxicillin ibuprofen paracetamol atorvastatin lisinopril salbutamol "
+    "chest abdominal lumbar cervical knee shoulder ankle wrist renal hepatic "
+    "chronic acute mild severe recurrent persistent stable improving worsening "
+    "xray mri ultrasound ecg biopsy culture panel screening followup review "
+    "patient reports pain fever cough fatigue nausea swelling dizziness rash "
+    "prescribed advised monitor continue reduce increase discontinue refer"
+).split()
+
+# A long tail of rarer clinical-looking terms, as in real notes
+VOCABULARY += [
+    f"{head}{middle}{tail}"
+    for head in ("cardio", "neuro", "gastro", "hepato", "nephro", "pulmo", "derma", "osteo",
+                 "myo", "hemato", "endo", "immuno", "onco", "rheuma", "psycho", "uro")
+    for middle in ("", "angio", "arthro", "chondro", "cysto", "fibro", "lipo", "myelo",
+                   "phlebo", "pyelo", "rhino", "spondylo", "thrombo", "vaso")
+    for tail in ("logy", "pathy", "itis", "megaly", "genic", "plasty", "scopy", "tomy",
+                 "algia", "emia", "osis", "trophy", "lysis", "gram", "stasis", "philia")
+]
+
+# Relative frequency of record types in a general practice
+RECORD_TYPE_WEIGHTS = {
+    'consultation': 30,
+    'prescription': 25,
+    'follow-up': 15,
+    'lab': 15,
+    'diagnosis': 8,
+    'imaging': 5,
+    'procedure': 2,
+}
+
+SPECIALIZATIONS = (
+    'General Practice', 'Cardiology', 'Endocrinology', 'Neurology',
+    'Pulmonology', 'Orthopedics', 'Dermatology', 'Psychiatry',
+)
+
+# panel_sizes and history_lengths count patients per doctor pk and records per patient pk
+SyntheticDataset = namedtuple('SyntheticDataset', [
+    'tag', 'password', 'patient_ids', 'doctor_ids', 'grants', 'records',
+    'panel_sizes', 'history_lengths',
+])
+
+
+def email_for(tag, kind, index):
+    return f"synthetic-{tag}-{kind}{index}@example.com"
+
+
+def _create_users(tag, kind, count, role, password_hash, batch_size):
+    joined = timezone.now()
+    users = []
+    for start in range(0, count, batch_size):
+        batch = [
+            User(
+                email=email_for(tag, kind, index),
+                password=password_hash,
+                role=role,
+                date_joined=joined,
+                blockchain_id=generate_blockchain_id(email_for(tag, kind, index), joined)
+            )
+            for index in range(start, min(count, start + batch_size))
+        ]
+        users.extend(User.objects.bulk_create(batch))
+    return users
+
+
+def seed(patients, doctors, records, rng=None, password='synthetic-pass',
+         chronic_fraction=0.1, chronic_weight=25, batch_size=5000, progress=None):
+    """
+    Insert a skewed synthetic dataset.
+
+    Args:
+        patients: Number of patients
+        doctors: Number of doctors
+        records: Number of medical records
+        rng: ``random.Random`` to draw from (seeded for repeatable data)
+        password: Password shared by every synthetic account
+        chronic_fraction: Share of patients with long histories
+        chronic_weight: How much more often chronic patients visit
+        batch_size: Rows per ``bulk_create``
+        progress: Optional callable receiving status lines
+
+    Returns:
+        SyntheticDataset
+    """
+    rng = rng or random.Random()
+    progress = progress or (lambda message: None)
+    tag = f"{rng.getrandbits(32):08x}"
+    # One hash for everyone: hashing is the slow part and adds nothing here
+    password_hash = make_password(password)
+
+    doctor_users = _create_users(tag, 'd', doctors, 'DOCTOR', password_hash, batch_size)
+    doctor_profiles = []
+    for start in range(0, doctors, batch_size):
+        batch = doctor_users[start:start + batch_size]
+        doctor_profiles.extend(DoctorProfile.objects.bulk_create([
+            DoctorProfile(
+                user=user,
+                first_name='Synthetic',
+                last_name=f"Doctor {start + offset}",
+                medical_license=f"SYN-{tag}-{start + offset}",
+                specialization=rng.choice(SPECIALIZATIONS),
+                hospital=f"Synthetic Hospital {rng.randint(1, max(1, doctors // 10))}",
+                doctor_id=doctor_id,
+                is_verified=True
+            )
+            for offset, (user, doctor_id) in enumerate(
+                zip(batch, allocate_many('doctor_id', len(batch)))
+            )
+        ]))
+    progress(f"Created {doctors} doctors")
+
+    patient_users = _create_users(tag, 'p', patients, 'PATIENT', password_hash, batch_size)
+    patient_profiles = []
+    for start in range(0, patients, batch_size):
+        batch = patient_users[start:start + batch_size]
+        patient_profiles.extend(PatientProfile.objects.bulk_create([
+            PatientProfile(
+                user=user,
+                first_name='Synthetic',
+                last_name=f"Patient {start + offset}",
+                age=rng.randint(1, 95),
+                health_id=health_id
+            )
+            for offset, (user, health_id) in enumerate(
+                zip(batch, allocate_many('health_id', len(batch)))
+            )
+        ]))
+    progress(f"Created {patients} patients")
+
+    # Zipf-like panel sizes: doctor k gets a share of roughly 1/k
+    panel_weights = [1 / rank ** 1.1 for rank in range(1, doctors + 1)]
+    primary = rng.choices(range(doctors), panel_weights, k=patients)
+    visit_weights = [
+        (chronic_weight if rng.random() < chronic_fraction else 1) * rng.lognormvariate(0, 0.8)
+        for _ in range(patients)
+    ]
+
+    now = timezone.now()
+    grants = []
+    for patient_index, doctor_index in enumerate(primary):
+        patient = patient_profiles[patient_index]
+        grants.append(AccessRequest(
+            patient=patient, doctor=doctor_profiles[doctor_index],
+            access_type='FULL', status='APPROVED'
+        ))
+        roll = rng.random()
+        if doctors > 1 and roll < 0.2:
+            other = rng.choices(range(doctors), panel_weights)[0]
+            if other == doctor_index:
+                continue
+            if roll < 0.15:
+                grants.append(AccessRequest(
+                    patient=patient, doctor=doctor_profiles[other], access_type='TEMPORARY',
+                    status='APPROVED', expires_at=now + timedelta(days=rng.randint(-5, 30))
+                ))
+            else:
+                grants.append(AccessRequest(
+                    patient=patient, doctor=doctor_profiles[other], access_type='FULL',
+                    status='REVOKED', revoked_at=now - timedelta(days=rng.randint(1, 365))
+                ))
+    AccessRequest.objects.bulk_create(grants, batch_size=batch_size)
+    progress(f"Created {len(grants)} access grants")
+
+    term_weights = [1 / rank for rank in range(1, len(VOCABULARY) + 1)]
+    record_types = list(RECORD_TYPE_WEIGHTS)
+    type_weights = list(RECORD_TYPE_WEIGHTS.values())
+
+    def words(low, high):
+        return ' '.join(rng.choices(VOCABULARY, term_weights, k=rng.randint(low, high)))
+
+    history_lengths = Counter()
+    remaining = records
+    while remaining > 0:
+        count = min(batch_size, remaining)
+        batch = []
+        for patient_index in rng.choices(range(patients), visit_weights, k=count):
+            history_lengths[patient_profiles[patient_index].pk] += 1
+            if rng.random() < 0.8:
+                doctor_index = primary[patient_index]
+            else:
+                doctor_index = rng.choices(range(doctors), panel_weights)[0]
+            batch.append(MedicalRecord(
+                patient=patient_profiles[patient_index],
+                doctor=doctor_profiles[doctor_index],
+                record_type=rng.choices(record_types, type_weights)[0],
+                diagnosis=words(2, 6),
+                notes=words(15, 40),
+                is_visible=rng.random() > 0.1,
+                ipfs_status='pinned'
+            ))
+        MedicalRecord.objects.bulk_create(batch)
+        remaining -= count
+        progress(f"Created {records - remaining} records")
+
+    # bulk_create skips the signals that maintain the dashboard counters
+    stats.rebuild_all(batch_size=batch_size)
+
+    return SyntheticDataset(
+        tag=tag,
+        password=password,
+        patient_ids=[profile.pk for profile in patient_profiles],
+        doctor_ids=[profile.pk for profile in doctor_profiles],
+        grants=len(grants),
+        records=records,
+        panel_sizes=Counter(doctor_profiles[index].pk for index in primary),
+        history_lengths=history_lengths,
+    )
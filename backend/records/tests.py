@@ -0,0 +1,592 @@
+import base64
+import json
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from unittest import mock, skipUnless
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import DatabaseError, connection
+from django.db.models import QuerySet
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from users.ipfs_service import ipfs_service
+from users.models import AccessRequest, ContentBlob, DoctorProfile, PatientProfile, User
+from users.pinata_stub import PinataStubServer, cid_for_bytes
+from . import anchoring, checks, ipfs_jobs
+from .export import record_to_fhir
+from .search import repair_sqlite_index, search_records
+from .models import AnchorBatch, IPFSPinJob, MedicalRecord
+
+
+def create_patient(email='patient@example.com'):
+    user = User.objects.create_user(email=email, password='Secret-pass-1', role='PATIENT')
+    return PatientProfile.objects.create(user=user, first_name='Pat', last_name='Ient')
+
+
+def create_doctor(email='doctor@example.com', license_number='LIC-1'):
+    user = User.objects.create_user(email=email, password='Secret-pass-1', role='DOCTOR')
+    return DoctorProfile.objects.create(
+        user=user,
+        first_name='Doc',
+        last_name='Tor',
+        medical_license=license_number,
+        specialization='General',
+        hospital='General Hospital'
+    )
+
+
+def create_records(patient, doctor, count, **fields):
+    return [
+        MedicalRecord.objects.create(
+            patient=patient,
+            doctor=doctor,
+            record_type='lab',
+            diagnosis=f'Diagnosis {index}',
+            notes='Notes',
+            **fields
+        )
+        for index in range(count)
+    ]
+
+
+def api_client(profile):
+    client = APIClient()
+    client.force_authenticate(profile.user)
+    return client
+
+
+class QueryPlanTests(TestCase):
+    """The list endpoints read through their composite indexes, never a scan and sort."""
+
+    def setUp(self):
+        self.patient = create_patient()
+        self.doctor = create_doctor()
+        AccessRequest.objects.create(patient=self.patient, doctor=self.doctor, status='APPROVED')
+        create_records(self.patient, self.doctor, 3)
+        create_records(self.patient, self.doctor, 2, is_visible=False)
+
+    def query_plans(self, profile, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = api_client(profile).get(url)
+        self.assertEqual(response.status_code, 200)
+        plans = []
+        with connection.cursor() as cursor:
+            for query in queries.captured_queries:
+                if query['sql'].startswith('SELECT'):
+                    cursor.execute(f"EXPLAIN QUERY PLAN {query['sql']}")
+                    plans.append([row[-1] for row in cursor.fetchall()])
+        return plans
+
+    def assertUsesIndex(self, profile, url, table, index):
+        plans = self.query_plans(profile, url)
+        for plan in plans:
+            for detail in plan:
+                self.assertFalse(detail.startswith(f'SCAN {table}'), plan)
+                self.assertNotIn('USE TEMP B-TREE', detail, plan)
+        self.assertTrue(
+            any(f'USING INDEX {index} ' in detail for plan in plans for detail in plan),
+            plans
+        )
+
+    def test_patient_record_list(self):
+        self.assertUsesIndex(self.patient, '/api/records/', 'records_medicalrecord', 'record_patient_created_idx')
+
+    def test_doctor_record_list(self):
+        self.assertUsesIndex(self.doctor, '/api/records/', 'records_medicalrecord', 'record_doctor_created_idx')
+
+    def test_patient_records_for_doctor(self):
+        self.assertUsesIndex(
+            self.doctor,
+            f'/api/patients/{self.patient.health_id}/records/',
+            'records_medicalrecord',
+            'record_patient_created_idx'
+        )
+
+    def test_patient_access_list(self):
+        self.assertUsesIndex(self.patient, '/api/auth/access/', 'users_accessrequest', 'access_patient_granted_idx')
+
+    def test_doctor_access_list(self):
+        self.assertUsesIndex(self.doctor, '/api/auth/access/', 'users_accessrequest', 'access_doctor_granted_idx')
+
+
+class RecordListPaginationTests(TestCase):
+
+    def setUp(self):
+        self.patient = create_patient()
+        self.doctor = create_doctor()
+        self.records = create_records(self.patient, self.doctor, 25)
+        self.client = api_client(self.patient)
+        self.client.get('/api/records/?page_size=1')  # Loads user.patient_profile once
+
+    def fetch_all(self, page_size, queries):
+        ids = []
+        url = f'/api/records/?page_size={page_size}'
+        while url:
+            with self.assertNumQueries(queries):
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            data = response.json()
+            self.assertLessEqual(len(data['results']), page_size)
+            ids.extend(record['id'] for record in data['results'])
+            url = data['next']
+        return ids
+
+    def test_query_count_does_not_grow_with_page_size(self):
+        # Just the page query, whatever the page holds; validators come from its rows
+        newest_first = [record.id for record in reversed(self.records)]
+        self.assertEqual(self.fetch_all(5, 1), newest_first)
+        self.assertEqual(self.fetch_all(20, 1), newest_first)
+
+    def test_revalidation_costs_one_page_query(self):
+        first = self.client.get('/api/records/?page_size=10').json()
+        url = f"/api/records/?page_size=10&cursor={first['next_cursor']}"
+        etag = self.client.get(url)['ETag']
+
+        with self.assertNumQueries(1):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        # Another page size or start is another representation
+        self.assertNotEqual(self.client.get('/api/records/?page_size=10')['ETag'], etag)
+        self.assertNotEqual(self.client.get(url.replace('page_size=10', 'page_size=5'))['ETag'], etag)
+
+    def test_edits_and_deletes_on_the_page_change_its_etag(self):
+        url = '/api/records/?page_size=10'
+        etag = self.client.get(url)['ETag']
+        self.records[-3].description = 'Amended'
+        self.records[-3].save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+        etag = self.client.get(url)['ETag']
+        self.records[-5].delete()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+        # Records past the page leave it alone
+        etag = self.client.get(url)['ETag']
+        self.records[0].delete()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    def test_cursor_round_trip(self):
+        first = self.client.get('/api/records/?page_size=10').json()
+        self.assertTrue(first['next_cursor'])
+        second = self.client.get(
+            '/api/records/', {'page_size': 10, 'cursor': first['next_cursor']}
+        ).json()
+        self.assertEqual(
+            [record['id'] for record in first['results'] + second['results']],
+            [record.id for record in reversed(self.records)][:20]
+        )
+
+    def test_invalid_cursor_is_not_found(self):
+        response = self.client.get('/api/records/', {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 404)
+
+
+class RecordSummaryTests(TestCase):
+
+    def setUp(self):
+        self.doctor = create_doctor()
+        self.other_doctor = create_doctor('other@example.com', 'LIC-2')
+        self.first = create_patient()
+        self.second = create_patient('second@example.com')
+        create_records(self.first, self.doctor, 3)
+        create_records(self.second, self.doctor, 2)
+        create_records(self.first, self.other_doctor, 4)
+
+    def summary(self, profile):
+        client = api_client(profile)
+        client.get('/api/records/summary/')  # Loads the user's profile once
+        with self.assertNumQueries(1):
+            response = client.get('/api/records/summary/')
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_doctor_summary_groups_per_patient(self):
+        self.assertEqual(
+            [(row['health_id'], row['record_count']) for row in self.summary(self.doctor)],
+            [(self.second.health_id, 2), (self.first.health_id, 3)]
+        )
+
+    def test_patient_summary_groups_per_doctor(self):
+        self.assertEqual(
+            [(row['doctor_id'], row['record_count']) for row in self.summary(self.first)],
+            [(self.other_doctor.doctor_id, 4), (self.doctor.doctor_id, 3)]
+        )
+
+
+class RecordStatsTests(TestCase):
+
+    def setUp(self):
+        self.patient = create_patient()
+        self.doctor = create_doctor()
+
+    def test_only_the_first_record_of_a_pair_counts_it(self):
+        other = create_doctor('other@example.com', 'LIC-2')
+        create_records(self.patient, self.doctor, 2)
+        create_records(self.patient, other, 1)
+        create_records(create_patient('second@example.com'), self.doctor, 1)
+
+        self.patient.record_stats.refresh_from_db()
+        self.assertEqual((self.patient.record_stats.total_records, self.patient.record_stats.unique_doctors), (3, 2))
+        self.doctor.record_stats.refresh_from_db()
+        self.assertEqual((self.doctor.record_stats.total_records, self.doctor.record_stats.unique_patients), (3, 2))
+
+    def test_pair_check_runs_under_the_stats_row_lock(self):
+        with CaptureQueriesContext(connection) as queries:
+            create_records(self.patient, self.doctor, 1)
+        sql = [query['sql'] for query in queries.captured_queries]
+        lock = next(i for i, query in enumerate(sql) if query.startswith('SELECT') and 'records_patientrecordstats' in query)
+        check = next(i for i, query in enumerate(sql) if query.startswith('SELECT') and 'FROM "records_medicalrecord"' in query)
+        insert = next(i for i, query in enumerate(sql) if query.startswith('INSERT INTO "records_medicalrecord"'))
+        self.assertLess(insert, lock)
+        self.assertLess(lock, check)
+        if connection.features.has_select_for_update:
+            self.assertIn('FOR UPDATE', sql[lock])
+
+    def test_insert_and_stats_commit_together(self):
+        with mock.patch('records.signals.stats.record_created', side_effect=DatabaseError('stats')):
+            with self.assertRaises(DatabaseError):
+                create_records(self.patient, self.doctor, 1)
+        self.assertFalse(MedicalRecord.objects.exists())
+
+
+class ExportTests(TestCase):
+
+    def setUp(self):
+        self.patient = create_patient()
+        self.doctor = create_doctor()
+        self.client = api_client(self.patient)
+        self.url = f'/api/patients/{self.patient.health_id}/export/'
+
+    def export(self, output):
+        # The body streams, so its queries run while it is consumed
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url, {'output': output})
+            body = b''.join(response.streaming_content).decode()
+        self.assertEqual(response.status_code, 200)
+        return body, len(queries)
+
+    def test_ndjson_lines_parse_with_constant_queries(self):
+        create_records(self.patient, self.doctor, 3)
+        body, few = self.export('ndjson')
+        self.assertEqual(len([json.loads(line) for line in body.splitlines()]), 3)
+
+        create_records(self.patient, self.doctor, 30)
+        body, many = self.export('ndjson')
+        self.assertEqual(len([json.loads(line) for line in body.splitlines()]), 33)
+        self.assertEqual(many, few)
+
+    def test_fhir_bundle_parses_with_total_and_constant_queries(self):
+        create_records(self.patient, self.doctor, 3)
+        body, few = self.export('fhir')
+        bundle = json.loads(body)
+        self.assertEqual((bundle['resourceType'], bundle['total'], len(bundle['entry'])), ('Bundle', 3, 3))
+
+        create_records(self.patient, self.doctor, 30)
+        body, many = self.export('fhir')
+        bundle = json.loads(body)
+        self.assertEqual((bundle['total'], len(bundle['entry'])), (33, 33))
+        self.assertEqual(many, few)
+
+    def test_fhir_attachments_carry_notes_and_content_types(self):
+        record, bare = create_records(self.patient, self.doctor, 2, ipfs_cid='bafy-document')
+        record.notes = 'Follow up in two weeks'
+        record.document.name = 'medical_documents/scan.pdf'
+        record.save()
+
+        notes, document = record_to_fhir(record)['content']
+        self.assertEqual(base64.b64decode(notes['attachment']['data']).decode(), 'Follow up in two weeks')
+        self.assertNotIn('Follow up', notes['attachment']['title'])
+        self.assertEqual(document['attachment']['contentType'], 'application/pdf')
+        self.assertEqual(record_to_fhir(bare)['content'][1]['attachment']['contentType'], 'application/octet-stream')
+
+
+class BulkImportTests(TestCase):
+
+    def setUp(self):
+        self.doctor = create_doctor()
+        self.patients = [create_patient(), create_patient('second@example.com')]
+        for patient in self.patients:
+            AccessRequest.objects.create(patient=patient, doctor=self.doctor, status='APPROVED')
+        self.stranger = create_patient('stranger@example.com')
+        self.client = api_client(self.doctor)
+
+    def rows(self, count, **fields):
+        return [{
+            'patient_health_id': self.patients[index % 2].health_id,
+            'record_type': 'lab',
+            'diagnosis': f'Result {index}',
+            'notes': 'Within range',
+            **fields,
+        } for index in range(count)]
+
+    def post(self, rows):
+        return self.client.post('/api/records/bulk/', {'records': rows}, format='json')
+
+    def test_any_bad_row_creates_nothing_and_is_reported_by_index(self):
+        rows = self.rows(4)
+        rows[1]['record_type'] = 'horoscope'
+        rows[3]['patient_health_id'] = 'HID-0000-0000'
+        response = self.post(rows)
+
+        self.assertEqual(response.status_code, 400)
+        body = response.json()
+        self.assertEqual((body['created'], body['failed']), (0, 2))
+        self.assertEqual([result['status'] for result in body['results']], ['skipped', 'error', 'skipped', 'error'])
+        self.assertEqual([result['index'] for result in body['results']], [0, 1, 2, 3])
+        self.assertIn('record_type', body['results'][1]['errors'])
+        self.assertIn('patient_health_id', body['results'][3]['errors'])
+        self.assertFalse(MedicalRecord.objects.exists())
+        self.assertFalse(IPFSPinJob.objects.exists())
+
+    def test_rows_for_patients_without_a_live_grant_are_rejected(self):
+        expired = create_patient('expired@example.com')
+        AccessRequest.objects.create(
+            patient=expired, doctor=self.doctor, status='APPROVED',
+            expires_at=timezone.now() - timedelta(days=1)
+        )
+        rows = self.rows(1)
+        rows.append({**rows[0], 'patient_health_id': self.stranger.health_id})
+        rows.append({**rows[0], 'patient_health_id': expired.health_id})
+        results = self.post(rows).json()['results']
+
+        self.assertEqual([result['status'] for result in results], ['skipped', 'error', 'error'])
+        for result in results[1:]:
+            self.assertEqual(result['errors'], {'patient_health_id': ["You do not have access to this patient's records."]})
+
+    def test_valid_batch_is_created_with_pin_jobs_and_stats(self):
+        response = self.post(self.rows(5))
+        self.assertEqual(response.status_code, 201)
+        body = response.json()
+        self.assertEqual((body['created'], body['failed']), (5, 0))
+        ids = [result['id'] for result in body['results']]
+        self.assertEqual(MedicalRecord.objects.filter(id__in=ids, doctor=self.doctor).count(), 5)
+        self.assertEqual(IPFSPinJob.objects.filter(record_id__in=ids, status='QUEUED').count(), 5)
+        self.assertEqual(self.patients[0].record_stats.total_records, 3)
+
+    def test_query_count_does_not_grow_with_the_batch(self):
+        def queries_for(count):
+            with CaptureQueriesContext(connection) as queries:
+                self.assertEqual(self.post(self.rows(count)).status_code, 201)
+            return len(queries)
+
+        self.post(self.rows(1))  # Loads the doctor's profile and stats rows once
+        self.assertEqual(queries_for(40), queries_for(4))
+
+
+class PinataStubMixin:
+    """Point ``ipfs_service`` at an in-process Pinata stub for the test class."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.pinata = PinataStubServer(('127.0.0.1', 0))
+        cls.pinata.start_in_thread()
+        cls.addClassCleanup(cls.pinata.server_close)
+        cls.addClassCleanup(cls.pinata.shutdown)
+        patcher = mock.patch.object(ipfs_service, 'base_url', cls.pinata.url)
+        patcher.start()
+        cls.addClassCleanup(patcher.stop)
+
+    def setUp(self):
+        super().setUp()
+        self.pinata.fail_rate = 0.0
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        self.enterContext(override_settings(MEDIA_ROOT=media_root))
+
+
+@override_settings(IPFS_JOB_BACKOFF_SECONDS=60, IPFS_JOB_MAX_BACKOFF_SECONDS=600, IPFS_JOB_LEASE_SECONDS=300)
+class IPFSPinQueueTests(PinataStubMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.records = create_records(create_patient(), create_doctor(), 3)
+        self.jobs = [ipfs_jobs.enqueue_record_pin(record) for record in self.records]
+
+    def test_racing_workers_never_claim_the_same_job(self):
+        rival = []
+        update = QuerySet.update
+
+        def rival_claims_first(queryset, **kwargs):
+            # The other worker claims after this one read its candidates
+            if not rival:
+                rival.append(None)
+                rival.extend(ipfs_jobs.claim_jobs(2))
+            return update(queryset, **kwargs)
+
+        with mock.patch.object(QuerySet, 'update', autospec=True, side_effect=rival_claims_first):
+            mine = ipfs_jobs.claim_jobs(3)
+
+        theirs = {job.pk for job in rival[1:]}
+        self.assertEqual(len(theirs), 2)
+        self.assertEqual({job.pk for job in mine}, {job.pk for job in self.jobs} - theirs)
+        self.assertEqual(set(IPFSPinJob.objects.values_list('status', 'attempts')), {('RUNNING', 1)})
+
+    def test_expired_lease_is_reclaimed(self):
+        first, second = ipfs_jobs.claim_jobs(2)
+        self.assertEqual(ipfs_jobs.claim_jobs(3), [self.jobs[2]])
+
+        # The worker holding ``first`` died; ``second`` is still within its lease
+        IPFSPinJob.objects.filter(pk=first.pk).update(locked_at=timezone.now() - timedelta(seconds=301))
+        reclaimed = ipfs_jobs.claim_jobs(3)
+        self.assertEqual([job.pk for job in reclaimed], [first.pk])
+        self.assertEqual(reclaimed[0].attempts, 2)
+
+    def test_unavailable_pinata_backs_off_exponentially(self):
+        self.pinata.fail_rate = 1.0
+        job = ipfs_jobs.claim_jobs(1)[0]
+        started = timezone.now()
+        self.assertFalse(ipfs_jobs.process_job(job))
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('QUEUED', 1))
+        self.assertIn('Simulated pinning failure', job.last_error)
+        delay = (job.next_attempt_at - started).total_seconds()
+        self.assertTrue(30 <= delay <= 61, delay)
+
+        # Not due again until then; the next failure waits about twice as long
+        IPFSPinJob.objects.exclude(pk=job.pk).delete()
+        self.assertEqual(ipfs_jobs.claim_jobs(1), [])
+        IPFSPinJob.objects.filter(pk=job.pk).update(next_attempt_at=started)
+        job = ipfs_jobs.claim_jobs(1)[0]
+        self.assertFalse(ipfs_jobs.process_job(job))
+        job.refresh_from_db()
+        delay = (job.next_attempt_at - timezone.now()).total_seconds()
+        self.assertTrue(59 <= delay <= 120, delay)
+
+    def test_job_fails_after_max_attempts(self):
+        self.pinata.fail_rate = 1.0
+        IPFSPinJob.objects.update(max_attempts=2)
+        job = self.jobs[0]
+        IPFSPinJob.objects.exclude(pk=job.pk).delete()
+        for _ in range(2):
+            IPFSPinJob.objects.filter(pk=job.pk).update(next_attempt_at=timezone.now())
+            self.assertFalse(ipfs_jobs.process_job(ipfs_jobs.claim_jobs(1)[0]))
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('FAILED', 2))
+        self.assertEqual(ipfs_jobs.claim_jobs(1), [])
+        self.records[0].refresh_from_db()
+        self.assertEqual(self.records[0].ipfs_status, 'failed')
+
+    def test_success_saves_the_cids(self):
+        record = self.records[0]
+        record.document = SimpleUploadedFile('report.pdf', b'lab report', 'application/pdf')
+        record.save()
+        IPFSPinJob.objects.exclude(record=record).delete()
+
+        self.assertTrue(ipfs_jobs.process_job(ipfs_jobs.claim_jobs(1)[0]))
+        record.refresh_from_db()
+        self.assertEqual(record.ipfs_status, 'pinned')
+        self.assertEqual(record.ipfs_cid, cid_for_bytes(b'lab report'))
+        self.assertIn(record.ipfs_metadata_cid, self.pinata.pins)
+        self.assertEqual(IPFSPinJob.objects.get().status, 'DONE')
+
+
+class RunIPFSWorkersTests(PinataStubMixin, TransactionTestCase):
+
+    def test_pool_drains_the_queue_once(self):
+        records = create_records(create_patient(), create_doctor(), 4)
+        for record in records:
+            ipfs_jobs.enqueue_record_pin(record)
+
+        call_command('run_ipfs_workers', '--once', '--threads', '2', stdout=open(os.devnull, 'w'))
+        self.assertEqual(set(IPFSPinJob.objects.values_list('status', flat=True)), {'DONE'})
+        self.assertEqual(MedicalRecord.objects.filter(ipfs_status='pinned').count(), 4)
+
+
+def publish_root(batch):
+    return f'0x{batch.root}'
+
+
+@mock.patch.object(anchoring.ipfs_service, 'upload_json', return_value={'success': True, 'cid': 'bafymanifest'})
+class AnchoringTests(TestCase):
+
+    def setUp(self):
+        self.records = create_records(create_patient(), create_doctor(), 5, ipfs_status='pinned')
+
+    def test_pinned_manifest_is_not_anchored(self, upload_json):
+        totals = anchoring.run_anchoring()
+        self.assertEqual((totals['records'], totals['pinned'], totals['anchored']), (5, 1, 0))
+        batch = AnchorBatch.objects.get()
+        self.assertEqual(batch.status, 'MANIFEST_PINNED')
+        self.assertIsNone(batch.anchored_at)
+        record = self.records[3]
+        self.assertTrue(anchoring.verify_record(record, record.anchor)['verified'])
+
+    @override_settings(ANCHOR_PUBLISHER='records.tests.publish_root')
+    def test_publisher_confirms_anchor(self, upload_json):
+        totals = anchoring.run_anchoring()
+        self.assertEqual(totals['anchored'], 1)
+        batch = AnchorBatch.objects.get()
+        self.assertEqual(batch.status, 'ANCHORED')
+        self.assertEqual(batch.anchor_tx, f'0x{batch.root}')
+        self.assertIsNotNone(batch.anchored_at)
+
+
+class DocumentReferenceTests(TestCase):
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        self.enterContext(override_settings(MEDIA_ROOT=media_root))
+        self.patient = create_patient()
+        self.doctor = create_doctor()
+        AccessRequest.objects.create(patient=self.patient, doctor=self.doctor, status='APPROVED')
+        self.client = api_client(self.doctor)
+
+    def post_record(self, content):
+        return self.client.post('/api/records/', {
+            'patient_health_id': self.patient.health_id,
+            'record_type': 'lab',
+            'diagnosis': 'Diagnosis',
+            'notes': 'Notes',
+            'document': SimpleUploadedFile('report.pdf', content, 'application/pdf'),
+        }, format='multipart')
+
+    def test_failed_insert_releases_the_reference(self):
+        response = self.post_record(b'shared report')
+        self.assertEqual(response.status_code, 201, response.content)
+        with mock.patch('records.ipfs_jobs.enqueue_record_pin', side_effect=RuntimeError('queue down')):
+            with self.assertRaises(RuntimeError):
+                self.post_record(b'shared report')
+            with self.assertRaises(RuntimeError):
+                self.post_record(b'unique report')
+
+        # The shared blob keeps only the saved record's reference; the new one is gone
+        self.assertEqual(list(ContentBlob.objects.values_list('refcount', flat=True)), [1])
+        self.assertEqual(MedicalRecord.objects.count(), 1)
+
+
+@skipUnless(connection.vendor == 'sqlite', 'SQLite full-text index')
+class FullTextIndexTests(TestCase):
+
+    def test_triggers_exist_after_migrations(self):
+        self.assertEqual(checks.missing_fulltext_objects(connection), [])
+        self.assertEqual(checks.check_fulltext_index(None, databases=['default']), [])
+
+    def test_search_uses_the_index(self):
+        patient = create_patient()
+        doctor = create_doctor()
+        records = create_records(patient, doctor, 3)
+        MedicalRecord.objects.filter(pk=records[1].pk).update(diagnosis='Seasonal influenza')
+        results = search_records(doctor.user, 'influ')
+        self.assertEqual([record.pk for record, _ in results], [records[1].pk])
+
+    def test_dropped_trigger_is_reported_and_repaired(self):
+        with connection.cursor() as cursor:
+            cursor.execute('DROP TRIGGER records_medicalrecord_fts_ai')
+        errors = checks.check_fulltext_index(None, databases=['default'])
+        self.assertEqual([error.id for error in errors], ['records.E001'])
+
+        # Rows written meanwhile are picked up by the rebuild
+        record = create_records(create_patient(), create_doctor(), 1)[0]
+        repair_sqlite_index(connection)
+        self.assertEqual(checks.missing_fulltext_objects(connection), [])
+        self.assertEqual([hit.pk for hit, _ in search_records(record.doctor.user, 'Diagnosis')], [record.pk])
@@ -1,14 +1,24 @@
 from django.urls import path
 from .views import (
     MedicalRecordListView,
+    BulkMedicalRecordView,
+    MedicalRecordSearchView,
     MedicalRecordDetailView,
+    RecordAnchorView,
     ToggleVisibilityView,
+    RecordSummaryView,
     PatientRecordsView,
+    PatientRecordsExportView,
 )
 
 urlpatterns = [
     path('records/', MedicalRecordListView.as_view(), name='records_list'),
+    path('records/bulk/', BulkMedicalRecordView.as_view(), name='records_bulk'),
+    path('records/search/', MedicalRecordSearchView.as_view(), name='records_search'),
+    path('records/summary/', RecordSummaryView.as_view(), name='records_summary'),
     path('records/<int:record_id>/', MedicalRecordDetailView.as_view(), name='record_detail'),
+    path('records/<int:record_id>/anchor/', RecordAnchorView.as_view(), name='record_anchor'),
     path('records/<int:record_id>/visibility/', ToggleVisibilityView.as_view(), name='toggle_visibility'),
     path('patients/<str:health_id>/records/', PatientRecordsView.as_view(), name='patient_records'),
+    path('patients/<str:health_id>/export/', PatientRecordsExportView.as_view(), name='patient_records_export'),
 ]
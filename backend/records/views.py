@@ -1,15 +1,28 @@
+from django.conf import settings
+from django.db.models import Count, Max, Q
+from django.http import StreamingHttpResponse
 from rest_framework import status
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 
+from .anchoring import verify_record
+from .bulk import import_records
+from .export import EXPORT_FORMATS, CONTENT_TYPES, export_queryset, iter_export
 from .models import MedicalRecord
+from .pagination import RecordKeysetPagination
+from .search import search_records
 from .serializers import MedicalRecordSerializer, CreateMedicalRecordSerializer
+from users.access import doctor_has_access, doctor_can_view_records
+from users.conditional import page_validators, not_modified, with_validators
 from users.models import PatientProfile
 
+# Serialized records embed doctor and patient fields, so their edits count too
+RECORD_VALIDATOR_FIELDS = ('updated_at', 'doctor__updated_at', 'patient__updated_at')
+
 
 class MedicalRecordListView(APIView):
-    """List and create medical records."""
+    """List (keyset-paginated) and create medical records."""
     permission_classes = [IsAuthenticated]
     
     def get(self, request):
@@ -31,8 +44,19 @@ class MedicalRecordListView(APIView):
                 status=status.HTTP_403_FORBIDDEN
             )
         
-        serializer = MedicalRecordSerializer(records, many=True)
-        return Response(serializer.data)
+        # Join doctor/patient up front so serializing a page stays O(1) queries
+        records = records.select_related('doctor', 'patient')
+        paginator = RecordKeysetPagination()
+        page = paginator.paginate_queryset(records, request, view=self)
+        
+        # Answer revalidations from the page itself, before serializing
+        validators = page_validators(page, *paginator.get_validator_parts(), fields=RECORD_VALIDATOR_FIELDS)
+        cached = not_modified(request, validators)
+        if cached is not None:
+            return cached
+        
+        serializer = MedicalRecordSerializer(page, many=True)
+        return with_validators(paginator.get_paginated_response(serializer.data), validators)
     
     def post(self, request):
         # Only doctors can create records
@@ -46,15 +70,10 @@ class MedicalRecordListView(APIView):
         patient_health_id = request.data.get('patient_health_id')
         if patient_health_id:
             try:
-                from users.models import AccessRequest
                 patient = PatientProfile.objects.get(health_id=patient_health_id)
                 
                 # Check for an approved access request from this patient to this doctor
-                has_access = AccessRequest.objects.filter(
-                    patient=patient,
-                    doctor=request.user.doctor_profile,
-                    status='APPROVED'
-                ).exists()
+                has_access = doctor_has_access(patient.pk, request.user.doctor_profile.pk)
                 
                 if not has_access:
                     return Response(
@@ -77,6 +96,92 @@ class MedicalRecordListView(APIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+class BulkMedicalRecordView(APIView):
+    """Create a batch of records in one request (doctors only).
+    
+    All or nothing: if any row fails, no record is created and the
+    response lists every failing row by its index.
+    """
+    permission_classes = [IsAuthenticated]
+    
+    def post(self, request):
+        if request.user.role != 'DOCTOR':
+            return Response(
+                {"error": "Only doctors can create medical records"}, 
+                status=status.HTTP_403_FORBIDDEN
+            )
+        
+        rows = request.data.get('records') if isinstance(request.data, dict) else request.data
+        if not isinstance(rows, list):
+            return Response(
+                {"error": "Expected a list of records"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if len(rows) > settings.BULK_IMPORT_MAX_ROWS:
+            return Response(
+                {"error": f"At most {settings.BULK_IMPORT_MAX_ROWS} records per request"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        results = import_records(request.user.doctor_profile, rows, all_or_nothing=True)
+        created = sum(1 for result in results if result['status'] == 'created')
+        failed = sum(1 for result in results if result['status'] == 'error')
+        return Response({
+            "created": created,
+            "failed": failed,
+            "results": results
+        }, status=status.HTTP_201_CREATED if created else status.HTTP_400_BAD_REQUEST)
+
+
+class MedicalRecordSearchView(APIView):
+    """Ranked full-text search over diagnosis and notes of accessible records."""
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request):
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return Response(
+                {"error": "Query parameter 'q' is required"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        record_type = request.query_params.get('record_type')
+        if record_type and record_type not in dict(MedicalRecord.RECORD_TYPES):
+            return Response(
+                {"error": f"Unknown record_type '{record_type}'"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        try:
+            limit = min(max(int(request.query_params.get('limit', 20)), 1), settings.SEARCH_MAX_RESULTS)
+            offset = max(int(request.query_params.get('offset', 0)), 0)
+        except ValueError:
+            return Response(
+                {"error": "limit and offset must be integers"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        hits = search_records(
+            request.user,
+            query,
+            record_type=record_type,
+            health_id=request.query_params.get('patient'),
+            limit=limit,
+            offset=offset
+        )
+        results = []
+        for record, rank in hits:
+            data = MedicalRecordSerializer(record).data
+            data['rank'] = rank
+            results.append(data)
+        
+        return Response({
+            "query": query,
+            "results": results,
+            "next_offset": offset + limit if len(hits) == limit else None
+        })
+
+
 class MedicalRecordDetailView(APIView):
     """Get single record details."""
     permission_classes = [IsAuthenticated]
@@ -85,7 +190,7 @@ class MedicalRecordDetailView(APIView):
         user = request.user
         
         try:
-            record = MedicalRecord.objects.get(id=record_id)
+            record = MedicalRecord.objects.select_related('doctor', 'patient').get(id=record_id)
         except MedicalRecord.DoesNotExist:
             return Response(
                 {"error": "Record not found"}, 
@@ -94,14 +199,14 @@ class MedicalRecordDetailView(APIView):
         
         # Check permission
         if user.role == 'PATIENT':
-            if record.patient.user != user:
+            if record.patient.user_id != user.pk:
                 return Response(
                     {"error": "Access denied"}, 
                     status=status.HTTP_403_FORBIDDEN
                 )
         elif user.role == 'DOCTOR':
             # Doctor can view if record is visible or they created it
-            if record.doctor.user != user and not record.is_visible:
+            if record.doctor.user_id != user.pk and not record.is_visible:
                 return Response(
                     {"error": "Access denied"}, 
                     status=status.HTTP_403_FORBIDDEN
@@ -111,6 +216,60 @@ class MedicalRecordDetailView(APIView):
         return Response(serializer.data)
 
 
+class RecordAnchorView(APIView):
+    """Verify a record against its anchored Merkle root (no chain access)."""
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request, record_id):
+        user = request.user
+        
+        try:
+            record = MedicalRecord.objects.select_related(
+                'doctor', 'patient', 'anchor__batch'
+            ).get(id=record_id)
+        except MedicalRecord.DoesNotExist:
+            return Response(
+                {"error": "Record not found"}, 
+                status=status.HTTP_404_NOT_FOUND
+            )
+        
+        # Same rules as the record itself
+        if user.role == 'PATIENT':
+            if record.patient.user_id != user.pk:
+                return Response(
+                    {"error": "Access denied"}, 
+                    status=status.HTTP_403_FORBIDDEN
+                )
+        elif user.role == 'DOCTOR':
+            if record.doctor.user_id != user.pk and not record.is_visible:
+                return Response(
+                    {"error": "Access denied"}, 
+                    status=status.HTTP_403_FORBIDDEN
+                )
+        
+        anchor = getattr(record, 'anchor', None)
+        if anchor is None:
+            return Response(
+                {"error": "Record has not been anchored yet"}, 
+                status=status.HTTP_404_NOT_FOUND
+            )
+        
+        batch = anchor.batch
+        return Response({
+            "id": record.id,
+            **verify_record(record, anchor),
+            "batch": batch.pk,
+            "leaf_index": anchor.leaf_index,
+            "leaf_count": batch.leaf_count,
+            "proof": anchor.proof,
+            "anchor_status": batch.status,
+            "manifest_cid": batch.manifest_cid,
+            "pinned_at": batch.pinned_at,
+            "anchor_tx": batch.anchor_tx,
+            "anchored_at": batch.anchored_at
+        })
+
+
 class ToggleVisibilityView(APIView):
     """Toggle record visibility (patients only)."""
     permission_classes = [IsAuthenticated]
@@ -143,6 +302,63 @@ class ToggleVisibilityView(APIView):
         })
 
 
+class RecordSummaryView(APIView):
+    """Record counts grouped per counterpart: patients for a doctor, doctors for a patient."""
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request):
+        user = request.user
+        
+        # One row per counterpart, so dashboards never page through every record
+        if user.role == 'DOCTOR':
+            summary = MedicalRecord.objects.filter(
+                doctor=user.doctor_profile
+            ).values(
+                'patient__health_id', 'patient__first_name', 'patient__last_name'
+            ).annotate(
+                record_count=Count('id'),
+                last_record_at=Max('created_at')
+            ).order_by('-last_record_at')
+            
+            return Response([
+                {
+                    "health_id": row['patient__health_id'],
+                    "name": f"{row['patient__first_name']} {row['patient__last_name']}",
+                    "record_count": row['record_count'],
+                    "last_record_at": row['last_record_at']
+                }
+                for row in summary
+            ])
+            
+        elif user.role == 'PATIENT':
+            summary = MedicalRecord.objects.filter(
+                patient=user.patient_profile
+            ).values(
+                'doctor__doctor_id', 'doctor__first_name', 'doctor__last_name',
+                'doctor__specialization', 'doctor__hospital'
+            ).annotate(
+                record_count=Count('id'),
+                last_record_at=Max('created_at')
+            ).order_by('-last_record_at')
+            
+            return Response([
+                {
+                    "doctor_id": row['doctor__doctor_id'],
+                    "name": f"{row['doctor__first_name']} {row['doctor__last_name']}",
+                    "specialization": row['doctor__specialization'],
+                    "hospital": row['doctor__hospital'],
+                    "record_count": row['record_count'],
+                    "last_record_at": row['last_record_at']
+                }
+                for row in summary
+            ])
+        
+        return Response(
+            {"error": "Invalid user role"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+
 class PatientRecordsView(APIView):
     """View patient records by health ID (doctors only)."""
     permission_classes = [IsAuthenticated]
@@ -162,40 +378,88 @@ class PatientRecordsView(APIView):
                 status=status.HTTP_404_NOT_FOUND
             )
         
-        # Check if patient has granted access to this doctor
-        from users.models import AccessRequest
-        has_explicit_access = AccessRequest.objects.filter(
-            patient=patient,
-            doctor=request.user.doctor_profile,
-            status='APPROVED'
-        ).exists()
-        
-        # Also allow if doctor has created records for this patient (legacy access)
-        has_record_access = MedicalRecord.objects.filter(
-            patient=patient,
-            doctor=request.user.doctor_profile
-        ).exists()
+        doctor = request.user.doctor_profile
         
-        if not has_explicit_access and not has_record_access:
+        # Patient must have granted access, or the doctor has created
+        # records for them (legacy access); decisions are cached
+        if not doctor_can_view_records(patient.pk, doctor.pk):
             return Response(
                 {"error": "You do not have access to this patient's records. The patient must grant you access first."},
                 status=status.HTTP_403_FORBIDDEN
             )
         
-        # Show all visible records plus ones created by this doctor
-        all_records = MedicalRecord.objects.filter(patient=patient)
-        visible_records = [
-            r for r in all_records 
-            if r.is_visible or r.doctor == request.user.doctor_profile
-        ]
+        # Show all visible records plus ones created by this doctor,
+        # filtered in SQL and served one keyset page at a time
+        records = MedicalRecord.objects.filter(
+            Q(is_visible=True) | Q(doctor=doctor),
+            patient=patient
+        )
+        paginator = RecordKeysetPagination()
+        page = paginator.paginate_queryset(records.select_related('doctor', 'patient'), request, view=self)
         
-        serializer = MedicalRecordSerializer(visible_records, many=True)
-        return Response({
+        validators = page_validators(
+            page,
+            patient.updated_at,
+            *paginator.get_validator_parts(),
+            fields=RECORD_VALIDATOR_FIELDS
+        )
+        cached = not_modified(request, validators)
+        if cached is not None:
+            return cached
+        
+        serializer = MedicalRecordSerializer(page, many=True)
+        return with_validators(Response({
             "patient": {
                 "health_id": patient.health_id,
                 "name": patient.full_name,
                 "age": patient.age
             },
-            "records": serializer.data
-        })
+            "records": serializer.data,
+            "next": paginator.get_next_link(),
+            "next_cursor": paginator.next_cursor
+        }), validators)
 
+
+
+class PatientRecordsExportView(APIView):
+    """Stream a patient's full record history as NDJSON or a FHIR Bundle.
+    
+    Patients may export their own history; doctors with access get the
+    same visible-plus-authored set as ``PatientRecordsView``.
+    """
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request, health_id):
+        export_format = request.query_params.get('output', 'ndjson')
+        if export_format not in EXPORT_FORMATS:
+            return Response(
+                {"error": f"output must be one of: {', '.join(EXPORT_FORMATS)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        try:
+            patient = PatientProfile.objects.get(health_id=health_id)
+        except PatientProfile.DoesNotExist:
+            return Response(
+                {"error": "Patient not found"}, 
+                status=status.HTTP_404_NOT_FOUND
+            )
+        
+        user = request.user
+        if user.role == 'PATIENT' and patient.user_id == user.id:
+            records = export_queryset(patient)
+        elif user.role == 'DOCTOR' and doctor_can_view_records(patient.pk, user.doctor_profile.pk):
+            records = export_queryset(patient, doctor=user.doctor_profile)
+        else:
+            return Response(
+                {"error": "You do not have access to this patient's records."},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        
+        extension = 'json' if export_format == 'fhir' else 'ndjson'
+        response = StreamingHttpResponse(
+            iter_export(records, export_format),
+            content_type=CONTENT_TYPES[export_format]
+        )
+        response['Content-Disposition'] = f'attachment; filename="{patient.health_id}-records.{extension}"'
+        return response
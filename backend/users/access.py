@@ -0,0 +1,151 @@
+"""
+Cached doctor -> patient access decisions.
+
+Record views ask "may doctor D act on patient P's records" on every
+request. Decisions are cached per ``(patient_id, doctor_id)`` in two
+layers: a short-lived in-process ``TTLCache`` and the shared Django cache
+(``CACHES['default']``). Signal handlers in ``users.signals`` and
+``records.signals`` invalidate both layers whenever an ``AccessRequest``
+or the pair's first record changes, and an approved grant with an
+``expires_at`` is never cached past its expiry.
+
+Invalidation runs once the writing transaction commits. Until then, other
+connections still read the old row, so invalidating earlier lets a
+concurrent miss re-cache the old decision. A load that overlaps the
+commit can still finish afterwards and write what it read. So shared
+entries are keyed by a per-pair version that invalidation bumps: a late
+write lands under the old version, which nobody reads any more. In-process,
+a load that overlapped an invalidation of the same pair is returned but not
+cached; loads of other pairs are unaffected.
+"""
+
+import threading
+import time
+from collections import namedtuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.utils import timezone
+
+from .cache import TTLCache
+
+AccessDecision = namedtuple('AccessDecision', ['approved', 'authored', 'expires_at'])
+
+_local_cache = TTLCache(maxsize=getattr(settings, 'ACCESS_CACHE_LOCAL_SIZE', 10000))
+
+# Pairs being loaded in this process -> whether they were invalidated meanwhile.
+# TTLCache runs one load per key at a time, so one flag per pair is enough.
+_loading = {}
+_loading_lock = threading.Lock()
+
+
+def _cache_key(patient_id, doctor_id):
+    return f"access:{patient_id}:{doctor_id}"
+
+
+def _version_key(patient_id, doctor_id):
+    return f"access:{patient_id}:{doctor_id}:version"
+
+
+def _shared_version(patient_id, doctor_id):
+    """The pair's current version in the shared cache, created if missing."""
+    key = _version_key(patient_id, doctor_id)
+    version = cache.get(key)
+    if version is None:
+        # A clock value, so a version lost to eviction never comes back
+        cache.add(key, time.time_ns(), None)
+        version = cache.get(key)
+    return version
+
+
+def _ttl(decision, limit):
+    """Seconds a decision may be cached, capped at the grant's expiry."""
+    if decision.approved and decision.expires_at is not None:
+        remaining = (decision.expires_at - timezone.now()).total_seconds()
+        return max(0, min(limit, int(remaining)))
+    return limit
+
+
+def _load_decision(patient_id, doctor_id):
+    from .models import AccessRequest
+    from records.models import MedicalRecord
+
+    # Read from the primary: a lagging replica could re-cache a decision
+    # that was just invalidated
+    grant = AccessRequest.objects.using(DEFAULT_DB_ALIAS).filter(
+        patient_id=patient_id,
+        doctor_id=doctor_id,
+        status='APPROVED'
+    ).values('expires_at').first()
+    expires_at = grant['expires_at'] if grant else None
+    approved = grant is not None and (expires_at is None or expires_at > timezone.now())
+
+    # Legacy access: doctors keep access to patients they created records for
+    authored = MedicalRecord.objects.using(DEFAULT_DB_ALIAS).filter(
+        patient_id=patient_id,
+        doctor_id=doctor_id
+    ).exists()
+    return AccessDecision(approved, authored, expires_at)
+
+
+def get_access_decision(patient_id, doctor_id):
+    """Return the ``AccessDecision`` for a pair, consulting both cache layers."""
+    key = _cache_key(patient_id, doctor_id)
+
+    def load():
+        with _loading_lock:
+            _loading[key] = False
+        try:
+            shared_key = f"{key}:v{_shared_version(patient_id, doctor_id)}"
+            decision = cache.get(shared_key)
+            if decision is not None:
+                return decision
+            decision = _load_decision(patient_id, doctor_id)
+            ttl = _ttl(decision, getattr(settings, 'ACCESS_CACHE_SHARED_TTL', 300))
+            if ttl:
+                cache.set(shared_key, decision, ttl)
+            return decision
+        except Exception:
+            with _loading_lock:
+                _loading.pop(key, None)
+            raise
+
+    def local_ttl(decision):
+        with _loading_lock:
+            if _loading.pop(key, False):
+                return 0  # May predate an invalidation that ran during the load
+        return _ttl(decision, getattr(settings, 'ACCESS_CACHE_LOCAL_TTL', 5))
+
+    return _local_cache.get_or_load(key, load, ttl=local_ttl)
+
+
+def doctor_has_access(patient_id, doctor_id):
+    """True if the patient has an unexpired APPROVED grant for the doctor."""
+    return get_access_decision(patient_id, doctor_id).approved
+
+
+def doctor_can_view_records(patient_id, doctor_id):
+    """True if the doctor holds a grant or has authored records for the patient."""
+    decision = get_access_decision(patient_id, doctor_id)
+    return decision.approved or decision.authored
+
+
+def invalidate_access(patient_id, doctor_id):
+    """Drop a cached decision from both layers."""
+    key = _cache_key(patient_id, doctor_id)
+    with _loading_lock:
+        if key in _loading:
+            _loading[key] = True
+    _local_cache.delete(key)
+    version_key = _version_key(patient_id, doctor_id)
+    try:
+        cache.incr(version_key)
+    except ValueError:
+        # Never read or evicted; a fresh clock value is a new version too
+        cache.set(version_key, time.time_ns(), None)
+
+
+def invalidate_access_on_commit(patient_id, doctor_id, using=None):
+    """``invalidate_access`` once the current transaction commits (now outside one)."""
+    transaction.on_commit(lambda: invalidate_access(patient_id, doctor_id), using=using)
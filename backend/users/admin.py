@@ -1,6 +1,9 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
-from .models import User, PatientProfile, DoctorProfile
+from django.http import FileResponse, Http404
+from django.urls import path, reverse
+from django.utils.html import format_html, format_html_join
+from .models import User, PatientProfile, DoctorProfile, ContentBlob, RequestProfile
 
 
 @admin.register(User)
@@ -34,3 +37,63 @@ class DoctorProfileAdmin(admin.ModelAdmin):
     list_display = ('doctor_id', 'first_name', 'last_name', 'specialization', 'is_verified')
     search_fields = ('doctor_id', 'first_name', 'last_name', 'medical_license')
     list_filter = ('is_verified', 'specialization')
+
+
+@admin.register(ContentBlob)
+class ContentBlobAdmin(admin.ModelAdmin):
+    list_display = ('sha256', 'path', 'size', 'cid', 'refcount', 'created_at')
+    search_fields = ('sha256', 'cid', 'path')
+    readonly_fields = ('created_at', 'updated_at')
+
+
+@admin.register(RequestProfile)
+class RequestProfileAdmin(admin.ModelAdmin):
+    list_display = ('created_at', 'method', 'path', 'user_email', 'status_code', 'duration_ms', 'queries', 'downloads')
+    list_filter = ('method', 'mode', 'status_code')
+    search_fields = ('path', 'user_email')
+    fields = (
+        'created_at', 'method', 'path', 'user_email', 'mode', 'status_code',
+        'duration_ms', 'queries', 'samples', 'downloads', 'summary_display'
+    )
+    readonly_fields = fields
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+    
+    def get_urls(self):
+        return [
+            path(
+                '<int:pk>/download/<str:kind>/',
+                self.admin_site.admin_view(self.download),
+                name='users_requestprofile_download'
+            ),
+        ] + super().get_urls()
+    
+    def download(self, request, pk, kind):
+        profile = RequestProfile.objects.filter(pk=pk).first()
+        if profile is None or kind not in ('pstats', 'collapsed') or not self.has_view_permission(request, profile):
+            raise Http404
+        file_path = profile.file_path(kind)
+        if file_path is None or not file_path.exists():
+            raise Http404
+        return FileResponse(open(file_path, 'rb'), as_attachment=True, filename=file_path.name)
+    
+    @admin.display(description='Files')
+    def downloads(self, obj):
+        links = [
+            (reverse('admin:users_requestprofile_download', args=[obj.pk, kind]), kind)
+            for kind in ('pstats', 'collapsed') if obj.file_path(kind) is not None
+        ]
+        return format_html_join(' ', '<a href="{}">{}</a>', links)
+    
+    @admin.display(description='Top functions')
+    def summary_display(self, obj):
+        return format_html('<pre>{}</pre>', obj.summary or 'Sampling only; download the collapsed stacks.')
+    
+    def delete_queryset(self, request, queryset):
+        # One by one, so each profile's files go too
+        for profile in queryset:
+            profile.delete()
@@ -0,0 +1,215 @@
+"""
+Claims-based JWT authentication without per-request user queries.
+
+Access tokens carry the user's role, email and profile primary key (see
+``CustomTokenObtainPairSerializer.get_token``). ``ClaimsJWTAuthentication``
+turns them into a ``ClaimsUser`` principal instead of loading the ``User``
+row, and ``user.patient_profile``/``user.doctor_profile`` become deferred
+instances that know only their keys, so filtering by them costs nothing.
+Reading any other profile field loads the whole row once.
+
+A ``ClaimsUser`` answers only ``CLAIM_FIELDS``; anything else (``phone``,
+``blockchain_id``, ...) raises ``AttributeError`` rather than quietly
+querying. Views that need such columns load the row explicitly through
+``request.user.user``, or read them from the profile's ``user``.
+
+What cannot live in a signed token -- whether the account is still active,
+still has the same role, or changed its password since the token was
+issued -- is checked against a small ``AuthState`` cached per user. The
+state sits behind a short per-process ``TTLCache`` and the shared Django
+cache, and ``users.signals`` drops it whenever the ``User`` row is saved
+or deleted.
+
+Tokens issued before these claims existed fall back to the regular
+database lookup until they expire.
+"""
+
+from collections import namedtuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.utils.functional import cached_property
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from .cache import TTLCache
+
+PROFILE_ID_CLAIM = 'profile_id'
+
+# What a ClaimsUser answers without touching the users table
+CLAIM_FIELDS = (
+    'id', 'pk', 'role', 'email', 'patient_profile', 'doctor_profile',
+    'is_active', 'is_staff', 'is_superuser', 'is_authenticated', 'is_anonymous',
+)
+
+AuthState = namedtuple('AuthState', ['is_active', 'is_staff', 'is_superuser', 'role', 'password_hash'])
+
+_local_cache = TTLCache(maxsize=getattr(settings, 'AUTH_STATE_LOCAL_SIZE', 10000))
+
+
+def _cache_key(user_id):
+    return f"auth:user:{user_id}"
+
+
+def _load_state(user_id):
+    from .models import User
+
+    # Primary, not a replica: deactivation must not be undone by lag
+    row = User.objects.using(DEFAULT_DB_ALIAS).filter(pk=user_id).values(
+        'is_active', 'is_staff', 'is_superuser', 'role', 'password'
+    ).first()
+    if row is None:
+        return None
+    return AuthState(
+        row['is_active'], row['is_staff'], row['is_superuser'], row['role'],
+        get_md5_hash_password(row['password'])
+    )
+
+
+def get_auth_state(user_id):
+    """
+    Return the cached ``AuthState`` for a user, or None if the user is gone.
+
+    Missing users are cached too (as ``False``) so a deleted account's
+    tokens don't hit the database on every request.
+    """
+    key = _cache_key(user_id)
+
+    def load():
+        state = cache.get(key)
+        if state is None:
+            state = _load_state(user_id) or False
+            cache.set(key, state, getattr(settings, 'AUTH_STATE_SHARED_TTL', 60))
+        return state
+
+    return _local_cache.get_or_load(
+        key,
+        load,
+        ttl=getattr(settings, 'AUTH_STATE_LOCAL_TTL', 5)
+    ) or None
+
+
+def invalidate_auth_state(user_id):
+    """Drop a user's cached state from both cache layers."""
+    key = _cache_key(user_id)
+    _local_cache.delete(key)
+    cache.delete(key)
+
+
+def lazy_instance(model, pk, **known):
+    """
+    A model instance that knows only its primary key (and ``known`` columns).
+
+    Every other field is deferred; ``ProfileModel.refresh_from_db`` loads
+    all of them together on first access.
+    """
+    names = ['id', *known]
+    return model.from_db(None, names, [pk, *known.values()])
+
+
+class ClaimsUser(TokenUser):
+    """Request principal built from validated token claims and ``AuthState``."""
+
+    def __init__(self, token, state):
+        super().__init__(token)
+        self.state = state
+
+    def __str__(self):
+        return self.email or super().__str__()
+
+    @cached_property
+    def id(self):
+        # Tokens carry the id as a string; compare equal to user_id columns
+        from .models import User
+        return User._meta.pk.to_python(self.token[api_settings.USER_ID_CLAIM])
+
+    @cached_property
+    def role(self):
+        return self.token['role']
+
+    @cached_property
+    def email(self):
+        return self.token.get('email', '')
+
+    @property
+    def is_active(self):
+        return self.state.is_active
+
+    @property
+    def is_staff(self):
+        return self.state.is_staff
+
+    @property
+    def is_superuser(self):
+        return self.state.is_superuser
+
+    def _profile(self, role, model, accessor):
+        profile_id = self.token.get(PROFILE_ID_CLAIM)
+        if self.role != role or profile_id is None:
+            # Same exception a real User raises, so hasattr() keeps working
+            from .models import User
+            raise getattr(User, accessor).RelatedObjectDoesNotExist(f"User has no {accessor}.")
+        return lazy_instance(model, profile_id, user_id=self.id)
+
+    @cached_property
+    def patient_profile(self):
+        from .models import PatientProfile
+        return self._profile('PATIENT', PatientProfile, 'patient_profile')
+
+    @cached_property
+    def doctor_profile(self):
+        from .models import DoctorProfile
+        return self._profile('DOCTOR', DoctorProfile, 'doctor_profile')
+
+    @cached_property
+    def user(self):
+        """The full ``User`` row, for the rare view that needs more than claims."""
+        from .models import User
+        return User.objects.get(pk=self.id)
+
+    def __getattr__(self, attr):
+        # TokenUser would answer any claim, or None; only CLAIM_FIELDS are supported
+        raise AttributeError(
+            f"'{type(self).__name__}' has no attribute '{attr}'; "
+            f"it answers only {', '.join(CLAIM_FIELDS)}. Load the row with .user for other columns."
+        )
+
+    def __eq__(self, other):
+        if isinstance(other, TokenUser) or hasattr(other, '_meta'):
+            return self.pk == other.pk
+        return NotImplemented
+
+    def __hash__(self):
+        return hash(self.id)
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    """``JWTAuthentication`` that trusts token claims plus a cached ``AuthState``."""
+
+    def get_user(self, validated_token):
+        required = ('role', PROFILE_ID_CLAIM, api_settings.REVOKE_TOKEN_CLAIM)
+        if any(claim not in validated_token for claim in required):
+            # Issued before claims-based auth; look the user up as before
+            return super().get_user(validated_token)
+
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError as exc:
+            raise InvalidToken(_("Token contained no recognizable user identification")) from exc
+
+        state = get_auth_state(user_id)
+        if state is None:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+        if api_settings.CHECK_USER_IS_ACTIVE and not state.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        if validated_token[api_settings.REVOKE_TOKEN_CLAIM] != state.password_hash:
+            raise AuthenticationFailed(_("The user's password has been changed."), code="password_changed")
+        if validated_token['role'] != state.role:
+            raise AuthenticationFailed(_("The user's role has changed."), code="role_changed")
+
+        return ClaimsUser(validated_token, state)
@@ -0,0 +1,100 @@
+"""
+Set-based onboarding of many patients at once.
+
+A batch costs a fixed number of queries regardless of its size: one to
+find emails that are already registered, two to reserve health IDs (see
+``users.identifiers``), one ``bulk_create`` for the users and one for
+their profiles, all in a single transaction. Password hashing dominates the cost, so the
+caller can pass ``hash_passwords`` to spread it over a process pool.
+"""
+
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.utils import timezone
+
+from .ipfs_service import generate_blockchain_id
+from .identifiers import allocate_many
+from .models import User, PatientProfile
+from .serializers import BulkPatientRowSerializer
+
+
+def hash_serially(passwords):
+    return [make_password(password) for password in passwords]
+
+
+def register_patients(rows, hash_passwords=None, batch_size=1000):
+    """
+    Validate and create a batch of patient accounts with profiles.
+
+    Args:
+        rows: List of dicts with email, password, first_name, last_name and
+            optionally age and phone
+        hash_passwords: Callable mapping a list of raw passwords to a list
+            of hashes (defaults to hashing in this process)
+        batch_size: ``bulk_create`` batch size
+
+    Returns:
+        list: One result per row, in order: ``{'index', 'status': 'created',
+            'email', 'health_id'}`` or ``{'index', 'status': 'error', 'errors'}``
+    """
+    hash_passwords = hash_passwords or hash_serially
+    results = [None] * len(rows)
+    valid = []
+    seen = set()
+    for index, row in enumerate(rows):
+        serializer = BulkPatientRowSerializer(data=row)
+        if not serializer.is_valid():
+            results[index] = {'index': index, 'status': 'error', 'errors': serializer.errors}
+        elif serializer.validated_data['email'] in seen:
+            results[index] = {'index': index, 'status': 'error',
+                              'errors': {'email': ["Duplicate email in this batch."]}}
+        else:
+            seen.add(serializer.validated_data['email'])
+            valid.append((index, serializer.validated_data))
+
+    registered = set(
+        User.objects.filter(email__in=seen).values_list('email', flat=True)
+    )
+    to_create = []
+    for index, data in valid:
+        if data['email'] in registered:
+            results[index] = {'index': index, 'status': 'error',
+                              'errors': {'email': ["Email already registered."]}}
+        else:
+            to_create.append((index, data))
+
+    if not to_create:
+        return results
+
+    hashes = hash_passwords([data['password'] for _, data in to_create])
+    joined = timezone.now()
+    users = [
+        User(
+            email=data['email'],
+            password=password_hash,
+            role='PATIENT',
+            phone=data.get('phone', ''),
+            date_joined=joined,
+            blockchain_id=generate_blockchain_id(data['email'], joined)
+        )
+        for (_, data), password_hash in zip(to_create, hashes)
+    ]
+    health_ids = allocate_many('health_id', len(users))
+
+    with transaction.atomic():
+        users = User.objects.bulk_create(users, batch_size=batch_size)
+        profiles = PatientProfile.objects.bulk_create([
+            PatientProfile(
+                user=user,
+                first_name=data['first_name'],
+                last_name=data['last_name'],
+                age=data.get('age'),
+                health_id=health_id
+            )
+            for user, (_, data), health_id in zip(users, to_create, health_ids)
+        ], batch_size=batch_size)
+
+    for (index, data), profile in zip(to_create, profiles):
+        results[index] = {'index': index, 'status': 'created',
+                          'email': data['email'], 'health_id': profile.health_id}
+    return results
@@ -0,0 +1,113 @@
+"""
+In-process caching helpers.
+
+``TTLCache`` is a bounded LRU map whose entries expire after a per-entry
+TTL. ``get_or_load`` adds request coalescing ("single-flight"): when many
+threads miss on the same key at once, only one runs the loader and the
+rest wait for and share its result.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+_MISSING = object()
+
+
+class _Flight:
+    """A load in progress that other threads can wait on."""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class TTLCache:
+    """Thread-safe bounded LRU cache with per-entry expiry."""
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self._in_flight = {}
+
+    def __len__(self):
+        return len(self._data)
+
+    def _get_locked(self, key):
+        entry = self._data.get(key)
+        if entry is None:
+            return _MISSING
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._data[key]
+            return _MISSING
+        self._data.move_to_end(key)
+        return value
+
+    def get(self, key, default=None):
+        with self._lock:
+            value = self._get_locked(key)
+        return default if value is _MISSING else value
+
+    def set(self, key, value, ttl):
+        """Store ``value`` for ``ttl`` seconds; a non-positive TTL skips caching."""
+        if ttl is None or ttl <= 0:
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def get_or_load(self, key, loader, ttl):
+        """
+        Return the cached value for ``key``, loading it at most once at a time.
+
+        Args:
+            key: Cache key
+            loader: Zero-argument callable producing the value on a miss
+            ttl: Seconds to keep the value, or a callable mapping the loaded
+                value to seconds (so outcomes can be cached differently)
+
+        Returns:
+            The cached or freshly loaded value. If the loader raises, every
+            thread waiting on that load sees the same exception.
+        """
+        with self._lock:
+            value = self._get_locked(key)
+            if value is not _MISSING:
+                return value
+            flight = self._in_flight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._in_flight[key] = _Flight()
+
+        if not leader:
+            flight.event.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            value = loader()
+        except Exception as exc:
+            flight.error = exc
+            raise
+        else:
+            flight.value = value
+            self.set(key, value, ttl(value) if callable(ttl) else ttl)
+            return value
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+            flight.event.set()
@@ -0,0 +1,116 @@
+"""
+Cheap HTTP validators for conditional GETs.
+
+List and profile endpoints are re-fetched on every frontend navigation.
+Instead of serializing the body and hashing it, validators are derived
+from what already changes whenever the payload does: ``max(updated_at)``
+over the rows (and the related rows whose fields are embedded in the
+payload) plus the row count, which catches deletions. When the client's
+``If-None-Match``/``If-Modified-Since`` still matches, the view returns
+``304 Not Modified`` before any serializer runs.
+
+Cursor-paginated lists use ``page_validators`` instead: the page has to be
+fetched either way, so its own rows (ids and stamps) plus the cursor and
+page size identify the representation without aggregating the whole set.
+"""
+
+import hashlib
+from collections import namedtuple
+
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
+
+Validators = namedtuple('Validators', ['etag', 'last_modified'])
+
+
+def make_validators(last_modified, *parts):
+    """
+    Build a weak ETag from arbitrary parts and pair it with a timestamp.
+
+    Args:
+        last_modified: Latest modification time (datetime or None)
+        *parts: Anything else the representation depends on
+
+    Returns:
+        Validators: (quoted weak ETag, Unix timestamp or None)
+    """
+    digest = hashlib.sha1(repr((last_modified, parts)).encode()).hexdigest()[:32]
+    timestamp = int(last_modified.timestamp()) if last_modified else None
+    return Validators(f'W/"{digest}"', timestamp)
+
+
+def queryset_validators(queryset, *parts, fields=('updated_at',)):
+    """
+    Validators for a collection from one aggregate query.
+
+    Args:
+        queryset: The rows the response is built from (before pagination)
+        *parts: Extra values the representation depends on
+        fields: ``updated_at`` lookups to take the max of, e.g.
+            ``('updated_at', 'doctor__updated_at')`` when doctor fields are
+            embedded in each item
+
+    Returns:
+        Validators
+    """
+    aggregates = {f"max_{index}": Max(field) for index, field in enumerate(fields)}
+    values = queryset.order_by().aggregate(count=Count('pk'), **aggregates)
+    stamps = [values[key] for key in aggregates if values[key] is not None]
+    return make_validators(max(stamps, default=None), values['count'], *parts)
+
+
+def page_validators(rows, *parts, fields=('updated_at',)):
+    """
+    Validators for one page of a collection, from rows already fetched.
+
+    Costs no queries beyond the page itself, so revalidating page N of a
+    long list stays O(page) instead of scanning every row on each request.
+
+    Args:
+        rows: The model instances on the page (related rows already joined)
+        *parts: Extra values the representation depends on, e.g. the
+            cursor, page size and next cursor
+        fields: ``updated_at`` lookups to take the max of, using the same
+            ``__`` paths as ``queryset_validators``
+
+    Returns:
+        Validators
+    """
+    stamps = []
+    for row in rows:
+        for field in fields:
+            value = row
+            for name in field.split('__'):
+                value = getattr(value, name)
+            stamps.append(value)
+    # Row ids catch inserts and deletes inside the page window
+    last_modified = max(stamps, default=None)
+    return make_validators(last_modified, [row.pk for row in rows], stamps, *parts)
+
+
+def not_modified(request, validators):
+    """Return a ``304`` response if the client's copy is current, else None."""
+    response = get_conditional_response(
+        request,
+        etag=validators.etag,
+        last_modified=validators.last_modified
+    )
+    if response is not None:
+        _patch(response, validators)
+    return response
+
+
+def with_validators(response, validators):
+    """Attach ``ETag``/``Last-Modified`` to a full response."""
+    _patch(response, validators)
+    return response
+
+
+def _patch(response, validators):
+    response['ETag'] = validators.etag
+    if validators.last_modified is not None:
+        response['Last-Modified'] = http_date(validators.last_modified)
+    # Per-user data: browsers may keep it but must revalidate every time
+    patch_cache_control(response, private=True, no_cache=True)
+    patch_vary_headers(response, ['Authorization'])
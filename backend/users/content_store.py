@@ -0,0 +1,147 @@
+"""
+Content-addressed storage of uploaded documents and certificates.
+
+An upload is read exactly once, in fixed-size chunks. Each chunk is fed to
+a SHA-256 digest on its way into storage, so the content hash costs no
+extra read and peak memory stays bounded by ``DOCUMENT_CHUNK_SIZE``.
+
+The hash is then looked up in ``ContentBlob``: if the same bytes were
+stored before, the fresh copy is discarded and the existing file (and its
+IPFS CID, if already pinned) is reused with its refcount bumped. Releasing
+the last reference deletes the file and unpins the CID.
+"""
+
+import hashlib
+import logging
+
+from django.conf import settings
+from django.core.files import File
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from .ipfs_service import ipfs_service
+from .models import ContentBlob
+
+logger = logging.getLogger(__name__)
+
+
+class HashingFile(File):
+    """File proxy that hashes and measures content as storage reads it."""
+
+    def __init__(self, file, name=None, chunk_size=None):
+        super().__init__(file, name or getattr(file, 'name', None))
+        self.chunk_size = chunk_size or settings.DOCUMENT_CHUNK_SIZE
+        self.sha256 = hashlib.sha256()
+        self.bytes_read = 0
+
+    def chunks(self, chunk_size=None):
+        chunk_size = chunk_size or self.chunk_size
+        if hasattr(self.file, 'chunks'):
+            source = self.file.chunks(chunk_size)
+        else:
+            source = super().chunks(chunk_size)
+        for chunk in source:
+            self.sha256.update(chunk)
+            self.bytes_read += len(chunk)
+            yield chunk
+
+    @property
+    def hexdigest(self):
+        return self.sha256.hexdigest()
+
+
+def store_upload(upload, model_field):
+    """
+    Store an upload (or reuse identical stored content) and take a reference.
+
+    Args:
+        upload: The uploaded file (any Django ``File``/``UploadedFile``)
+        model_field: The ``FileField`` the upload belongs to (provides the
+            storage backend and ``upload_to`` naming)
+
+    Returns:
+        ContentBlob: The blob now referenced once more; ``blob.path`` is the
+            storage name to assign to the field
+
+    The reference is taken before the row that will hold it is saved. If
+    that save fails, the caller must ``release`` it.
+    """
+    storage = model_field.storage
+    hashing = HashingFile(upload)
+    name = model_field.generate_filename(None, hashing.name)
+    stored_name = storage.save(name, hashing, max_length=model_field.max_length)
+
+    digest = hashing.hexdigest
+    while True:
+        try:
+            with transaction.atomic():
+                blob = ContentBlob.objects.select_for_update().filter(sha256=digest).first()
+                if blob is None:
+                    blob = ContentBlob.objects.create(
+                        sha256=digest, path=stored_name, size=hashing.bytes_read, refcount=1
+                    )
+                else:
+                    blob.refcount = F('refcount') + 1
+                    blob.save(update_fields=['refcount', 'updated_at'])
+                    blob.refresh_from_db()
+            break
+        except IntegrityError:
+            continue  # An identical upload created the blob first; take a reference
+
+    if blob.path != stored_name:
+        storage.delete(stored_name)
+    return blob
+
+
+def pin_blob(sha256, field_file):
+    """
+    Return the CID for stored content, uploading it only if never pinned.
+
+    ``field_file`` is only opened when the blob has no CID yet (or when
+    there is no blob, e.g. for uploads stored before deduplication).
+
+    Returns:
+        dict: ``upload_file``-style result with 'success' and 'cid'
+    """
+    blob = ContentBlob.objects.filter(sha256=sha256).first() if sha256 else None
+    if blob is not None and blob.cid:
+        return {'success': True, 'cid': blob.cid, 'reused': True}
+
+    with field_file.open('rb') as file:
+        result = ipfs_service.upload_file(file, filename=field_file.name)
+    if result.get('success') and blob is not None:
+        ContentBlob.objects.filter(pk=blob.pk, cid__isnull=True).update(cid=result.get('cid'))
+    return result
+
+
+def release(sha256, storage):
+    """
+    Drop one reference; delete the file and unpin once nothing uses it.
+
+    Cleanup runs after the surrounding transaction commits, and re-checks
+    under lock that identical content was not stored again in between: the
+    file is kept if a new blob points at it, and the CID stays pinned if any
+    blob holds that content.
+    """
+    if not sha256:
+        return
+    with transaction.atomic():
+        blob = ContentBlob.objects.select_for_update().filter(sha256=sha256).first()
+        if blob is None:
+            return
+        if blob.refcount > 1:
+            ContentBlob.objects.filter(pk=blob.pk).update(refcount=F('refcount') - 1)
+            return
+        blob.delete()
+
+    def cleanup():
+        with transaction.atomic():
+            current = ContentBlob.objects.select_for_update().filter(sha256=sha256).first()
+            if current is None or current.path != blob.path:
+                storage.delete(blob.path)
+            if blob.cid and current is None:
+                result = ipfs_service.unpin(blob.cid)
+                if not result.get('success'):
+                    logger.warning("Unpinning %s failed: %s", blob.cid, result.get('error'))
+
+    transaction.on_commit(cleanup)
@@ -0,0 +1,186 @@
+"""
+Collision-free allocation of public health and doctor IDs.
+
+IDs used to be 32 random bits, so collisions became likely past ~50k rows
+and surfaced as ``IntegrityError`` on insert. Now every ID comes from a
+database sequence (``IdentifierSequence``), so uniqueness is guaranteed
+rather than hoped for:
+
+1. A process reserves a block of ``ID_BLOCK_SIZE`` sequence values with one
+   UPDATE and hands them out from memory.
+2. Each value goes through a keyed Feistel permutation, so consecutive
+   registrations get unrelated-looking, non-guessable IDs. Every scheme
+   derives its own key, so a health ID says nothing about the doctor ID
+   with the same sequence value.
+3. A hexadecimal Luhn (mod 16) check digit is appended, so a mistyped ID
+   is recognisable. IDs from the old random generator carry no check
+   digit, so it is only consulted once a lookup has missed, to tell the
+   user their ID was mistyped rather than unknown (``mistyped_id_error``).
+
+With seven payload digits plus the check digit, IDs keep the familiar
+``HID-XXXX-YYYY`` shape for the first 16**7 (~268M) values. After that the
+second group grows by one character per tier (``HID-XXXX-YYYYY``), and
+longer IDs can never equal shorter ones. Each reserved block is checked
+against existing rows once, which also steps around IDs issued by the old
+random generator.
+"""
+
+import hashlib
+import hmac
+import threading
+from collections import deque
+
+from django.conf import settings
+from django.db import connections, router, transaction
+from django.db.models import F
+
+from .models import IdentifierSequence, PatientProfile, DoctorProfile
+
+BASE_DIGITS = 7
+FEISTEL_ROUNDS = 4
+
+SCHEMES = {
+    'health_id': ('HID', PatientProfile, 'health_id'),
+    'doctor_id': ('DOC', DoctorProfile, 'doctor_id'),
+}
+
+
+def _key(prefix):
+    """The permutation key of one scheme (by its prefix, e.g. ``'HID'``)."""
+    secret = getattr(settings, 'ID_PERMUTATION_KEY', '') or f"identifiers:{settings.SECRET_KEY}"
+    return hmac.new(secret.encode(), f"scheme:{prefix}".encode(), hashlib.sha256).digest()
+
+
+def _tier(value):
+    """Split a sequence value into (payload digits, index within that tier)."""
+    digits = BASE_DIGITS
+    while value >= 16 ** digits:
+        value -= 16 ** digits
+        digits += 1
+    return digits, value
+
+
+def permute(index, digits, key):
+    """Keyed bijection on ``[0, 16**digits)``: a balanced Feistel network."""
+    half_bits = 2 * digits
+    mask = (1 << half_bits) - 1
+    left, right = index >> half_bits, index & mask
+    for round_number in range(FEISTEL_ROUNDS):
+        message = f"{digits}:{round_number}:{right}".encode()
+        mixed = int.from_bytes(hmac.new(key, message, hashlib.sha256).digest()[:8], 'big')
+        left, right = right, left ^ (mixed & mask)
+    return (left << half_bits) | right
+
+
+def check_digit(payload):
+    """Luhn mod 16 check character for a hexadecimal payload."""
+    total = 0
+    factor = 2
+    for char in reversed(payload):
+        addend = factor * int(char, 16)
+        total += addend // 16 + addend % 16
+        factor = 1 if factor == 2 else 2
+    return f"{(16 - total % 16) % 16:X}"
+
+
+def has_valid_check_digit(identifier):
+    """True if an allocated ID's last character matches its payload."""
+    body = identifier.partition('-')[2].replace('-', '')
+    try:
+        return len(body) > BASE_DIGITS and check_digit(body[:-1]) == body[-1].upper()
+    except ValueError:
+        return False
+
+
+def mistyped_id_error(identifier, label):
+    """
+    Explain an ID that matched no row, if its check digit is off.
+
+    Args:
+        identifier: The ID as the user entered it
+        label: How to name it in the message, e.g. ``'Health ID'``
+
+    Returns:
+        str or None: A "mistyped" message, or None for a well-formed ID
+            that just doesn't exist (yet)
+    """
+    if has_valid_check_digit(identifier.strip()):
+        return None
+    return f"{label} {identifier} looks mistyped: its check digit does not match."
+
+
+def format_identifier(prefix, value, key=None):
+    """Render sequence ``value`` as e.g. ``HID-XXXX-YYYY``."""
+    digits, index = _tier(value)
+    payload = f"{permute(index, digits, key or _key(prefix)):0{digits}X}"
+    body = payload + check_digit(payload)
+    return f"{prefix}-{body[:4]}-{body[4:]}"
+
+
+class IdentifierAllocator:
+    """Hands out IDs for one scheme from reserved blocks of the sequence."""
+
+    def __init__(self, name):
+        self.name = name
+        self.prefix, self.model, self.field = SCHEMES[name]
+        self.pending = deque()
+        self.lock = threading.Lock()
+
+    def _reserve_values(self, db, count):
+        with transaction.atomic(using=db):
+            sequences = IdentifierSequence.objects.using(db).filter(name=self.name)
+            if not sequences.update(next_value=F('next_value') + count):
+                IdentifierSequence.objects.using(db).get_or_create(name=self.name)
+                sequences.update(next_value=F('next_value') + count)
+            end = sequences.values_list('next_value', flat=True).get()
+        return range(end - count, end)
+
+    def _reserve(self, db, count):
+        """Reserve at least ``count`` fresh IDs that no row uses yet."""
+        key = _key(self.prefix)
+        identifiers = []
+        while len(identifiers) < count:
+            values = self._reserve_values(db, count - len(identifiers))
+            candidates = [format_identifier(self.prefix, value, key) for value in values]
+            taken = set(
+                self.model.objects.using(db)
+                .filter(**{f"{self.field}__in": candidates})
+                .values_list(self.field, flat=True)
+            )
+            # Values still cached here can only reappear if the sequence row
+            # was reset (e.g. a test database flush); never hand them out twice
+            taken.update(self.pending)
+            identifiers.extend(candidate for candidate in candidates if candidate not in taken)
+        return identifiers
+
+    def allocate(self, count=1):
+        """
+        Return ``count`` unused IDs.
+
+        Blocks are only cached when reserved in autocommit mode. Inside a
+        transaction the reservation could still roll back, so exactly
+        ``count`` values are reserved and they live or die with the
+        caller's writes.
+        """
+        db = router.db_for_write(self.model)
+        with self.lock:
+            if len(self.pending) >= count:
+                return [self.pending.popleft() for _ in range(count)]
+            if connections[db].in_atomic_block:
+                return self._reserve(db, count)
+            block_size = max(getattr(settings, 'ID_BLOCK_SIZE', 100), count - len(self.pending))
+            self.pending.extend(self._reserve(db, block_size))
+            return [self.pending.popleft() for _ in range(count)]
+
+
+_allocators = {name: IdentifierAllocator(name) for name in SCHEMES}
+
+
+def allocate(name):
+    """Allocate one ``'health_id'`` or ``'doctor_id'``."""
+    return _allocators[name].allocate(1)[0]
+
+
+def allocate_many(name, count):
+    """Allocate ``count`` IDs at once (for bulk onboarding)."""
+    return _allocators[name].allocate(count) if count else []
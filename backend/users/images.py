@@ -0,0 +1,178 @@
+"""
+Resized WebP variants of profile pictures, made off the request path.
+
+Uploads are stored as sent, often multi-megabyte phone photos. When a
+profile's ``profile_picture`` changes, ``users.signals`` schedules
+``process_profile_picture`` for after the commit, on a small background
+thread pool (``PROFILE_PICTURE_WORKERS``). The job:
+
+- applies the EXIF orientation, then drops all metadata, GPS included
+- center-crops the picture to a square at each of ``PROFILE_PICTURE_SIZES``
+  pixels
+- writes the squares as WebP (``PROFILE_PICTURE_QUALITY``)
+
+The stored names are recorded in ``profile_picture_variants`` with the
+picture they came from. Serializers fall back to the original until the
+variants exist, and when they belong to an older picture. The pool lives
+in the web process, so a restart can drop queued work; ``manage.py
+process_profile_pictures`` catches up on anything missing.
+"""
+
+import io
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+logger = logging.getLogger(__name__)
+
+VARIANT_DIR = 'profile_pictures/variants'
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def picture_sizes():
+    return tuple(sorted(getattr(settings, 'PROFILE_PICTURE_SIZES', (64, 160, 512))))
+
+
+def current_variants(profile):
+    """Size -> storage name of the variants of the current picture ({} if none)."""
+    variants = profile.profile_picture_variants or {}
+    if not profile.profile_picture or variants.get('source') != profile.profile_picture.name:
+        return {}
+    return variants.get('sizes', {})
+
+
+def variant_url(profile, size, request=None, variants=None):
+    """
+    URL of the picture at ``size`` pixels, or None without a picture.
+
+    Until that size has been processed this is the original upload.
+    """
+    if not profile.profile_picture:
+        return None
+    if variants is None:
+        variants = current_variants(profile)
+    name = variants.get(str(size))
+    url = default_storage.url(name) if name else profile.profile_picture.url
+    return request.build_absolute_uri(url) if request else url
+
+
+def variant_urls(profile, request=None):
+    """URL of the picture at each size, or None without a picture."""
+    if not profile.profile_picture:
+        return None
+    variants = current_variants(profile)
+    return {str(size): variant_url(profile, size, request, variants) for size in picture_sizes()}
+
+
+def render_variants(file, sizes, quality):
+    """
+    WebP bytes of ``file`` center-cropped to each square size.
+
+    Returns:
+        dict: size -> bytes
+    """
+    with Image.open(file) as image:
+        # Let the JPEG decoder downscale while decoding; far less work for photos
+        image.draft('RGB', (max(sizes) * 2, max(sizes) * 2))
+        image = ImageOps.exif_transpose(image)
+        image = image.convert('RGBA' if image.mode in ('RGBA', 'LA', 'P') else 'RGB')
+        rendered = {}
+        for size in sizes:
+            variant = ImageOps.fit(image, (size, size), Image.Resampling.LANCZOS)
+            buffer = io.BytesIO()
+            variant.save(buffer, 'WEBP', quality=quality, method=4)
+            rendered[size] = buffer.getvalue()
+        return rendered
+
+
+def delete_variants(variants):
+    for name in (variants or {}).get('sizes', {}).values():
+        default_storage.delete(name)
+
+
+def process_profile_picture(model, pk, force=False):
+    """
+    Build the variants of one profile's current picture.
+
+    Args:
+        model: ``PatientProfile`` or ``DoctorProfile``
+        pk: The profile's primary key
+        force: Rebuild even if the variants are current (e.g. new sizes)
+
+    Returns:
+        bool: True if variants were stored
+    """
+    profile = model.objects.filter(pk=pk).first()
+    if profile is None:
+        return False
+    source = profile.profile_picture.name if profile.profile_picture else ''
+    previous = profile.profile_picture_variants or {}
+    if previous.get('source', '') == source and not force:
+        return False
+
+    variants = {}
+    if source:
+        try:
+            with profile.profile_picture.open('rb') as file:
+                rendered = render_variants(file, picture_sizes(), getattr(settings, 'PROFILE_PICTURE_QUALITY', 80))
+        except (OSError, UnidentifiedImageError, Image.DecompressionBombError, ValueError) as exc:
+            # Recorded without sizes so it is not retried; the original keeps being served
+            logger.warning("Could not process profile picture %s: %s", source, exc)
+            rendered = {}
+        stem = os.path.splitext(os.path.basename(source))[0]
+        variants = {'source': source, 'sizes': {
+            str(size): default_storage.save(f"{VARIANT_DIR}/{model._meta.model_name}-{pk}-{stem}-{size}.webp", ContentFile(data))
+            for size, data in rendered.items()
+        }}
+
+    # Only if the picture did not change again meanwhile; updated_at moves so ETags do too
+    unchanged = Q(profile_picture=source) if source else Q(profile_picture='') | Q(profile_picture__isnull=True)
+    stored = model.objects.filter(unchanged, pk=pk).update(
+        profile_picture_variants=variants, updated_at=timezone.now()
+    )
+    if not stored:
+        delete_variants(variants)
+        return False
+    delete_variants(previous)
+    return bool(variants.get('sizes'))
+
+
+def _run(model, pk):
+    try:
+        process_profile_picture(model, pk)
+    except Exception:
+        logger.exception("Processing the profile picture of %s %s failed", model.__name__, pk)
+    finally:
+        # Each pool thread owns its own DB connection
+        connection.close()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'PROFILE_PICTURE_WORKERS', 2),
+                thread_name_prefix='profile-picture'
+            )
+        return _executor
+
+
+def schedule_profile_picture(profile):
+    """Process a profile's picture in the background once the transaction commits."""
+    model, pk = type(profile), profile.pk
+    if getattr(settings, 'PROFILE_PICTURE_ASYNC', True):
+        transaction.on_commit(lambda: _get_executor().submit(_run, model, pk))
+    else:
+        transaction.on_commit(lambda: process_profile_picture(model, pk))
@@ -6,12 +6,99 @@ using Pinata's API, and retrieve content via IPFS gateways.
 """
 
 import hashlib
+import io
+import mimetypes
+import os
+import threading
+import time
+import uuid
 import requests
+from requests.adapters import HTTPAdapter
 from django.conf import settings
+from django.dispatch import Signal
+
+from healthsecure.metrics import instrument_ipfs
+
+from .cache import TTLCache
+
+# Sent after every Pinata API/gateway call with ``method``, ``url``,
+# ``status_code`` (None if the request raised) and ``duration`` in seconds
+ipfs_request = Signal()
+
+
+class MultipartFileStream:
+    """
+    File-like ``multipart/form-data`` body that streams a file in chunks.
+    
+    ``requests`` buffers ``files=`` uploads fully in memory; this reader
+    yields the preamble, the file in ``chunk_size`` pieces and the closing
+    boundary instead. When the file size is known it reports ``len()`` so
+    the request carries a Content-Length rather than chunked encoding.
+    """
+    
+    def __init__(self, file, filename, field_name='file', chunk_size=1024 * 1024):
+        self.boundary = uuid.uuid4().hex
+        self.chunk_size = chunk_size
+        self._file = file
+        filename = filename.replace('"', '%22')
+        self._head = (
+            f"--{self.boundary}\r\n"
+            f'Content-Disposition: form-data; name="{field_name}"; filename="{filename}"\r\n'
+            f"Content-Type: {mimetypes.guess_type(filename)[0] or 'application/octet-stream'}\r\n\r\n"
+        ).encode()
+        self._tail = f"\r\n--{self.boundary}--\r\n".encode()
+        self._parts = [io.BytesIO(self._head), file, io.BytesIO(self._tail)]
+        self._size = self._file_size(file)
+    
+    @staticmethod
+    def _file_size(file):
+        size = getattr(file, 'size', None)
+        if size is not None:
+            return size
+        try:
+            position = file.tell()
+            file.seek(0, os.SEEK_END)
+            size = file.tell() - position
+            file.seek(position)
+            return size
+        except (AttributeError, OSError, ValueError):
+            return None
+    
+    @property
+    def content_type(self):
+        return f"multipart/form-data; boundary={self.boundary}"
+    
+    def __len__(self):
+        if self._size is None:
+            raise TypeError("Stream length is unknown")
+        return len(self._head) + self._size + len(self._tail)
+    
+    def read(self, size=-1):
+        if size is None or size < 0:
+            size = self.chunk_size
+        while self._parts:
+            data = self._parts[0].read(size)
+            if data:
+                return data
+            self._parts.pop(0)
+        return b''
+    
+    def __iter__(self):
+        while True:
+            data = self.read(self.chunk_size)
+            if not data:
+                return
+            yield data
 
 
 class PinataIPFSService:
-    """Service class for interacting with Pinata IPFS."""
+    """Service class for interacting with Pinata IPFS.
+    
+    All calls go through one pooled ``HTTPAdapter`` so TCP/TLS connections
+    to the API and gateway are kept alive and reused across requests and
+    threads. Each thread gets its own lightweight ``requests.Session``
+    (sessions are not thread-safe) mounted on that shared adapter.
+    """
     
     BASE_URL = "https://api.pinata.cloud"
     
@@ -19,6 +106,106 @@ class PinataIPFSService:
         self.api_key = getattr(settings, 'PINATA_API_KEY', '')
         self.secret_key = getattr(settings, 'PINATA_SECRET_KEY', '')
         self.gateway = getattr(settings, 'PINATA_GATEWAY', 'https://gateway.pinata.cloud/ipfs/')
+        self.base_url = getattr(settings, 'PINATA_API_URL', self.BASE_URL).rstrip('/')
+        self.timeout = getattr(settings, 'PINATA_TIMEOUT', 30)
+        self.chunk_size = getattr(settings, 'DOCUMENT_CHUNK_SIZE', 1024 * 1024)
+        self.pool_connections = getattr(settings, 'PINATA_POOL_CONNECTIONS', 4)
+        self.pool_maxsize = getattr(settings, 'PINATA_POOL_MAXSIZE', 10)
+        self.pool_block = getattr(settings, 'PINATA_POOL_BLOCK', False)
+        
+        self._adapter = None
+        self._adapter_lock = threading.Lock()
+        self._local = threading.local()
+        self._in_flight = 0
+        self._in_flight_lock = threading.Lock()
+        
+        # CIDs are immutable, so a positive verification can be kept for long
+        self.verify_cache = TTLCache(maxsize=getattr(settings, 'IPFS_VERIFY_CACHE_SIZE', 10000))
+        self.verify_hit_ttl = getattr(settings, 'IPFS_VERIFY_HIT_TTL', 86400)
+        self.verify_miss_ttl = getattr(settings, 'IPFS_VERIFY_MISS_TTL', 30)
+    
+    @property
+    def adapter(self):
+        """Connection-pooling adapter shared by every thread."""
+        if self._adapter is None:
+            with self._adapter_lock:
+                if self._adapter is None:
+                    self._adapter = HTTPAdapter(
+                        pool_connections=self.pool_connections,
+                        pool_maxsize=self.pool_maxsize,
+                        pool_block=self.pool_block,
+                    )
+        return self._adapter
+    
+    @property
+    def session(self):
+        """This thread's session, mounted on the shared adapter."""
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = requests.Session()
+            session.mount('https://', self.adapter)
+            session.mount('http://', self.adapter)
+            self._local.session = session
+        return session
+    
+    def _request(self, method, url, **kwargs):
+        """Issue an HTTP request over the pooled keep-alive connections."""
+        kwargs.setdefault('timeout', self.timeout)
+        with self._in_flight_lock:
+            self._in_flight += 1
+        started = time.perf_counter()
+        status_code = None
+        try:
+            response = self.session.request(method, url, **kwargs)
+            status_code = response.status_code
+            return response
+        finally:
+            with self._in_flight_lock:
+                self._in_flight -= 1
+            ipfs_request.send(
+                sender=self.__class__,
+                method=method,
+                url=url,
+                status_code=status_code,
+                duration=time.perf_counter() - started
+            )
+    
+    def pool_stats(self):
+        """
+        Snapshot of connection pool usage, for sizing the pool.
+        
+        Returns:
+            dict: Totals ('active', 'idle', 'opened', 'requests', 'reused')
+                plus the same counters per host under 'hosts'
+        """
+        totals = {'active': self._in_flight, 'idle': 0, 'opened': 0, 'requests': 0, 'reused': 0}
+        hosts = {}
+        if self._adapter is not None:
+            pools = self._adapter.poolmanager.pools
+            for key in list(pools.keys()):
+                pool = pools.get(key)
+                if pool is None:
+                    continue
+                queue = list(pool.pool.queue) if pool.pool is not None else []
+                host_stats = {
+                    'idle': sum(1 for conn in queue if conn is not None),
+                    'opened': pool.num_connections,
+                    'requests': pool.num_requests,
+                    'reused': max(pool.num_requests - pool.num_connections, 0),
+                    'maxsize': pool.pool.maxsize if pool.pool is not None else 0,
+                }
+                hosts[f"{key.key_scheme}://{key.key_host}:{key.key_port}"] = host_stats
+                for name in ('idle', 'opened', 'requests', 'reused'):
+                    totals[name] += host_stats[name]
+        return {**totals, 'hosts': hosts}
+    
+    def close(self):
+        """Close all pooled connections; the pool is rebuilt on next use."""
+        with self._adapter_lock:
+            if self._adapter is not None:
+                self._adapter.close()
+            self._adapter = None
+        self._local = threading.local()
         
     @property
     def headers(self):
@@ -28,12 +215,14 @@ class PinataIPFSService:
             'pinata_secret_api_key': self.secret_key,
         }
     
+    @instrument_ipfs('test_authentication')
     def test_authentication(self):
         """Test Pinata API authentication."""
-        url = f"{self.BASE_URL}/data/testAuthentication"
-        response = requests.get(url, headers=self.headers)
+        url = f"{self.base_url}/data/testAuthentication"
+        response = self._request('GET', url, headers=self.headers)
         return response.status_code == 200
     
+    @instrument_ipfs('upload_file')
     def upload_file(self, file, filename=None):
         """
         Upload a file to IPFS via Pinata.
@@ -45,18 +234,21 @@ class PinataIPFSService:
         Returns:
             dict: Contains 'success', 'cid', 'ipfs_url', and 'error' (if any)
         """
-        url = f"{self.BASE_URL}/pinning/pinFileToIPFS"
+        url = f"{self.base_url}/pinning/pinFileToIPFS"
         
         try:
             # Prepare the file for upload
             if filename is None:
                 filename = getattr(file, 'name', 'file')
             
-            files = {
-                'file': (filename, file)
+            # Stream the body so memory stays bounded by the chunk size
+            body = MultipartFileStream(file, filename, chunk_size=self.chunk_size)
+            headers = {
+                **self.headers,
+                'Content-Type': body.content_type
             }
             
-            response = requests.post(url, headers=self.headers, files=files)
+            response = self._request('POST', url, headers=headers, data=body)
             
             if response.status_code == 200:
                 data = response.json()
@@ -80,6 +272,7 @@ class PinataIPFSService:
                 'error': str(e)
             }
     
+    @instrument_ipfs('upload_json')
     def upload_json(self, data, name=None):
         """
         Pin JSON data to IPFS via Pinata.
@@ -91,7 +284,7 @@ class PinataIPFSService:
         Returns:
             dict: Contains 'success', 'cid', 'ipfs_url', and 'error' (if any)
         """
-        url = f"{self.BASE_URL}/pinning/pinJSONToIPFS"
+        url = f"{self.base_url}/pinning/pinJSONToIPFS"
         
         try:
             payload = {
@@ -106,7 +299,7 @@ class PinataIPFSService:
                 'Content-Type': 'application/json'
             }
             
-            response = requests.post(url, headers=headers, json=payload)
+            response = self._request('POST', url, headers=headers, json=payload)
             
             if response.status_code == 200:
                 response_data = response.json()
@@ -134,6 +327,7 @@ class PinataIPFSService:
             return None
         return f"{self.gateway}{cid}"
     
+    @instrument_ipfs('unpin')
     def unpin(self, cid):
         """
         Remove a pin from Pinata.
@@ -144,12 +338,13 @@ class PinataIPFSService:
         Returns:
             dict: Contains 'success' and 'error' (if any)
         """
-        url = f"{self.BASE_URL}/pinning/unpin/{cid}"
+        url = f"{self.base_url}/pinning/unpin/{cid}"
         
         try:
-            response = requests.delete(url, headers=self.headers)
+            response = self._request('DELETE', url, headers=self.headers)
             
             if response.status_code == 200:
+                self.verify_cache.delete(cid)
                 return {'success': True}
             else:
                 return {
@@ -163,6 +358,7 @@ class PinataIPFSService:
                 'error': str(e)
             }
     
+    @instrument_ipfs('verify_cid')
     def verify_cid(self, cid):
         """
         Verify that a CID exists and is accessible.
@@ -177,7 +373,7 @@ class PinataIPFSService:
         
         try:
             # Just check if the file is accessible (HEAD request)
-            response = requests.head(url, timeout=10)
+            response = self._request('HEAD', url, timeout=10)
             
             if response.status_code == 200:
                 return {
@@ -197,6 +393,24 @@ class PinataIPFSService:
                 'success': False,
                 'error': str(e)
             }
+    
+    def _verify_ttl(self, result):
+        """Cache hits for long, misses briefly and transport errors not at all."""
+        if not result.get('success'):
+            return 0
+        return self.verify_hit_ttl if result.get('accessible') else self.verify_miss_ttl
+    
+    def verify_cid_cached(self, cid):
+        """
+        ``verify_cid`` behind a TTL cache with request coalescing.
+        
+        Concurrent calls for the same CID share a single gateway request.
+        """
+        return self.verify_cache.get_or_load(
+            cid,
+            lambda: self.verify_cid(cid),
+            ttl=self._verify_ttl
+        )
 
 
 def generate_blockchain_id(email, created_at):
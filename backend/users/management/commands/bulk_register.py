@@ -0,0 +1,84 @@
+import csv
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+
+from users.bulk import register_patients
+
+OPTIONAL_COLUMNS = ('age', 'phone')
+
+
+def _init_worker():
+    # Spawned (non-forked) workers need the app registry for the hashers
+    import django
+    django.setup()
+
+
+class Command(BaseCommand):
+    help = (
+        "Onboard patients from a CSV file (email,password,first_name,last_name[,age,phone]), "
+        "hashing passwords on a process pool."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="CSV file with a header row, or - for stdin")
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help="Processes used for password hashing (1 hashes in-process)")
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        workers = max(1, options['workers'])
+        pool = None
+        hash_passwords = None
+        if workers > 1:
+            pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker)
+
+            def hash_passwords(passwords):
+                chunksize = max(1, len(passwords) // (workers * 4))
+                return list(pool.map(make_password, passwords, chunksize=chunksize))
+
+        stream = sys.stdin if options['path'] == '-' else open(options['path'], newline='', encoding='utf-8')
+        created = failed = 0
+        started = time.perf_counter()
+
+        def flush(batch, line_numbers):
+            nonlocal created, failed
+            for result in register_patients(batch, hash_passwords, batch_size=options['batch_size']):
+                if result['status'] == 'created':
+                    created += 1
+                else:
+                    failed += 1
+                    self.stderr.write(f"line {line_numbers[result['index']]}: {json.dumps(result['errors'])}")
+
+        try:
+            batch, line_numbers = [], []
+            reader = csv.DictReader(stream)
+            for row in reader:
+                # Blank optional cells mean "not provided"
+                for column in OPTIONAL_COLUMNS:
+                    if not (row.get(column) or '').strip():
+                        row.pop(column, None)
+                batch.append(row)
+                line_numbers.append(reader.line_num)
+                if len(batch) >= options['batch_size']:
+                    flush(batch, line_numbers)
+                    batch, line_numbers = [], []
+            if batch:
+                flush(batch, line_numbers)
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+            if pool is not None:
+                pool.shutdown()
+
+        elapsed = time.perf_counter() - started
+        rate = created / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"Registered {created} patients ({failed} failed) in {elapsed:.2f}s "
+            f"- {rate:.0f} patients/s"
+        ))
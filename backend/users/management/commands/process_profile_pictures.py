@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from users.images import process_profile_picture
+from users.models import PatientProfile, DoctorProfile
+
+
+class Command(BaseCommand):
+    help = "Build missing resized WebP variants of profile pictures (all of them with --force)."
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true',
+                            help="Rebuild every picture, e.g. after changing PROFILE_PICTURE_SIZES")
+    
+    def handle(self, *args, **options):
+        processed = 0
+        for model in (PatientProfile, DoctorProfile):
+            profiles = model.objects.exclude(profile_picture='').exclude(profile_picture__isnull=True)
+            for profile in profiles.only('pk', 'profile_picture', 'profile_picture_variants').iterator(chunk_size=500):
+                source = (profile.profile_picture_variants or {}).get('source')
+                if not options['force'] and source == profile.profile_picture.name:
+                    continue
+                if process_profile_picture(model, profile.pk, force=options['force']):
+                    processed += 1
+        self.stdout.write(self.style.SUCCESS(f"Processed {processed} profile pictures."))
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+
+from users.pinata_stub import PinataStubServer
+
+
+class Command(BaseCommand):
+    help = "Run a local stand-in for the Pinata API and IPFS gateway."
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8787)
+        parser.add_argument('--latency', type=float, default=0.0,
+                            help="Seconds to sleep before answering pin/unpin calls")
+        parser.add_argument('--fail-rate', type=float, default=0.0,
+                            help="Fraction of pin/unpin calls answered with HTTP 503")
+        parser.add_argument('--verbose', action='store_true')
+    
+    def handle(self, *args, **options):
+        server = PinataStubServer(
+            (options['host'], options['port']),
+            latency=options['latency'],
+            fail_rate=options['fail_rate'],
+            verbose=options['verbose'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Pinata stub listening on {server.url} "
+            f"(set PINATA_API_URL={server.url} PINATA_GATEWAY={server.url}/ipfs/)"
+        ))
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
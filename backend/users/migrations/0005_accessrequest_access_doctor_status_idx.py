@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0004_doctorprofile_profile_picture_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='accessrequest',
+            index=models.Index(fields=['doctor', '-granted_at', 'status'], name='access_doctor_granted_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='accessrequest',
+            index=models.Index(fields=['patient', '-granted_at'], name='access_patient_granted_idx'),
+        ),
+    ]
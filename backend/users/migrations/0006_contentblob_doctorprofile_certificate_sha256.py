@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-18 05:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0005_accessrequest_access_doctor_status_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ContentBlob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sha256', models.CharField(max_length=64, unique=True)),
+                ('path', models.CharField(help_text='Storage name of the single stored copy', max_length=255)),
+                ('size', models.PositiveBigIntegerField(default=0)),
+                ('cid', models.CharField(blank=True, max_length=100, null=True)),
+                ('refcount', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='doctorprofile',
+            name='certificate_sha256',
+            field=models.CharField(blank=True, help_text='SHA-256 of the certificate content', max_length=64, null=True),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:35
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def backfill_updated_at(apps, schema_editor):
+    """Existing requests last changed when revoked, else when granted."""
+    AccessRequest = apps.get_model('users', 'AccessRequest')
+    AccessRequest.objects.update(updated_at=Coalesce('revoked_at', 'granted_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0006_contentblob_doctorprofile_certificate_sha256'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='accessrequest',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.RunPython(backfill_updated_at, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:47
+
+from django.db import migrations, models
+
+
+def create_sequences(apps, schema_editor):
+    IdentifierSequence = apps.get_model('users', 'IdentifierSequence')
+    for name in ('health_id', 'doctor_id'):
+        IdentifierSequence.objects.get_or_create(name=name)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0007_accessrequest_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IdentifierSequence',
+            fields=[
+                ('name', models.CharField(max_length=32, primary_key=True, serialize=False)),
+                ('next_value', models.PositiveBigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(create_sequences, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0008_identifiersequence'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RequestProfile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('method', models.CharField(max_length=10)),
+                ('path', models.CharField(max_length=500)),
+                ('user_email', models.CharField(max_length=254)),
+                ('mode', models.CharField(choices=[('full', 'cProfile + sampling'), ('sample', 'Sampling only')], default='full', max_length=10)),
+                ('status_code', models.PositiveSmallIntegerField()),
+                ('duration_ms', models.FloatField()),
+                ('queries', models.PositiveIntegerField(default=0)),
+                ('samples', models.PositiveIntegerField(default=0)),
+                ('pstats_file', models.CharField(blank=True, max_length=255)),
+                ('collapsed_file', models.CharField(blank=True, max_length=255)),
+                ('summary', models.TextField(blank=True, help_text='Top functions by cumulative time')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0009_requestprofile'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='doctorprofile',
+            name='profile_picture_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+        migrations.AddField(
+            model_name='patientprofile',
+            name='profile_picture_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
@@ -1,6 +1,6 @@
-import uuid
 from django.contrib.auth.models import AbstractUser, BaseUserManager
 from django.db import models
+from django.utils import timezone
 
 
 class UserManager(BaseUserManager):
@@ -10,6 +10,11 @@ class UserManager(BaseUserManager):
         if not email:
             raise ValueError('Email is required')
         email = self.normalize_email(email)
+        extra_fields.setdefault('date_joined', timezone.now())
+        if not extra_fields.get('blockchain_id'):
+            # Known before the INSERT, so creating a user is a single write
+            from .ipfs_service import generate_blockchain_id
+            extra_fields['blockchain_id'] = generate_blockchain_id(email, extra_fields['date_joined'])
         user = self.model(email=email, **extra_fields)
         user.set_password(password)
         user.save(using=self._db)
@@ -23,15 +28,15 @@ class UserManager(BaseUserManager):
 
 
 def generate_health_id():
-    """Generate unique health ID in format HID-XXXX-YYYY."""
-    uid = uuid.uuid4().hex[:8].upper()
-    return f"HID-{uid[:4]}-{uid[4:]}"
+    """Allocate a unique health ID in format HID-XXXX-YYYY (see users.identifiers)."""
+    from .identifiers import allocate
+    return allocate('health_id')
 
 
 def generate_doctor_id():
-    """Generate unique doctor ID in format DOC-XXXX-YYYY."""
-    uid = uuid.uuid4().hex[:8].upper()
-    return f"DOC-{uid[:4]}-{uid[4:]}"
+    """Allocate a unique doctor ID in format DOC-XXXX-YYYY (see users.identifiers)."""
+    from .identifiers import allocate
+    return allocate('doctor_id')
 
 
 class User(AbstractUser):
@@ -74,7 +79,25 @@ class User(AbstractUser):
         return self.blockchain_id
 
 
-class PatientProfile(models.Model):
+class ProfileModel(models.Model):
+    """Base for role profiles.
+    
+    Request principals hold profiles that only know their keys (see
+    ``users.authentication``). The first read of any deferred field loads
+    all of them in one query instead of one query per field.
+    """
+    
+    class Meta:
+        abstract = True
+    
+    def refresh_from_db(self, using=None, fields=None, from_queryset=None):
+        deferred = self.get_deferred_fields()
+        if fields is not None and deferred and set(fields) <= deferred:
+            fields = deferred
+        super().refresh_from_db(using=using, fields=fields, from_queryset=from_queryset)
+
+
+class PatientProfile(ProfileModel):
     """Patient-specific profile information."""
     
     user = models.OneToOneField(
@@ -91,6 +114,8 @@ class PatientProfile(models.Model):
         null=True,
         help_text="Profile picture image"
     )
+    # Resized WebP copies, written in the background (see users.images)
+    profile_picture_variants = models.JSONField(default=dict, blank=True, editable=False)
     health_id = models.CharField(
         max_length=20, 
         unique=True, 
@@ -114,7 +139,7 @@ class PatientProfile(models.Model):
         return f"{self.first_name} {self.last_name}"
 
 
-class DoctorProfile(models.Model):
+class DoctorProfile(ProfileModel):
     """Doctor-specific profile information."""
     
     user = models.OneToOneField(
@@ -133,6 +158,8 @@ class DoctorProfile(models.Model):
         null=True,
         help_text="Profile picture image"
     )
+    # Resized WebP copies, written in the background (see users.images)
+    profile_picture_variants = models.JSONField(default=dict, blank=True, editable=False)
     doctor_id = models.CharField(
         max_length=20, 
         unique=True, 
@@ -144,6 +171,12 @@ class DoctorProfile(models.Model):
         blank=True, 
         null=True
     )
+    certificate_sha256 = models.CharField(
+        max_length=64,
+        null=True,
+        blank=True,
+        help_text="SHA-256 of the certificate content"
+    )
     # IPFS CID for doctor certificate
     certificate_cid = models.CharField(
         max_length=100,
@@ -215,12 +248,98 @@ class AccessRequest(models.Model):
     granted_at = models.DateTimeField(auto_now_add=True)
     expires_at = models.DateTimeField(null=True, blank=True)
     revoked_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         ordering = ['-granted_at']
         unique_together = ['patient', 'doctor']  # One request per patient-doctor pair
+        indexes = [
+            # Access lists page newest-first; a doctor's list also filters on
+            # status, which the index covers so no table row is read to test it
+            models.Index(fields=['doctor', '-granted_at', 'status'], name='access_doctor_granted_idx'),
+            models.Index(fields=['patient', '-granted_at'], name='access_patient_granted_idx'),
+        ]
     
     def __str__(self):
         doctor_name = self.doctor.full_name if self.doctor else self.doctor_id_requested
         return f"{self.patient.full_name} -> {doctor_name} ({self.status})"
 
+
+class IdentifierSequence(models.Model):
+    """Next unreserved value of a public ID sequence (health_id, doctor_id).
+    
+    Processes reserve blocks by incrementing ``next_value``; the values are
+    turned into IDs by ``users.identifiers``.
+    """
+    
+    name = models.CharField(max_length=32, primary_key=True)
+    next_value = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"{self.name}: {self.next_value}"
+
+
+class ContentBlob(models.Model):
+    """Content-addressed index of stored uploads (documents, certificates).
+    
+    Identical bytes are stored and pinned once; every record or profile
+    referencing them holds one reference. The file is deleted and the CID
+    unpinned only when the last reference is released.
+    """
+    
+    sha256 = models.CharField(max_length=64, unique=True)
+    path = models.CharField(max_length=255, help_text="Storage name of the single stored copy")
+    size = models.PositiveBigIntegerField(default=0)
+    cid = models.CharField(max_length=100, null=True, blank=True)
+    refcount = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"{self.sha256[:12]} x{self.refcount} ({self.cid or 'unpinned'})"
+
+
+class RequestProfile(models.Model):
+    """A profiled request captured by ``healthsecure.profiling``.
+    
+    The profiles themselves are files under ``PROFILE_DIR``; deleting the
+    row deletes them.
+    """
+    
+    MODE_CHOICES = [
+        ('full', 'cProfile + sampling'),
+        ('sample', 'Sampling only'),
+    ]
+    
+    method = models.CharField(max_length=10)
+    path = models.CharField(max_length=500)
+    user_email = models.CharField(max_length=254)
+    mode = models.CharField(max_length=10, choices=MODE_CHOICES, default='full')
+    status_code = models.PositiveSmallIntegerField()
+    duration_ms = models.FloatField()
+    queries = models.PositiveIntegerField(default=0)
+    samples = models.PositiveIntegerField(default=0)
+    pstats_file = models.CharField(max_length=255, blank=True)
+    collapsed_file = models.CharField(max_length=255, blank=True)
+    summary = models.TextField(blank=True, help_text="Top functions by cumulative time")
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['-created_at']
+    
+    def __str__(self):
+        return f"{self.method} {self.path} ({self.duration_ms:.0f}ms)"
+    
+    def file_path(self, kind):
+        """Absolute path of the ``'pstats'`` or ``'collapsed'`` file, or None."""
+        from healthsecure.profiling import profile_dir
+        name = self.pstats_file if kind == 'pstats' else self.collapsed_file
+        return profile_dir() / name if name else None
+    
+    def delete(self, *args, **kwargs):
+        for kind in ('pstats', 'collapsed'):
+            path = self.file_path(kind)
+            if path is not None:
+                path.unlink(missing_ok=True)
+        return super().delete(*args, **kwargs)
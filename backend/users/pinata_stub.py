@@ -0,0 +1,194 @@
+"""
+Local stand-in for the Pinata pinning API and IPFS gateway.
+
+Implements just enough of the endpoints used by ``PinataIPFSService`` to
+run the backend, the pinning workers and benchmarks fully offline:
+
+    GET    /data/testAuthentication
+    POST   /pinning/pinFileToIPFS
+    POST   /pinning/pinJSONToIPFS
+    DELETE /pinning/unpin/<cid>
+    HEAD   /ipfs/<cid>  (and GET)
+
+Set ``PINATA_API_URL=http://host:port`` and
+``PINATA_GATEWAY=http://host:port/ipfs/`` to point the service at it.
+"""
+
+import hashlib
+import json
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+BASE58_ALPHABET = '123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz'
+
+
+def cid_for_bytes(data):
+    """Compute a CIDv0-style identifier (base58 sha2-256 multihash)."""
+    digest = b'\x12\x20' + hashlib.sha256(data).digest()
+    number = int.from_bytes(digest, 'big')
+    encoded = ''
+    while number:
+        number, remainder = divmod(number, 58)
+        encoded = BASE58_ALPHABET[remainder] + encoded
+    return encoded
+
+
+class PinataStubHandler(BaseHTTPRequestHandler):
+    """Request handler; state lives on the server instance."""
+
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_body(self):
+        if self.headers.get('Transfer-Encoding', '').lower() == 'chunked':
+            chunks = []
+            while True:
+                size = int(self.rfile.readline().split(b';')[0].strip(), 16)
+                if size == 0:
+                    self.rfile.readline()
+                    break
+                chunks.append(self.rfile.read(size))
+                self.rfile.readline()
+            return b''.join(chunks)
+        length = int(self.headers.get('Content-Length') or 0)
+        return self.rfile.read(length)
+
+    def _simulate_conditions(self):
+        """Apply configured latency and failure injection; True if failed."""
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        if self.server.fail_rate and random.random() < self.server.fail_rate:
+            self._send_json(503, {'error': 'Simulated pinning failure'})
+            return True
+        return False
+
+    def _authorized(self):
+        return bool(self.headers.get('pinata_api_key') is not None)
+
+    def _pin(self, content, content_type):
+        cid = cid_for_bytes(content)
+        with self.server.lock:
+            self.server.pins[cid] = (content_type, content)
+        return {
+            'IpfsHash': cid,
+            'PinSize': len(content),
+            'Timestamp': datetime.now(timezone.utc).isoformat(),
+        }
+
+    def do_GET(self):
+        if self.path.startswith('/data/testAuthentication'):
+            if not self._authorized():
+                self._send_json(401, {'error': 'Missing API key'})
+                return
+            self._send_json(200, {'message': 'Congratulations! You are communicating with the Pinata API!'})
+            return
+        self._serve_gateway(include_body=True)
+
+    def do_HEAD(self):
+        self._serve_gateway(include_body=False)
+
+    def _serve_gateway(self, include_body):
+        if not self.path.startswith('/ipfs/'):
+            self.send_response(404)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        cid = self.path[len('/ipfs/'):].split('?')[0].strip('/')
+        with self.server.lock:
+            pinned = self.server.pins.get(cid)
+        if pinned is None:
+            self.send_response(404)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        content_type, content = pinned
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        if include_body:
+            self.wfile.write(content)
+
+    def do_POST(self):
+        body = self._read_body()
+        if self._simulate_conditions():
+            return
+
+        if self.path == '/pinning/pinJSONToIPFS':
+            payload = json.loads(body or b'{}')
+            content = json.dumps(
+                payload.get('pinataContent'), sort_keys=True, separators=(',', ':')
+            ).encode()
+            self._send_json(200, self._pin(content, 'application/json'))
+            return
+
+        if self.path == '/pinning/pinFileToIPFS':
+            content_type = self.headers.get('Content-Type', '')
+            message = BytesParser(policy=HTTP).parsebytes(
+                f"Content-Type: {content_type}\r\n\r\n".encode() + body
+            )
+            for part in message.iter_parts():
+                if part.get_param('name', header='content-disposition') == 'file':
+                    content = part.get_payload(decode=True) or b''
+                    mime = part.get_content_type() or 'application/octet-stream'
+                    self._send_json(200, self._pin(content, mime))
+                    return
+            self._send_json(400, {'error': 'No file part in request'})
+            return
+
+        self._send_json(404, {'error': f'Unknown endpoint {self.path}'})
+
+    def do_DELETE(self):
+        if self._simulate_conditions():
+            return
+        if not self.path.startswith('/pinning/unpin/'):
+            self._send_json(404, {'error': f'Unknown endpoint {self.path}'})
+            return
+        cid = self.path[len('/pinning/unpin/'):]
+        with self.server.lock:
+            removed = self.server.pins.pop(cid, None)
+        if removed is None:
+            self._send_json(404, {'error': 'CID not pinned'})
+            return
+        self._send_json(200, {'message': 'OK'})
+
+
+class PinataStubServer(ThreadingHTTPServer):
+    """Threaded HTTP server holding pins in memory."""
+
+    daemon_threads = True
+
+    def __init__(self, address, latency=0.0, fail_rate=0.0, verbose=False):
+        super().__init__(address, PinataStubHandler)
+        self.latency = latency
+        self.fail_rate = fail_rate
+        self.verbose = verbose
+        self.pins = {}
+        self.lock = threading.Lock()
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start_in_thread(self):
+        """Serve from a daemon thread (handy for scripts and benchmarks)."""
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return thread
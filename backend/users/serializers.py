@@ -1,10 +1,21 @@
+import logging
+
 from rest_framework import serializers
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
 from django.contrib.auth import get_user_model
-from .models import PatientProfile, DoctorProfile, AccessRequest
+from django.db import IntegrityError, transaction
+from healthsecure.metrics import IPFS_UPLOAD_FAILURES
+from .authentication import PROFILE_ID_CLAIM
+from .identifiers import mistyped_id_error
+from .images import picture_sizes, variant_url, variant_urls
+from .models import PatientProfile, DoctorProfile, AccessRequest, generate_health_id, generate_doctor_id
 
 User = get_user_model()
 
+logger = logging.getLogger(__name__)
+
 
 class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
     """Custom JWT serializer that includes user role and profile info."""
@@ -14,6 +25,16 @@ class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
         token = super().get_token(user)
         token['role'] = user.role
         token['email'] = user.email
+        
+        # Claims read by users.authentication.ClaimsJWTAuthentication so
+        # requests need no user or profile lookup
+        profile_id = None
+        if user.role == 'PATIENT' and hasattr(user, 'patient_profile'):
+            profile_id = user.patient_profile.pk
+        elif user.role == 'DOCTOR' and hasattr(user, 'doctor_profile'):
+            profile_id = user.doctor_profile.pk
+        token[PROFILE_ID_CLAIM] = profile_id
+        token[api_settings.REVOKE_TOKEN_CLAIM] = get_md5_hash_password(user.password)
         return token
     
     def validate(self, attrs):
@@ -56,26 +77,39 @@ class PatientRegisterSerializer(serializers.Serializer):
         return value
     
     def create(self, validated_data):
-        user = User.objects.create_user(
-            email=validated_data['email'],
-            password=validated_data['password'],
-            role='PATIENT',
-            phone=validated_data.get('phone', '')
-        )
-        
-        # Generate blockchain ID for user
-        user.generate_blockchain_id()
+        # Taken from the process-wide block outside the transaction
+        health_id = generate_health_id()
         
-        PatientProfile.objects.create(
-            user=user,
-            first_name=validated_data['first_name'],
-            last_name=validated_data['last_name'],
-            age=validated_data.get('age')
-        )
+        # User (blockchain ID included) and profile commit together or not at all
+        try:
+            with transaction.atomic():
+                user = User.objects.create_user(
+                    email=validated_data['email'],
+                    password=validated_data['password'],
+                    role='PATIENT',
+                    phone=validated_data.get('phone', '')
+                )
+                PatientProfile.objects.create(
+                    user=user,
+                    first_name=validated_data['first_name'],
+                    last_name=validated_data['last_name'],
+                    age=validated_data.get('age'),
+                    health_id=health_id
+                )
+        except IntegrityError:
+            # Lost a race with a concurrent registration of the same email
+            raise serializers.ValidationError({'email': ["Email already registered."]})
         
         return user
 
 
+class BulkPatientRowSerializer(PatientRegisterSerializer):
+    """One row of a bulk onboarding file; email uniqueness is checked set-wise."""
+    
+    def validate_email(self, value):
+        return User.objects.normalize_email(value)
+
+
 class DoctorRegisterSerializer(serializers.Serializer):
     """Serializer for doctor registration."""
     
@@ -100,46 +134,71 @@ class DoctorRegisterSerializer(serializers.Serializer):
         return value
     
     def create(self, validated_data):
-        from .ipfs_service import ipfs_service
+        from .content_store import store_upload, pin_blob, release
         
         certificate_file = validated_data.pop('certificate', None)
+        certificate_field = DoctorProfile._meta.get_field('certificate')
         
-        user = User.objects.create_user(
-            email=validated_data['email'],
-            password=validated_data['password'],
-            role='DOCTOR',
-            phone=validated_data.get('phone', '')
-        )
-        
-        # Generate blockchain ID for user
-        user.generate_blockchain_id()
+        # Store the certificate before opening the transaction so no file
+        # I/O happens while it is held; identical content is reused
+        blob = None
+        if certificate_file:
+            try:
+                blob = store_upload(certificate_file, certificate_field)
+            except Exception:
+                # Registration proceeds without a stored certificate
+                logger.exception("Storing certificate for %s failed", validated_data['email'])
         
-        doctor_profile = DoctorProfile.objects.create(
-            user=user,
-            first_name=validated_data['first_name'],
-            last_name=validated_data['last_name'],
-            medical_license=validated_data['medical_license'],
-            specialization=validated_data['specialization'],
-            hospital=validated_data['hospital']
-        )
+        doctor_id = generate_doctor_id()
+        try:
+            with transaction.atomic():
+                user = User.objects.create_user(
+                    email=validated_data['email'],
+                    password=validated_data['password'],
+                    role='DOCTOR',
+                    phone=validated_data.get('phone', '')
+                )
+                doctor_profile = DoctorProfile.objects.create(
+                    user=user,
+                    first_name=validated_data['first_name'],
+                    last_name=validated_data['last_name'],
+                    medical_license=validated_data['medical_license'],
+                    specialization=validated_data['specialization'],
+                    hospital=validated_data['hospital'],
+                    doctor_id=doctor_id,
+                    certificate=blob.path if blob else None,
+                    certificate_sha256=blob.sha256 if blob else None,
+                    certificate_cid=blob.cid if blob else None
+                )
+        except Exception as exc:
+            # No profile holds the certificate reference; give it back
+            if blob:
+                release(blob.sha256, certificate_field.storage)
+            if isinstance(exc, IntegrityError):
+                raise serializers.ValidationError(
+                    "Email or medical license already registered."
+                )
+            raise
         
-        # Upload certificate to IPFS if provided
-        if certificate_file:
+        # Pin after commit unless this content is already pinned
+        if blob and not blob.cid:
+            # Certificate is saved locally, so a failed upload doesn't fail
+            # registration; it shows in doctor_certificates_unpinned
             try:
-                # Save the file locally first
-                doctor_profile.certificate = certificate_file
-                doctor_profile.save(update_fields=['certificate'])
-                
-                # Upload to IPFS
-                result = ipfs_service.upload_file(
-                    certificate_file,
-                    filename=certificate_file.name
+                result = pin_blob(blob.sha256, doctor_profile.certificate)
+            except Exception as exc:
+                result = {'success': False, 'error': str(exc)}
+            if result.get('success'):
+                doctor_profile.certificate_cid = result.get('cid')
+                DoctorProfile.objects.filter(pk=doctor_profile.pk).update(
+                    certificate_cid=doctor_profile.certificate_cid
+                )
+            else:
+                IPFS_UPLOAD_FAILURES.labels('doctor_certificate').inc()
+                logger.warning(
+                    "Pinning certificate of doctor %s failed: %s",
+                    doctor_profile.doctor_id, result.get('error')
                 )
-                if result.get('success'):
-                    doctor_profile.certificate_cid = result.get('cid')
-                    doctor_profile.save(update_fields=['certificate_cid'])
-            except Exception:
-                pass  # Certificate saved locally, IPFS upload optional
         
         return user
 
@@ -151,25 +210,26 @@ class PatientProfileSerializer(serializers.ModelSerializer):
     phone = serializers.CharField(source='user.phone', required=False)
     blockchain_id = serializers.CharField(source='user.blockchain_id', read_only=True)
     profile_picture_url = serializers.SerializerMethodField()
+    profile_picture_urls = serializers.SerializerMethodField()
     
     class Meta:
         model = PatientProfile
         fields = [
             'health_id', 'first_name', 'last_name', 'age',
-            'email', 'phone', 'profile_picture', 'profile_picture_url',
+            'email', 'phone', 'profile_picture', 'profile_picture_url', 'profile_picture_urls',
             'profile_cid', 'blockchain_id',
             'created_at', 'updated_at'
         ]
-        read_only_fields = ['health_id', 'profile_picture_url', 'profile_cid', 'blockchain_id', 'created_at', 'updated_at']
+        read_only_fields = ['health_id', 'profile_picture_url', 'profile_picture_urls', 'profile_cid', 'blockchain_id',
+                            'created_at', 'updated_at']
     
     def get_profile_picture_url(self, obj):
-        """Get full URL for profile picture."""
-        if obj.profile_picture:
-            request = self.context.get('request')
-            if request:
-                return request.build_absolute_uri(obj.profile_picture.url)
-            return obj.profile_picture.url
-        return None
+        """Get full URL for profile picture (largest processed size)."""
+        return variant_url(obj, picture_sizes()[-1], self.context.get('request'))
+    
+    def get_profile_picture_urls(self, obj):
+        """Get URLs for profile picture by size in pixels."""
+        return variant_urls(obj, self.context.get('request'))
 
 
 class DoctorProfileSerializer(serializers.ModelSerializer):
@@ -180,17 +240,19 @@ class DoctorProfileSerializer(serializers.ModelSerializer):
     blockchain_id = serializers.CharField(source='user.blockchain_id', read_only=True)
     certificate_url = serializers.SerializerMethodField()
     profile_picture_url = serializers.SerializerMethodField()
+    profile_picture_urls = serializers.SerializerMethodField()
     
     class Meta:
         model = DoctorProfile
         fields = [
             'doctor_id', 'first_name', 'last_name', 'medical_license',
             'specialization', 'hospital', 'is_verified',
-            'email', 'phone', 'profile_picture', 'profile_picture_url',
+            'email', 'phone', 'profile_picture', 'profile_picture_url', 'profile_picture_urls',
             'certificate_cid', 'certificate_url',
             'profile_cid', 'blockchain_id', 'created_at', 'updated_at'
         ]
-        read_only_fields = ['doctor_id', 'is_verified', 'profile_picture_url', 'certificate_cid', 'certificate_url', 
+        read_only_fields = ['doctor_id', 'is_verified', 'profile_picture_url', 'profile_picture_urls',
+                          'certificate_cid', 'certificate_url', 
                           'profile_cid', 'blockchain_id', 'created_at', 'updated_at']
     
     def get_certificate_url(self, obj):
@@ -202,13 +264,12 @@ class DoctorProfileSerializer(serializers.ModelSerializer):
         return None
     
     def get_profile_picture_url(self, obj):
-        """Get full URL for profile picture."""
-        if obj.profile_picture:
-            request = self.context.get('request')
-            if request:
-                return request.build_absolute_uri(obj.profile_picture.url)
-            return obj.profile_picture.url
-        return None
+        """Get full URL for profile picture (largest processed size)."""
+        return variant_url(obj, picture_sizes()[-1], self.context.get('request'))
+    
+    def get_profile_picture_urls(self, obj):
+        """Get URLs for profile picture by size in pixels."""
+        return variant_urls(obj, self.context.get('request'))
 
 
 class UserProfileSerializer(serializers.Serializer):
@@ -233,16 +294,18 @@ class AccessRequestSerializer(serializers.ModelSerializer):
     
     patient_name = serializers.CharField(source='patient.full_name', read_only=True)
     patient_health_id = serializers.CharField(source='patient.health_id', read_only=True)
+    patient_picture_url = serializers.SerializerMethodField()
     doctor_name = serializers.SerializerMethodField()
     doctor_hospital = serializers.SerializerMethodField()
+    doctor_picture_url = serializers.SerializerMethodField()
     access_type_display = serializers.SerializerMethodField()
     status_display = serializers.SerializerMethodField()
     
     class Meta:
         model = AccessRequest
         fields = [
-            'id', 'patient_name', 'patient_health_id',
-            'doctor_name', 'doctor_hospital', 'doctor_id_requested',
+            'id', 'patient_name', 'patient_health_id', 'patient_picture_url',
+            'doctor_name', 'doctor_hospital', 'doctor_picture_url', 'doctor_id_requested',
             'access_type', 'access_type_display',
             'status', 'status_display',
             'granted_at', 'expires_at', 'revoked_at'
@@ -259,6 +322,15 @@ class AccessRequestSerializer(serializers.ModelSerializer):
             return obj.doctor.hospital
         return None
     
+    def get_patient_picture_url(self, obj):
+        # Lists show many avatars at once: the smallest size
+        return variant_url(obj.patient, picture_sizes()[0], self.context.get('request'))
+    
+    def get_doctor_picture_url(self, obj):
+        if obj.doctor:
+            return variant_url(obj.doctor, picture_sizes()[0], self.context.get('request'))
+        return None
+    
     def get_access_type_display(self, obj):
         return dict(AccessRequest.ACCESS_TYPE_CHOICES).get(obj.access_type, obj.access_type)
     
@@ -291,7 +363,11 @@ class CreateAccessRequestSerializer(serializers.Serializer):
             try:
                 doctor = DoctorProfile.objects.get(doctor_id=doctor_id)
             except DoctorProfile.DoesNotExist:
-                pass  # Save the doctor_id_requested for later
+                # Save the doctor_id_requested for later, unless no doctor
+                # can ever be issued it
+                error = mistyped_id_error(doctor_id, 'Doctor ID')
+                if error:
+                    raise serializers.ValidationError({'doctor_id': [error]})
         
         # Check for existing request
         if doctor:
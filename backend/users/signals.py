@@ -0,0 +1,43 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .access import invalidate_access_on_commit
+from .authentication import invalidate_auth_state
+from .content_store import release
+from .images import delete_variants, schedule_profile_picture
+from .models import AccessRequest, DoctorProfile, PatientProfile, User
+
+
+@receiver(post_save, sender=AccessRequest)
+@receiver(post_delete, sender=AccessRequest)
+def invalidate_access_decision(sender, instance, using=None, **kwargs):
+    # Grants, revocations and expiry changes all go through save()
+    if instance.doctor_id is not None:
+        invalidate_access_on_commit(instance.patient_id, instance.doctor_id, using=using)
+
+
+@receiver(post_delete, sender=DoctorProfile)
+def release_certificate(sender, instance, **kwargs):
+    release(instance.certificate_sha256, instance.certificate.storage)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_user_auth_state(sender, instance, **kwargs):
+    # Deactivation, role and password changes must reach cached principals
+    invalidate_auth_state(instance.pk)
+
+
+@receiver(post_save, sender=PatientProfile)
+@receiver(post_save, sender=DoctorProfile)
+def schedule_picture_variants(sender, instance, **kwargs):
+    # Variants are rebuilt whenever the picture differs from the one they came from
+    source = instance.profile_picture.name if instance.profile_picture else ''
+    if source != (instance.profile_picture_variants or {}).get('source', ''):
+        schedule_profile_picture(instance)
+
+
+@receiver(post_delete, sender=PatientProfile)
+@receiver(post_delete, sender=DoctorProfile)
+def delete_profile_picture_variants(sender, instance, **kwargs):
+    delete_variants(instance.profile_picture_variants)
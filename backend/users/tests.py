@@ -0,0 +1,476 @@
+import os
+import shutil
+import tempfile
+from io import BytesIO, StringIO
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import DatabaseError, IntegrityError, connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework import serializers
+from PIL import Image
+from rest_framework.test import APIClient
+
+from . import access, authentication, content_store, images
+from .bulk import register_patients
+from .identifiers import BASE_DIGITS, SCHEMES, IdentifierAllocator, format_identifier, has_valid_check_digit
+from .models import AccessRequest, ContentBlob, DoctorProfile, IdentifierSequence, PatientProfile, User
+from .serializers import CustomTokenObtainPairSerializer, DoctorRegisterSerializer, PatientRegisterSerializer
+
+
+def create_patient(email='patient@example.com'):
+    user = User.objects.create_user(email=email, password='Secret-pass-1', role='PATIENT')
+    return PatientProfile.objects.create(user=user, first_name='Pat', last_name='Ient')
+
+
+def create_doctor(email='doctor@example.com', license_number='LIC-1'):
+    user = User.objects.create_user(email=email, password='Secret-pass-1', role='DOCTOR')
+    return DoctorProfile.objects.create(
+        user=user,
+        first_name='Doc',
+        last_name='Tor',
+        medical_license=license_number,
+        specialization='General',
+        hospital='General Hospital'
+    )
+
+
+class AccessCacheTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        access._local_cache.clear()
+        self.patient = create_patient()
+        self.doctor = create_doctor()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.grant = AccessRequest.objects.create(
+                patient=self.patient,
+                doctor=self.doctor,
+                access_type='FULL',
+                status='APPROVED'
+            )
+
+    def test_revoke_is_seen_by_the_next_read(self):
+        client = APIClient()
+        client.force_authenticate(self.doctor.user)
+        url = f'/api/patients/{self.patient.health_id}/records/'
+        self.assertEqual(client.get(url).status_code, 200)
+
+        patient_client = APIClient()
+        patient_client.force_authenticate(self.patient.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = patient_client.post(f'/api/auth/access/{self.grant.pk}/revoke/')
+        self.assertEqual(response.status_code, 200)
+
+        self.assertEqual(client.get(url).status_code, 403)
+        self.assertFalse(access.doctor_has_access(self.patient.pk, self.doctor.pk))
+
+    def test_invalidation_waits_for_commit(self):
+        self.assertTrue(access.doctor_has_access(self.patient.pk, self.doctor.pk))
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.grant.status = 'REVOKED'
+            self.grant.save()
+        self.assertEqual(len(callbacks), 1)
+
+        # Other connections still see the grant, so the cache must too
+        self.assertTrue(access.doctor_has_access(self.patient.pk, self.doctor.pk))
+        callbacks[0]()
+        self.assertFalse(access.doctor_has_access(self.patient.pk, self.doctor.pk))
+
+    def test_load_overlapping_a_revoke_is_not_cached(self):
+        load_decision = access._load_decision
+
+        def load_then_revoke(patient_id, doctor_id):
+            # Read the grant, then let the revoke commit before the result is cached
+            decision = load_decision(patient_id, doctor_id)
+            with self.captureOnCommitCallbacks(execute=True):
+                self.grant.status = 'REVOKED'
+                self.grant.save()
+            return decision
+
+        with mock.patch.object(access, '_load_decision', side_effect=load_then_revoke):
+            self.assertTrue(access.doctor_has_access(self.patient.pk, self.doctor.pk))
+        self.assertFalse(access.doctor_has_access(self.patient.pk, self.doctor.pk))
+
+    def test_invalidating_another_pair_does_not_skip_the_local_cache(self):
+        other = create_patient('other@example.com')
+        load_decision = access._load_decision
+
+        def load_then_invalidate_other(patient_id, doctor_id):
+            decision = load_decision(patient_id, doctor_id)
+            access.invalidate_access(other.pk, self.doctor.pk)
+            return decision
+
+        with mock.patch.object(access, '_load_decision', side_effect=load_then_invalidate_other):
+            self.assertTrue(access.doctor_has_access(self.patient.pk, self.doctor.pk))
+        with self.assertNumQueries(0):
+            self.assertTrue(access.doctor_has_access(self.patient.pk, self.doctor.pk))
+
+
+class IdentifierTests(TestCase):
+
+    def test_schemes_do_not_share_bodies(self):
+        for value in (0, 1, 12345, 16 ** 7 + 5):
+            health_id = format_identifier(SCHEMES['health_id'][0], value)
+            doctor_id = format_identifier(SCHEMES['doctor_id'][0], value)
+            self.assertNotEqual(health_id.partition('-')[2], doctor_id.partition('-')[2])
+            self.assertTrue(has_valid_check_digit(health_id))
+            self.assertTrue(has_valid_check_digit(doctor_id))
+
+    def test_profiles_get_distinct_bodies(self):
+        patient = create_patient()
+        doctor = create_doctor()
+        self.assertRegex(patient.health_id, r'^HID-[0-9A-F]{4}-[0-9A-F]{4}$')
+        self.assertRegex(doctor.doctor_id, r'^DOC-[0-9A-F]{4}-[0-9A-F]{4}$')
+        self.assertNotEqual(patient.health_id[4:], doctor.doctor_id[4:])
+
+    def test_mistyped_ids_are_called_out(self):
+        patient = create_patient()
+        doctor_client = APIClient()
+        doctor_client.force_authenticate(create_doctor().user)
+        health_id = patient.health_id
+        typo = health_id[:-1] + format(int(health_id[-1], 16) ^ 1, 'X')
+        self.assertFalse(has_valid_check_digit(typo))
+
+        response = doctor_client.get(f'/api/auth/patients/{typo}/')
+        self.assertEqual(response.status_code, 404)
+        self.assertIn('looks mistyped', response.json()['error'])
+        # A well-formed ID that isn't registered is just not found
+        unused = format_identifier('HID', 10 ** 6)
+        self.assertEqual(doctor_client.get(f'/api/auth/patients/{unused}/').json()['error'], "Patient not found")
+
+        patient_client = APIClient()
+        patient_client.force_authenticate(patient.user)
+        response = patient_client.post('/api/auth/access/', {'doctor_id': 'DOC-1234-5678'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('looks mistyped', response.json()['doctor_id'][0])
+        # An unregistered but valid doctor ID is kept for later
+        pending = format_identifier('DOC', 10 ** 6)
+        response = patient_client.post('/api/auth/access/', {'doctor_id': pending})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(AccessRequest.objects.get(doctor__isnull=True).doctor_id_requested, pending)
+
+
+@override_settings(ID_BLOCK_SIZE=3)
+class IdentifierAllocationTests(TransactionTestCase):
+    """Blocks are only cached in autocommit mode, so this runs outside a test transaction."""
+
+    def setUp(self):
+        self.health = IdentifierAllocator('health_id')
+        self.doctor = IdentifierAllocator('doctor_id')
+
+    def next_value(self, name):
+        return IdentifierSequence.objects.get(name=name).next_value
+
+    def test_allocation_across_block_boundaries_and_schemes(self):
+        health_ids = self.health.allocate(2)
+        doctor_ids = self.doctor.allocate(1)
+        self.assertEqual((self.next_value('health_id'), self.next_value('doctor_id')), (3, 3))
+
+        # One left in the block, so two more reserve the next block
+        health_ids += self.health.allocate(2)
+        self.assertEqual(self.next_value('health_id'), 6)
+        health_ids += [self.health.allocate(1)[0] for _ in range(3)]
+        # Two cached doctor IDs plus one block of three covers five
+        doctor_ids += self.doctor.allocate(5)
+        self.assertEqual((self.next_value('health_id'), self.next_value('doctor_id')), (9, 6))
+
+        self.assertEqual(len(set(health_ids)), 7)
+        self.assertEqual(len(set(doctor_ids)), 6)
+        # Sequence values 0-5 are issued in both schemes, as different bodies
+        self.assertFalse({i[4:] for i in health_ids} & {i[4:] for i in doctor_ids})
+        for identifier in health_ids + doctor_ids:
+            self.assertRegex(identifier, r'^(HID|DOC)-[0-9A-F]{4}-[0-9A-F]{4}$')
+            self.assertTrue(has_valid_check_digit(identifier))
+
+    def test_block_crossing_into_the_longer_tier(self):
+        IdentifierSequence.objects.create(name='health_id', next_value=16 ** BASE_DIGITS - 2)
+        health_ids = self.health.allocate(4)
+        self.assertEqual([len(i) for i in health_ids], [13, 13, 14, 14])
+        self.assertEqual(len(set(health_ids)), 4)
+        self.assertTrue(all(has_valid_check_digit(i) for i in health_ids))
+
+    def test_block_skips_ids_already_taken(self):
+        taken = format_identifier('HID', 1)
+        patient = create_patient()
+        PatientProfile.objects.filter(pk=patient.pk).update(health_id=taken)
+        IdentifierSequence.objects.filter(name='health_id').update(next_value=0)
+
+        health_ids = self.health.allocate(3)
+        self.assertNotIn(taken, health_ids)
+        self.assertEqual(health_ids[:1], [format_identifier('HID', 0)])
+
+
+class ClaimsAuthenticationTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        authentication._local_cache.clear()
+        self.patient = create_patient()
+        token = CustomTokenObtainPairSerializer.get_token(self.patient.user).access_token
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def test_authenticated_read_skips_user_queries(self):
+        self.assertEqual(self.client.get('/api/auth/stats/').status_code, 200)  # Warms the state cache
+
+        # Only the stats row; no users_user or profile lookup
+        with CaptureQueriesContext(connection) as queries:
+            with self.assertNumQueries(1):
+                response = self.client.get('/api/auth/stats/')
+        self.assertEqual(response.status_code, 200)
+        for query in queries.captured_queries:
+            self.assertNotIn('"users_user"', query['sql'])
+            self.assertNotIn('"users_patientprofile"', query['sql'])
+
+    def test_deactivated_user_is_rejected(self):
+        self.assertEqual(self.client.get('/api/auth/stats/').status_code, 200)
+        user = self.patient.user
+        user.is_active = False
+        user.save()
+        response = self.client.get('/api/auth/stats/')
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response.json()['code'], 'user_inactive')
+
+    def test_password_change_invalidates_token(self):
+        self.assertEqual(self.client.get('/api/auth/stats/').status_code, 200)
+        user = self.patient.user
+        user.set_password('Another-pass-2')
+        user.save()
+        response = self.client.get('/api/auth/stats/')
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response.json()['code'], 'password_changed')
+
+    def test_unknown_attributes_raise_instead_of_querying(self):
+        token = CustomTokenObtainPairSerializer.get_token(self.patient.user).access_token
+        user = authentication.ClaimsJWTAuthentication().get_user(token)
+        with self.assertNumQueries(0):
+            self.assertEqual((user.role, user.email), ('PATIENT', 'patient@example.com'))
+            self.assertEqual(user.patient_profile.pk, self.patient.pk)
+            with self.assertRaisesMessage(AttributeError, "has no attribute 'phone'"):
+                user.phone
+            self.assertFalse(hasattr(user, 'blockchain_id'))
+
+        # The row is loaded only when asked for
+        with self.assertNumQueries(1):
+            self.assertEqual(user.user.blockchain_id, self.patient.user.blockchain_id)
+
+    def test_profile_endpoint_reads_user_columns_through_the_profile(self):
+        response = self.client.get('/api/auth/profile/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['profile']['blockchain_id'], self.patient.user.blockchain_id)
+
+
+class RegistrationRollbackTests(TestCase):
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        self.enterContext(override_settings(MEDIA_ROOT=media_root))
+        self.media_root = media_root
+
+    def patient_data(self, **fields):
+        return {'email': 'new@example.com', 'password': 'Secret-pass-1',
+                'first_name': 'New', 'last_name': 'Patient', **fields}
+
+    def doctor_data(self, **fields):
+        return {**self.patient_data(), 'medical_license': 'LIC-9', 'specialization': 'General',
+                'hospital': 'General Hospital', **fields}
+
+    def register(self, serializer_class, data):
+        serializer = serializer_class(data=data)
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+        return serializer.save()
+
+    def assertNothingRegistered(self):
+        self.assertFalse(User.objects.exists())
+        self.assertFalse(PatientProfile.objects.exists())
+        self.assertFalse(DoctorProfile.objects.exists())
+
+    def test_failed_wallet_id_creates_no_user(self):
+        with mock.patch('users.ipfs_service.generate_blockchain_id', side_effect=RuntimeError('keccak')):
+            with self.assertRaises(RuntimeError):
+                self.register(PatientRegisterSerializer, self.patient_data())
+        self.assertNothingRegistered()
+
+    def test_failed_patient_profile_rolls_back_the_user(self):
+        with mock.patch.object(PatientProfile.objects, 'create', side_effect=IntegrityError):
+            with self.assertRaises(serializers.ValidationError):
+                self.register(PatientRegisterSerializer, self.patient_data())
+        self.assertNothingRegistered()
+
+        # The same email can register once the failure is gone
+        user = self.register(PatientRegisterSerializer, self.patient_data())
+        self.assertTrue(user.blockchain_id)
+        self.assertEqual(PatientProfile.objects.get().user, user)
+
+    def test_failed_doctor_profile_rolls_back_the_user_and_releases_the_certificate(self):
+        certificate = SimpleUploadedFile('licence.pdf', b'certificate bytes', 'application/pdf')
+        with self.captureOnCommitCallbacks(execute=True):
+            with mock.patch.object(DoctorProfile.objects, 'create', side_effect=DatabaseError('disk full')):
+                with self.assertRaises(DatabaseError):
+                    self.register(DoctorRegisterSerializer, self.doctor_data(certificate=certificate))
+        self.assertNothingRegistered()
+        self.assertFalse(ContentBlob.objects.exists())
+        stored = [name for _, _, names in os.walk(self.media_root) for name in names]
+        self.assertEqual(stored, [])
+
+
+class ContentStoreReleaseTests(TestCase):
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        self.enterContext(override_settings(MEDIA_ROOT=media_root))
+        self.field = DoctorProfile._meta.get_field('certificate')
+        self.unpin = self.enterContext(
+            mock.patch.object(content_store.ipfs_service, 'unpin', return_value={'success': True})
+        )
+
+    def store(self):
+        upload = SimpleUploadedFile('licence.pdf', b'certificate bytes', 'application/pdf')
+        return content_store.store_upload(upload, self.field)
+
+    def test_last_reference_deletes_the_file_and_unpins(self):
+        blob = self.store()
+        ContentBlob.objects.filter(pk=blob.pk).update(cid='QmShared')
+        with self.captureOnCommitCallbacks(execute=True):
+            content_store.release(blob.sha256, self.field.storage)
+        self.assertFalse(self.field.storage.exists(blob.path))
+        self.unpin.assert_called_once_with('QmShared')
+
+    def test_content_stored_again_before_cleanup_is_kept(self):
+        blob = self.store()
+        ContentBlob.objects.filter(pk=blob.pk).update(cid='QmShared')
+        with self.captureOnCommitCallbacks() as callbacks:
+            content_store.release(blob.sha256, self.field.storage)
+
+        # The same bytes arrive again before the cleanup runs
+        recreated = self.store()
+        callbacks[0]()
+        self.assertFalse(self.field.storage.exists(blob.path))
+        self.assertTrue(self.field.storage.exists(recreated.path))
+        self.unpin.assert_not_called()
+
+    def test_recreated_blob_on_the_same_path_keeps_its_file(self):
+        blob = self.store()
+        with self.captureOnCommitCallbacks() as callbacks:
+            content_store.release(blob.sha256, self.field.storage)
+        ContentBlob.objects.create(sha256=blob.sha256, path=blob.path, size=blob.size, refcount=1)
+        callbacks[0]()
+        self.assertTrue(self.field.storage.exists(blob.path))
+
+
+class BulkRegisterTests(TestCase):
+
+    def test_bad_row_is_reported_and_good_rows_are_created(self):
+        create_patient('taken@example.com')
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False) as csv_file:
+            csv_file.write(
+                'email,password,first_name,last_name,age,phone\n'
+                'one@example.com,Secret-pass-1,One,Patient,30,\n'
+                'not-an-email,Secret-pass-1,Bad,Row,,\n'
+                'two@example.com,Secret-pass-1,Two,Patient,,555-0102\n'
+                'taken@example.com,Secret-pass-1,Taken,Email,,\n'
+            )
+        self.addCleanup(os.unlink, csv_file.name)
+
+        stdout, stderr = StringIO(), StringIO()
+        call_command('bulk_register', csv_file.name, '--workers', '1', stdout=stdout, stderr=stderr)
+
+        self.assertIn('Registered 2 patients (2 failed)', stdout.getvalue())
+        errors = stderr.getvalue().splitlines()
+        self.assertEqual(len(errors), 2)
+        self.assertTrue(errors[0].startswith('line 3: {"email"'), errors[0])
+        self.assertTrue(errors[1].startswith('line 5: {"email": ["Email already registered."]'), errors[1])
+
+        created = PatientProfile.objects.filter(user__email__in=['one@example.com', 'two@example.com'])
+        self.assertEqual(
+            sorted(created.values_list('first_name', 'age', 'user__phone')),
+            [('One', 30, ''), ('Two', None, '555-0102')]
+        )
+        self.assertTrue(all(profile.health_id.startswith('HID-') for profile in created))
+
+    def test_duplicate_emails_in_a_batch_keep_the_first(self):
+        row = {'password': 'Secret-pass-1', 'first_name': 'Pat', 'last_name': 'Ient'}
+        results = register_patients([
+            {**row, 'email': 'same@example.com'},
+            {**row, 'email': 'same@example.com'},
+        ])
+        self.assertEqual([result['status'] for result in results], ['created', 'error'])
+        self.assertEqual(results[1]['errors'], {'email': ["Duplicate email in this batch."]})
+        self.assertEqual(User.objects.filter(email='same@example.com').count(), 1)
+
+
+def picture_upload(name='photo.png', size=(60, 30), color='red'):
+    buffer = BytesIO()
+    Image.new('RGB', size, color).save(buffer, 'PNG')
+    return SimpleUploadedFile(name, buffer.getvalue(), 'image/png')
+
+
+@override_settings(PROFILE_PICTURE_SIZES=(16, 32), PROFILE_PICTURE_ASYNC=False)
+class ProfilePictureTests(TestCase):
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        self.enterContext(override_settings(MEDIA_ROOT=media_root))
+        self.variant_dir = os.path.join(media_root, images.VARIANT_DIR)
+        self.patient = create_patient()
+
+    def upload(self, **kwargs):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.patient.profile_picture = picture_upload(**kwargs)
+            self.patient.save()
+        self.patient.refresh_from_db()
+
+    def test_upload_builds_square_webp_variants(self):
+        before = PatientProfile.objects.get(pk=self.patient.pk).updated_at
+        self.upload()
+
+        variants = self.patient.profile_picture_variants
+        self.assertEqual(variants['source'], self.patient.profile_picture.name)
+        self.assertEqual(sorted(variants['sizes']), ['16', '32'])
+        for size, name in variants['sizes'].items():
+            with Image.open(os.path.join(self.variant_dir, os.path.basename(name))) as variant:
+                self.assertEqual((variant.format, variant.size), ('WEBP', (int(size), int(size))))
+        # The variants are part of the payload, so ETags must move
+        self.assertGreater(self.patient.updated_at, before)
+        self.assertEqual(images.variant_url(self.patient, 16), f"/media/{variants['sizes']['16']}")
+
+    def test_unchanged_picture_is_skipped(self):
+        self.upload()
+        stamp = self.patient.updated_at
+        with self.assertNumQueries(1):
+            self.assertFalse(images.process_profile_picture(PatientProfile, self.patient.pk))
+        self.patient.refresh_from_db()
+        self.assertEqual(self.patient.updated_at, stamp)
+        self.assertEqual(len(os.listdir(self.variant_dir)), 2)
+
+    def test_variants_of_a_replaced_picture_are_discarded(self):
+        self.upload()
+        first = self.patient.profile_picture_variants
+        render = images.render_variants
+
+        def replaced_while_rendering(*args):
+            # Another upload lands before this job stores its variants
+            PatientProfile.objects.filter(pk=self.patient.pk).update(profile_picture='profile_pictures/newer.png')
+            return render(*args)
+
+        self.patient.profile_picture = picture_upload('second.png', color='blue')
+        with mock.patch.object(images, 'render_variants', side_effect=replaced_while_rendering):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.patient.save()
+        self.patient.refresh_from_db()
+
+        self.assertEqual(self.patient.profile_picture.name, 'profile_pictures/newer.png')
+        self.assertEqual(self.patient.profile_picture_variants, first)
+        self.assertEqual(
+            sorted(os.listdir(self.variant_dir)),
+            sorted(os.path.basename(name) for name in first['sizes'].values())
+        )
+        # Only the first picture's variants are current; the replacement falls back to the original
+        self.assertEqual(images.current_variants(self.patient), {})
@@ -8,6 +8,7 @@ from .views import (
     PatientSearchView,
     DashboardStatsView,
     IPFSVerifyView,
+    IPFSPoolStatsView,
     AccessRequestView,
     RevokeAccessView,
 )
@@ -36,4 +37,5 @@ urlpatterns = [
     
     # IPFS verification
     path('ipfs/verify/<str:cid>/', IPFSVerifyView.as_view(), name='ipfs_verify'),
+    path('ipfs/pool/', IPFSPoolStatsView.as_view(), name='ipfs_pool_stats'),
 ]
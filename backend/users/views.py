@@ -1,7 +1,7 @@
 from rest_framework import status
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.permissions import AllowAny, IsAuthenticated, IsAdminUser
 from rest_framework_simplejwt.views import TokenObtainPairView
 from django.contrib.auth import get_user_model
 
@@ -15,6 +15,7 @@ from .serializers import (
     AccessRequestSerializer,
     CreateAccessRequestSerializer,
 )
+from .conditional import make_validators, queryset_validators, not_modified, with_validators
 
 User = get_user_model()
 
@@ -64,8 +65,31 @@ class ProfileView(APIView):
     permission_classes = [IsAuthenticated]
     
     def get(self, request):
-        serializer = UserProfileSerializer(request.user, context={'request': request})
-        return Response(serializer.data)
+        user = request.user
+        if user.role == 'PATIENT' and hasattr(user, 'patient_profile'):
+            profile = user.patient_profile
+        elif user.role == 'DOCTOR' and hasattr(user, 'doctor_profile'):
+            profile = user.doctor_profile
+        else:
+            profile = None
+        
+        if profile:
+            # The payload is the profile row plus a few user columns; read them
+            # through profile.user, which the serializer reuses
+            account = profile.user
+            validators = make_validators(
+                profile.updated_at,
+                user.role, profile.pk, account.email, account.phone, account.blockchain_id
+            )
+        else:
+            # Only the role and email are returned
+            validators = make_validators(None, user.role, user.email)
+        cached = not_modified(request, validators)
+        if cached is not None:
+            return cached
+        
+        serializer = UserProfileSerializer(user, context={'request': request})
+        return with_validators(Response(serializer.data), validators)
     
     def put(self, request):
         user = request.user
@@ -95,8 +119,7 @@ class ProfileView(APIView):
             
             # Update phone on user if provided
             if 'phone' in request.data:
-                user.phone = request.data['phone']
-                user.save()
+                User.objects.filter(pk=user.pk).update(phone=request.data['phone'])
             
             return Response(serializer.data)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
@@ -110,47 +133,32 @@ class DashboardStatsView(APIView):
         user = request.user
         
         if user.role == 'PATIENT' and hasattr(user, 'patient_profile'):
-            from records.models import MedicalRecord
+            from records.models import PatientRecordStats
             
-            records = MedicalRecord.objects.filter(patient=user.patient_profile)
-            total_records = records.count()
-            
-            # Get unique doctors who have created records for this patient
-            unique_doctors = records.values('doctor').distinct().count()
-            
-            # Get last visit date
-            last_record = records.first()
-            last_visit = last_record.created_at.isoformat() if last_record else None
-            
-            # Count hidden vs visible records
-            visible_count = records.filter(is_visible=True).count()
-            hidden_count = records.filter(is_visible=False).count()
+            # Counters are maintained on write; this is a primary-key lookup
+            stats = PatientRecordStats.objects.filter(
+                pk=user.patient_profile.pk
+            ).first() or PatientRecordStats()
             
             return Response({
-                'total_records': total_records,
-                'unique_doctors': unique_doctors,
-                'last_visit': last_visit,
-                'visible_records': visible_count,
-                'hidden_records': hidden_count
+                'total_records': stats.total_records,
+                'unique_doctors': stats.unique_doctors,
+                'last_visit': stats.last_visit.isoformat() if stats.last_visit else None,
+                'visible_records': stats.visible_records,
+                'hidden_records': stats.hidden_records
             })
             
         elif user.role == 'DOCTOR' and hasattr(user, 'doctor_profile'):
-            from records.models import MedicalRecord
-            
-            records = MedicalRecord.objects.filter(doctor=user.doctor_profile)
-            total_records = records.count()
+            from records.models import DoctorRecordStats
             
-            # Get unique patients this doctor has treated
-            unique_patients = records.values('patient').distinct().count()
-            
-            # Get last activity date
-            last_record = records.first()
-            last_activity = last_record.created_at.isoformat() if last_record else None
+            stats = DoctorRecordStats.objects.filter(
+                pk=user.doctor_profile.pk
+            ).first() or DoctorRecordStats()
             
             return Response({
-                'total_records': total_records,
-                'unique_patients': unique_patients,
-                'last_activity': last_activity
+                'total_records': stats.total_records,
+                'unique_patients': stats.unique_patients,
+                'last_activity': stats.last_activity.isoformat() if stats.last_activity else None
             })
         
         return Response(
@@ -179,8 +187,9 @@ class PatientSearchView(APIView):
                 "age": patient.age
             })
         except PatientProfile.DoesNotExist:
+            from .identifiers import mistyped_id_error
             return Response(
-                {"error": "Patient not found"}, 
+                {"error": mistyped_id_error(health_id, 'Health ID') or "Patient not found"}, 
                 status=status.HTTP_404_NOT_FOUND
             )
 
@@ -192,7 +201,7 @@ class IPFSVerifyView(APIView):
     def get(self, request, cid):
         from .ipfs_service import ipfs_service
         
-        result = ipfs_service.verify_cid(cid)
+        result = ipfs_service.verify_cid_cached(cid)
         
         if result.get('success'):
             return Response({
@@ -209,6 +218,16 @@ class IPFSVerifyView(APIView):
             }, status=status.HTTP_400_BAD_REQUEST)
 
 
+class IPFSPoolStatsView(APIView):
+    """Connection pool usage of the IPFS service in this process (staff only)."""
+    permission_classes = [IsAdminUser]
+    
+    def get(self, request):
+        from .ipfs_service import ipfs_service
+        
+        return Response(ipfs_service.pool_stats())
+
+
 class AccessRequestView(APIView):
     """Manage access requests between patients and doctors."""
     permission_classes = [IsAuthenticated]
@@ -222,8 +241,8 @@ class AccessRequestView(APIView):
         if user.role == 'PATIENT' and hasattr(user, 'patient_profile'):
             # Get access requests sent by this patient
             requests = AccessRequest.objects.filter(patient=user.patient_profile)
-            serializer = AccessRequestSerializer(requests, many=True)
-            return Response(serializer.data)
+            # Items show the doctor's name and hospital
+            related = 'doctor__updated_at'
             
         elif user.role == 'DOCTOR' and hasattr(user, 'doctor_profile'):
             # Get access requests received by this doctor (approved and revoked)
@@ -231,13 +250,21 @@ class AccessRequestView(APIView):
                 doctor=user.doctor_profile,
                 status__in=['APPROVED', 'REVOKED']
             )
-            serializer = AccessRequestSerializer(requests, many=True)
-            return Response(serializer.data)
+            related = 'patient__updated_at'
         
-        return Response(
-            {"error": "Invalid user role"},
-            status=status.HTTP_400_BAD_REQUEST
-        )
+        else:
+            return Response(
+                {"error": "Invalid user role"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        validators = queryset_validators(requests, fields=('updated_at', related))
+        cached = not_modified(request, validators)
+        if cached is not None:
+            return cached
+        
+        serializer = AccessRequestSerializer(requests.select_related('patient', 'doctor'), many=True)
+        return with_validators(Response(serializer.data), validators)
     
     def post(self, request):
         """Create a new access request (patients only)."""
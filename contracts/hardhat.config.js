@@ -11,9 +11,10 @@ module.exports = {
     defaultNetwork: 'cyprus1',
     networks: {
         cyprus1: {
-            url: process.env.RPC_URL,
-            accounts: [process.env.CYPRUS1_PK],
-            chainId: Number(process.env.CHAIN_ID),
+            // Defaults keep the config valid for local runs without a .env
+            url: process.env.RPC_URL || 'https://orchard.rpc.quai.network/cyprus1',
+            accounts: process.env.CYPRUS1_PK ? [process.env.CYPRUS1_PK] : [],
+            chainId: Number(process.env.CHAIN_ID || 15000),
         },
     },
 
@@ -0,0 +1,61 @@
+/**
+ * Deploy the contracts to a local Hardhat node and emit one of each event
+ * the backend indexes, so `manage.py index_chain` has something to read.
+ *
+ *   npx hardhat node
+ *   npx hardhat run scripts/deployLocal.js --network localhost
+ *   CHAIN_DEPLOYMENTS_FILE=../contracts/deployments.localhost.json python manage.py index_chain --once
+ */
+const fs = require('fs')
+const path = require('path')
+const { ethers, network } = require('hardhat')
+
+async function deploy(name, ...args) {
+    const contract = await ethers.deployContract(name, args)
+    await contract.waitForDeployment()
+    console.log(`   ✅ ${name}:`, await contract.getAddress())
+    return contract
+}
+
+async function main() {
+    const [owner, patient, doctor] = await ethers.getSigners()
+    const startBlock = await ethers.provider.getBlockNumber()
+
+    console.log('🚀 Deploying HealthSecure contracts to', network.name)
+    const identity = await deploy('HealthSecureIdentity')
+    const registry = await deploy('MedicalRecordRegistry', await identity.getAddress())
+    const access = await deploy('AccessControl', await identity.getAddress())
+
+    console.log('\n📝 Emitting sample events...')
+    const hash = (text) => ethers.keccak256(ethers.toUtf8Bytes(text))
+    await (await identity.connect(patient).registerPatient(hash('patient@example.com'), 'HID-TEST-0001', 'QmSampleProfile')).wait()
+    await (await identity.connect(doctor).registerDoctor(hash('doctor@example.com'), 'DOC-TEST-0001', 'QmSampleProfile')).wait()
+    await (await identity.connect(owner).verifyDoctor(doctor.address)).wait()
+    await (await registry.connect(doctor).createRecord(patient.address, hash('record'), 'QmSampleRecord', 2)).wait()
+    await (await registry.connect(patient).toggleVisibility(0)).wait()
+    await (await access.connect(patient).grantAccess(doctor.address, 0)).wait()
+    await (await access.connect(patient).revokeAccess(doctor.address)).wait()
+
+    const deploymentInfo = {
+        network: network.name,
+        chainId: String(network.config.chainId ?? (await ethers.provider.getNetwork()).chainId),
+        deployer: owner.address,
+        startBlock,
+        timestamp: new Date().toISOString(),
+        contracts: {
+            HealthSecureIdentity: await identity.getAddress(),
+            MedicalRecordRegistry: await registry.getAddress(),
+            AccessControl: await access.getAddress()
+        }
+    }
+    const output = path.join(__dirname, '..', `deployments.${network.name}.json`)
+    fs.writeFileSync(output, JSON.stringify(deploymentInfo, null, 2))
+    console.log('\n📁 Deployment info saved to', path.basename(output))
+}
+
+main()
+    .then(() => process.exit(0))
+    .catch((error) => {
+        console.error('❌ Deployment failed:', error)
+        process.exit(1)
+    })
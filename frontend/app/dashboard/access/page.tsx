@@ -14,8 +14,8 @@ import { Select, SelectContent, SelectItem, SelectTrigger, SelectValue } from '@
 import { useAuth } from '@/hooks/useAuth'
 import {
   PatientProfile,
-  MedicalRecord,
-  getRecords,
+  DoctorRecordSummary,
+  getDoctorSummary,
   AccessRequest,
   getAccessRequests,
   createAccessRequest,
@@ -57,9 +57,9 @@ export default function AccessControlPage() {
         setIsLoadingRecords(true)
         setError(null)
 
-        // Fetch both records and access requests
-        const [records, accessRequests] = await Promise.all([
-          getRecords(),
+        // Fetch both the per-doctor record summary and access requests
+        const [summary, accessRequests] = await Promise.all([
+          getDoctorSummary(),
           getAccessRequests()
         ])
 
@@ -92,30 +92,30 @@ export default function AccessControlPage() {
           }
         })
 
-        // Then merge with records data
-        records.forEach((record: MedicalRecord, index: number) => {
-          const doctorKey = record.doctor_name
+        // Then merge with the record summary
+        summary.forEach((row: DoctorRecordSummary, index: number) => {
+          const doctorKey = row.name
 
           if (doctorMap.has(doctorKey)) {
             // Update existing doctor
             const existing = doctorMap.get(doctorKey)!
-            existing.recordCount += 1
-            existing.hospital = record.hospital
-            existing.specialization = record.record_type_display
+            existing.recordCount = row.record_count
+            existing.hospital = row.hospital
+            existing.specialization = row.specialization
           } else {
             // Add new doctor from records (implicit access)
             doctorMap.set(doctorKey, {
               id: 1000 + index,
-              doctorName: record.doctor_name,
-              specialization: record.record_type_display,
-              hospital: record.hospital,
+              doctorName: row.name,
+              specialization: row.specialization,
+              hospital: row.hospital,
               accessType: 'Full',
-              grantedDate: new Date(record.created_at).toLocaleDateString('en-US', {
+              grantedDate: new Date(row.last_record_at).toLocaleDateString('en-US', {
                 year: 'numeric',
                 month: 'short',
                 day: 'numeric'
               }),
-              recordCount: 1,
+              recordCount: row.record_count,
               status: 'APPROVED'
             })
           }
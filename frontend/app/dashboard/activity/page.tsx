@@ -1,13 +1,13 @@
 'use client'
 
-import { useState, useEffect } from 'react'
 import { DashboardLayout } from '@/components/dashboard/dashboard-layout'
 import { Card, CardContent, CardHeader, CardTitle } from '@/components/ui/card'
 import { Badge } from '@/components/ui/badge'
 import { Button } from '@/components/ui/button'
 import { Eye, Download, UserPlus, UserMinus, FileText, Shield, Loader2, AlertCircle, Activity } from 'lucide-react'
 import { useAuth } from '@/hooks/useAuth'
-import { PatientProfile, MedicalRecord, getRecords } from '@/lib/api'
+import { useRecordPages } from '@/hooks/useRecordPages'
+import { PatientProfile, MedicalRecord } from '@/lib/api'
 
 interface ActivityLog {
   id: number
@@ -82,42 +82,25 @@ const formatRelativeTime = (dateString: string): string => {
 export default function ActivityLogsPage() {
   const { isLoading: authLoading, user, profile } = useAuth('PATIENT')
   const patientProfile = profile as PatientProfile | null
-  const [activityLogs, setActivityLogs] = useState<ActivityLog[]>([])
-  const [isLoadingRecords, setIsLoadingRecords] = useState(true)
-  const [error, setError] = useState<string | null>(null)
-
-  // Fetch records and generate activity logs
-  useEffect(() => {
-    async function fetchRecords() {
-      try {
-        setIsLoadingRecords(true)
-        setError(null)
-        const records = await getRecords()
-
-        // Generate activity logs from records
-        const logs: ActivityLog[] = records.map((record: MedicalRecord, index: number) => ({
-          id: record.id,
-          type: 'create',
-          action: 'Medical record added',
-          user: record.doctor_name,
-          details: `${record.record_type_display} - ${record.diagnosis}`,
-          timestamp: formatRelativeTime(record.created_at),
-          verified: !!record.ipfs_cid || !!record.ipfs_metadata_cid
-        }))
-
-        // Sort by most recent first (records should already be sorted, but ensure it)
-        setActivityLogs(logs)
-      } catch (err) {
-        setError(err instanceof Error ? err.message : 'Failed to load activity logs')
-      } finally {
-        setIsLoadingRecords(false)
-      }
-    }
-
-    if (!authLoading) {
-      fetchRecords()
-    }
-  }, [authLoading])
+  const {
+    records,
+    hasMore,
+    isLoading: isLoadingRecords,
+    isLoadingMore,
+    error,
+    loadMore
+  } = useRecordPages(!authLoading)
+
+  // Generate activity logs from the loaded pages, which arrive newest first
+  const activityLogs: ActivityLog[] = records.map((record: MedicalRecord) => ({
+    id: record.id,
+    type: 'create',
+    action: 'Medical record added',
+    user: record.doctor_name,
+    details: `${record.record_type_display} - ${record.diagnosis}`,
+    timestamp: formatRelativeTime(record.created_at),
+    verified: !!record.ipfs_cid || !!record.ipfs_metadata_cid
+  }))
 
   const verifiedCount = activityLogs.filter(l => l.verified).length
 
@@ -226,6 +209,14 @@ export default function ActivityLogsPage() {
                 })}
               </div>
             )}
+            {hasMore && (
+              <div className="flex justify-center mt-4">
+                <Button variant="outline" onClick={loadMore} disabled={isLoadingMore}>
+                  {isLoadingMore && <Loader2 className="w-4 h-4 mr-2 animate-spin" />}
+                  Load older activity
+                </Button>
+              </div>
+            )}
           </CardContent>
         </Card>
       </div>
@@ -11,8 +11,8 @@ import { Input } from '@/components/ui/input'
 import { useAuth } from '@/hooks/useAuth'
 import {
     DoctorProfile,
-    MedicalRecord,
-    getRecords,
+    PatientRecordSummary,
+    getPatientSummary,
     searchPatient,
     AccessRequest,
     getAccessRequests
@@ -66,9 +66,9 @@ export default function DoctorAccessControlPage() {
                 setIsLoadingRecords(true)
                 setError(null)
 
-                // Fetch both records and access requests
-                const [records, accessRequests] = await Promise.all([
-                    getRecords(),
+                // Fetch both the per-patient record summary and access requests
+                const [summary, accessRequests] = await Promise.all([
+                    getPatientSummary(),
                     getAccessRequests()
                 ])
 
@@ -97,28 +97,28 @@ export default function DoctorAccessControlPage() {
                     }
                 })
 
-                // Then merge with records data
-                records.forEach((record: MedicalRecord, index: number) => {
-                    const patientKey = record.patient_health_id
+                // Then merge with the record summary
+                summary.forEach((row: PatientRecordSummary, index: number) => {
+                    const patientKey = row.health_id
 
                     if (patientMap.has(patientKey)) {
                         // Update existing patient
                         const existing = patientMap.get(patientKey)!
-                        existing.recordCount += 1
+                        existing.recordCount = row.record_count
                         // Update last access if more recent
                         const existingDate = new Date(existing.lastAccess)
-                        const recordDate = new Date(record.created_at)
+                        const recordDate = new Date(row.last_record_at)
                         if (recordDate > existingDate) {
-                            existing.lastAccess = record.created_at
+                            existing.lastAccess = row.last_record_at
                         }
                     } else {
                         // Add new patient from records
                         patientMap.set(patientKey, {
                             id: 1000 + index,
-                            patientName: record.patient_name,
-                            healthId: record.patient_health_id,
-                            recordCount: 1,
-                            lastAccess: record.created_at,
+                            patientName: row.name,
+                            healthId: row.health_id,
+                            recordCount: row.record_count,
+                            lastAccess: row.last_record_at,
                             accessType: 'Full',
                             fromAccessRequest: false,
                             status: 'APPROVED'
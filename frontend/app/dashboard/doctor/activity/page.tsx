@@ -15,7 +15,8 @@ import {
 } from '@/components/ui/select'
 import { FileText, UserPlus, Edit, Eye, Clock, ShieldCheck, Loader2, AlertCircle, Activity } from 'lucide-react'
 import { useAuth } from '@/hooks/useAuth'
-import { DoctorProfile, MedicalRecord, getRecords } from '@/lib/api'
+import { useRecordPages } from '@/hooks/useRecordPages'
+import { DoctorProfile, MedicalRecord, getDashboardStats } from '@/lib/api'
 
 interface ActivityItem {
   id: number
@@ -45,45 +46,38 @@ const formatRelativeTime = (dateString: string): string => {
 export default function DoctorActivityPage() {
   const { isLoading: authLoading, user, profile } = useAuth('DOCTOR')
   const doctorProfile = profile as DoctorProfile | null
-  const [activities, setActivities] = useState<ActivityItem[]>([])
-  const [isLoadingRecords, setIsLoadingRecords] = useState(true)
-  const [error, setError] = useState<string | null>(null)
+  const {
+    records,
+    hasMore,
+    isLoading: isLoadingRecords,
+    isLoadingMore,
+    error,
+    loadMore
+  } = useRecordPages(!authLoading)
+  const [totalRecords, setTotalRecords] = useState<number | null>(null)
   const [filterType, setFilterType] = useState('all')
   const [filterTime, setFilterTime] = useState('all')
 
-  // Fetch records and generate activity
   useEffect(() => {
-    async function fetchRecords() {
-      try {
-        setIsLoadingRecords(true)
-        setError(null)
-        const records = await getRecords()
-
-        // Generate activity from records
-        const activityItems: ActivityItem[] = records.map((record: MedicalRecord) => ({
-          id: record.id,
-          type: 'record_added',
-          title: `Added ${record.record_type_display}`,
-          patient: record.patient_name,
-          patientId: record.patient_health_id,
-          description: record.diagnosis,
-          timestamp: formatRelativeTime(record.created_at),
-          status: record.ipfs_cid || record.ipfs_metadata_cid ? 'verified' : 'completed'
-        }))
-
-        setActivities(activityItems)
-      } catch (err) {
-        setError(err instanceof Error ? err.message : 'Failed to load activity')
-      } finally {
-        setIsLoadingRecords(false)
-      }
-    }
-
     if (!authLoading) {
-      fetchRecords()
+      getDashboardStats()
+        .then(stats => setTotalRecords(stats.total_records ?? null))
+        .catch(console.error)
     }
   }, [authLoading])
 
+  // Generate activity from the loaded pages
+  const activities: ActivityItem[] = records.map((record: MedicalRecord) => ({
+    id: record.id,
+    type: 'record_added',
+    title: `Added ${record.record_type_display}`,
+    patient: record.patient_name,
+    patientId: record.patient_health_id,
+    description: record.diagnosis,
+    timestamp: formatRelativeTime(record.created_at),
+    status: record.ipfs_cid || record.ipfs_metadata_cid ? 'verified' : 'completed'
+  }))
+
   const filteredActivities = activities.filter((activity) => {
     const matchesType = filterType === 'all' || activity.type === filterType
     return matchesType
@@ -105,7 +99,7 @@ export default function DoctorActivityPage() {
   }
 
   // Stats
-  const recordsAdded = activities.filter(a => a.type === 'record_added').length
+  const recordsAdded = totalRecords ?? activities.filter(a => a.type === 'record_added').length
   const verifiedCount = activities.filter(a => a.status === 'verified').length
 
   if (authLoading || isLoadingRecords) {
@@ -295,6 +289,14 @@ export default function DoctorActivityPage() {
                 })}
               </div>
             )}
+            {hasMore && (
+              <div className="flex justify-center mt-4">
+                <Button variant="outline" onClick={loadMore} disabled={isLoadingMore}>
+                  {isLoadingMore && <Loader2 className="w-4 h-4 mr-2 animate-spin" />}
+                  Load older activity
+                </Button>
+              </div>
+            )}
           </CardContent>
         </Card>
       </div>
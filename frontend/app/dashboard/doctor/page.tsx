@@ -16,7 +16,7 @@ import { Select, SelectContent, SelectItem, SelectTrigger, SelectValue } from '@
 import { useAuth } from '@/hooks/useAuth'
 import {
   searchPatient,
-  getPatientRecords,
+  getPatientRecordsPage,
   createRecord,
   DoctorProfile,
   MedicalRecord
@@ -35,6 +35,8 @@ export default function DoctorDashboard() {
   const [searchError, setSearchError] = useState<string | null>(null)
   const [selectedPatient, setSelectedPatient] = useState<PatientInfo | null>(null)
   const [patientRecords, setPatientRecords] = useState<MedicalRecord[]>([])
+  const [recordsCursor, setRecordsCursor] = useState<string | null>(null)
+  const [isLoadingMore, setIsLoadingMore] = useState(false)
   const [isAddRecordOpen, setIsAddRecordOpen] = useState(false)
   const [isSubmitting, setIsSubmitting] = useState(false)
 
@@ -54,6 +56,7 @@ export default function DoctorDashboard() {
     setSearchError(null)
     setSelectedPatient(null)
     setPatientRecords([])
+    setRecordsCursor(null)
 
     try {
       // First search for the patient
@@ -62,8 +65,9 @@ export default function DoctorDashboard() {
 
       // Then get their records
       try {
-        const recordsData = await getPatientRecords(searchId.trim())
+        const recordsData = await getPatientRecordsPage(searchId.trim())
         setPatientRecords(recordsData.records)
+        setRecordsCursor(recordsData.next_cursor)
       } catch {
         // Patient found but no records or access denied
         setPatientRecords([])
@@ -75,6 +79,22 @@ export default function DoctorDashboard() {
     }
   }
 
+  // Older records load one page at a time
+  const handleLoadMore = async () => {
+    if (!selectedPatient || !recordsCursor) return
+
+    setIsLoadingMore(true)
+    try {
+      const recordsData = await getPatientRecordsPage(selectedPatient.health_id, recordsCursor)
+      setPatientRecords(current => [...current, ...recordsData.records])
+      setRecordsCursor(recordsData.next_cursor)
+    } catch (err) {
+      console.error('Failed to load records:', err)
+    } finally {
+      setIsLoadingMore(false)
+    }
+  }
+
   const handleAddRecord = async () => {
     if (!selectedPatient || !recordType || !diagnosis) return
 
@@ -381,6 +401,14 @@ export default function DoctorDashboard() {
                       No visible medical records for this patient.
                     </p>
                   )}
+                  {recordsCursor && (
+                    <div className="flex justify-center mt-4">
+                      <Button variant="outline" onClick={handleLoadMore} disabled={isLoadingMore}>
+                        {isLoadingMore && <Loader2 className="w-4 h-4 mr-2 animate-spin" />}
+                        Load earlier records
+                      </Button>
+                    </div>
+                  )}
                 </div>
               </CardContent>
             </Card>
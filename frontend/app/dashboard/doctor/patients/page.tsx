@@ -24,7 +24,7 @@ import {
 } from '@/components/ui/dialog'
 import { Label } from '@/components/ui/label'
 import { useAuth } from '@/hooks/useAuth'
-import { DoctorProfile, MedicalRecord, getRecords, searchPatient } from '@/lib/api'
+import { DoctorProfile, PatientRecordSummary, getPatientSummary, searchPatient } from '@/lib/api'
 
 interface PatientInfo {
   id: string
@@ -57,46 +57,23 @@ export default function MyPatientsPage() {
   const [searchResult, setSearchResult] = useState<SearchResult | null>(null)
   const [searchError, setSearchError] = useState<string | null>(null)
 
-  // Fetch records and extract unique patients
+  // Fetch the per-patient record summary
   useEffect(() => {
     async function fetchRecords() {
       try {
         setIsLoadingRecords(true)
         setError(null)
-        const records = await getRecords()
+        const summary = await getPatientSummary()
 
-        setTotalRecords(records.length)
+        setTotalRecords(summary.reduce((total, row) => total + row.record_count, 0))
 
-        // Extract unique patients from records
-        const patientMap = new Map<string, PatientInfo>()
-
-        records.forEach((record: MedicalRecord) => {
-          const patientKey = record.patient_health_id
-
-          if (patientMap.has(patientKey)) {
-            // Update existing patient
-            const existing = patientMap.get(patientKey)!
-            existing.recordCount += 1
-            // Update last visit if this record is more recent
-            const existingDate = new Date(existing.lastVisit)
-            const recordDate = new Date(record.created_at)
-            if (recordDate > existingDate) {
-              existing.lastVisit = record.created_at
-            }
-          } else {
-            // Add new patient
-            patientMap.set(patientKey, {
-              id: record.patient_health_id,
-              name: record.patient_name,
-              lastVisit: record.created_at,
-              recordCount: 1
-            })
-          }
-        })
-
-        // Sort by most recent visit
-        const patientList = Array.from(patientMap.values())
-          .sort((a, b) => new Date(b.lastVisit).getTime() - new Date(a.lastVisit).getTime())
+        // Already one row per patient, most recent visit first
+        const patientList: PatientInfo[] = summary.map((row: PatientRecordSummary) => ({
+          id: row.health_id,
+          name: row.name,
+          lastVisit: row.last_record_at,
+          recordCount: row.record_count
+        }))
 
         setPatients(patientList)
       } catch (err) {
@@ -1,6 +1,6 @@
 'use client'
 
-import { useState, useEffect } from 'react'
+import { useState } from 'react'
 import { DashboardLayout } from '@/components/dashboard/dashboard-layout'
 import { Card, CardContent, CardHeader, CardTitle } from '@/components/ui/card'
 import { Badge } from '@/components/ui/badge'
@@ -15,7 +15,8 @@ import {
 } from '@/components/ui/select'
 import { ShieldCheck, Clock, CheckCircle2, AlertCircle, FileText, ExternalLink, Loader2 } from 'lucide-react'
 import { useAuth } from '@/hooks/useAuth'
-import { DoctorProfile, MedicalRecord, getRecords } from '@/lib/api'
+import { useRecordPages } from '@/hooks/useRecordPages'
+import { DoctorProfile, MedicalRecord } from '@/lib/api'
 
 interface VerificationItem {
   id: number
@@ -33,61 +34,45 @@ interface VerificationItem {
 export default function VerificationsPage() {
   const { isLoading: authLoading, user, profile } = useAuth('DOCTOR')
   const doctorProfile = profile as DoctorProfile | null
-  const [verifications, setVerifications] = useState<VerificationItem[]>([])
-  const [isLoadingRecords, setIsLoadingRecords] = useState(true)
-  const [error, setError] = useState<string | null>(null)
+  const {
+    records,
+    hasMore,
+    isLoading: isLoadingRecords,
+    isLoadingMore,
+    error,
+    loadMore
+  } = useRecordPages(!authLoading)
   const [statusFilter, setStatusFilter] = useState('all')
 
-  // Fetch records and generate verifications
-  useEffect(() => {
-    async function fetchRecords() {
-      try {
-        setIsLoadingRecords(true)
-        setError(null)
-        const records = await getRecords()
-
-        // Generate verification entries from records
-        const verificationItems: VerificationItem[] = records.map((record: MedicalRecord) => ({
-          id: record.id,
-          recordId: `REC-${record.id.toString().padStart(4, '0')}`,
-          type: record.record_type_display,
-          patient: record.patient_name,
-          patientId: record.patient_health_id,
-          submittedAt: new Date(record.created_at).toLocaleDateString('en-US', {
-            year: 'numeric',
-            month: 'short',
-            day: 'numeric'
-          }) + ' ' + new Date(record.created_at).toLocaleTimeString('en-US', {
-            hour: 'numeric',
-            minute: '2-digit',
-            hour12: true
-          }),
-          status: record.ipfs_cid || record.ipfs_metadata_cid ? 'verified' : 'pending',
-          blockchainHash: record.ipfs_metadata_cid || record.ipfs_cid || null,
-          verifiedAt: record.ipfs_cid ? new Date(record.updated_at || record.created_at).toLocaleDateString('en-US', {
-            year: 'numeric',
-            month: 'short',
-            day: 'numeric'
-          }) + ' ' + new Date(record.updated_at || record.created_at).toLocaleTimeString('en-US', {
-            hour: 'numeric',
-            minute: '2-digit',
-            hour12: true
-          }) : null,
-          ipfsUrl: record.ipfs_url || null
-        }))
-
-        setVerifications(verificationItems)
-      } catch (err) {
-        setError(err instanceof Error ? err.message : 'Failed to load verifications')
-      } finally {
-        setIsLoadingRecords(false)
-      }
-    }
-
-    if (!authLoading) {
-      fetchRecords()
-    }
-  }, [authLoading])
+  // Generate verification entries from the loaded pages
+  const verifications: VerificationItem[] = records.map((record: MedicalRecord) => ({
+    id: record.id,
+    recordId: `REC-${record.id.toString().padStart(4, '0')}`,
+    type: record.record_type_display,
+    patient: record.patient_name,
+    patientId: record.patient_health_id,
+    submittedAt: new Date(record.created_at).toLocaleDateString('en-US', {
+      year: 'numeric',
+      month: 'short',
+      day: 'numeric'
+    }) + ' ' + new Date(record.created_at).toLocaleTimeString('en-US', {
+      hour: 'numeric',
+      minute: '2-digit',
+      hour12: true
+    }),
+    status: record.ipfs_cid || record.ipfs_metadata_cid ? 'verified' : 'pending',
+    blockchainHash: record.ipfs_metadata_cid || record.ipfs_cid || null,
+    verifiedAt: record.ipfs_cid ? new Date(record.updated_at || record.created_at).toLocaleDateString('en-US', {
+      year: 'numeric',
+      month: 'short',
+      day: 'numeric'
+    }) + ' ' + new Date(record.updated_at || record.created_at).toLocaleTimeString('en-US', {
+      hour: 'numeric',
+      minute: '2-digit',
+      hour12: true
+    }) : null,
+    ipfsUrl: record.ipfs_url || null
+  }))
 
   const filteredVerifications = verifications.filter((verification) => {
     const matchesStatus = statusFilter === 'all' || verification.status === statusFilter
@@ -353,6 +338,15 @@ export default function VerificationsPage() {
             ))}
           </div>
         )}
+
+        {hasMore && (
+          <div className="flex justify-center">
+            <Button variant="outline" onClick={loadMore} disabled={isLoadingMore}>
+              {isLoadingMore && <Loader2 className="w-4 h-4 mr-2 animate-spin" />}
+              Load older records
+            </Button>
+          </div>
+        )}
       </div>
     </DashboardLayout>
   )
@@ -8,33 +8,30 @@ import { MedicalRecordCard } from '@/components/dashboard/medical-record-card'
 import { Card, CardContent, CardHeader, CardTitle } from '@/components/ui/card'
 import { FileText, Users, Calendar, EyeOff, ShieldCheck, Loader2 } from 'lucide-react'
 import { Badge } from '@/components/ui/badge'
+import { Button } from '@/components/ui/button'
 import { useAuth } from '@/hooks/useAuth'
-import { getRecords, toggleRecordVisibility, MedicalRecord, PatientProfile } from '@/lib/api'
+import { useRecordPages } from '@/hooks/useRecordPages'
+import { getDashboardStats, toggleRecordVisibility, DashboardStats, PatientProfile } from '@/lib/api'
 
 export default function PatientDashboard() {
   const { isLoading: authLoading, user, profile } = useAuth('PATIENT')
-  const [records, setRecords] = useState<MedicalRecord[]>([])
-  const [isLoadingRecords, setIsLoadingRecords] = useState(true)
-  const [error, setError] = useState<string | null>(null)
+  const {
+    records,
+    setRecords,
+    hasMore,
+    isLoading: isLoadingRecords,
+    isLoadingMore,
+    error,
+    loadMore
+  } = useRecordPages(!authLoading && !!user)
+  const [stats, setStats] = useState<DashboardStats>({})
 
   const patientProfile = profile as PatientProfile | null
 
-  // Fetch medical records
+  // The stat cards come from the server-side counters, not the loaded pages
   useEffect(() => {
-    async function fetchRecords() {
-      try {
-        const data = await getRecords()
-        setRecords(data)
-      } catch (err) {
-        setError('Failed to load medical records')
-        console.error(err)
-      } finally {
-        setIsLoadingRecords(false)
-      }
-    }
-
     if (!authLoading && user) {
-      fetchRecords()
+      getDashboardStats().then(setStats).catch(console.error)
     }
   }, [authLoading, user])
 
@@ -44,6 +41,12 @@ export default function PatientDashboard() {
       setRecords(records.map(record =>
         record.id === id ? { ...record, is_visible: result.is_visible } : record
       ))
+      const shift = result.is_visible ? 1 : -1
+      setStats(current => ({
+        ...current,
+        visible_records: (current.visible_records ?? 0) + shift,
+        hidden_records: (current.hidden_records ?? 0) - shift
+      }))
     } catch (err) {
       console.error('Failed to toggle visibility:', err)
     }
@@ -61,23 +64,23 @@ export default function PatientDashboard() {
     )
   }
 
-  const visibleRecords = records.filter(r => r.is_visible).length
-  const hiddenRecords = records.filter(r => !r.is_visible).length
+  const visibleRecords = stats.visible_records ?? 0
+  const hiddenRecords = stats.hidden_records ?? 0
   const userName = patientProfile
     ? `${patientProfile.first_name} ${patientProfile.last_name}`
     : user?.name || 'Patient'
   const healthId = patientProfile?.health_id || user?.health_id || 'N/A'
 
   // Get the most recent record date for "Last Visit"
-  const lastVisitDate = records.length > 0
-    ? new Date(records[0].created_at).toLocaleDateString('en-US', { month: 'short', day: 'numeric' })
+  const lastVisitDate = stats.last_visit
+    ? new Date(stats.last_visit).toLocaleDateString('en-US', { month: 'short', day: 'numeric' })
     : 'None'
-  const lastVisitYear = records.length > 0
-    ? new Date(records[0].created_at).getFullYear().toString()
+  const lastVisitYear = stats.last_visit
+    ? new Date(stats.last_visit).getFullYear().toString()
     : ''
 
   // Count unique doctors
-  const uniqueDoctors = new Set(records.map(r => r.doctor_name)).size
+  const uniqueDoctors = stats.unique_doctors ?? 0
 
   return (
     <DashboardLayout
@@ -120,7 +123,7 @@ export default function PatientDashboard() {
         <div className="grid grid-cols-1 md:grid-cols-2 lg:grid-cols-4 gap-6">
           <StatCard
             title="Total Records"
-            value={records.length}
+            value={stats.total_records ?? records.length}
             icon={FileText}
             description="Lifetime medical records"
           />
@@ -188,6 +191,14 @@ export default function PatientDashboard() {
                   ))}
                 </div>
               )}
+              {hasMore && (
+                <div className="flex justify-center mt-4">
+                  <Button variant="outline" onClick={loadMore} disabled={isLoadingMore}>
+                    {isLoadingMore && <Loader2 className="w-4 h-4 mr-2 animate-spin" />}
+                    Load more
+                  </Button>
+                </div>
+              )}
             </CardContent>
           </Card>
         </motion.div>
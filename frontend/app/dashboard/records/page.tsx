@@ -1,6 +1,6 @@
 'use client'
 
-import { useState, useEffect } from 'react'
+import { useState } from 'react'
 import { DashboardLayout } from '@/components/dashboard/dashboard-layout'
 import { MedicalRecordCard } from '@/components/dashboard/medical-record-card'
 import { Card, CardContent, CardHeader, CardTitle } from '@/components/ui/card'
@@ -11,14 +11,21 @@ import { Search, Filter, Loader2, AlertCircle, FileText, Download, Calendar, Bui
 import { Select, SelectContent, SelectItem, SelectTrigger, SelectValue } from '@/components/ui/select'
 import { Dialog, DialogContent, DialogHeader, DialogTitle } from '@/components/ui/dialog'
 import { useAuth } from '@/hooks/useAuth'
-import { PatientProfile, MedicalRecord, getRecords, toggleRecordVisibility, getDocumentUrl } from '@/lib/api'
+import { useRecordPages } from '@/hooks/useRecordPages'
+import { PatientProfile, MedicalRecord, toggleRecordVisibility, getDocumentUrl } from '@/lib/api'
 
 export default function MedicalRecordsPage() {
   const { isLoading: authLoading, user, profile } = useAuth('PATIENT')
   const patientProfile = profile as PatientProfile | null
-  const [records, setRecords] = useState<MedicalRecord[]>([])
-  const [isLoadingRecords, setIsLoadingRecords] = useState(true)
-  const [error, setError] = useState<string | null>(null)
+  const {
+    records,
+    setRecords,
+    hasMore,
+    isLoading: isLoadingRecords,
+    isLoadingMore,
+    error,
+    loadMore
+  } = useRecordPages(!authLoading)
   const [searchQuery, setSearchQuery] = useState('')
   const [filterType, setFilterType] = useState('all')
 
@@ -35,26 +42,6 @@ export default function MedicalRecordsPage() {
     })
   }
 
-  // Fetch records from API
-  useEffect(() => {
-    async function fetchRecords() {
-      try {
-        setIsLoadingRecords(true)
-        setError(null)
-        const data = await getRecords()
-        setRecords(data)
-      } catch (err) {
-        setError(err instanceof Error ? err.message : 'Failed to load records')
-      } finally {
-        setIsLoadingRecords(false)
-      }
-    }
-
-    if (!authLoading) {
-      fetchRecords()
-    }
-  }, [authLoading])
-
   const handleToggleVisibility = async (id: number) => {
     try {
       const result = await toggleRecordVisibility(id)
@@ -241,6 +228,14 @@ ${record.notes || 'No additional notes'}
                 ))}
               </div>
             )}
+            {hasMore && (
+              <div className="flex justify-center mt-4">
+                <Button variant="outline" onClick={loadMore} disabled={isLoadingMore}>
+                  {isLoadingMore && <Loader2 className="w-4 h-4 mr-2 animate-spin" />}
+                  Load more
+                </Button>
+              </div>
+            )}
           </CardContent>
         </Card>
       </div>
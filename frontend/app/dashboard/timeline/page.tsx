@@ -8,7 +8,8 @@ import { Badge } from '@/components/ui/badge'
 import { Calendar, Loader2, AlertCircle } from 'lucide-react'
 import { Button } from '@/components/ui/button'
 import { useAuth } from '@/hooks/useAuth'
-import { PatientProfile, MedicalRecord, getRecords } from '@/lib/api'
+import { useRecordPages } from '@/hooks/useRecordPages'
+import { PatientProfile, MedicalRecord, getDashboardStats } from '@/lib/api'
 
 interface TimelineEvent {
   date: string
@@ -21,44 +22,37 @@ interface TimelineEvent {
 export default function TimelinePage() {
   const { isLoading: authLoading, user, profile } = useAuth('PATIENT')
   const patientProfile = profile as PatientProfile | null
-  const [timelineEvents, setTimelineEvents] = useState<TimelineEvent[]>([])
-  const [isLoadingRecords, setIsLoadingRecords] = useState(true)
-  const [error, setError] = useState<string | null>(null)
+  const {
+    records,
+    hasMore,
+    isLoading: isLoadingRecords,
+    isLoadingMore,
+    error,
+    loadMore
+  } = useRecordPages(!authLoading)
+  const [totalRecords, setTotalRecords] = useState<number | null>(null)
 
-  // Fetch records and transform to timeline events
   useEffect(() => {
-    async function fetchRecords() {
-      try {
-        setIsLoadingRecords(true)
-        setError(null)
-        const records = await getRecords()
-
-        // Transform records to timeline events
-        const events: TimelineEvent[] = records.map((record: MedicalRecord) => ({
-          date: new Date(record.created_at).toLocaleDateString('en-US', {
-            year: 'numeric',
-            month: 'short',
-            day: 'numeric'
-          }),
-          recordType: `${record.record_type_display} - ${record.diagnosis}`,
-          doctor: record.doctor_name,
-          hospital: record.hospital,
-          verified: !!record.ipfs_cid || !!record.ipfs_metadata_cid // Consider verified if on IPFS
-        }))
-
-        setTimelineEvents(events)
-      } catch (err) {
-        setError(err instanceof Error ? err.message : 'Failed to load timeline')
-      } finally {
-        setIsLoadingRecords(false)
-      }
-    }
-
     if (!authLoading) {
-      fetchRecords()
+      getDashboardStats()
+        .then(stats => setTotalRecords(stats.total_records ?? null))
+        .catch(console.error)
     }
   }, [authLoading])
 
+  // Transform the loaded pages to timeline events
+  const timelineEvents: TimelineEvent[] = records.map((record: MedicalRecord) => ({
+    date: new Date(record.created_at).toLocaleDateString('en-US', {
+      year: 'numeric',
+      month: 'short',
+      day: 'numeric'
+    }),
+    recordType: `${record.record_type_display} - ${record.diagnosis}`,
+    doctor: record.doctor_name,
+    hospital: record.hospital,
+    verified: !!record.ipfs_cid || !!record.ipfs_metadata_cid // Consider verified if on IPFS
+  }))
+
   const verifiedCount = timelineEvents.filter(e => e.verified).length
 
   if (authLoading || isLoadingRecords) {
@@ -117,7 +111,7 @@ export default function TimelinePage() {
                   A complete chronological view of your lifelong medical history
                 </p>
                 <div className="flex items-center gap-2 mt-3">
-                  <Badge variant="secondary">{timelineEvents.length} Records</Badge>
+                  <Badge variant="secondary">{totalRecords ?? timelineEvents.length} Records</Badge>
                   {verifiedCount > 0 && (
                     <Badge variant="outline" className="border-green-500/30 text-green-700 bg-green-50">
                       {verifiedCount} Verified on Blockchain
@@ -144,6 +138,14 @@ export default function TimelinePage() {
             ) : (
               <MedicalTimeline events={timelineEvents} />
             )}
+            {hasMore && (
+              <div className="flex justify-center mt-4">
+                <Button variant="outline" onClick={loadMore} disabled={isLoadingMore}>
+                  {isLoadingMore && <Loader2 className="w-4 h-4 mr-2 animate-spin" />}
+                  Load earlier records
+                </Button>
+              </div>
+            )}
           </CardContent>
         </Card>
       </div>
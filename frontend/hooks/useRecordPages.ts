@@ -0,0 +1,58 @@
+'use client'
+
+import { useCallback, useEffect, useState } from 'react'
+import { MedicalRecord, getRecordsPage } from '@/lib/api'
+
+// Loads the record list one cursor page at a time, newest first.
+// Pages only load when asked for, so long histories stay cheap to open.
+export function useRecordPages(enabled: boolean) {
+    const [records, setRecords] = useState<MedicalRecord[]>([])
+    const [nextCursor, setNextCursor] = useState<string | null>(null)
+    const [isLoading, setIsLoading] = useState(true)
+    const [isLoadingMore, setIsLoadingMore] = useState(false)
+    const [error, setError] = useState<string | null>(null)
+
+    useEffect(() => {
+        async function fetchFirstPage() {
+            try {
+                setIsLoading(true)
+                setError(null)
+                const page = await getRecordsPage()
+                setRecords(page.results)
+                setNextCursor(page.next_cursor)
+            } catch (err) {
+                setError(err instanceof Error ? err.message : 'Failed to load records')
+            } finally {
+                setIsLoading(false)
+            }
+        }
+
+        if (enabled) {
+            fetchFirstPage()
+        }
+    }, [enabled])
+
+    const loadMore = useCallback(async () => {
+        if (!nextCursor || isLoadingMore) return
+        try {
+            setIsLoadingMore(true)
+            const page = await getRecordsPage(nextCursor)
+            setRecords(previous => [...previous, ...page.results])
+            setNextCursor(page.next_cursor)
+        } catch (err) {
+            setError(err instanceof Error ? err.message : 'Failed to load records')
+        } finally {
+            setIsLoadingMore(false)
+        }
+    }, [nextCursor, isLoadingMore])
+
+    return {
+        records,
+        setRecords,
+        hasMore: nextCursor !== null,
+        isLoading,
+        isLoadingMore,
+        error,
+        loadMore
+    }
+}
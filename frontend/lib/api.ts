@@ -67,6 +67,8 @@ export interface PatientProfile {
     phone: string;
     profile_picture?: string | null;
     profile_picture_url?: string | null;
+    // Resized WebP URLs keyed by size in pixels ("64", "160", "512")
+    profile_picture_urls?: Record<string, string> | null;
 }
 
 export interface DoctorProfile {
@@ -81,6 +83,8 @@ export interface DoctorProfile {
     phone: string;
     profile_picture?: string | null;
     profile_picture_url?: string | null;
+    // Resized WebP URLs keyed by size in pixels ("64", "160", "512")
+    profile_picture_urls?: Record<string, string> | null;
 }
 
 export interface MedicalRecord {
@@ -90,6 +94,9 @@ export interface MedicalRecord {
     diagnosis: string;
     notes: string;
     document: string | null;
+    ipfs_cid?: string | null;
+    ipfs_metadata_cid?: string | null;
+    ipfs_status?: 'pending' | 'pinned' | 'failed';
     is_visible: boolean;
     created_at: string;
     doctor_name: string;
@@ -325,8 +332,15 @@ export async function getDashboardStats(): Promise<DashboardStats> {
 }
 
 // Medical Records APIs
-export async function getRecords(): Promise<MedicalRecord[]> {
-    const response = await fetchWithAuth('/records/');
+export interface RecordPage {
+    next: string | null;
+    next_cursor: string | null;
+    results: MedicalRecord[];
+}
+
+export async function getRecordsPage(cursor?: string): Promise<RecordPage> {
+    const query = cursor ? `?cursor=${encodeURIComponent(cursor)}` : '';
+    const response = await fetchWithAuth(`/records/${query}`);
 
     if (!response.ok) {
         throw new Error('Failed to fetch records');
@@ -335,6 +349,65 @@ export async function getRecords(): Promise<MedicalRecord[]> {
     return response.json();
 }
 
+// Record counts grouped per patient (doctors) or per doctor (patients)
+export interface PatientRecordSummary {
+    health_id: string;
+    name: string;
+    record_count: number;
+    last_record_at: string;
+}
+
+export interface DoctorRecordSummary {
+    doctor_id: string;
+    name: string;
+    specialization: string;
+    hospital: string;
+    record_count: number;
+    last_record_at: string;
+}
+
+async function fetchRecordSummary() {
+    const response = await fetchWithAuth('/records/summary/');
+
+    if (!response.ok) {
+        throw new Error('Failed to fetch record summary');
+    }
+
+    return response.json();
+}
+
+// A doctor's patients, most recent record first
+export async function getPatientSummary(): Promise<PatientRecordSummary[]> {
+    return fetchRecordSummary();
+}
+
+// A patient's doctors, most recent record first
+export async function getDoctorSummary(): Promise<DoctorRecordSummary[]> {
+    return fetchRecordSummary();
+}
+
+export async function searchRecords(q: string, options: {
+    record_type?: string;
+    patient?: string;
+    offset?: number;
+} = {}): Promise<{
+    query: string;
+    results: (MedicalRecord & { rank: number | null })[];
+    next_offset: number | null;
+}> {
+    const params = new URLSearchParams({ q });
+    if (options.record_type) params.set('record_type', options.record_type);
+    if (options.patient) params.set('patient', options.patient);
+    if (options.offset) params.set('offset', String(options.offset));
+    const response = await fetchWithAuth(`/records/search/?${params.toString()}`);
+
+    if (!response.ok) {
+        throw new Error('Failed to search records');
+    }
+
+    return response.json();
+}
+
 export async function createRecord(data: {
     patient_health_id: string;
     record_type: string;
@@ -436,11 +509,16 @@ export async function searchPatient(healthId: string): Promise<{
     return response.json();
 }
 
-export async function getPatientRecords(healthId: string): Promise<{
+export interface PatientRecordPage {
     patient: { health_id: string; name: string; age: number | null };
     records: MedicalRecord[];
-}> {
-    const response = await fetchWithAuth(`/patients/${healthId}/records/`);
+    next: string | null;
+    next_cursor: string | null;
+}
+
+export async function getPatientRecordsPage(healthId: string, cursor?: string): Promise<PatientRecordPage> {
+    const query = cursor ? `?cursor=${encodeURIComponent(cursor)}` : '';
+    const response = await fetchWithAuth(`/patients/${healthId}/records/${query}`);
 
     if (!response.ok) {
         throw new Error('Failed to fetch patient records');